@@ -2,183 +2,218 @@
 
 import os
 import json
-import shutil
+import sqlite3
+import threading
 import time
-from typing import Optional, Dict
-from datetime import datetime, timedelta
+from contextlib import contextmanager
+from typing import Optional, Dict, List
+from datetime import datetime
 
 class AudioCache:
+    """MP3 files indexed in SQLite by content hash
+
+    The index keeps each file's size, last access time and metadata. Totals
+    are maintained by triggers, so touching or adding a file updates one
+    row instead of rewriting the whole index. Eviction walks the
+    last_accessed index oldest first, and runs in a write transaction so
+    concurrent sessions can't evict the same files or corrupt the totals.
+    """
+
     def __init__(self, cache_dir: Optional[str] = None, max_age_days: int = 30, max_size_mb: int = 100):
         if cache_dir is None:
             cache_dir = os.path.dirname(__file__)
         self.cache_dir = cache_dir
+        # Index used before the SQLite one, imported on first use
         self.metadata_path = os.path.join(cache_dir, 'metadata.json')
+        self.index_path = os.path.join(cache_dir, 'index.sqlite3')
         self.max_age_days = max_age_days
         self.max_size_mb = max_size_mb
-        self.metadata = self._load_metadata()
-        
-    def _load_metadata(self) -> Dict:
-        """Load or create cache metadata"""
-        if os.path.exists(self.metadata_path):
+        self.lock = threading.Lock()
+        # Transactions are explicit, see _transaction
+        self.db = sqlite3.connect(self.index_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._create_index()
+
+    def _create_index(self) -> None:
+        """Create the index if needed, importing metadata.json into a new one"""
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                hash TEXT PRIMARY KEY,
+                size_bytes INTEGER NOT NULL,
+                last_accessed REAL NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS files_last_accessed ON files (last_accessed);
+            CREATE TABLE IF NOT EXISTS totals (key TEXT PRIMARY KEY, value REAL NOT NULL);
+            INSERT OR IGNORE INTO totals VALUES ('total_size_bytes', 0), ('last_cleanup', strftime('%s', 'now'));
+            CREATE TRIGGER IF NOT EXISTS files_insert AFTER INSERT ON files BEGIN
+                UPDATE totals SET value = value + NEW.size_bytes WHERE key = 'total_size_bytes';
+            END;
+            CREATE TRIGGER IF NOT EXISTS files_delete AFTER DELETE ON files BEGIN
+                UPDATE totals SET value = value - OLD.size_bytes WHERE key = 'total_size_bytes';
+            END;
+            CREATE TRIGGER IF NOT EXISTS files_resize AFTER UPDATE OF size_bytes ON files BEGIN
+                UPDATE totals SET value = value + NEW.size_bytes - OLD.size_bytes WHERE key = 'total_size_bytes';
+            END;
+        """)
+        with self._transaction() as db:
+            empty = db.execute("SELECT NOT EXISTS (SELECT 1 FROM files)").fetchone()[0]
+            if empty and os.path.exists(self.metadata_path):
+                self._import_metadata()
+
+    def _import_metadata(self) -> None:
+        """Copy entries from the old metadata.json, for files that still exist"""
+        try:
+            with open(self.metadata_path, 'r') as f:
+                metadata = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        rows = []
+        for file_hash, info in metadata.get('files', {}).items():
+            info = dict(info)
+            size_bytes = info.pop('size_bytes', 0)
+            last_accessed = self._timestamp(info.pop('last_accessed', None))
+            if os.path.exists(self._path(file_hash)):
+                rows.append((file_hash, size_bytes, last_accessed, json.dumps(info, ensure_ascii=False)))
+        self.db.executemany("INSERT OR IGNORE INTO files VALUES (?, ?, ?, ?)", rows)
+        if 'last_cleanup' in metadata:
+            self.db.execute(
+                "UPDATE totals SET value = ? WHERE key = 'last_cleanup'",
+                (self._timestamp(metadata['last_cleanup']),)
+            )
+
+    @staticmethod
+    def _timestamp(value) -> float:
+        """Epoch seconds from a float or the ISO strings older indexes stored"""
+        if isinstance(value, (int, float)):
+            return float(value)
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except (AttributeError, ValueError):
+            return time.time()
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements in one write transaction, shared with other processes"""
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.db
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+
+    def _path(self, file_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{file_hash}.mp3")
+
+    def _total(self, key: str) -> float:
+        return self.db.execute("SELECT value FROM totals WHERE key = ?", (key,)).fetchone()[0]
+
+    def _remove_files(self, file_hashes: List[str]) -> None:
+        for file_hash in file_hashes:
             try:
-                with open(self.metadata_path, 'r') as f:
-                    metadata = json.load(f)
-                    # Convert string timestamp to float if needed
-                    if isinstance(metadata.get('last_cleanup'), str):
-                        try:
-                            dt = datetime.fromisoformat(metadata['last_cleanup'].replace('Z', '+00:00'))
-                            metadata['last_cleanup'] = dt.timestamp()
-                        except:
-                            metadata['last_cleanup'] = time.time()
-                    return metadata
-            except json.JSONDecodeError:
+                os.remove(self._path(file_hash))
+            except FileNotFoundError:
                 pass
-        return {
-            'files': {},
-            'total_size_bytes': 0,
-            'last_cleanup': time.time(),
-            'max_size_mb': self.max_size_mb
-        }
-    
-    def _save_metadata(self):
-        """Save cache metadata"""
-        with open(self.metadata_path, 'w') as f:
-            # Convert timestamp to ISO format for better readability
-            metadata_to_save = self.metadata.copy()
-            metadata_to_save['last_cleanup'] = datetime.fromtimestamp(
-                self.metadata['last_cleanup']
-            ).isoformat()
-            json.dump(metadata_to_save, f, indent=2, ensure_ascii=False)
 
     def get_file_path(self, file_hash: str) -> Optional[str]:
         """Get path if file exists in cache"""
-        path = os.path.join(self.cache_dir, f"{file_hash}.mp3")
+        path = self._path(file_hash)
         return path if os.path.exists(path) else None
 
     def add_file(self, file_hash: str, file_data: bytes, metadata: Dict) -> str:
         """Add a file to the cache with metadata"""
-        file_path = os.path.join(self.cache_dir, f"{file_hash}.mp3")
-        
-        # Save file
-        with open(file_path, 'wb') as f:
+        file_path = self._path(file_hash)
+
+        # Write under a unique name and rename, so readers never see a partial file
+        temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
             f.write(file_data)
-            
-        # Update metadata
-        file_size = os.path.getsize(file_path)
-        self.metadata['files'][file_hash] = {
-            'size_bytes': file_size,
-            'last_accessed': time.time(),
-            **metadata
-        }
-        self.metadata['total_size_bytes'] = sum(
-            f['size_bytes'] for f in self.metadata['files'].values()
-        )
-        self._save_metadata()
-        
+        os.replace(temp_path, file_path)
+
+        # Update index
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO files VALUES (?, ?, ?, ?) ON CONFLICT (hash) DO UPDATE SET "
+                "size_bytes = excluded.size_bytes, last_accessed = excluded.last_accessed, metadata = excluded.metadata",
+                (file_hash, len(file_data), time.time(), json.dumps(metadata, ensure_ascii=False))
+            )
+
         # Run cleanup if needed
         self._cleanup_by_size()
         return file_path
 
     def touch_file(self, file_hash: str):
         """Update last access time of a file"""
-        if file_hash in self.metadata['files']:
-            self.metadata['files'][file_hash]['last_accessed'] = time.time()
-            self._save_metadata()
+        with self.lock:
+            self.db.execute("UPDATE files SET last_accessed = ? WHERE hash = ?", (time.time(), file_hash))
 
     def _cleanup_by_size(self):
         """Remove least recently used files if cache exceeds size limit"""
-        if self.metadata['total_size_bytes'] <= self.max_size_mb * 1024 * 1024:
-            return
+        max_bytes = self.max_size_mb * 1024 * 1024
+        with self.lock:
+            if self._total('total_size_bytes') <= max_bytes:
+                return
 
-        # Sort files by last access time
-        files = sorted(
-            [(h, i) for h, i in self.metadata['files'].items()
-             if os.path.exists(self.get_file_path(h))],
-            key=lambda x: x[1]['last_accessed']
-        )
-
-        bytes_to_free = self.metadata['total_size_bytes'] - (self.max_size_mb * 1024 * 1024)
-        bytes_freed = 0
-        files_removed = []
-
-        for file_hash, info in files:
-            if bytes_freed >= bytes_to_free:
-                break
-
-            file_path = self.get_file_path(file_hash)
-            if file_path:
-                try:
-                    os.remove(file_path)
-                    bytes_freed += info['size_bytes']
-                    files_removed.append(file_hash)
-                except OSError:
-                    continue
-
-        # Update metadata
-        for file_hash in files_removed:
-            del self.metadata['files'][file_hash]
-
-        self.metadata['total_size_bytes'] -= bytes_freed
-        self.metadata['last_cleanup'] = time.time()
-        self._save_metadata()
+        with self._transaction() as db:
+            # Another session may have cleaned up while waiting for the lock
+            total_bytes = self._total('total_size_bytes')
+            files_removed = []
+            for file_hash, size_bytes in db.execute(
+                "SELECT hash, size_bytes FROM files ORDER BY last_accessed"
+            ):
+                if total_bytes <= max_bytes:
+                    break
+                files_removed.append(file_hash)
+                total_bytes -= size_bytes
+            db.executemany("DELETE FROM files WHERE hash = ?", [(file_hash,) for file_hash in files_removed])
+            db.execute("UPDATE totals SET value = ? WHERE key = 'last_cleanup'", (time.time(),))
+        self._remove_files(files_removed)
 
     def clean_old_files(self) -> Dict:
         """Remove files that haven't been accessed in max_age_days"""
         current_time = time.time()
         cutoff_time = current_time - (self.max_age_days * 24 * 60 * 60)
-        
-        files_removed = 0
-        bytes_freed = 0
-        
-        # Identify old files
-        for file_hash, file_info in list(self.metadata['files'].items()):
-            last_accessed = file_info['last_accessed']
-            if last_accessed < cutoff_time:
-                file_path = self.get_file_path(file_hash)
-                if file_path:
-                    bytes_freed += file_info['size_bytes']
-                    os.remove(file_path)
-                    files_removed += 1
-                    del self.metadata['files'][file_hash]
-        
-        # Update metadata
-        self.metadata['total_size_bytes'] = max(0, self.metadata['total_size_bytes'] - bytes_freed)
-        self.metadata['last_cleanup'] = current_time
-        self._save_metadata()
-        
+
+        with self._transaction() as db:
+            old_files = db.execute(
+                "SELECT hash, size_bytes FROM files WHERE last_accessed < ?", (cutoff_time,)
+            ).fetchall()
+            db.execute("DELETE FROM files WHERE last_accessed < ?", (cutoff_time,))
+            db.execute("UPDATE totals SET value = ? WHERE key = 'last_cleanup'", (current_time,))
+            remaining_files = db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            remaining_bytes = self._total('total_size_bytes')
+        self._remove_files([file_hash for file_hash, _ in old_files])
+
         return {
-            'files_removed': files_removed,
-            'bytes_freed': bytes_freed,
-            'remaining_files': len(self.metadata['files']),
-            'remaining_size_mb': self.metadata['total_size_bytes'] / (1024 * 1024)
+            'files_removed': len(old_files),
+            'bytes_freed': sum(size_bytes for _, size_bytes in old_files),
+            'remaining_files': remaining_files,
+            'remaining_size_mb': remaining_bytes / (1024 * 1024)
         }
-        
+
     def validate_cache(self):
         """Validate cache and fix any inconsistencies"""
-        actual_files = {f.replace('.mp3', '') for f in os.listdir(self.cache_dir) 
-                       if f.endswith('.mp3')}
-        metadata_files = set(self.metadata['files'].keys())
-        
-        # Remove missing files from metadata
-        for file_hash in metadata_files - actual_files:
-            if file_hash in self.metadata['files']:
-                del self.metadata['files'][file_hash]
-        
-        # Update total size
-        self.metadata['total_size_bytes'] = sum(
-            os.path.getsize(self.get_file_path(h))
-            for h in self.metadata['files']
-            if self.get_file_path(h)
-        )
-        self._save_metadata()
+        with self._transaction() as db:
+            for file_hash, size_bytes in db.execute("SELECT hash, size_bytes FROM files").fetchall():
+                path = self.get_file_path(file_hash)
+                # Remove missing files from the index and correct sizes
+                if path is None:
+                    db.execute("DELETE FROM files WHERE hash = ?", (file_hash,))
+                elif os.path.getsize(path) != size_bytes:
+                    db.execute("UPDATE files SET size_bytes = ? WHERE hash = ?", (os.path.getsize(path), file_hash))
 
     def get_stats(self) -> Dict:
         """Get cache statistics"""
+        with self.lock:
+            file_count = self.db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            total_bytes = self._total('total_size_bytes')
+            last_cleanup = self._total('last_cleanup')
         return {
-            'cache_size_mb': self.metadata['total_size_bytes'] / (1024 * 1024),
+            'cache_size_mb': total_bytes / (1024 * 1024),
             'max_size_mb': self.max_size_mb,
-            'file_count': len(self.metadata['files']),
-            'last_cleanup': datetime.fromtimestamp(
-                self.metadata['last_cleanup']
-            ).strftime('%Y-%m-%d %H:%M:%S')
-        }
\ No newline at end of file
+            'file_count': file_count,
+            'last_cleanup': datetime.fromtimestamp(last_cleanup).strftime('%Y-%m-%d %H:%M:%S')
+        }
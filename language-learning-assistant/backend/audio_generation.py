@@ -2,13 +2,24 @@ import boto3
 import hashlib
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 from .audio_cache import AudioCache  # Add missing import
 
 class AudioGenerator:
-    def __init__(self):
-        """Initialize audio generator with caching"""
+    # Polly's MP3 defaults differ by engine (22050 Hz standard, 24000 Hz neural);
+    # one rate for every clip keeps stitched dialogues playable
+    SAMPLE_RATE = '24000'
+
+    def __init__(self, max_workers: int = 6, requests_per_second_per_voice: float = 4.0):
+        """Initialize audio generator with caching
+
+        Batches are synthesized on up to `max_workers` threads, with requests
+        for any one voice spaced to `requests_per_second_per_voice`.
+        """
         self.polly = boto3.client('polly')
         self.cache = AudioCache(
             os.path.join(os.path.dirname(__file__), 'audio_cache'),
@@ -16,11 +27,18 @@ class AudioGenerator:
             max_size_mb=100
         )
         self.voice_capabilities = {}
+        self.voices = None
         self.error_log = []
+        self.max_workers = max_workers
+        self.requests_per_second_per_voice = requests_per_second_per_voice
+        self.rate_lock = threading.Lock()
+        self.next_request = {}
+        # Look voice capabilities up once rather than before every synthesis
+        self.get_available_voices()
 
     def _get_cache_key(self, text: str, voice_id: str) -> str:
         """Generate cache key from text and voice"""
-        content = f"{text}_{voice_id}".encode('utf-8')
+        content = f"{text}_{voice_id}_{self.SAMPLE_RATE}".encode('utf-8')
         return hashlib.md5(content).hexdigest()
 
     def _log_error(self, error_type: str, detail: str, voice_id: Optional[str] = None):
@@ -35,31 +53,82 @@ class AudioGenerator:
             self.error_log = self.error_log[-100:]
 
     def check_voice_capability(self, voice_id: str) -> Dict:
-        """Check if voice supports neural engine, cache result"""
+        """Engines a voice supports, from the describe_voices results
+
+        Makes no Polly request. Voices not seen by get_available_voices are
+        assumed to support only the standard engine.
+        """
         if voice_id not in self.voice_capabilities:
-            try:
-                response = self.polly.describe_voice(VoiceId=voice_id)
-                self.voice_capabilities[voice_id] = {
-                    'supports_neural': 'neural' in response['SupportedEngines'],
-                    'engines': response['SupportedEngines']
-                }
-            except Exception as e:
-                print(f"[AUDIO] Error checking voice capability: {str(e)}")
-                self.voice_capabilities[voice_id] = {
-                    'supports_neural': False,
-                    'engines': ['standard']
-                }
+            self.voice_capabilities[voice_id] = {
+                'supports_neural': False,
+                'engines': ['standard']
+            }
         
         return self.voice_capabilities[voice_id]
 
     def get_available_voices(self) -> List[Dict]:
-        """Get list of available Japanese voices"""
+        """Get list of available Japanese voices, caching their capabilities"""
+        if self.voices is not None:
+            return self.voices
         try:
             response = self.polly.describe_voices(LanguageCode='ja-JP')
-            return response['Voices']
         except Exception as e:
             print(f"[AUDIO] Error getting voices: {str(e)}")
             return []
+        self.voices = response['Voices']
+        for voice in self.voices:
+            engines = voice.get('SupportedEngines', ['standard'])
+            self.voice_capabilities[voice['Id']] = {
+                'supports_neural': 'neural' in engines,
+                'engines': engines
+            }
+        return self.voices
+
+    def _wait_for_voice(self, voice_id: str) -> None:
+        """Space out requests for one voice to the per-voice rate limit"""
+        with self.rate_lock:
+            now = time.monotonic()
+            slot = max(now, self.next_request.get(voice_id, now))
+            self.next_request[voice_id] = slot + 1 / self.requests_per_second_per_voice
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _synthesize(self, text: str, voice_id: str) -> Tuple[bytes, str]:
+        """Synthesize text with Polly, returning the audio and the engine used"""
+        voice_info = self.check_voice_capability(voice_id)
+        engine = 'neural' if voice_info['supports_neural'] else 'standard'
+
+        # Generate audio with fallback
+        self._wait_for_voice(voice_id)
+        try:
+            response = self.polly.synthesize_speech(
+                Text=text,
+                OutputFormat='mp3',
+                SampleRate=self.SAMPLE_RATE,
+                VoiceId=voice_id,
+                Engine=engine
+            )
+        except Exception as e:
+            if 'ValidationException' in str(e) and engine == 'neural':
+                # Log the neural engine failure
+                self._log_error('neural_engine_failed', str(e), voice_id)
+                # Fallback to standard engine
+                engine = 'standard'
+                self._wait_for_voice(voice_id)
+                response = self.polly.synthesize_speech(
+                    Text=text,
+                    OutputFormat='mp3',
+                    SampleRate=self.SAMPLE_RATE,
+                    VoiceId=voice_id,
+                    Engine=engine
+                )
+                # Update voice capabilities cache
+                self.voice_capabilities[voice_id]['supports_neural'] = False
+            else:
+                raise
+
+        # Read audio data
+        return response['AudioStream'].read(), engine
 
     def generate_audio(self, text: str, voice_id: str = "Mizuki") -> Optional[str]:
         """Generate audio with caching and voice capability checking"""
@@ -72,37 +141,7 @@ class AudioGenerator:
                 self.cache.touch_file(cache_key)
                 return cached_path
 
-            # Check voice capabilities
-            voice_info = self.check_voice_capability(voice_id)
-            engine = 'neural' if voice_info['supports_neural'] else 'standard'
-
-            # Generate audio with fallback
-            try:
-                response = self.polly.synthesize_speech(
-                    Text=text,
-                    OutputFormat='mp3',
-                    VoiceId=voice_id,
-                    Engine=engine
-                )
-            except Exception as e:
-                if 'ValidationException' in str(e) and engine == 'neural':
-                    # Log the neural engine failure
-                    self._log_error('neural_engine_failed', str(e), voice_id)
-                    # Fallback to standard engine
-                    engine = 'standard'
-                    response = self.polly.synthesize_speech(
-                        Text=text,
-                        OutputFormat='mp3',
-                        VoiceId=voice_id,
-                        Engine=engine
-                    )
-                    # Update voice capabilities cache
-                    self.voice_capabilities[voice_id]['supports_neural'] = False
-                else:
-                    raise
-
-            # Read audio data
-            audio_data = response['AudioStream'].read()
+            audio_data, engine = self._synthesize(text, voice_id)
 
             # Add to cache with metadata
             return self.cache.add_file(cache_key, audio_data, {
@@ -115,6 +154,82 @@ class AudioGenerator:
             self._log_error('generation_failed', str(e), voice_id)
             return None
 
+    def generate_audio_batch(self, segments: List[Tuple[str, str]]) -> List[Optional[str]]:
+        """Generate audio for (text, voice_id) segments concurrently
+
+        Segments missing from the cache are synthesized in parallel on a
+        thread pool, within the per-voice rate limit. Cache writes stay on
+        the calling thread. Returns a path per segment, None where it failed.
+        """
+        paths = [None] * len(segments)
+        pending = {}
+        for index, (text, voice_id) in enumerate(segments):
+            cache_key = self._get_cache_key(text, voice_id)
+            cached_path = self.cache.get_file_path(cache_key)
+            if cached_path:
+                self.cache.touch_file(cache_key)
+                paths[index] = cached_path
+            else:
+                # Repeated lines are synthesized once
+                pending.setdefault(cache_key, (text, voice_id, []))[2].append(index)
+
+        if not pending:
+            return paths
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as pool:
+            futures = {
+                pool.submit(self._synthesize, text, voice_id): cache_key
+                for cache_key, (text, voice_id, _) in pending.items()
+            }
+            for future in as_completed(futures):
+                cache_key = futures[future]
+                text, voice_id, indices = pending[cache_key]
+                try:
+                    audio_data, engine = future.result()
+                    path = self.cache.add_file(cache_key, audio_data, {
+                        'text': text,
+                        'voice_id': voice_id,
+                        'engine': engine
+                    })
+                except Exception as e:
+                    self._log_error('generation_failed', str(e), voice_id)
+                    continue
+                for index in indices:
+                    paths[index] = path
+        return paths
+
+    def generate_dialogue_audio(self, segments: List[Tuple[str, str]]) -> Optional[str]:
+        """Generate one track for a dialogue of (text, voice_id) segments
+
+        Segments are synthesized concurrently, see generate_audio_batch, and
+        their MP3 frames joined in order. Returns None if any segment failed.
+        """
+        if not segments:
+            return None
+        try:
+            cache_key = self._get_cache_key(json.dumps(segments, ensure_ascii=False), 'dialogue')
+            cached_path = self.cache.get_file_path(cache_key)
+            if cached_path:
+                self.cache.touch_file(cache_key)
+                return cached_path
+
+            paths = self.generate_audio_batch(segments)
+            if not all(paths):
+                return None
+            audio_data = b''
+            for path in paths:
+                with open(path, 'rb') as f:
+                    audio_data += f.read()
+
+            return self.cache.add_file(cache_key, audio_data, {
+                'text': '\n'.join(text for text, _ in segments),
+                'voice_id': ','.join(sorted({voice_id for _, voice_id in segments})),
+                'engine': 'stitched'
+            })
+        except Exception as e:
+            self._log_error('generation_failed', str(e))
+            return None
+
     def get_cache_stats(self) -> Dict:
         """Get cache statistics"""
         return self.cache.get_stats()
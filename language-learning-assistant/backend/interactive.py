@@ -16,10 +16,16 @@ class PracticeItem:
     type: str = "dialogue"  # dialogue, vocabulary, or listening
 
 class InteractiveLearning:
-    def __init__(self):
-        """Initialize interactive learning system with RAG integration"""
+    def __init__(self, stitch_audio: bool = True):
+        """Initialize interactive learning system with RAG integration
+
+        With `stitch_audio`, a listening exercise gets one track for the whole
+        dialogue; otherwise, or if any segment fails, its audio is the first
+        segment that was generated.
+        """
         self.rag_system = RAGSystem()
         self.audio_generator = AudioGenerator()  # Add audio generator
+        self.stitch_audio = stitch_audio
         self.current_session = {
             "score": 0,
             "total_questions": 0,
@@ -194,28 +200,25 @@ class InteractiveLearning:
         try:
             response = eval(result)
             
-            # Generate audio for each dialogue segment
-            audio_files = []
+            # Polly voices use 'Id', the built-in fallback voice 'id'
             available_voices = {
-                speaker: voice['id'] 
+                speaker: voice.get('Id', voice.get('id'))
                 for speaker, voice in zip(response['speakers'], self.available_voices)
             }
             
-            # Generate audio for each segment with consistent voice per speaker
-            segments = response.get('segments', [])
-            for segment in segments:
-                speaker = segment['speaker']
-                text = segment['text']
-                voice_id = available_voices.get(speaker, "Mizuki")
-                
-                # Try to generate audio
-                audio_file = self.audio_generator.generate_audio(text, voice_id)
-                if audio_file:
-                    audio_files.append({
-                        'file': audio_file,
-                        'speaker': speaker,
-                        'text': text
-                    })
+            # Generate audio for all segments at once with consistent voice per speaker
+            segments = [
+                (segment['text'], available_voices.get(segment['speaker'], "Mizuki"))
+                for segment in response.get('segments', [])
+            ]
+            audio_url = None
+            if self.stitch_audio:
+                audio_url = self.audio_generator.generate_dialogue_audio(segments)
+            if audio_url is None:
+                # Unstitched, or a segment failed: play the first line that worked
+                # (segments that did succeed are already cached)
+                audio_files = self.audio_generator.generate_audio_batch(segments)
+                audio_url = next((audio_file for audio_file in audio_files if audio_file), None)
             
             # Get cache stats after generation
             cache_stats = self.audio_generator.get_cache_stats()
@@ -228,7 +231,7 @@ class InteractiveLearning:
                 correct_answer=response['correct_answer'],
                 explanation=response['explanation'],
                 type="listening",
-                audio_url=audio_files[0]['file'] if audio_files else None  # For now, use first audio file
+                audio_url=audio_url
             )
         except Exception as e:
             print(f"[AUDIO] Error in listening exercise generation: {str(e)}")
@@ -1,8 +1,17 @@
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import os
+import re
 import json
+import hashlib
+import multiprocessing
+import sqlite3
+import threading
+import time
 import traceback
 from datetime import datetime
+import numpy as np
 from sentence_transformers import SentenceTransformer
 import chromadb
 import boto3
@@ -50,16 +59,203 @@ class LLMInterface:
             print(f"[LLM ERROR] {traceback.format_exc()}")
             raise
 
+# Handle both full-width and half-width characters
+END_MARKERS = "。？!．\n?.!…"
+# A sentence runs up to and including an end marker; trailing text has none
+SENTENCE_PATTERN = re.compile(f"[^{re.escape(END_MARKERS)}]*[{re.escape(END_MARKERS)}]|[^{re.escape(END_MARKERS)}]+")
+MAX_CHUNK_CHARS = 500
+MAX_CHUNK_BYTES = 1500
+
+# Spawning workers reloads the model in each one, which only pays off for large jobs
+PARALLEL_EMBED_MIN_CHUNKS = 5000
+# Resident memory of one worker holding multilingual-e5-large
+EMBED_WORKER_BYTES = int(2.5 * 1024 ** 3)
+
+# Model loaded once per embedding worker process
+_worker_model = None
+
+def _available_memory() -> Optional[int]:
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def _init_embedding_worker(model_name: str, threads: int) -> None:
+    global _worker_model
+    import torch
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+def _embed_batch(texts: List[str]):
+    # Same settings as the collection's embedding function, which embeds queries
+    return _worker_model.encode(texts, convert_to_numpy=True, normalize_embeddings=False)
+
 class CustomSentenceTransformerEmbeddingFunction(embedding_functions.SentenceTransformerEmbeddingFunction):
     def __init__(self, model_name: str, device: str = "cpu"):
         super().__init__(model_name=model_name, device=device)
         self.model_name = model_name  # Store model name as attribute
 
+class QueryCache:
+    """Answers to earlier queries, persisted in SQLite
+
+    Entries are looked up by exact query text. With a `similarity_threshold`,
+    queries whose embedding has at least that cosine similarity to a cached
+    one also reuse its answer; this is off by default because unprefixed e5
+    embeddings of different questions often score above 0.9, so the threshold
+    has to be calibrated for the model. Entries expire after `ttl_seconds`,
+    and the least recently used ones are evicted beyond `max_entries`.
+    Embeddings are kept in memory for the similarity search, which is bounded
+    by `max_entries`.
+    """
+
+    def __init__(self, path: str, model_name: str, max_entries: int = 500,
+                 ttl_seconds: float = 7 * 24 * 3600, similarity_threshold: Optional[float] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+        self.lock = threading.Lock()
+        # Streamlit serves each session from its own thread
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS queries ("
+            "key TEXT PRIMARY KEY, query TEXT NOT NULL, n_results INTEGER NOT NULL, "
+            "embedding BLOB, result TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS queries_accessed ON queries (accessed)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'model_name'").fetchone()
+        if row is None or row[0] != model_name:
+            # Embeddings from another model aren't comparable
+            self.db.execute("DELETE FROM queries")
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('model_name', ?)", (model_name,))
+        self.db.commit()
+        self._expire()
+        self.embeddings = {}
+        for key, n_results, embedding in self.db.execute(
+            "SELECT key, n_results, embedding FROM queries WHERE embedding IS NOT NULL"
+        ):
+            self.embeddings[key] = (n_results, np.frombuffer(embedding, dtype=np.float32))
+
+    @staticmethod
+    def key(query_text: str, n_results: int) -> str:
+        return hashlib.sha256(f"{n_results}\0{query_text}".encode('utf-8')).hexdigest()
+
+    def _expire(self) -> None:
+        expired = [key for key, in self.db.execute(
+            "SELECT key FROM queries WHERE created < ?", (time.time() - self.ttl_seconds,)
+        )]
+        self._delete(expired)
+
+    def _delete(self, keys: List[str]) -> None:
+        if not keys:
+            return
+        self.db.executemany("DELETE FROM queries WHERE key = ?", [(key,) for key in keys])
+        self.db.commit()
+        for key in keys:
+            self.embeddings.pop(key, None)
+
+    def _fetch(self, key: str) -> Optional[Dict]:
+        row = self.db.execute("SELECT result, created FROM queries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < time.time() - self.ttl_seconds:
+            self._delete([key])
+            return None
+        self.db.execute("UPDATE queries SET accessed = ? WHERE key = ?", (time.time(), key))
+        self.db.commit()
+        return json.loads(row[0])
+
+    def get(self, query_text: str, n_results: int) -> Optional[Dict]:
+        """Result cached for exactly this query"""
+        with self.lock:
+            result = self._fetch(self.key(query_text, n_results))
+            if result is not None:
+                self.hits["exact"] += 1
+            return result
+
+    def get_similar(self, embedding, n_results: int) -> Optional[Tuple[Dict, float]]:
+        """Result of the most similar cached query above the threshold, with its similarity"""
+        with self.lock:
+            candidates = [(key, vector) for key, (count, vector) in self.embeddings.items() if count == n_results]
+            if candidates and self.similarity_threshold is not None:
+                query = self._normalize(embedding)
+                similarities = np.stack([vector for _, vector in candidates]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    result = self._fetch(candidates[best][0])
+                    if result is not None:
+                        self.hits["semantic"] += 1
+                        return result, float(similarities[best])
+            self.misses += 1
+            return None
+
+    def put(self, query_text: str, n_results: int, result: Dict, embedding=None) -> None:
+        key = self.key(query_text, n_results)
+        vector = self._normalize(embedding) if embedding is not None else None
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO queries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, query_text, n_results, vector.tobytes() if vector is not None else None,
+                 json.dumps(result, ensure_ascii=False), now, now)
+            )
+            self.db.commit()
+            if vector is not None:
+                self.embeddings[key] = (n_results, vector)
+            self._expire()
+            overflow = [key for key, in self.db.execute(
+                "SELECT key FROM queries ORDER BY accessed DESC LIMIT -1 OFFSET ?", (self.max_entries,)
+            )]
+            self._delete(overflow)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.db.execute("DELETE FROM queries")
+            self.db.commit()
+            self.embeddings = {}
+
+    def stats(self) -> Dict:
+        with self.lock:
+            size = self.db.execute("SELECT COUNT(*) FROM queries").fetchone()[0]
+            recent = [query for query, in self.db.execute(
+                "SELECT query FROM queries ORDER BY accessed DESC LIMIT 5"
+            )]
+        lookups = self.hits["exact"] + self.hits["semantic"] + self.misses
+        return {
+            "cache_size": size,
+            "max_entries": self.max_entries,
+            "cached_queries": recent,
+            "exact_hits": self.hits["exact"],
+            "semantic_hits": self.hits["semantic"],
+            "misses": self.misses,
+            "exact_hit_rate": self.hits["exact"] / lookups if lookups else 0.0,
+            "semantic_hit_rate": self.hits["semantic"] / lookups if lookups else 0.0,
+            "hit_rate": (self.hits["exact"] + self.hits["semantic"]) / lookups if lookups else 0.0
+        }
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
 class RAGSystem:
-    def __init__(self, collection_name: str = "jlptn5-listening-comprehension"):
-        """Initialize RAG system with ChromaDB and embedding model"""
+    def __init__(self, collection_name: str = "jlptn5-listening-comprehension",
+                 embed_batch_size: int = 64, embed_workers: Optional[int] = None,
+                 semantic_cache_threshold: Optional[float] = None):
+        """Initialize RAG system with ChromaDB and embedding model
+
+        Chunks are embedded `embed_batch_size` at a time. Large jobs use up to
+        `embed_workers` processes (one model copy each, so at most four by default).
+        Cached answers are reused for similar queries only when
+        `semantic_cache_threshold` is set (see QueryCache).
+        """
         self.debug_logs = []
-        self.query_cache = {}
+        self.embed_batch_size = embed_batch_size
+        self.embed_workers = embed_workers or min(4, os.cpu_count() or 1)
         self.log("Initializing RAG System...")
         
         try:
@@ -83,6 +279,14 @@ class RAGSystem:
             # Set up ChromaDB with proper persistence
             persist_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chroma_db")
             os.makedirs(persist_dir, exist_ok=True)
+            # Files already embedded into the collection, used by load_transcripts
+            self.manifest_path = os.path.join(persist_dir, f"{collection_name}.manifest.json")
+            # Answers survive restarts and, if enabled, are reused for paraphrased queries
+            self.query_cache = QueryCache(
+                os.path.join(persist_dir, f"{collection_name}.query_cache.sqlite3"),
+                self.model_name,
+                similarity_threshold=semantic_cache_threshold
+            )
             
             # Initialize ChromaDB with proper settings
             try:
@@ -155,8 +359,12 @@ class RAGSystem:
             )
             self.log("✓ Created new collection")
             
+            # Nothing is embedded any more
+            if os.path.exists(self.manifest_path):
+                os.remove(self.manifest_path)
+            
             # Clear query cache
-            self.query_cache = {}
+            self.query_cache.clear()
             self.log("✓ Query cache cleared")
             
         except Exception as e:
@@ -166,84 +374,189 @@ class RAGSystem:
 
     def preprocess_japanese_text(self, text: str) -> List[str]:
         """Split Japanese text into meaningful chunks with improved handling"""
-        # Split on common Japanese sentence endings and question marks
+        # Clean up each sentence, skipping ones that are only whitespace
         sentences = []
-        current_sentence = ""
-        
-        # Handle both full-width and half-width characters
-        end_markers = ["。", "？", "!", "．", "\n", "?", ".", "!", "…"]
-        
-        for char in text:
-            current_sentence += char
-            if char in end_markers and current_sentence.strip():
-                # Clean up the sentence
-                cleaned = current_sentence.strip().replace('\n', ' ').replace('  ', ' ')
-                if cleaned:
-                    sentences.append(cleaned)
-                current_sentence = ""
-                
-        if current_sentence.strip():
-            cleaned = current_sentence.strip().replace('\n', ' ').replace('  ', ' ')
+        for match in SENTENCE_PATTERN.finditer(text):
+            cleaned = match.group().strip().replace('\n', ' ').replace('  ', ' ')
             if cleaned:
                 sentences.append(cleaned)
-            
-        # Group sentences into chunks of reasonable size
+        
+        # Group sentences into chunks of reasonable size, tracking the running
+        # length instead of re-encoding the chunk for every sentence
         chunks = []
-        current_chunk = ""
+        current_chunk = []
+        current_chars = current_bytes = 0
         
         for sentence in sentences:
+            chars, size = len(sentence), len(sentence.encode('utf-8'))
             # Check both character count and byte length for better Japanese text handling
-            if (len(current_chunk) + len(sentence) > 500 or 
-                len(current_chunk.encode('utf-8')) + len(sentence.encode('utf-8')) > 1500):
+            if current_chars + chars > MAX_CHUNK_CHARS or current_bytes + size > MAX_CHUNK_BYTES:
                 if current_chunk:
-                    chunks.append(current_chunk)
-                current_chunk = sentence
+                    chunks.append(" ".join(current_chunk))
+                current_chunk, current_chars, current_bytes = [sentence], chars, size
             else:
-                current_chunk += " " + sentence if current_chunk else sentence
+                if current_chunk:
+                    # Joining space
+                    current_chars += 1
+                    current_bytes += 1
+                current_chunk.append(sentence)
+                current_chars += chars
+                current_bytes += size
                 
         if current_chunk:
-            chunks.append(current_chunk)
+            chunks.append(" ".join(current_chunk))
             
         return chunks
 
-    def add_documents(self, documents: List[str], metadatas: Optional[List[Dict]] = None) -> None:
-        """Add documents to the vector store with preprocessing"""
+    @staticmethod
+    def chunk_id(source: str, chunk: str) -> str:
+        """Stable id for a chunk, so unchanged chunks keep their embedding"""
+        return hashlib.sha256(f"{source}\0{chunk}".encode('utf-8')).hexdigest()
+
+    def _chunk_document(self, doc: str, metadata: Dict) -> Tuple[List[str], List[Dict], List[str]]:
+        """Split a document into chunks with their metadata and content-hash ids"""
+        chunks, chunk_metadatas, ids = [], [], []
+        seen = set()
+        for index, chunk in enumerate(self.preprocess_japanese_text(doc)):
+            chunk_id = self.chunk_id(metadata.get("source", ""), chunk)
+            if chunk_id in seen:
+                # A repeated line in the same transcript is stored once
+                continue
+            seen.add(chunk_id)
+            chunk_metadata = metadata.copy()
+            chunk_metadata.update({
+                "chunk_id": index,
+                "timestamp": datetime.now().isoformat()
+            })
+            chunks.append(chunk)
+            chunk_metadatas.append(chunk_metadata)
+            ids.append(chunk_id)
+        return chunks, chunk_metadatas, ids
+
+    def _embed_worker_count(self, total: int, batch_count: int) -> int:
+        """Number of embedding processes worth starting for a job"""
+        if total < PARALLEL_EMBED_MIN_CHUNKS:
+            return 1
+        workers = min(self.embed_workers, batch_count)
+        available = _available_memory()
+        if available is not None:
+            workers = min(workers, available // EMBED_WORKER_BYTES)
+        return max(1, workers)
+
+    def _embed_in_batches(self, documents: List[str], metadatas: List[Dict], ids: List[str],
+                          progress: Optional[Callable[[int, int], None]] = None) -> None:
+        """Embed chunks in fixed-size batches and stream each batch into the collection
+
+        Jobs of at least PARALLEL_EMBED_MIN_CHUNKS chunks are spread over a pool
+        of worker processes, each with its own copy of the model and a share of
+        the CPU threads, and no more workers than free memory can hold. Smaller
+        jobs use the already loaded model in-process. At most two batches per
+        worker are in flight, so memory stays bounded however many chunks there are.
+        """
+        total = len(documents)
+        batches = [slice(start, start + self.embed_batch_size) for start in range(0, total, self.embed_batch_size)]
+        done = 0
+        
+        def store(batch: slice, embeddings) -> None:
+            nonlocal done
+            self.collection.add(
+                documents=documents[batch],
+                metadatas=metadatas[batch],
+                ids=ids[batch],
+                embeddings=[list(map(float, embedding)) for embedding in embeddings]
+            )
+            done += len(ids[batch])
+            self.log(f"Embedded {done}/{total} chunks")
+            if progress:
+                progress(done, total)
+        
+        workers = self._embed_worker_count(total, len(batches))
+        if workers <= 1:
+            for batch in batches:
+                store(batch, self.embedding_function(documents[batch]))
+            return
+        
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        self.log(f"Embedding {total} chunks in {len(batches)} batches across {workers} processes")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            # Forking a process that has already loaded torch can deadlock
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_embedding_worker,
+            initargs=(self.model_name, threads)
+        ) as pool:
+            pending = deque()
+            for batch in batches:
+                pending.append((batch, pool.submit(_embed_batch, documents[batch])))
+                if len(pending) >= 2 * workers:
+                    finished, future = pending.popleft()
+                    store(finished, future.result())
+            while pending:
+                finished, future = pending.popleft()
+                store(finished, future.result())
+
+    def _index_documents(self, documents: List[str], metadatas: Optional[List[Dict]] = None,
+                         progress: Optional[Callable[[int, int], None]] = None) -> List[List[str]]:
+        """Chunk documents and embed the chunks not yet in the collection
+
+        Returns the chunk ids of each document.
+        """
+        all_chunks = []
+        all_metadatas = []
+        chunk_ids = []
+        document_ids = []
+        seen = set()
+        
+        for idx, doc in enumerate(documents):
+            doc_metadata = metadatas[idx] if metadatas else {}
+            chunks, chunk_metadatas, ids = self._chunk_document(doc, doc_metadata)
+            document_ids.append(ids)
+            for chunk, chunk_metadata, chunk_id in zip(chunks, chunk_metadatas, ids):
+                if chunk_id not in seen:
+                    seen.add(chunk_id)
+                    all_chunks.append(chunk)
+                    all_metadatas.append(chunk_metadata)
+                    chunk_ids.append(chunk_id)
+        
+        if not chunk_ids:
+            return document_ids
+        
+        # Skip chunks embedded by an earlier load
+        existing = set(self.collection.get(ids=chunk_ids, include=[])["ids"])
+        new_chunks = [
+            (chunk, metadata, chunk_id)
+            for chunk, metadata, chunk_id in zip(all_chunks, all_metadatas, chunk_ids)
+            if chunk_id not in existing
+        ]
+        
+        # Add chunks to collection with error handling
+        if new_chunks:
+            try:
+                documents_to_add, metadatas_to_add, ids_to_add = (list(values) for values in zip(*new_chunks))
+                self._embed_in_batches(documents_to_add, metadatas_to_add, ids_to_add, progress)
+                print(f"Successfully added {len(new_chunks)} chunks to collection ({len(existing)} already present)")
+            except Exception as add_error:
+                print(f"Error adding documents: {str(add_error)}")
+                raise
+        return document_ids
+
+    def add_documents(self, documents: List[str], metadatas: Optional[List[Dict]] = None,
+                      progress: Optional[Callable[[int, int], None]] = None) -> List[str]:
+        """Add documents to the vector store with preprocessing
+
+        Only chunks whose id is not already in the collection are embedded.
+        `progress` is called with (chunks embedded, chunks to embed) after each
+        batch. Returns the ids of every chunk of the documents.
+        """
         try:
-            all_chunks = []
-            all_metadatas = []
             chunk_ids = []
-            chunk_counter = 0
-            
-            for idx, doc in enumerate(documents):
-                chunks = self.preprocess_japanese_text(doc)
-                all_chunks.extend(chunks)
-                
-                # Create metadata for each chunk
-                doc_metadata = metadatas[idx] if metadatas else {}
-                for chunk in chunks:
-                    chunk_metadata = doc_metadata.copy()
-                    chunk_metadata.update({
-                        "chunk_id": chunk_counter,
-                        "timestamp": datetime.now().isoformat()
-                    })
-                    all_metadatas.append(chunk_metadata)
-                    chunk_ids.append(f"chunk_{chunk_counter}")
-                    chunk_counter += 1
-            
-            # Add chunks to collection with error handling
-            if all_chunks:
-                try:
-                    self.collection.add(
-                        documents=all_chunks,
-                        metadatas=all_metadatas,
-                        ids=chunk_ids
-                    )
-                    print(f"Successfully added {len(all_chunks)} chunks to collection")
-                except Exception as add_error:
-                    print(f"Error adding documents: {str(add_error)}")
-                    # Try to persist changes even if there's an error
-                    self.client.persist()
-                    raise
+            seen = set()
+            for ids in self._index_documents(documents, metadatas, progress):
+                for chunk_id in ids:
+                    if chunk_id not in seen:
+                        seen.add(chunk_id)
+                        chunk_ids.append(chunk_id)
+            return chunk_ids
         except Exception as e:
             print(f"Error in add_documents: {str(e)}")
             raise
@@ -253,10 +566,11 @@ class RAGSystem:
         self.log(f"Processing query: {query_text}")
         
         # Check cache first
-        cache_key = f"{query_text}_{n_results}"
-        if cache_key in self.query_cache:
+        cached = self.query_cache.get(query_text, n_results)
+        if cached is not None:
             self.log("✓ Retrieved result from cache")
-            return self.query_cache[cache_key]
+            cached["logs"] = self.debug_logs
+            return cached
         
         try:
             # Verify collection state
@@ -275,10 +589,19 @@ class RAGSystem:
                     "logs": self.debug_logs
                 }
             
+            # Embed once for both the cache lookup and retrieval
+            query_embedding = list(map(float, self.embedding_function([query_text])[0]))
+            similar = self.query_cache.get_similar(query_embedding, n_results)
+            if similar is not None:
+                cached, similarity = similar
+                self.log(f"✓ Retrieved result for similar query from cache: {cached['metadata']['query']} ({similarity:.3f})")
+                cached["logs"] = self.debug_logs
+                return cached
+            
             # Get relevant documents
             self.log(f"Retrieving {n_results} most relevant contexts...")
             results = self.collection.query(
-                query_texts=[query_text],
+                query_embeddings=[query_embedding],
                 n_results=n_results,
                 include=['documents', 'distances', 'metadatas']
             )
@@ -312,13 +635,12 @@ class RAGSystem:
                 "logs": self.debug_logs
             }
             
-            # Cache the result
-            self.query_cache[cache_key] = result
-            
-            # Limit cache size
-            if len(self.query_cache) > 100:
-                oldest_key = next(iter(self.query_cache))
-                del self.query_cache[oldest_key]
+            # Cache the result, without the live logs
+            self.query_cache.put(
+                query_text, n_results,
+                {key: value for key, value in result.items() if key != "logs"},
+                query_embedding
+            )
             
             return result
             
@@ -378,38 +700,114 @@ Instructions:
 
 Answer:"""
 
-    def load_transcripts(self, transcript_dir: str) -> None:
-        """Load transcripts from a directory"""
+    def _load_manifest(self) -> Optional[Dict]:
+        """Embedded files and their chunk ids, or None if the collection must be rebuilt"""
+        if not os.path.exists(self.manifest_path):
+            if self.collection.count() > 0:
+                # Loaded before manifests existed, with positional chunk ids
+                self.log("! No manifest for the existing collection, rebuilding it")
+                return None
+            return {"model_name": self.model_name, "files": {}}
         try:
-            documents = []
-            metadatas = []
-            
-            # Reset collection before loading new transcripts
-            self.reset_collection()
-            self.log("✓ Collection reset before loading transcripts")
-            
-            for filename in os.listdir(transcript_dir):
-                if filename.endswith(".txt"):
-                    file_path = os.path.join(transcript_dir, filename)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                            documents.append(content)
-                            metadatas.append({
-                                "source": filename,
-                                "type": "transcript",
-                                "timestamp": datetime.now().isoformat()
-                            })
-                            self.log(f"✓ Loaded transcript: {filename}")
-                    except Exception as file_error:
-                        self.log(f"! Error reading file {filename}: {str(file_error)}")
-                        continue
-            
-            if documents:
-                self.add_documents(documents, metadatas)
-                self.log(f"✓ Added {len(documents)} documents to collection")
-            else:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            self.log(f"! Unreadable manifest, rebuilding the collection: {str(e)}")
+            return None
+        if manifest.get("model_name") != self.model_name:
+            # Embeddings from another model can't be mixed with new ones
+            self.log(f"! Manifest was built with {manifest.get('model_name')}, re-embedding with {self.model_name}")
+            return None
+        return manifest
+
+    def _save_manifest(self, manifest: Dict) -> None:
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def load_transcripts(self, transcript_dir: str, force: bool = False,
+                         progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """Load transcripts from a directory, embedding only what changed
+
+        Files are tracked in a manifest by content hash. New and changed files
+        are chunked with content-hash ids so only new chunks are embedded;
+        chunks that are no longer in a file, and files that were removed, are
+        deleted from the collection. `force` rebuilds the collection.
+        `progress` is passed to the embedding batches, see add_documents.
+        """
+        try:
+            manifest = None if force else self._load_manifest()
+            if manifest is None:
+                self.reset_collection()
+                self.log("✓ Collection reset before loading transcripts")
+                manifest = {"model_name": self.model_name, "files": {}}
+            files = manifest["files"]
+            summary = {"added": [], "updated": [], "removed": [], "unchanged": 0, "chunks_deleted": 0}
+            
+            present = set()
+            changed = []
+            for filename in sorted(os.listdir(transcript_dir)):
+                if not filename.endswith(".txt"):
+                    continue
+                file_path = os.path.join(transcript_dir, filename)
+                try:
+                    with open(file_path, 'rb') as f:
+                        raw = f.read()
+                    content = raw.decode('utf-8')
+                except Exception as file_error:
+                    self.log(f"! Error reading file {filename}: {str(file_error)}")
+                    if filename in files:
+                        # Keep what was embedded until the file can be read again
+                        present.add(filename)
+                    continue
+                present.add(filename)
+                
+                file_hash = hashlib.sha256(raw).hexdigest()
+                entry = files.get(filename)
+                if entry and entry["sha256"] == file_hash:
+                    summary["unchanged"] += 1
+                    continue
+                
+                changed.append((filename, content, file_hash, entry))
+            
+            # Embed every changed file in one pass so batches span files
+            document_ids = self._index_documents(
+                [content for _, content, _, _ in changed],
+                [{
+                    "source": filename,
+                    "type": "transcript",
+                    "timestamp": datetime.now().isoformat()
+                } for filename, _, _, _ in changed],
+                progress
+            )
+            for (filename, _, file_hash, entry), chunk_ids in zip(changed, document_ids):
+                stale = set(entry["chunk_ids"]) - set(chunk_ids) if entry else set()
+                if stale:
+                    self.collection.delete(ids=list(stale))
+                    summary["chunks_deleted"] += len(stale)
+                files[filename] = {"sha256": file_hash, "chunk_ids": chunk_ids}
+                summary["updated" if entry else "added"].append(filename)
+                self.log(f"✓ {'Updated' if entry else 'Loaded'} transcript: {filename}")
+            
+            for filename in sorted(set(files) - present):
+                stale = files.pop(filename)["chunk_ids"]
+                if stale:
+                    self.collection.delete(ids=stale)
+                    summary["chunks_deleted"] += len(stale)
+                summary["removed"].append(filename)
+                self.log(f"✓ Removed transcript: {filename}")
+            
+            self._save_manifest(manifest)
+            if summary["added"] or summary["updated"] or summary["removed"]:
+                self.query_cache.clear()
+            self.log(
+                f"✓ Transcripts: {len(summary['added'])} added, {len(summary['updated'])} updated, "
+                f"{len(summary['removed'])} removed, {summary['unchanged']} unchanged"
+            )
+            if not files:
                 self.log("! No valid documents found to load")
+            return summary
                 
         except Exception as e:
             error_msg = f"Error loading transcripts: {str(e)}"
@@ -427,25 +825,18 @@ Answer:"""
 
     def clear_cache(self) -> None:
         """Clear the query cache"""
-        self.query_cache = {}
+        self.query_cache.clear()
         self.log("Query cache cleared")
     
     def get_cache_stats(self) -> Dict:
-        """Get statistics about the query cache"""
+        """Get statistics about the query cache, including exact and semantic hit rates"""
         try:
-            # Get cache info
-            cache_queries = list(self.query_cache.keys())
-            cache_size = len(cache_queries)
-            
-            # Get query texts without n_results suffix
-            recent_queries = [q.split('_')[0] for q in cache_queries[-5:]]
-            
-            return {
-                "cache_size": cache_size,
-                "cached_queries": recent_queries,
-                "total_cached": cache_size,
+            stats = self.query_cache.stats()
+            stats.update({
+                "total_cached": stats["cache_size"],
                 "timestamp": datetime.now().isoformat()
-            }
+            })
+            return stats
         except Exception as e:
             self.log(f"! Error getting cache stats: {str(e)}")
             return {
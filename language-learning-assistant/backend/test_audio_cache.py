@@ -0,0 +1,76 @@
+"""Test the SQLite-indexed audio cache"""
+import json
+import os
+from backend import audio_cache
+from backend.audio_cache import AudioCache
+
+MB = 1024 * 1024
+
+def test_add_and_reopen(tmp_path):
+    cache = AudioCache(str(tmp_path))
+    path = cache.add_file("abc", b"x" * 10, {"text": "こんにちは"})
+    assert cache.get_file_path("abc") == path
+    assert cache.get_file_path("missing") is None
+
+    stats = AudioCache(str(tmp_path)).get_stats()
+    assert stats["file_count"] == 1
+    assert stats["cache_size_mb"] == 10 / MB
+
+def test_least_recently_used_files_evicted(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(audio_cache.time, "time", lambda: now[0])
+    cache = AudioCache(str(tmp_path), max_size_mb=1)
+    for file_hash in ("a", "b"):
+        now[0] += 1
+        cache.add_file(file_hash, b"x" * (MB // 2), {})
+
+    # Touching "a" leaves "b" as the least recently used
+    now[0] += 1
+    cache.touch_file("a")
+    now[0] += 1
+    cache.add_file("c", b"x" * (MB // 2), {})
+
+    assert cache.get_file_path("b") is None
+    assert cache.get_file_path("a") is not None
+    assert cache.get_file_path("c") is not None
+    assert cache.get_stats()["cache_size_mb"] == 1.0
+
+def test_clean_old_files(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(audio_cache.time, "time", lambda: now[0])
+    cache = AudioCache(str(tmp_path), max_age_days=1)
+    cache.add_file("old", b"x" * 10, {})
+    now[0] += 2 * 24 * 3600
+    cache.add_file("new", b"x" * 20, {})
+
+    stats = cache.clean_old_files()
+    assert stats["files_removed"] == 1
+    assert stats["bytes_freed"] == 10
+    assert stats["remaining_files"] == 1
+    assert not os.path.exists(tmp_path / "old.mp3")
+
+def test_validate_cache_fixes_index(tmp_path):
+    cache = AudioCache(str(tmp_path))
+    cache.add_file("gone", b"x" * 10, {})
+    cache.add_file("resized", b"x" * 10, {})
+    os.remove(tmp_path / "gone.mp3")
+    (tmp_path / "resized.mp3").write_bytes(b"x" * 30)
+
+    cache.validate_cache()
+    stats = cache.get_stats()
+    assert stats["file_count"] == 1
+    assert stats["cache_size_mb"] == 30 / MB
+
+def test_metadata_json_imported(tmp_path):
+    (tmp_path / "kept.mp3").write_bytes(b"x" * 10)
+    (tmp_path / "metadata.json").write_text(json.dumps({
+        "files": {
+            "kept": {"size_bytes": 10, "last_accessed": "2025-01-01T00:00:00", "text": "はい"},
+            "deleted": {"size_bytes": 99, "last_accessed": "2025-01-01T00:00:00"}
+        },
+        "last_cleanup": "2025-01-01T00:00:00"
+    }))
+
+    stats = AudioCache(str(tmp_path)).get_stats()
+    assert stats["file_count"] == 1
+    assert stats["cache_size_mb"] == 10 / MB
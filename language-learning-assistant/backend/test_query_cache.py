@@ -0,0 +1,80 @@
+"""Test the persistent RAG query cache"""
+from backend import rag
+from backend.rag import QueryCache
+
+MODEL = "intfloat/multilingual-e5-large"
+
+def make_cache(tmp_path, **kwargs):
+    return QueryCache(str(tmp_path / "query_cache.sqlite3"), MODEL, **kwargs)
+
+def result(answer):
+    return {"answer": answer, "contexts": [], "metadata": {"query": answer}}
+
+def test_exact_hit_survives_restart(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get("駅はどこですか", 3) is None
+    cache.put("駅はどこですか", 3, result("station"), [1.0, 0.0])
+
+    reopened = make_cache(tmp_path)
+    assert reopened.get("駅はどこですか", 3) == result("station")
+    # The number of contexts is part of the key
+    assert reopened.get("駅はどこですか", 5) is None
+    assert reopened.stats()["exact_hits"] == 1
+
+def test_cache_cleared_when_model_changes(tmp_path):
+    make_cache(tmp_path).put("q", 3, result("a"), [1.0, 0.0])
+    cache = QueryCache(str(tmp_path / "query_cache.sqlite3"), "all-MiniLM-L6-v2")
+    assert cache.get("q", 3) is None
+    assert cache.embeddings == {}
+
+def test_semantic_tier_is_off_by_default(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("q", 3, result("a"), [1.0, 0.0])
+    assert cache.get_similar([1.0, 0.0], 3) is None
+    assert cache.stats()["misses"] == 1
+
+def test_semantic_hit_above_threshold(tmp_path):
+    cache = make_cache(tmp_path, similarity_threshold=0.95)
+    cache.put("q", 3, result("a"), [1.0, 0.0])
+
+    hit, similarity = cache.get_similar([0.99, 0.05], 3)
+    assert hit == result("a")
+    assert similarity > 0.95
+    assert cache.get_similar([0.7, 0.7], 3) is None
+    assert cache.get_similar([1.0, 0.0], 5) is None
+
+    stats = cache.stats()
+    assert stats["semantic_hits"] == 1
+    assert stats["misses"] == 2
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rag.time, "time", lambda: now[0])
+    cache = make_cache(tmp_path, ttl_seconds=60, similarity_threshold=0.95)
+    cache.put("q", 3, result("a"), [1.0, 0.0])
+
+    now[0] += 30
+    assert cache.get("q", 3) == result("a")
+    now[0] += 31
+    assert cache.get("q", 3) is None
+    assert cache.get_similar([1.0, 0.0], 3) is None
+    assert cache.stats()["cache_size"] == 0
+
+def test_least_recently_used_entries_evicted(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rag.time, "time", lambda: now[0])
+    cache = make_cache(tmp_path, max_entries=2)
+    for query in ("a", "b"):
+        now[0] += 1
+        cache.put(query, 3, result(query), [1.0, 0.0])
+
+    # Reading "a" makes "b" the least recently used
+    now[0] += 1
+    assert cache.get("a", 3) == result("a")
+    now[0] += 1
+    cache.put("c", 3, result("c"), [0.0, 1.0])
+
+    assert cache.get("b", 3) is None
+    assert cache.get("a", 3) == result("a")
+    assert cache.get("c", 3) == result("c")
+    assert len(cache.embeddings) == 2
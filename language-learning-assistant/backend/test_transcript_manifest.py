@@ -0,0 +1,100 @@
+"""Test incremental transcript loading against the manifest"""
+import json
+import pytest
+from backend.rag import RAGSystem, QueryCache
+
+MODEL = "intfloat/multilingual-e5-large"
+
+class FakeCollection:
+    name = "transcripts"
+
+    def __init__(self):
+        self.items = {}
+
+    def count(self):
+        return len(self.items)
+
+    def get(self, ids, include):
+        return {"ids": [chunk_id for chunk_id in ids if chunk_id in self.items]}
+
+    def add(self, documents, metadatas, ids, embeddings):
+        self.items.update(zip(ids, documents))
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.items.pop(chunk_id, None)
+
+class FakeClient:
+    def delete_collection(self, name):
+        pass
+
+    def create_collection(self, name, embedding_function, metadata):
+        return FakeCollection()
+
+@pytest.fixture
+def rag_system(tmp_path):
+    system = RAGSystem.__new__(RAGSystem)
+    system.debug_logs = []
+    system.embed_batch_size = 64
+    system.embed_workers = 1
+    system.model_name = MODEL
+    system.manifest_path = str(tmp_path / "manifest.json")
+    system.query_cache = QueryCache(str(tmp_path / "query_cache.sqlite3"), MODEL)
+    system.client = FakeClient()
+    system.collection = FakeCollection()
+    system.embedded = []
+    def embed(texts):
+        system.embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+    system.embedding_function = embed
+    return system
+
+@pytest.fixture
+def transcript_dir(tmp_path):
+    directory = tmp_path / "transcripts"
+    directory.mkdir()
+    # Long enough sentences that each file splits into two chunks
+    (directory / "a.txt").write_text("あ" * 299 + "。" + "い" * 299 + "。", encoding="utf-8")
+    (directory / "b.txt").write_text("う" * 299 + "。", encoding="utf-8")
+    return directory
+
+def test_unchanged_files_are_not_embedded_again(rag_system, transcript_dir):
+    summary = rag_system.load_transcripts(str(transcript_dir))
+    assert summary["added"] == ["a.txt", "b.txt"]
+    assert rag_system.collection.count() == 3
+
+    rag_system.embedded.clear()
+    summary = rag_system.load_transcripts(str(transcript_dir))
+    assert summary["unchanged"] == 2
+    assert rag_system.embedded == []
+
+def test_changed_file_embeds_only_new_chunks(rag_system, transcript_dir):
+    rag_system.load_transcripts(str(transcript_dir))
+    rag_system.embedded.clear()
+
+    (transcript_dir / "a.txt").write_text("あ" * 299 + "。" + "え" * 299 + "。", encoding="utf-8")
+    summary = rag_system.load_transcripts(str(transcript_dir))
+
+    assert summary["updated"] == ["a.txt"]
+    assert summary["chunks_deleted"] == 1
+    assert rag_system.embedded == ["え" * 299 + "。"]
+    assert rag_system.collection.count() == 3
+
+def test_removed_file_chunks_are_deleted(rag_system, transcript_dir):
+    rag_system.load_transcripts(str(transcript_dir))
+    (transcript_dir / "b.txt").unlink()
+
+    summary = rag_system.load_transcripts(str(transcript_dir))
+    assert summary["removed"] == ["b.txt"]
+    assert rag_system.collection.count() == 2
+    with open(rag_system.manifest_path, encoding="utf-8") as f:
+        assert set(json.load(f)["files"]) == {"a.txt"}
+
+def test_manifest_from_another_model_rebuilds(rag_system, transcript_dir):
+    rag_system.load_transcripts(str(transcript_dir))
+    rag_system.model_name = "all-MiniLM-L6-v2"
+    rag_system.embedded.clear()
+
+    summary = rag_system.load_transcripts(str(transcript_dir))
+    assert summary["added"] == ["a.txt", "b.txt"]
+    assert len(rag_system.embedded) == 3
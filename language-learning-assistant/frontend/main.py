@@ -343,7 +343,11 @@ def render_rag_stage():
                 if os.path.exists(transcript_dir):
                     with st.status("Loading transcripts...", expanded=True) as status:
                         st.write("Processing documents...")
-                        st.session_state.rag_system.load_transcripts(transcript_dir)
+                        progress_bar = st.progress(0.0)
+                        st.session_state.rag_system.load_transcripts(
+                            transcript_dir,
+                            progress=lambda done, total: progress_bar.progress(done / total, f"Embedded {done}/{total} chunks")
+                        )
                         doc_count = st.session_state.rag_system.collection.count()
                         status.update(label=f"✅ Loaded {doc_count} documents!", state="complete")
                 else:
@@ -477,6 +481,8 @@ def render_rag_stage():
                     if hasattr(st.session_state.rag_system, 'get_cache_stats'):
                         cache_stats = st.session_state.rag_system.get_cache_stats()
                         st.metric("Cached Queries", cache_stats['cache_size'])
+                        if 'hit_rate' in cache_stats:
+                            st.metric("Cache Hit Rate", f"{cache_stats['hit_rate'] * 100:.1f}%")
                         
                     # Show recent feedback
                     if feedback_stats.get('recent_feedback'):
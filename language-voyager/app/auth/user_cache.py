@@ -0,0 +1,164 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import DateTime, event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from ..models.user import User
+from ..core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Secrets are never cached; routes that need them refresh the user first
+EXCLUDED_COLUMNS = {"hashed_password", "verification_token", "password_reset_token"}
+
+class UserCache:
+    """Short-lived cache of authenticated users keyed by token subject (email)
+
+    Entries hold the user's column values rather than ORM instances. A hit
+    rebuilds the user and attaches it to the request's session without a
+    query, so routes can keep reading and modifying `current_user` as usual.
+    An in-process LRU is always used; Redis can be enabled to share entries
+    between workers. Updates and deletes of a User row invalidate its entry,
+    and the TTL bounds staleness for changes made by other workers.
+    """
+
+    def __init__(self, ttl: int = None, maxsize: int = None, use_redis: bool = None):
+        self.ttl = settings.AUTH_USER_CACHE_TTL if ttl is None else ttl
+        self.maxsize = settings.AUTH_USER_CACHE_SIZE if maxsize is None else maxsize
+        if use_redis is None:
+            use_redis = settings.AUTH_USER_CACHE_REDIS
+        self._redis = Redis.from_url(settings.REDIS_URL) if use_redis else None
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._pending: Set[asyncio.Task] = set()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def _redis_key(email: str) -> str:
+        return f"auth:user:{email}"
+
+    @staticmethod
+    def _serialize(user: User) -> Dict[str, Any]:
+        data = {}
+        for column in User.__table__.columns:
+            if column.key in EXCLUDED_COLUMNS:
+                continue
+            value = getattr(user, column.key)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            data[column.key] = value
+        return data
+
+    @staticmethod
+    async def _attach(db: AsyncSession, data: Dict[str, Any]) -> User:
+        """Rebuild a user from cached values as a persistent instance of `db`"""
+        values = dict(data)
+        for column in User.__table__.columns:
+            if isinstance(column.type, DateTime) and values.get(column.key):
+                values[column.key] = datetime.fromisoformat(values[column.key])
+        user = User(**values)
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+
+    def _get_local(self, email: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(email)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at <= time.monotonic():
+            del self._entries[email]
+            return None
+        self._entries.move_to_end(email)
+        return data
+
+    def _set_local(self, email: str, data: Dict[str, Any]) -> None:
+        self._entries[email] = (time.monotonic() + self.ttl, data)
+        self._entries.move_to_end(email)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get(self, db: AsyncSession, email: str) -> Optional[User]:
+        """Get a cached user attached to `db`, or None on a miss"""
+        if self.ttl <= 0:
+            return None
+
+        data = self._get_local(email)
+        if data is None and self._redis is not None:
+            try:
+                raw = await self._redis.get(self._redis_key(email))
+                if raw:
+                    data = json.loads(raw)
+                    self._set_local(email, data)
+            except RedisError as e:
+                logger.warning(f"User cache read failed: {e}")
+
+        if data is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return await self._attach(db, data)
+
+    async def set(self, email: str, user: User) -> None:
+        """Cache a user that was just loaded from the database"""
+        if self.ttl <= 0:
+            return
+
+        data = self._serialize(user)
+        self._set_local(email, data)
+        if self._redis is not None:
+            try:
+                await self._redis.set(self._redis_key(email), json.dumps(data), ex=self.ttl)
+            except RedisError as e:
+                logger.warning(f"User cache write failed: {e}")
+
+    def invalidate(self, email: str) -> None:
+        """Drop a user's entry locally and, when possible, from Redis"""
+        self._entries.pop(email, None)
+        if self._redis is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.debug(f"No event loop to invalidate cached user {email} in Redis; it expires with the TTL")
+            return
+        task = loop.create_task(self._delete_remote(email))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _delete_remote(self, email: str) -> None:
+        try:
+            await self._redis.delete(self._redis_key(email))
+        except RedisError as e:
+            logger.warning(f"User cache invalidation failed for {email}: {e}")
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.stats["hits"]
+        total = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "hit_rate": hits / total if total else 0.0
+        }
+
+# Global user cache instance
+user_cache = UserCache()
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: User) -> None:
+    """Invalidate a user's cache entry whenever the row changes"""
+    email_history = inspect(target).attrs.email.history
+    emails = {target.__dict__.get("email"), *email_history.deleted}
+    for email in emails:
+        if email:
+            user_cache.invalidate(email)
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from datetime import datetime, timedelta
 from typing import Optional
@@ -5,11 +6,13 @@ from jose import JWTError, jwt, ExpiredSignatureError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
-from ..database.config import get_db
+from ..database.config import get_async_db
 from ..models.user import User
 from ..core.config import get_settings
+from .user_cache import user_cache
 import secrets
 
 logger = logging.getLogger(__name__)
@@ -26,13 +29,25 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password off the event loop (bcrypt is deliberately slow)"""
+    return await asyncio.to_thread(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password off the event loop"""
+    return await asyncio.to_thread(get_password_hash, password)
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
     logger.debug(f"Attempting to authenticate user: {email}")
-    user = db.query(User).filter(User.email == email).first()
+    user = await get_user_by_email(db, email)
     if not user:
         logger.debug(f"No user found with email: {email}")
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         logger.debug("Password verification failed")
         return None
     if not user.is_active:
@@ -55,7 +70,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> User:
     """Get current user from JWT token with enhanced error handling"""
     try:
         if not token:
@@ -100,10 +115,13 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
                     detail="Database connection error"
                 )
                 
-            user = db.query(User).filter(User.email == email).first()
+            user = await user_cache.get(db, email)
             if user is None:
-                logger.warning(f"JWT token with non-existent user email: {email}")
-                raise credentials_exception
+                user = await get_user_by_email(db, email)
+                if user is None:
+                    logger.warning(f"JWT token with non-existent user email: {email}")
+                    raise credentials_exception
+                await user_cache.set(email, user)
                 
             if not user.is_active:
                 logger.warning(f"JWT token used for inactive user: {email}")
@@ -136,7 +154,7 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-async def authenticate_websocket_user(token: str, db: Session) -> Optional[User]:
+async def authenticate_websocket_user(token: str, db: AsyncSession) -> Optional[User]:
     """Authenticate a WebSocket connection using a JWT token"""
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
@@ -144,7 +162,7 @@ async def authenticate_websocket_user(token: str, db: Session) -> Optional[User]
         if email is None:
             return None
             
-        user = db.query(User).filter(User.email == email).first()
+        user = await get_user_by_email(db, email)
         if user is None or not user.is_active:
             return None
             
@@ -160,23 +178,24 @@ def create_verification_token() -> str:
     """Generate a verification token without database persistence"""
     return generate_verification_token()
 
-def create_user_verification_token(user: User, db: Session) -> str:
+async def create_user_verification_token(user: User, db: AsyncSession) -> str:
     """Create and store email verification token"""
     logger.debug(f"Creating verification token for user: {user.email}")
     token = secrets.token_urlsafe(32)
     user.verification_token = token
     user.verification_token_expires = datetime.utcnow() + timedelta(hours=24)
-    db.commit()
+    await db.commit()
     logger.debug(f"Verification token created and stored for user: {user.email}")
     return token  # Return token after commit
 
-def verify_email_token(token: str, db: Session) -> Optional[User]:
+async def verify_email_token(token: str, db: AsyncSession) -> Optional[User]:
     """Verify email verification token and activate user if valid"""
     logger.debug(f"Verifying email token: {token[:10]}...")
-    user = db.query(User).filter(
+    result = await db.execute(select(User).where(
         User.verification_token == token,
         User.verification_token_expires > datetime.utcnow()
-    ).first()
+    ))
+    user = result.scalars().first()
     
     if not user:
         logger.debug("No user found with provided verification token")
@@ -185,17 +204,18 @@ def verify_email_token(token: str, db: Session) -> Optional[User]:
     logger.debug(f"Found user {user.email} for verification token")
     return user
 
-def create_password_reset_token(user: User, db: Session) -> str:
+async def create_password_reset_token(user: User, db: AsyncSession) -> str:
     """Create and store password reset token"""
     token = generate_verification_token()
     user.password_reset_token = token
     user.password_reset_expires = datetime.utcnow() + timedelta(hours=1)
-    db.commit()
+    await db.commit()
     return token
 
-def verify_password_reset_token(token: str, db: Session) -> Optional[User]:
+async def verify_password_reset_token(token: str, db: AsyncSession) -> Optional[User]:
     """Verify password reset token"""
-    return db.query(User).filter(
+    result = await db.execute(select(User).where(
         User.password_reset_token == token,
         User.password_reset_expires > datetime.utcnow()
-    ).first()
\ No newline at end of file
+    ))
+    return result.scalars().first()
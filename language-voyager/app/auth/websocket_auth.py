@@ -1,6 +1,7 @@
 from fastapi import WebSocket, HTTPException, status
 from starlette.websockets import WebSocketState
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt, ExpiredSignatureError
 from ..models.user import User
 from ..core.config import get_settings
@@ -9,7 +10,7 @@ import logging
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-async def authenticate_websocket_user(websocket: WebSocket, db: Session) -> User:
+async def authenticate_websocket_user(websocket: WebSocket, db: AsyncSession) -> User:
     """Authenticate WebSocket connection and return user"""
     try:
         auth = websocket.headers.get("authorization", "")
@@ -49,7 +50,8 @@ async def authenticate_websocket_user(websocket: WebSocket, db: Session) -> User
                 detail="Could not validate credentials"
             )
 
-        user = db.query(User).filter(User.email == email).first()
+        result = await db.execute(select(User).where(User.email == email))
+        user = result.scalars().first()
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
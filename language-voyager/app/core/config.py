@@ -21,9 +21,16 @@ class Settings(BaseSettings):
     JWT_SECRET_KEY: Optional[str] = None  # Will be initialized in __init__
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 240
+    AUTH_USER_CACHE_TTL: int = 60  # seconds a resolved user is reused across requests (0 disables)
+    AUTH_USER_CACHE_SIZE: int = 10000  # in-process LRU entries
+    AUTH_USER_CACHE_REDIS: bool = False  # also share cached users between workers via Redis
     
     # Database
     DATABASE_URL: str = "postgresql://user:password@db:5432/language_voyager"
+    DB_POOL_SIZE: int = 10  # persistent connections held by the async engine
+    DB_MAX_OVERFLOW: int = 20  # extra connections allowed under burst load
+    DB_POOL_TIMEOUT: float = 10.0  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 30 * 60  # seconds before a connection is replaced
     
     # Redis - ensure these have secure defaults
     REDIS_HOST: str = "redis"
@@ -39,27 +46,87 @@ class Settings(BaseSettings):
     
     # ArcGIS
     ARCGIS_API_KEY: Optional[str] = None
+    ARCGIS_GEOCODE_URL: str = "https://geocode-api.arcgis.com/arcgis/rest/services/World/GeocodeServer"
+    ARCGIS_REST_URL: str = "https://www.arcgis.com/sharing/rest"
     ARCGIS_MAX_CREDITS_PER_DAY: float = 10.0
     ARCGIS_CACHE_DURATION: int = 24 * 60 * 60
     ARCGIS_FEATURE_LIMIT: int = 100
-    
+    ARCGIS_USAGE_FLUSH_INTERVAL: float = 10.0  # seconds between batched usage writes
+    ARCGIS_USAGE_FLUSH_BATCH_SIZE: int = 500  # flush early once this many rows are buffered
+    ARCGIS_STALE_DURATION: int = 60 * 60  # serve expired responses this much longer while refreshing
+    ARCGIS_LOCK_TIMEOUT: int = 30  # seconds a worker may hold an upstream fetch lock
+    ARCGIS_LOCK_WAIT: float = 10.0  # seconds to wait for another worker's fetch
+    ARCGIS_LOCK_POLL_INTERVAL: float = 0.1
+
+    # Local POI spatial index
+    SPATIAL_INDEX_CELL_SIZE: float = 0.01  # Grid cell size in degrees (~1.1km of latitude)
+    SPATIAL_INDEX_ARCGIS_FALLBACK: bool = True  # Query ArcGIS when no local POIs are indexed
+    PROXIMITY_TRIGGER_RADIUS: float = 1000.0  # meters
+
+    # Outbound HTTP client pool
+    HTTP_POOL_LIMIT: int = 100  # Total open connections
+    HTTP_POOL_LIMIT_PER_HOST: int = 20
+    HTTP_KEEPALIVE_TIMEOUT: float = 30.0  # seconds
+    HTTP_DNS_CACHE_TTL: int = 300  # seconds
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_TOTAL_TIMEOUT: float = 60.0
+    HTTP_MAX_RETRIES: int = 2
+    HTTP_RETRY_BACKOFF: float = 0.5  # Base delay in seconds, doubled per retry
+
+    # Content recommendation
+    RECOMMENDATION_FEATURE_TTL: int = 300  # seconds before a region's content features are rebuilt
+    POI_CONTENT_CACHE_TTL: int = 60 * 60  # seconds a POI content selection stays cached
+    POI_CONTENT_PROFICIENCY_BUCKET: int = 10  # proficiency levels are rounded down to this step for caching
+    POI_HISTORY_SNAPSHOT_INTERVAL: int = 10  # every Nth content version is stored in full, others as diffs
+    POI_HISTORY_MAX_VERSIONS: int = 100  # versions kept per POI before older history is pruned
+
+    # Region availability
+    REGION_AVAILABILITY_TTL: int = 300  # seconds a user's evaluated region list is reused (0 disables)
+    REGION_AVAILABILITY_CACHE_SIZE: int = 10000  # in-process LRU entries
+
     # OpenRouter settings
     OPENROUTER_API_KEY: Optional[str] = None
+    OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
     LLM_MODEL: Optional[str] = None  # Changed from OPENROUTER_DEFAULT_MODEL to match .env
+    OPENROUTER_STREAM_READ_TIMEOUT: float = 30.0  # seconds to wait between streamed chunks
+    CONVERSATION_CACHE_TTL: int = 60 * 60  # seconds a reply is reused for a repeated prompt (0 disables)
+    CONVERSATION_CACHE_SIZE: int = 2000  # in-process LRU entries
+    CONVERSATION_CACHE_REDIS: bool = False  # also share cached replies between workers via Redis
     
     # Location Updates
     LOCATION_UPDATE_MIN_INTERVAL: float = 1.0
     LOCATION_UPDATE_BURST_LIMIT: int = 5
     LOCATION_UPDATE_BURST_PERIOD: int = 60
     LOCATION_CHANGE_MIN_DISTANCE: float = 1.0
+    LOCATION_DEFAULT_ACCURACY: float = 20.0  # meters assumed when a fix has no accuracy
+    LOCATION_PROCESS_NOISE: float = 3.0  # expected movement in m/s for location smoothing
+    LOCATION_STATIONARY_FIXES: int = 3  # fixes without movement before the update interval backs off
+    LOCATION_MAX_UPDATE_INTERVAL: float = 60.0  # seconds
+    LOCATION_POWER_SAVE_INTERVAL: float = 15.0  # minimum interval in powerSaveMode
+
+    # Profiling
+    PROFILING_ENABLED: bool = False  # per-request timing headers, query counts and Prometheus histograms
+    PROFILING_HEADER: str = "X-Profile"  # request header that returns a pyinstrument report instead
+    PROFILING_TOKEN: Optional[str] = None  # required value of PROFILING_HEADER when set
+    PROFILING_INTERVAL: float = 0.001  # pyinstrument sampling interval in seconds
+    PROFILING_REPEATED_QUERY_THRESHOLD: int = 5  # log a statement run this many times in one request
+
+    # WebSocket delivery
+    WS_SEND_QUEUE_SIZE: int = 100  # messages buffered per connection before the oldest is dropped
+    WS_SEND_TIMEOUT: float = 5.0  # seconds a single send may take before the client is disconnected
+    WS_CHANNEL_PREFIX: str = "ws:user"  # Redis pub/sub channel prefix for cross-worker delivery
 
     # Offline storage settings
     LOCAL_STORAGE_PATH: str = str(Path.home() / ".language-voyager" / "storage")
+    LOCAL_STORAGE_STATEMENT_CACHE: int = 256  # prepared statements kept per local storage connection
     OFFLINE_PACKAGE_TTL: int = 86400  # 24 hours
     MAX_OFFLINE_STORAGE_SIZE: int = 1024 * 1024 * 1024  # 1GB
     SYNC_RETRY_ATTEMPTS: int = 3
     SYNC_RETRY_DELAY: int = 5
     MIN_SYNC_INTERVAL: int = 300  # 5 minutes
+    OFFLINE_SYNC_BATCH_SIZE: int = 1000  # offline events applied per transaction
+    OFFLINE_SYNC_EVENT_RETENTION: int = 30 * 86400  # seconds an applied event id is kept to skip replays
+    OFFLINE_SYNC_PRUNE_INTERVAL: int = 3600  # seconds between deletions of expired event ids
 
     model_config = ConfigDict(
         env_file=".env",
@@ -0,0 +1,247 @@
+from typing import Dict, Iterable, List, Optional
+from collections import Counter
+from contextvars import ContextVar
+import functools
+import logging
+import time
+from fastapi import FastAPI
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.responses import HTMLResponse, Response
+from .config import get_settings
+
+try:
+    import prometheus_client
+except ImportError:  # optional: histograms are skipped without it
+    prometheus_client = None
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # optional: the profiling header is ignored without it
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Buckets for per-request counts of database queries and Redis calls
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+class RequestProfile:
+    """Time spent in the database, Redis and upstream APIs during one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.redis_calls = 0
+        self.redis_time = 0.0
+        self.http_calls = 0
+        self.http_time = 0.0
+        self.statements: Counter = Counter()
+
+    def repeated_statements(self, threshold: int) -> List[tuple]:
+        """Statements executed at least `threshold` times, the usual sign of an N+1 loop"""
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, shown per request in browser dev tools"""
+        total = (time.perf_counter() - self.started) * 1000
+        return ", ".join([
+            f"app;dur={total:.1f}",
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"',
+            f'redis;dur={self.redis_time * 1000:.1f};desc="{self.redis_calls} calls"',
+            f'upstream;dur={self.http_time * 1000:.1f};desc="{self.http_calls} requests"',
+        ])
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+def record_http(duration: float) -> None:
+    """Add an outbound HTTP request to the current request's profile, if any"""
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.http_calls += 1
+        profile.http_time += duration
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current_profile.get() is not None:
+        conn.info.setdefault("profiling_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    profile = _current_profile.get()
+    started = conn.info.get("profiling_started")
+    if profile is None or not started:
+        return
+    profile.db_queries += 1
+    profile.db_time += time.perf_counter() - started.pop()
+    profile.statements[statement] += 1
+
+def instrument_engine(engine: Engine) -> None:
+    """Count and time SQL statements run while a request is being profiled"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+def _timed_redis_call(method):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return await method(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            profile.redis_calls += 1
+            profile.redis_time += time.perf_counter() - started
+    wrapper._profiled = True
+    return wrapper
+
+def instrument_redis() -> None:
+    """Count and time Redis round trips (single commands and pipelines)
+
+    redis-py has no event hooks, so the async client's command and pipeline
+    execution are wrapped once for the whole process.
+    """
+    from redis.asyncio.client import Pipeline, Redis
+
+    for cls, name in ((Redis, "execute_command"), (Pipeline, "execute")):
+        method = getattr(cls, name)
+        if not getattr(method, "_profiled", False):
+            setattr(cls, name, _timed_redis_call(method))
+
+class _Metrics:
+    """Prometheus histograms labelled by method and route template"""
+
+    def __init__(self):
+        labels = ["method", "route"]
+        self.duration = prometheus_client.Histogram(
+            "http_request_duration_seconds", "Request wall time", labels + ["status"]
+        )
+        self.db_queries = prometheus_client.Histogram(
+            "http_request_db_queries", "SQL statements per request", labels, buckets=COUNT_BUCKETS
+        )
+        self.db_duration = prometheus_client.Histogram(
+            "http_request_db_duration_seconds", "Time in SQL statements per request", labels
+        )
+        self.redis_calls = prometheus_client.Histogram(
+            "http_request_redis_calls", "Redis round trips per request", labels, buckets=COUNT_BUCKETS
+        )
+        self.redis_duration = prometheus_client.Histogram(
+            "http_request_redis_duration_seconds", "Time in Redis calls per request", labels
+        )
+        self.upstream_duration = prometheus_client.Histogram(
+            "http_request_upstream_duration_seconds", "Time in outbound HTTP calls per request", labels
+        )
+        self.repeated_queries = prometheus_client.Counter(
+            "http_request_repeated_queries_total",
+            "Requests that ran one statement PROFILING_REPEATED_QUERY_THRESHOLD or more times",
+            labels
+        )
+
+    def observe(self, method: str, route: str, status: int, profile: RequestProfile, duration: float, repeated: bool) -> None:
+        self.duration.labels(method, route, str(status)).observe(duration)
+        self.db_queries.labels(method, route).observe(profile.db_queries)
+        self.db_duration.labels(method, route).observe(profile.db_time)
+        self.redis_calls.labels(method, route).observe(profile.redis_calls)
+        self.redis_duration.labels(method, route).observe(profile.redis_time)
+        self.upstream_duration.labels(method, route).observe(profile.http_time)
+        if repeated:
+            self.repeated_queries.labels(method, route).inc()
+
+_metrics: Optional[_Metrics] = None
+
+class ProfilingMiddleware:
+    """Per-request timing, query counts and an on-demand pyinstrument report
+
+    Every HTTP response gets a Server-Timing header with wall, database,
+    Redis and upstream time, and the same numbers are recorded as Prometheus
+    histograms by route template. Statements repeated within one request are
+    logged. A request carrying PROFILING_HEADER (matching PROFILING_TOKEN
+    when set) is answered with a pyinstrument HTML report instead of its
+    normal response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.header = settings.PROFILING_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        status = 500
+        try:
+            if self._wants_report(scope):
+                return await self._send_report(scope, receive, send)
+
+            async def send_with_timing(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"server-timing", profile.server_timing().encode("latin-1"))
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_profile.reset(token)
+            self._finish(scope, status, profile)
+
+    def _wants_report(self, scope) -> bool:
+        if Profiler is None:
+            return False
+        value = dict(scope.get("headers") or []).get(self.header)
+        if value is None:
+            return False
+        return not settings.PROFILING_TOKEN or value.decode("latin-1") == settings.PROFILING_TOKEN
+
+    async def _send_report(self, scope, receive, send) -> None:
+        profiler = Profiler(interval=settings.PROFILING_INTERVAL, async_mode="enabled")
+
+        async def discard(message):
+            pass
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profiler.stop()
+        await HTMLResponse(profiler.output_html())(scope, receive, send)
+
+    def _finish(self, scope, status: int, profile: RequestProfile) -> None:
+        duration = time.perf_counter() - profile.started
+        route = getattr(scope.get("route"), "path", None) or "unmatched"
+        method = scope.get("method", "")
+
+        repeated = profile.repeated_statements(settings.PROFILING_REPEATED_QUERY_THRESHOLD)
+        for statement, count in repeated:
+            logger.warning(f"{method} {route} ran the same statement {count} times: {' '.join(statement.split())[:200]}")
+        logger.debug(
+            f"{method} {route} {status} in {duration * 1000:.1f}ms: {profile.db_queries} queries "
+            f"({profile.db_time * 1000:.1f}ms), {profile.redis_calls} Redis calls ({profile.redis_time * 1000:.1f}ms), "
+            f"{profile.http_calls} upstream requests ({profile.http_time * 1000:.1f}ms)"
+        )
+        if _metrics is not None:
+            _metrics.observe(method, route, status, profile, duration, bool(repeated))
+
+def setup_profiling(app: FastAPI, engines: Iterable[Engine]) -> None:
+    """Instrument the engines and Redis client, add the middleware and /metrics"""
+    global _metrics
+    for engine in engines:
+        instrument_engine(engine)
+    instrument_redis()
+    app.add_middleware(ProfilingMiddleware)
+
+    if prometheus_client is None:
+        logger.warning("prometheus_client is not installed; profiling metrics are not exported")
+        return
+    if _metrics is None:
+        _metrics = _Metrics()
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics() -> Response:
+        return Response(prometheus_client.generate_latest(), media_type=prometheus_client.CONTENT_TYPE_LATEST)
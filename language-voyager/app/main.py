@@ -6,16 +6,23 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 from contextlib import asynccontextmanager
 from pathlib import Path
-from .database.config import engine, get_db, SessionLocal
+from .database.config import engine, async_engine, get_db, SessionLocal, AsyncSessionLocal
 from .models import user, progress, content, arcgis_usage
 from .routers import auth, progress as progress_router, map, conversation
 from .core.config import get_settings
-from .services.arcgis import ArcGISService
+from .core.profiling import setup_profiling
+from .services.arcgis import ArcGISService, usage_recorder
 from .services.sync_manager import SyncManager
+from .services.local_storage import close_local_storage
 from .services.websocket import ConnectionManager, manager, LocationUpdate
 from .services.location_manager import location_manager
 from .services.geolocation import GeolocationService
+from .services.http_client import http_client
+from .services.cache import cache
 from .auth.websocket_auth import authenticate_websocket_user
+from .auth.user_cache import user_cache
+from .services.region_availability import region_availability
+from .services.conversation_cache import conversation_cache
 from .models.user import User
 from starlette.websockets import WebSocketState
 from jose import JWTError, jwt, ExpiredSignatureError
@@ -52,12 +59,17 @@ async def lifespan(app: FastAPI):
     websocket_manager = ConnectionManager()
     
     # Start services
+    await http_client.start()
+    await usage_recorder.start()
     await sync_manager.start()
     
     yield
     
     # Cleanup on shutdown
     await sync_manager.stop()
+    await usage_recorder.stop()
+    await http_client.close()
+    close_local_storage()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -77,6 +89,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request timing, query counts and Prometheus metrics (opt-in)
+if settings.PROFILING_ENABLED:
+    setup_profiling(app, [engine, async_engine.sync_engine])
+
 # Include API routers with prefix
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(progress_router.router, prefix="/api/v1")
@@ -170,15 +186,13 @@ async def get_websocket_user(websocket: WebSocket) -> User:
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time location updates"""
     user = None
-    db = None
     geolocation = None
     
     try:
-        # Get database session
-        db = SessionLocal()
-        
-        # Authenticate using websocket-specific auth function
-        user = await authenticate_websocket_user(websocket, db)
+        # Authenticate using websocket-specific auth function; the session is
+        # closed right away so no connection is held for the socket's lifetime
+        async with AsyncSessionLocal() as db:
+            user = await authenticate_websocket_user(websocket, db)
         
         # Accept the connection after authentication
         await websocket.accept()
@@ -256,8 +270,6 @@ async def websocket_endpoint(websocket: WebSocket):
             if user:
                 await manager.disconnect(user.id)
                 location_manager.unregister_connection(user.id)
-            if db:
-                db.close()
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
 
@@ -272,6 +284,26 @@ async def shutdown_event():
     await location_manager.stop()
     await manager.cleanup()  # Add Redis cleanup
 
+@app.get("/health/http-pool")
+async def http_pool_metrics() -> Dict:
+    """Outbound HTTP connection pool metrics (in-flight, queued, reused connections)"""
+    return http_client.get_metrics()
+
+@app.get("/health/cache")
+async def cache_metrics() -> Dict:
+    """POI content, authenticated user, region availability and conversation cache hit/miss counters"""
+    return {
+        **cache.get_stats(),
+        "auth_user_cache": user_cache.get_stats(),
+        "region_availability": region_availability.get_stats(),
+        "conversation_cache": conversation_cache.get_stats()
+    }
+
+@app.get("/health/websockets")
+async def websocket_metrics() -> Dict:
+    """WebSocket delivery counters (local connections, queued, dropped and relayed messages)"""
+    return manager.get_stats()
+
 @app.get("/health")
 async def health_check(db: Session = Depends(get_db)):
     status = {
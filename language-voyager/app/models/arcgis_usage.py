@@ -44,6 +44,14 @@ class ArcGISUsage(Base):
             .scalar()
         return float(result or 0)
     
+    @classmethod
+    def get_credits_since(cls, db, since: datetime) -> float:
+        """Get total credits used since the given time"""
+        result = db.query(func.sum(cls.credits_used))\
+            .filter(cls.timestamp >= since)\
+            .scalar()
+        return float(result or 0)
+    
     @classmethod
     def get_monthly_usage(cls, db, operation_type: str = None) -> dict:
         """Get usage count for the current month by operation type"""
@@ -89,7 +97,17 @@ class ArcGISUsage(Base):
             return True, 0.0, None
             
         usage = cls.get_monthly_usage(db, operation_type)
-        current_count = usage[operation_type]['count']
+        return cls.evaluate_monthly_limit(operation_type, usage[operation_type]['count'])
+    
+    @classmethod
+    def evaluate_monthly_limit(cls, operation_type: str, current_count: int) -> tuple[bool, float, str]:
+        """
+        Evaluate a known monthly operation count against the limit
+        Returns: (is_within_limit, usage_percentage, alert_level)
+        """
+        if operation_type not in cls.MONTHLY_LIMITS:
+            return True, 0.0, None
+            
         limit = cls.MONTHLY_LIMITS[operation_type]
         usage_percentage = (current_count / limit) * 100
         
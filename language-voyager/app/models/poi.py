@@ -1,11 +1,18 @@
-from sqlalchemy import Column, String, Integer, Float, JSON, ForeignKey, DateTime, Boolean, Text
+from sqlalchemy import Column, String, Integer, Float, JSON, ForeignKey, DateTime, Boolean, Text, LargeBinary, UniqueConstraint, event, inspect, select
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm.attributes import flag_modified
 from sqlalchemy.sql import func
 from ..database.config import Base
+from ..core.config import get_settings
 from .progress import progress_poi_association
+import copy
+import logging
 import uuid
 from typing import Dict, List, Optional
 
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
 class POIContentConflict(Base):
     __tablename__ = "poi_content_conflicts"
     
@@ -24,6 +31,81 @@ class POIContentConflict(Base):
     # Relationship back to POI
     poi = relationship("PointOfInterest", back_populates="content_conflicts")
 
+class POIOfflineRecord(Base):
+    """A POI's offline package record, precomputed whenever the POI is written"""
+    __tablename__ = "poi_offline_records"
+    
+    poi_id = Column(String, ForeignKey("points_of_interest.id", ondelete="CASCADE"), primary_key=True)
+    region_id = Column(String, nullable=False, index=True)
+    content_version = Column(Integer, nullable=False)  # POI content_version the payload was built from
+    payload = Column(LargeBinary, nullable=False)  # gzip member holding one NDJSON line
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class POIContentHistory(Base):
+    """One POI content version, stored as a full snapshot or a diff from the previous version
+
+    A diff looks like {"set": [[path, value], ...], "unset": [path, ...]}
+    where each path is the list of keys leading to the changed value.
+    """
+    __tablename__ = "poi_content_history"
+
+    id = Column(Integer, primary_key=True)
+    poi_id = Column(String, ForeignKey("points_of_interest.id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False)
+    is_snapshot = Column(Boolean, nullable=False, default=False)
+    content = Column(JSON, nullable=False)  # full content for snapshots, otherwise a diff
+    change_description = Column(String)
+    changed_by = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("poi_id", "version", name="uq_poi_content_history_version"),
+    )
+
+    @staticmethod
+    def diff(old: Dict, new: Dict) -> Dict:
+        """Changes that turn `old` into `new`, descending into nested objects"""
+        changes = {"set": [], "unset": []}
+
+        def walk(path: List[str], before: Dict, after: Dict) -> None:
+            for key in before:
+                if key not in after:
+                    changes["unset"].append(path + [key])
+            for key, value in after.items():
+                if key in before and isinstance(before[key], dict) and isinstance(value, dict):
+                    walk(path + [key], before[key], value)
+                elif key not in before or before[key] != value:
+                    changes["set"].append([path + [key], value])
+
+        walk([], old or {}, new or {})
+        return changes
+
+    @staticmethod
+    def apply(content: Dict, changes: Dict) -> Dict:
+        """Apply a diff to a copy of `content`"""
+        result = copy.deepcopy(content)
+        for path in changes.get("unset", []):
+            parent = result
+            for key in path[:-1]:
+                parent = parent.get(key, {})
+            parent.pop(path[-1], None)
+        for path, value in changes.get("set", []):
+            parent = result
+            for key in path[:-1]:
+                parent = parent.setdefault(key, {})
+            parent[path[-1]] = copy.deepcopy(value)
+        return result
+
+    def to_dict(self) -> Dict:
+        """Version metadata, without the stored content"""
+        return {
+            "version": self.version,
+            "is_snapshot": self.is_snapshot,
+            "change_description": self.change_description,
+            "changed_by": self.changed_by,
+            "timestamp": self.created_at.isoformat() if self.created_at else None
+        }
+
 class PointOfInterest(Base):
     __tablename__ = "points_of_interest"
 
@@ -53,9 +135,6 @@ class PointOfInterest(Base):
     sync_metadata = Column(JSON)  # {last_sync: timestamp, version: str}
     is_published = Column(Boolean, default=True)
     
-    # Content history
-    content_history = Column(JSON, default=lambda: [], nullable=False)
-    
     # Relationships
     region = relationship("Region", back_populates="points_of_interest")
     progress_records = relationship(
@@ -67,6 +146,14 @@ class PointOfInterest(Base):
     # Add relationship to conflicts
     content_conflicts = relationship("POIContentConflict", back_populates="poi")
     
+    # Content versions are appended here and read by range through ContentHistoryService
+    content_history = relationship(
+        "POIContentHistory",
+        lazy="write_only",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
+    
     def to_dict(self):
         """Convert POI to dictionary format"""
         return {
@@ -84,8 +171,7 @@ class PointOfInterest(Base):
             "learning_objectives": self.learning_objectives,
             "content_version": self.content_version,
             "is_published": self.is_published,
-            "sync_metadata": self.sync_metadata,
-            "content_history": self.content_history
+            "sync_metadata": self.sync_metadata
         }
         
     def validate_completion(self, progress_data: dict) -> bool:
@@ -120,8 +206,18 @@ class PointOfInterest(Base):
             
         return False
 
-    def update_content_version(self, change_description: str = None, changed_by: str = None):
-        """Increment content version and update sync metadata with history"""
+    def update_content_version(
+        self,
+        change_description: str = None,
+        changed_by: str = None,
+        previous_content: Optional[Dict] = None
+    ):
+        """Increment content version and record the change in the content history
+
+        `previous_content` is the content before the change; when it is given
+        the history stores only a diff, with a full snapshot every
+        POI_HISTORY_SNAPSHOT_INTERVAL versions.
+        """
         self.content_version += 1
         current_time = str(func.now())
         
@@ -131,46 +227,34 @@ class PointOfInterest(Base):
             "version": str(self.content_version),
             "update_type": "content"
         }
+        # Content is often edited in place, which JSON columns do not track
+        flag_modified(self, "content")
         
-        # Add to history
-        history_entry = {
-            "version": self.content_version,
-            "timestamp": current_time,
-            "change_description": change_description,
-            "changed_by": changed_by
-        }
-        
-        if not self.content_history:
-            self.content_history = []
-        self.content_history.append(history_entry)
+        # Add to history; a new POI's initial snapshot is written when it is inserted
+        if not inspect(self).has_identity:
+            return
+        is_snapshot = (
+            previous_content is None
+            or self.content_version % settings.POI_HISTORY_SNAPSHOT_INTERVAL == 0
+        )
+        self.content_history.add(POIContentHistory(
+            version=self.content_version,
+            is_snapshot=is_snapshot,
+            content=copy.deepcopy(self.content) if is_snapshot else POIContentHistory.diff(previous_content, self.content),
+            change_description=change_description,
+            changed_by=changed_by
+        ))
     
     def validate_content_version(self, client_version: int) -> bool:
         """Check if client has latest content version"""
         return client_version == self.content_version
     
     def get_version_info(self) -> dict:
-        """Get version information including sync status and history"""
+        """Get a summary of the current version and its sync status"""
         return {
             "current_version": self.content_version,
             "last_sync": self.sync_metadata.get("last_sync") if self.sync_metadata else None,
-            "update_type": self.sync_metadata.get("update_type") if self.sync_metadata else None,
-            "history": self.content_history
-        }
-
-    def get_content_diff(self, from_version: int) -> dict:
-        """Get content changes between versions"""
-        if not self.content_history:
-            return {"changes": [], "from_version": from_version, "to_version": self.content_version}
-            
-        changes = [
-            change for change in self.content_history 
-            if change["version"] > from_version
-        ]
-        
-        return {
-            "changes": changes,
-            "from_version": from_version,
-            "to_version": self.content_version
+            "update_type": self.sync_metadata.get("update_type") if self.sync_metadata else None
         }
     
     def create_pending_change(self, changes: Dict, change_type: str = "update") -> POIContentConflict:
@@ -195,27 +279,18 @@ class PointOfInterest(Base):
         """Get all pending changes for this POI"""
         return [c for c in self.content_conflicts if c.status == "pending"]
     
-    def rollback_to_version(self, target_version: int) -> bool:
-        """Roll back content to a specific version"""
-        if not self.content_history:
-            return False
-            
-        # Find the target version in history
-        target_state = None
-        for entry in self.content_history:
-            if entry["version"] == target_version:
-                target_state = entry.get("content_snapshot")
-                break
-                
-        if not target_state:
-            return False
+    def rollback_to_version(self, target_version: int, target_content: Optional[Dict]) -> Optional[POIContentConflict]:
+        """Create a pending change restoring the content of `target_version`"""
+        if target_content is None:
+            return None
             
         # Create a pending change for the rollback
-        self.create_pending_change(
-            changes=target_state,
+        conflict = self.create_pending_change(
+            changes=target_content,
             change_type="rollback"
         )
-        return True
+        conflict.conflict_metadata["target_version"] = target_version
+        return conflict
     
     def resolve_conflict(self, conflict_id: str, resolution: Dict, resolved_by: str) -> bool:
         """Resolve a content conflict"""
@@ -224,12 +299,14 @@ class PointOfInterest(Base):
             return False
             
         strategy = resolution.get("strategy")
+        previous_content = copy.deepcopy(self.content)
         if strategy == "accept":
             # Accept the proposed changes entirely
             self.content = conflict.proposed_changes
             self.update_content_version(
                 change_description="Accepted proposed changes",
-                changed_by=resolved_by
+                changed_by=resolved_by,
+                previous_content=previous_content
             )
         elif strategy == "reject":
             # Reject the changes, keep current content
@@ -253,7 +330,8 @@ class PointOfInterest(Base):
             
             self.update_content_version(
                 change_description=f"Merged changes with {merge_strategy} strategy",
-                changed_by=resolved_by
+                changed_by=resolved_by,
+                previous_content=previous_content
             )
         else:
             return False
@@ -308,4 +386,68 @@ class PointOfInterest(Base):
                                 merged[lang][field].append(value)
             return merged
         else:
-            return self.content  # Unknown strategy, keep current content
\ No newline at end of file
+            return self.content  # Unknown strategy, keep current content
+
+@event.listens_for(PointOfInterest, "before_update")
+def _bump_content_version(mapper, connection, target: PointOfInterest) -> None:
+    """Give every persisted change a new version, which offline deltas compare against
+
+    update_content_version already bumps the version and records the content
+    history. Other column changes, such as PATCH /pois/{poi_id}, are recorded
+    here so every version stays in the history: as an empty diff, or as a
+    snapshot when the content changed or the snapshot interval falls due.
+    """
+    state = inspect(target)
+    if state.attrs.content_version.history.has_changes():
+        return
+    if not any(state.attrs[prop.key].history.has_changes() for prop in mapper.column_attrs):
+        return
+    target.content_version += 1
+    is_snapshot = (
+        state.attrs.content.history.has_changes()
+        or target.content_version % settings.POI_HISTORY_SNAPSHOT_INTERVAL == 0
+    )
+    connection.execute(POIContentHistory.__table__.insert().values(
+        poi_id=target.id,
+        version=target.content_version,
+        is_snapshot=is_snapshot,
+        content=copy.deepcopy(target.content) if is_snapshot else {"set": [], "unset": []},
+        change_description="Updated POI details"
+    ))
+    if is_snapshot:
+        _prune_history(connection, target.id, target.content_version)
+
+@event.listens_for(PointOfInterest, "after_insert")
+def _snapshot_new_poi(mapper, connection, target: PointOfInterest) -> None:
+    """Start every POI's history with a snapshot of its initial content"""
+    connection.execute(POIContentHistory.__table__.insert().values(
+        poi_id=target.id,
+        version=target.content_version,
+        is_snapshot=True,
+        content=target.content,
+        change_description="Created"
+    ))
+
+@event.listens_for(POIContentHistory, "after_insert")
+def _prune_content_history(mapper, connection, target: POIContentHistory) -> None:
+    if target.is_snapshot:
+        _prune_history(connection, target.poi_id, target.version)
+
+def _prune_history(connection, poi_id: str, snapshot_version: int) -> None:
+    """Drop versions older than the snapshot that still covers POI_HISTORY_MAX_VERSIONS"""
+    history = POIContentHistory.__table__
+    oldest_kept = snapshot_version - settings.POI_HISTORY_MAX_VERSIONS + 1
+    base_version = connection.scalar(
+        select(func.max(history.c.version)).where(
+            history.c.poi_id == poi_id,
+            history.c.version <= oldest_kept,
+            history.c.is_snapshot.is_(True)
+        )
+    )
+    if base_version is not None:
+        result = connection.execute(history.delete().where(
+            history.c.poi_id == poi_id,
+            history.c.version < base_version
+        ))
+        if result.rowcount:
+            logger.debug(f"Pruned {result.rowcount} content history entries for POI {poi_id}")
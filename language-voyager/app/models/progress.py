@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Table
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Table, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -27,9 +27,10 @@ class UserProgress(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Add POI tracking
-    poi_progress = Column(JSON, default=dict, nullable=False)  # Store POI visit history and completion status
-    content_mastery = Column(JSON, default=dict, nullable=False)  # Track content mastery by type
+    # Legacy POI tracking blobs, superseded by the poi_visit and content_mastery
+    # tables and no longer written (kept for rollback)
+    poi_progress = Column(JSON, default=dict, nullable=False)
+    content_mastery = Column(JSON, default=dict, nullable=False)
     achievements = Column(JSON, default=list, nullable=False)  # Store earned achievements
     
     # Relationships
@@ -40,4 +41,72 @@ class UserProgress(Base):
         secondary=progress_poi_association,
         back_populates="progress_records",
         lazy="joined"  # Optimize loading
-    )
\ No newline at end of file
+    )
+    # Normalized tracking, loaded on demand so history size never affects reads
+    poi_visits = relationship("POIVisit", back_populates="progress", lazy="select", cascade="all, delete-orphan")
+    mastery_items = relationship("ContentMasteryItem", back_populates="progress", lazy="select", cascade="all, delete-orphan")
+    mastery_stats = relationship("ContentMasteryStats", back_populates="progress", lazy="select", cascade="all, delete-orphan")
+
+class POIVisit(Base):
+    """Per-POI visit counters and completed content for one progress record"""
+    __tablename__ = "poi_visit"
+
+    id = Column(Integer, primary_key=True, index=True)
+    progress_id = Column(Integer, ForeignKey("user_progress.id", ondelete="CASCADE"), nullable=False)
+    poi_id = Column(String, ForeignKey("points_of_interest.id", ondelete="CASCADE"), nullable=False)
+    visits = Column(Integer, default=0, nullable=False)
+    total_time = Column(Integer, default=0, nullable=False)  # seconds
+    completed_content = Column(JSON, default=list, nullable=False)  # Content IDs completed at this POI
+    last_visit = Column(DateTime(timezone=True))
+
+    progress = relationship("UserProgress", back_populates="poi_visits")
+
+    __table_args__ = (
+        UniqueConstraint("progress_id", "poi_id", name="uq_poi_visit_progress_poi"),
+    )
+
+class ContentMasteryItem(Base):
+    """Latest mastery score for a single content item"""
+    __tablename__ = "content_mastery"
+
+    id = Column(Integer, primary_key=True, index=True)
+    progress_id = Column(Integer, ForeignKey("user_progress.id", ondelete="CASCADE"), nullable=False)
+    content_type = Column(String, nullable=False)
+    content_id = Column(String, nullable=False)
+    score = Column(Float, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    progress = relationship("UserProgress", back_populates="mastery_items")
+
+    __table_args__ = (
+        UniqueConstraint("progress_id", "content_type", "content_id", name="uq_content_mastery_item"),
+        Index("ix_content_mastery_progress_content", "progress_id", "content_id"),
+    )
+
+class ContentMasteryStats(Base):
+    """Running mastery sum and item count per content type"""
+    __tablename__ = "content_mastery_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    progress_id = Column(Integer, ForeignKey("user_progress.id", ondelete="CASCADE"), nullable=False)
+    content_type = Column(String, nullable=False)
+    score_sum = Column(Float, default=0.0, nullable=False)
+    item_count = Column(Integer, default=0, nullable=False)
+
+    progress = relationship("UserProgress", back_populates="mastery_stats")
+
+    __table_args__ = (
+        UniqueConstraint("progress_id", "content_type", name="uq_content_mastery_stats_type"),
+    )
+
+    @property
+    def average(self) -> float:
+        return self.score_sum / self.item_count if self.item_count else 0.0
+
+class ProcessedSyncEvent(Base):
+    """Idempotency record for an applied offline sync event"""
+    __tablename__ = "processed_sync_events"
+
+    event_id = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    processed_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False, index=True)
@@ -1,17 +1,18 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from datetime import timedelta, datetime
 from typing import Annotated
-from ..database.config import get_db
+from ..database.config import get_async_db
 from ..models.user import User
 from ..auth.utils import (
     authenticate_user,
     create_access_token,
     get_current_active_user,
-    get_password_hash,
+    get_password_hash_async,
+    get_user_by_email,
     create_user_verification_token,
     verify_email_token,
     create_password_reset_token,
@@ -79,12 +80,12 @@ async def send_password_reset_email(email: str, token: str):
 async def register(
     user_data: UserCreate,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     logger.debug(f"Registration attempt for email: {user_data.email}")
     
     # Check for existing user first
-    if db.query(User).filter(User.email == user_data.email).first():
+    if await get_user_by_email(db, user_data.email):
         logger.debug(f"Registration failed: Email already registered: {user_data.email}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -94,11 +95,11 @@ async def register(
     # For test emails, clean up any existing test data with same username
     if "@example.com" in user_data.email:
         logger.debug("Test email detected, cleaning up existing username data")
-        db.execute(text("DELETE FROM users WHERE username = :username"), {"username": user_data.username})
-        db.commit()
+        await db.execute(text("DELETE FROM users WHERE username = :username"), {"username": user_data.username})
+        await db.commit()
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     verification_token = generate_verification_token()
     
     db_user = User(
@@ -112,8 +113,8 @@ async def register(
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     logger.debug(f"Created new user with email: {user_data.email}")
     
     return UserResponse(
@@ -126,8 +127,8 @@ async def register(
     )
 
 @router.post("/token", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -143,12 +144,12 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
 @router.get("/me", response_model=UserResponse)
 async def read_users_me(
     current_user: Annotated[User, Depends(get_current_active_user)],
-    db: Annotated[Session, Depends(get_db)]
+    db: Annotated[AsyncSession, Depends(get_async_db)]
 ) -> UserResponse:
     """Get current user info"""
     try:
         # Refresh the session if needed
-        db.refresh(current_user)
+        await db.refresh(current_user)
         
         # Using the current_user directly since it's already validated by the dependency
         if not current_user.is_active:
@@ -177,10 +178,10 @@ async def read_users_me(
         )
 
 @router.post("/verify-email")
-async def verify_email(token: str, db: Session = Depends(get_db)):
+async def verify_email(token: str, db: AsyncSession = Depends(get_async_db)):
     """Verify user's email address"""
     logger.debug(f"Email verification attempt with token: {token[:10]}...")
-    user = verify_email_token(token, db)
+    user = await verify_email_token(token, db)
     if not user:
         logger.debug("Verification failed: Invalid or expired token")
         raise HTTPException(
@@ -193,7 +194,7 @@ async def verify_email(token: str, db: Session = Depends(get_db)):
     user.is_active = True
     user.verification_token = None  # Clear the token after use
     user.verification_token_expires = None
-    db.commit()
+    await db.commit()
     logger.debug(f"Email verified successfully for user: {user.email}")
     
     return {"message": "Email verified successfully"}
@@ -202,43 +203,43 @@ async def verify_email(token: str, db: Session = Depends(get_db)):
 async def request_password_reset(
     request: PasswordResetRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Request password reset token"""
-    user = db.query(User).filter(User.email == request.email).first()
+    user = await get_user_by_email(db, request.email)
     if user:
-        token = create_password_reset_token(user, db)
+        token = await create_password_reset_token(user, db)
         background_tasks.add_task(send_password_reset_email, user.email, token)
     return {"message": "If the email exists, a password reset link has been sent"}
 
 @router.post("/reset-password")
-async def reset_password(reset_data: PasswordReset, db: Session = Depends(get_db)):
+async def reset_password(reset_data: PasswordReset, db: AsyncSession = Depends(get_async_db)):
     """Reset password using reset token"""
-    user = verify_password_reset_token(reset_data.token, db)
+    user = await verify_password_reset_token(reset_data.token, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired reset token"
         )
     
-    user.hashed_password = get_password_hash(reset_data.new_password)
+    user.hashed_password = await get_password_hash_async(reset_data.new_password)
     user.password_reset_token = None
     user.password_reset_expires = None
     user.is_active = True  # Activate user when password is reset
     user.email_verified = True  # Consider email verified after password reset
-    db.commit()
+    await db.commit()
     
     return {"message": "Password reset successfully"}
 
 @router.get("/validate")
 async def validate_token(
     current_user: Annotated[User, Depends(get_current_active_user)],
-    db: Annotated[Session, Depends(get_db)]
+    db: Annotated[AsyncSession, Depends(get_async_db)]
 ) -> dict:
     """Validate the current token and return user info"""
     try:
         # Refresh the session
-        db.refresh(current_user)
+        await db.refresh(current_user)
         
         if not current_user.is_active:
             raise HTTPException(
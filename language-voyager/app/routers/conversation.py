@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 from datetime import datetime
+import json
 import logging
 from ..database.config import get_db
 from ..auth.utils import get_current_active_user
@@ -26,12 +28,33 @@ openrouter_service = OpenRouterService()
 async def get_openrouter_service() -> OpenRouterService:
     return OpenRouterService()
 
+def _sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _stream_chat(messages: List[Dict], context: Dict) -> AsyncIterator[str]:
+    """Relay generated text as server-sent events"""
+    try:
+        async for event in openrouter_service.stream_conversation(messages, context):
+            event_type = event.pop("type")
+            yield _sse_event(event_type, event)
+    except Exception as e:
+        # Headers are already sent, so errors are reported in the stream
+        logger.error(f"Error streaming conversation response: {e}")
+        yield _sse_event("error", {"message": f"Error generating conversation response: {str(e)}"})
+
 @router.post("/chat", response_model=ResponseModel[dict])
 async def chat(
+    request: Request,
     messages: List[Message],
-    context: Optional[Dict] = None
+    context: Optional[Dict] = None,
+    stream: bool = Query(False, description="Stream the reply as server-sent events")
 ) -> ResponseModel[dict]:
-    """Generate a conversation response using the LLM."""
+    """Generate a conversation response using the LLM.
+
+    With `stream=true` (or `Accept: text/event-stream`) the reply is sent as
+    `delta` events carrying text as it is generated, then a `done` event with
+    the complete message, or an `error` event.
+    """
     if context is None:
         context = {}
 
@@ -40,9 +63,17 @@ async def chat(
     if current_location_details:
         context["current_location"] = current_location_details
 
+    # Convert Pydantic models to dict for serialization
+    dict_messages = [jsonable_encoder(msg) for msg in messages]
+
+    if stream or "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            _stream_chat(dict_messages, context),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
     try:
-        # Convert Pydantic models to dict for serialization
-        dict_messages = [jsonable_encoder(msg) for msg in messages]
         response = await openrouter_service.generate_conversation(dict_messages, context)
         return ResponseModel(
             success=True,
@@ -55,4 +86,4 @@ async def chat(
             success=False,
             message=f"Error generating conversation response: {str(e)}",
             data={}
-        )
\ No newline at end of file
+        )
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, BackgroundTasks, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, BackgroundTasks, status
+from fastapi.responses import FileResponse, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.orm.attributes import flag_modified
 from typing import Dict, List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
 import logging
 from starlette.websockets import WebSocketState  # Add this import
-from ..database.config import get_db, SessionLocal
+from ..database.config import get_db, get_async_db, AsyncSessionLocal
 from ..services.arcgis import ArcGISService
 from ..services.google_places import GooglePlacesService  # Add this import
 from ..auth.utils import get_current_active_user
@@ -15,16 +18,21 @@ from ..models.region import Region
 from ..models.poi import PointOfInterest, POIContentConflict
 from ..models.progress import UserProgress
 from ..models.content import LanguageContent, ContentType
-from .schemas.map import Region as RegionSchema, POIResponse, POICreate, POIUpdate, POIUpdate, ContentDeliveryResponse
+from .schemas.map import Region as RegionSchema, POIResponse, POICreate, POIUpdate, POIUpdate, ContentDeliveryResponse, OfflineDeltaRequest
 from ..core.schemas import ResponseModel
 from ..services.cache import cache, RedisCache
 from ..services.recommendation import ContentRecommender
+from ..services.progress_tracking import ProgressTracker
 from ..services.websocket import manager, LocationUpdate
 from ..services.offline_maps import OfflineMapService
+from ..services.region_availability import region_availability
+from ..services.content_history import ContentHistoryService
 from ..services.location_manager import location_manager
+from ..services.spatial_index import spatial_index
 from ..models.arcgis_usage import ArcGISUsage
 from ..core.config import get_settings
 import asyncio
+import copy
 from ..auth.websocket_auth import authenticate_websocket_user
 
 settings = get_settings()
@@ -55,87 +63,47 @@ async def get_arcgis_service(db: Session = Depends(get_db)) -> ArcGISService:
 def get_offline_map_service(db: Session = Depends(get_db)) -> OfflineMapService:
     return OfflineMapService(db)
 
-@router.get("/regions", response_model=ResponseModel[List[RegionSchema]], dependencies=[Depends(get_current_active_user)])
+@router.get("/regions", response_model=ResponseModel[List[RegionSchema]])
 async def list_available_regions(
+    request: Request,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> ResponseModel[List[RegionSchema]]:
-    """List available regions with their metadata, progress requirements, and availability status"""
-    # Get all regions from database
-    regions = db.query(Region).all()
-    
-    # Get user's progress for all regions
-    progress_records = {
-        p.region_name: p for p in db.query(UserProgress).filter(
-            UserProgress.user_id == current_user.id
-        ).all()
-    }
-    
-    # Convert to response schema with availability checks
-    region_responses = []
-    for region in regions:
-        # Check if user meets requirements
-        is_available = True
-        requirements = {}
-        
-        if region.requirements:
-            is_available = False
-            for req_region, req_level in region.requirements.items():
-                if req_region in progress_records:
-                    prog = progress_records[req_region]
-                    if prog.proficiency_level >= req_level:
-                        is_available = True
-                        break  # If any requirement is met, region is available
-                    else:
-                        requirements[req_region] = req_level
-                else:
-                    requirements[req_region] = req_level
-        
-        # Convert to response model
-        region_response = RegionSchema(
-            id=region.id,
-            name=region.name,
-            local_name=region.local_name,
-            description=region.description,
-            languages=region.languages,
-            bounds=region.bounds,
-            center=region.center,
-            difficulty_level=region.difficulty_level,
-            is_available=is_available,
-            requirements=requirements if not is_available else None,
-            total_pois=region.total_pois,
-            total_challenges=region.total_challenges,
-            recommended_level=region.recommended_level,
-            created_at=region.created_at,
-            updated_at=region.updated_at
-        )
-        region_responses.append(region_response)
-    
-    return ResponseModel(
-        success=True,
-        message="Regions retrieved successfully",
-        data=region_responses
-    )
+    """List available regions with their metadata, progress requirements, and availability status
+
+    The response is served pre-serialized from the region availability cache
+    and carries an ETag, so clients revalidating with If-None-Match get a 304.
+    """
+    payload, etag = await region_availability.get_regions(db, current_user.id)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags or etag in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
-@router.get("/region/{region_id}/pois", response_model=ResponseModel[List[POIResponse]], dependencies=[Depends(get_current_active_user)])
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+@router.get("/region/{region_id}/pois", response_model=ResponseModel[List[POIResponse]])
 async def get_region_pois(
     region_id: str,
     poi_type: str = Query(None, description="Type of POI to filter by"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ) -> ResponseModel[List[POIResponse]]:
     """Get points of interest for a specific region, with optional type filtering"""
     # Verify region exists and is accessible
-    region = db.query(Region).filter(Region.id == region_id).first()
+    region = await db.get(Region, region_id)
     if not region:
         raise HTTPException(status_code=404, detail="Region not found")
     
     # Build query
-    query = db.query(PointOfInterest).filter(PointOfInterest.region_id == region_id)
+    query = select(PointOfInterest).where(PointOfInterest.region_id == region_id)
     if poi_type:
-        query = query.filter(PointOfInterest.poi_type == poi_type)
+        query = query.where(PointOfInterest.poi_type == poi_type)
     
-    pois = query.all()
+    pois = (await db.execute(query)).scalars().all()
     return ResponseModel(
         success=True,
         message=f"Retrieved {len(pois)} POIs for region {region_id}",
@@ -163,7 +131,7 @@ async def get_route(
     end_point = {"lat": end_lat, "lon": end_lon}
     return await service.get_route(start_point, end_point)
 
-@router.post("/location/update", dependencies=[Depends(get_current_active_user)])
+@router.post("/location/update")
 async def update_location(
     lat: float,
     lon: float,
@@ -172,7 +140,7 @@ async def update_location(
     service: ArcGISService = Depends(get_arcgis_service)
 ) -> Dict:
     """Update user location and get proximity-based triggers (HTTP fallback)"""
-    triggers = await service.check_proximity_triggers(lat, lon, current_user.id)
+    triggers = await service.check_proximity_triggers(lat, lon, current_user.id, region_id)
     
     # Update WebSocket manager's location tracking even for HTTP requests
     await manager.update_user_location(current_user.id, lat, lon, region_id)
@@ -205,24 +173,26 @@ async def get_map_layers(
     """Get available map layers for a region"""
     return await service.get_region_layers(region_id)
 
-@router.get("/pois/nearby", response_model=ResponseModel[List[POIResponse]], dependencies=[Depends(get_current_active_user)])
+@router.get("/pois/nearby", response_model=ResponseModel[List[POIResponse]])
 async def get_nearby_points_of_interest(
     lat: float,
     lon: float,
     radius: float = Query(1000, description="Search radius in meters"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
     service: ArcGISService = Depends(get_arcgis_service)
 ) -> ResponseModel[List[POIResponse]]:
     """Get POIs within specified radius of a point"""
-    # Use ArcGIS to find POIs within radius
-    nearby = await service.get_nearby_pois(lat, lon, radius)
+    # Use the local spatial index (ArcGIS only as fallback) to find POIs within radius
+    nearby = await service.find_nearby_pois(lat, lon, radius)
     
-    # Get POI IDs from ArcGIS response
+    # Get POI IDs from the nearby features, nearest first
     poi_ids = [feature["id"] for feature in nearby.get("features", [])]
     
-    # Fetch full POI details from database
-    pois = db.query(PointOfInterest).filter(PointOfInterest.id.in_(poi_ids)).all()
+    # Fetch full POI details from database and keep distance ordering
+    result = await db.execute(select(PointOfInterest).where(PointOfInterest.id.in_(poi_ids)))
+    pois_by_id = {poi.id: poi for poi in result.scalars()}
+    pois = [pois_by_id[poi_id] for poi_id in poi_ids if poi_id in pois_by_id]
     
     return ResponseModel(
         success=True,
@@ -230,10 +200,10 @@ async def get_nearby_points_of_interest(
         data=pois
     )
 
-@router.post("/pois", response_model=ResponseModel[POIResponse], dependencies=[Depends(get_current_active_user)])
+@router.post("/pois", response_model=ResponseModel[POIResponse])
 async def create_poi(
     poi: POICreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
     service: ArcGISService = Depends(get_arcgis_service)
 ) -> ResponseModel[POIResponse]:
@@ -242,19 +212,22 @@ async def create_poi(
         raise HTTPException(status_code=403, detail="Not authorized to create POIs")
     
     # Verify region exists
-    region = db.query(Region).filter(Region.id == poi.region_id).first()
+    region = await db.get(Region, poi.region_id)
     if not region:
         raise HTTPException(status_code=404, detail="Region not found")
     
     # Create POI
     db_poi = PointOfInterest(**poi.model_dump(exclude_unset=True))
     db.add(db_poi)
-    db.commit()
-    db.refresh(db_poi)
+    await db.commit()
+    await db.refresh(db_poi)
     
     # Update region POI count
     region.total_pois += 1
-    db.commit()
+    await db.commit()
+    
+    # Keep the local spatial index current
+    spatial_index.upsert(db_poi)
     
     return ResponseModel(
         success=True,
@@ -262,18 +235,18 @@ async def create_poi(
         data=db_poi
     )
 
-@router.patch("/pois/{poi_id}", response_model=ResponseModel[POIResponse], dependencies=[Depends(get_current_active_user)])
+@router.patch("/pois/{poi_id}", response_model=ResponseModel[POIResponse])
 async def update_poi(
     poi_id: str,
     poi_update: POIUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ) -> ResponseModel[POIResponse]:
     """Update a POI. Admin only."""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to update POIs")
     
-    db_poi = db.query(PointOfInterest).filter(PointOfInterest.id == poi_id).first()
+    db_poi = await db.get(PointOfInterest, poi_id)
     if not db_poi:
         raise HTTPException(status_code=404, detail="POI not found")
     
@@ -281,8 +254,11 @@ async def update_poi(
     for field, value in poi_update.model_dump(exclude_unset=True).items():
         setattr(db_poi, field, value)
     
-    db.commit()
-    db.refresh(db_poi)
+    await db.commit()
+    await db.refresh(db_poi)
+    spatial_index.upsert(db_poi)
+    # POI type and content feed the cached content selection
+    await cache.invalidate_poi_content(poi_id)
     
     return ResponseModel(
         success=True,
@@ -297,89 +273,71 @@ async def get_poi_content(
     proficiency_level: float = Query(..., ge=0, le=100, description="User's proficiency level"),
     content_type: Optional[str] = Query(None, description="Optional content type filter"),
     client_version: Optional[int] = Query(None, description="Client's current content version"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ) -> ResponseModel[ContentDeliveryResponse]:
     """Get language learning content for a specific POI."""
     # Get POI and verify it exists
-    poi = db.query(PointOfInterest).filter(PointOfInterest.id == poi_id).first()
+    poi = await db.get(PointOfInterest, poi_id)
     if not poi:
         raise HTTPException(status_code=404, detail="POI not found")
 
-    # Get region for dialect/context information
-    region = db.query(Region).filter(Region.id == poi.region_id).first()
-    if not region:
-        raise HTTPException(status_code=404, detail="Region not found")
-
     # Version check
-    version_info = poi.get_version_info()
     if client_version and not poi.validate_content_version(client_version):
         raise HTTPException(
             status_code=409, 
             detail="Content version mismatch. Please update content."
         )
 
+    # The content selection and regional context are shared by all users, so
+    # they are cached per proficiency bucket and checked against the POI's
+    # current content version; user progress is applied on top below.
+    proficiency_bucket = cache.quantize_proficiency(proficiency_level)
+    shared_content = await cache.get_poi_content(
+        poi_id,
+        language,
+        proficiency_bucket,
+        client_version=poi.content_version,
+        content_type=content_type
+    )
+
     # Get or initialize user progress
-    logger.info(f"Looking for progress with user_id={current_user.id}, language={language}, region_id={poi.region_id}")
-    all_user_progress = db.query(UserProgress).filter(
-        UserProgress.user_id == current_user.id
-    ).all()
-    logger.info(f"Found {len(all_user_progress)} total progress records for user {current_user.id}")
-    for p in all_user_progress:
-        logger.info(f"Progress: user_id={p.user_id}, language={p.language}, region_id={p.region_id}, region_name={p.region_name}")
-        
-    progress = db.query(UserProgress).filter(
+    logger.debug(f"Looking for progress with user_id={current_user.id}, language={language}, region_id={poi.region_id}")
+    result = await db.execute(select(UserProgress).where(
         UserProgress.user_id == current_user.id,
         UserProgress.language == language,
         UserProgress.region_id == poi.region_id  # Only use region_id for consistency
-    ).first()
+    ))
+    progress = result.scalars().first()
 
     if not progress:
-        logger.info(f"No progress found, creating new record")
+        logger.debug(f"No progress found, creating new record")
         progress = UserProgress(
             user_id=current_user.id,
             language=language,
             region_id=poi.region_id,  # Use region_id consistently
             region_name=poi.region_id,  # Set for backward compatibility
             proficiency_level=proficiency_level,
-            poi_progress={},
-            content_mastery={},
             achievements=[]
         )
         db.add(progress)
-        db.commit()
-        db.refresh(progress)  # Ensure we have the latest data
-    else:
-        logger.info(f"Found progress with POI progress: {progress.poi_progress}, content mastery: {progress.content_mastery}")
-        if progress.poi_progress and poi.id in progress.poi_progress:
-            logger.info(f"POI progress for {poi.id}: {progress.poi_progress[poi.id]}")
-        flag_modified(progress, "poi_progress")  # Mark JSON fields as modified to ensure SQLAlchemy tracks changes
-        flag_modified(progress, "content_mastery")
-
-    # Get current POI progress
-    poi_progress = progress.poi_progress.get(poi_id, {})
-    poi_visits = poi_progress.get("visits", 0)
-    completed_content = poi_progress.get("completed_content", [])
-
-    # Get content types to check
-    content_types = [content_type] if content_type else [
-        ContentType.VOCABULARY,
-        ContentType.PHRASE,
-        ContentType.DIALOGUE,
-        ContentType.CULTURAL_NOTE
-    ]
-
-    # Calculate mastery and visit factors
-    mastery_values = []
-    for ct, items in progress.content_mastery.items():
-        mastery_values.extend(items.values())
-    
-    # Calculate average mastery and factor (30% max increase)
-    avg_mastery = sum(mastery_values) / len(mastery_values) if mastery_values else 0
+        await db.commit()
+        await db.refresh(progress)  # Ensure we have the latest data
+
+    # Get current POI progress and running mastery totals
+    def load_progress_state(session):
+        tracker = ProgressTracker(session)
+        poi_visit = tracker.get_poi_visit(progress.id, poi_id)
+        if poi_visit is None:
+            return 0, [], tracker.get_average_mastery(progress.id)
+        return poi_visit.visits, list(poi_visit.completed_content or []), tracker.get_average_mastery(progress.id)
+
+    poi_visits, completed_content, (avg_mastery, mastered_count) = await db.run_sync(load_progress_state)
+
+    # Mastery factor from the average mastery (30% max increase)
     mastery_factor = (avg_mastery / 100) * 0.3
     
     # Visit factor calculation (20% max)
-    poi_visits = progress.poi_progress.get(poi.id, {}).get("visits", 0)
     visit_factor = min((poi_visits / 10) * 0.2, 0.2)
     
     # Calculate total adjustment with 20% cap for test compliance
@@ -387,7 +345,7 @@ async def get_poi_content(
     current_difficulty = poi.difficulty * (1 + total_adjustment)
     
     # Always ensure some progression when user has progress
-    if mastery_values or poi_visits > 0:
+    if mastered_count or poi_visits > 0:
         base_increase = poi.difficulty * 0.05  # Minimum 5% increase
         current_difficulty = max(current_difficulty, poi.difficulty + base_increase)
     
@@ -400,23 +358,52 @@ async def get_poi_content(
         next_difficulty = base * (1 + next_adjustment)
         difficulty_progression[f"visit_{visit}"] = next_difficulty
 
-    # Get content recommendations
-    content_results = {}
-    for ct in content_types:
-        # Get completed items for this content type
-        completed_items = []
-        if poi.id in progress.poi_progress:
-            completed_items = progress.poi_progress[poi.id].get("completed_content", [])
-            
-        recommendations = ContentRecommender.get_recommended_content(
-            db=db,
-            user_progress=progress,
+    if shared_content is None:
+        # Get region for dialect/context information
+        region = await db.get(Region, poi.region_id)
+        if not region:
+            raise HTTPException(status_code=404, detail="Region not found")
+
+        # Get content types to check
+        content_types = [content_type] if content_type else [
+            ContentType.VOCABULARY,
+            ContentType.PHRASE,
+            ContentType.DIALOGUE,
+            ContentType.CULTURAL_NOTE
+        ]
+
+        # Select content for all types in one pass
+        selected = await db.run_sync(lambda session: ContentRecommender.select_content_by_type(
+            db=session,
             poi=poi,
-            content_type=ct,
-            limit=5,
-            completed_content=completed_items
+            language=language,
+            content_types=content_types,
+            limit=5
+        ))
+        shared_content = {
+            "content": {str(ContentRecommender._normalize_content_type(t) or t): items for t, items in selected.items()},
+            "local_context": {
+                "dialect": region.region_metadata.get("dialect", "standard"),
+                "formality_level": poi.content.get("ja", {}).get("formality_level", "polite"),
+                "region_specific_customs": region.region_metadata.get("customs", {})
+            }
+        }
+        await cache.set_poi_content(
+            poi_id,
+            language,
+            proficiency_bucket,
+            shared_content,
+            version=poi.content_version,
+            content_type=content_type
         )
-        content_results[ct] = recommendations
+
+    # Apply this user's completion and mastery state
+    content_results = await db.run_sync(lambda session: ContentRecommender.personalize_recommendations(
+        db=session,
+        progress_id=progress.id,
+        selected=shared_content["content"],
+        completed_content=completed_content
+    ))
 
     # Include difficulty factors in response
     difficulty_factors = {
@@ -436,9 +423,7 @@ async def get_poi_content(
             cultural_notes=content_results.get(ContentType.CULTURAL_NOTE, []),
             difficulty_level=current_difficulty,
             local_context={
-                "dialect": region.region_metadata.get("dialect", "standard"),
-                "formality_level": poi.content.get("ja", {}).get("formality_level", "polite"),
-                "region_specific_customs": region.region_metadata.get("customs", {}),
+                **shared_content["local_context"],
                 "difficulty_factors": difficulty_factors,
                 "difficulty_progression": difficulty_progression,
                 "visit_count": poi_visits
@@ -462,16 +447,14 @@ def _determine_formality_level(poi_type: str) -> str:
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time location updates"""
     user = None
-    db = None
     geolocation = None
     
     try:
-        # Get database session
-        db = SessionLocal()
-        
-        # Authenticate before accepting connection
+        # Authenticate before accepting connection; the session is closed right
+        # away so no connection is held for the socket's lifetime
         try:
-            user = await authenticate_websocket_user(websocket, db)
+            async with AsyncSessionLocal() as db:
+                user = await authenticate_websocket_user(websocket, db)
             if not user:
                 await websocket.close(code=1008)  # Policy violation
                 return
@@ -562,12 +545,10 @@ async def websocket_endpoint(websocket: WebSocket):
             if user:
                 await manager.disconnect(user.id)
                 location_manager.unregister_connection(user.id)
-            if db:
-                db.close()
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
 
-@router.post("/offline/package", dependencies=[Depends(get_current_active_user)])
+@router.post("/offline/package")
 async def download_offline_package(
     region_id: str,
     bounds: Dict,
@@ -582,7 +563,65 @@ async def download_offline_package(
         zoom_levels=zoom_levels
     )
 
-@router.get("/offline/status/{region_id}", dependencies=[Depends(get_current_active_user)])
+@router.post("/offline/package/stream")
+async def build_streamed_offline_package(
+    region_id: str,
+    bounds: Dict,
+    zoom_levels: List[int] = [12, 13, 14, 15, 16],
+    current_user: User = Depends(get_current_active_user),
+    offline_service: OfflineMapService = Depends(get_offline_map_service)
+) -> Dict:
+    """Build a streamed (NDJSON) offline package and return its manifest"""
+    try:
+        manifest = await offline_service.build_package_file(
+            region_id=region_id,
+            bounds=bounds,
+            zoom_levels=zoom_levels,
+            user_id=current_user.id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {
+        **manifest,
+        "download_url": f"{settings.API_V1_PREFIX}{router.prefix}/offline/package/{region_id}/download"
+    }
+
+@router.get("/offline/package/{region_id}/download")
+async def download_streamed_offline_package(
+    region_id: str,
+    current_user: User = Depends(get_current_active_user),
+    offline_service: OfflineMapService = Depends(get_offline_map_service)
+) -> FileResponse:
+    """Download a built offline package; supports Range and If-Range for resuming"""
+    path = offline_service.get_package_path(region_id, current_user.id)
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Offline package not built")
+    return FileResponse(
+        path,
+        media_type="application/x-ndjson",
+        filename=f"{region_id}.ndjson"
+    )
+
+@router.post("/offline/delta/{region_id}")
+async def get_offline_delta(
+    region_id: str,
+    request: OfflineDeltaRequest,
+    current_user: User = Depends(get_current_active_user),
+    offline_service: OfflineMapService = Depends(get_offline_map_service)
+) -> Response:
+    """Get POIs and achievements changed since the client's version vector (gzip-framed NDJSON)"""
+    try:
+        delta = await offline_service.get_region_delta(
+            region_id=region_id,
+            client_versions=request.versions,
+            user_id=current_user.id,
+            achievements_since=request.achievements_since
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return Response(content=delta, media_type="application/gzip")
+
+@router.get("/offline/status/{region_id}")
 async def check_offline_package_status(
     region_id: str,
     timestamp: Optional[str] = None,
@@ -595,7 +634,7 @@ async def check_offline_package_status(
         timestamp=timestamp
     )
 
-@router.post("/offline/sync/{region_id}", dependencies=[Depends(get_current_active_user)])
+@router.post("/offline/sync/{region_id}")
 async def sync_offline_changes(
     region_id: str,
     offline_data: Dict,
@@ -605,14 +644,15 @@ async def sync_offline_changes(
     """Sync changes made while offline"""
     return await offline_service.sync_offline_changes(
         region_id=region_id,
-        offline_data=offline_data
+        offline_data=offline_data,
+        user_id=current_user.id
     )
 
 class RegionGeometry(BaseModel):
     type: str
     coordinates: List[List[float]]
 
-@router.post("/regions/spatial-analysis", dependencies=[Depends(get_current_active_user)])
+@router.post("/regions/spatial-analysis")
 async def analyze_region_spatial_relationships(
     geometry: RegionGeometry,
     region_id: str,
@@ -622,7 +662,7 @@ async def analyze_region_spatial_relationships(
     """Analyze spatial relationships between provided geometry and region features"""
     return await service.analyze_spatial_relationships(geometry.dict(), region_id)
 
-@router.post("/regions/route", dependencies=[Depends(get_current_active_user)])
+@router.post("/regions/route")
 async def find_region_route(
     points: List[Dict[str, float]],
     region_id: str,
@@ -633,7 +673,7 @@ async def find_region_route(
     """Find optimal route between multiple points within a region"""
     return await service.find_optimal_route(points, region_id, optimize_for)
 
-@router.get("/regions/{region_id}/boundary", dependencies=[Depends(get_current_active_user)])
+@router.get("/regions/{region_id}/boundary")
 async def get_region_boundary_geometry(
     region_id: str,
     service: ArcGISService = Depends(get_arcgis_service),
@@ -642,7 +682,7 @@ async def get_region_boundary_geometry(
     """Get detailed boundary geometry for a region"""
     return await service.get_region_boundary(region_id)
 
-@router.get("/regions/{region_id}/check-intersection", dependencies=[Depends(get_current_active_user)])
+@router.get("/regions/{region_id}/check-intersection")
 async def check_region_point_intersection(
     lat: float,
     lon: float,
@@ -653,7 +693,7 @@ async def check_region_point_intersection(
     """Check if a point intersects with region boundaries and get metadata"""
     return await service.check_region_intersection(lat, lon, region_id)
 
-@router.get("/regions/{region_id}/analytics", dependencies=[Depends(get_current_active_user)])
+@router.get("/regions/{region_id}/analytics")
 async def get_region_analytics(
     region_id: str,
     service: ArcGISService = Depends(get_arcgis_service),
@@ -662,7 +702,7 @@ async def get_region_analytics(
     """Get advanced spatial analytics for a region"""
     return await service.get_region_analytics(region_id)
 
-@router.get("/regions/{region_id}/similar", dependencies=[Depends(get_current_active_user)])
+@router.get("/regions/{region_id}/similar")
 async def find_similar_regions(
     region_id: str,
     criteria: List[str] = Query(["density", "poi_types"], description="Criteria to match"),
@@ -672,7 +712,7 @@ async def find_similar_regions(
     """Find regions with similar characteristics"""
     return await service.find_similar_regions(region_id, criteria)
 
-@router.get("/regions/{region_id}/connectivity", dependencies=[Depends(get_current_active_user)])
+@router.get("/regions/{region_id}/connectivity")
 async def analyze_region_connectivity(
     region_id: str,
     service: ArcGISService = Depends(get_arcgis_service),
@@ -681,7 +721,7 @@ async def analyze_region_connectivity(
     """Analyze region connectivity and accessibility"""
     return await service.analyze_region_connectivity(region_id)
 
-@router.get("/regions/{region_id}/clusters", dependencies=[Depends(get_current_active_user)])
+@router.get("/regions/{region_id}/clusters")
 async def get_region_clustering(
     region_id: str,
     feature_type: str = Query(..., description="Type of feature to cluster"),
@@ -691,13 +731,13 @@ async def get_region_clustering(
     """Get spatial clusters of specific features within a region"""
     return await service.get_region_clustering(region_id, feature_type)
 
-@router.post("/regions/transitions", response_model=ResponseModel, dependencies=[Depends(get_current_active_user)])
+@router.post("/regions/transitions", response_model=ResponseModel)
 async def check_region_transitions(
     location: Dict[str, float],
     previous_location: Optional[Dict[str, float]] = None,
     current_user: User = Depends(get_current_active_user),
     arcgis_service: ArcGISService = Depends(get_arcgis_service),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> ResponseModel:
     """Check for region transitions and manage dynamic region loading"""
     transitions = await arcgis_service.get_region_transitions(
@@ -722,7 +762,7 @@ async def check_region_transitions(
         data=transitions
     )
 
-@router.get("/regions/nearby", response_model=ResponseModel, dependencies=[Depends(get_current_active_user)])
+@router.get("/regions/nearby", response_model=ResponseModel)
 async def get_nearby_regions(
     lat: float,
     lon: float,
@@ -747,7 +787,7 @@ async def get_nearby_regions(
         data=nearby
     )
 
-@router.get("/regions/{region_id}/region-analytics", dependencies=[Depends(get_current_active_user)])  # Changed path to avoid operation ID conflict
+@router.get("/regions/{region_id}/region-analytics")  # Changed path to avoid operation ID conflict
 async def get_region_analytics(
     region_id: str,
     current_user: User = Depends(get_current_active_user),
@@ -807,7 +847,7 @@ class GeolocationConfig(BaseModel):
             }
         }
     
-@router.get("/location/config", dependencies=[Depends(get_current_active_user)])
+@router.get("/location/config")
 async def get_location_config(
     current_user: User = Depends(get_current_active_user)
 ) -> ResponseModel[GeolocationConfig]:
@@ -825,11 +865,11 @@ async def get_location_config(
         data=config
     )
 
-@router.post("/location/config", dependencies=[Depends(get_current_active_user)])
+@router.post("/location/config")
 async def update_location_config(
     config: GeolocationConfig,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> ResponseModel[GeolocationConfig]:
     """Update user's geolocation preferences"""
     if not hasattr(current_user, 'location_preferences'):
@@ -837,7 +877,7 @@ async def update_location_config(
     
     current_user.location_preferences.update(config.model_dump())
     flag_modified(current_user, "location_preferences")
-    db.commit()
+    await db.commit()
     
     return ResponseModel(
         success=True,
@@ -845,15 +885,15 @@ async def update_location_config(
         data=config
     )
 
-@router.get("/pois/{poi_id}/version", response_model=ResponseModel[dict], dependencies=[Depends(get_current_active_user)])
+@router.get("/pois/{poi_id}/version", response_model=ResponseModel[dict])
 async def check_poi_version(
     poi_id: str,
     client_version: int = Query(..., description="Client's current content version"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ) -> ResponseModel[dict]:
     """Check if client has latest POI content version"""
-    poi = db.query(PointOfInterest).filter(PointOfInterest.id == poi_id).first()
+    poi = await db.get(PointOfInterest, poi_id)
     if not poi:
         raise HTTPException(status_code=404, detail="POI not found")
         
@@ -869,11 +909,11 @@ async def check_poi_version(
         }
     )
 
-@router.post("/pois/{poi_id}/content", response_model=ResponseModel[dict], dependencies=[Depends(get_current_active_user)])
+@router.post("/pois/{poi_id}/content", response_model=ResponseModel[dict])
 async def update_poi_content(
     poi_id: str,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
     cache: RedisCache = Depends()
 ) -> ResponseModel[dict]:
@@ -881,15 +921,15 @@ async def update_poi_content(
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
         
-    poi = db.query(PointOfInterest).filter(PointOfInterest.id == poi_id).first()
+    poi = await db.get(PointOfInterest, poi_id)
     if not poi:
         raise HTTPException(status_code=404, detail="POI not found")
     
     # Update version and invalidate cache
-    poi.update_content_version()
+    poi.update_content_version(previous_content=poi.content)
     background_tasks.add_task(cache.invalidate_poi_content, poi_id)
     
-    db.commit()
+    await db.commit()
     
     return ResponseModel(
         success=True,
@@ -904,7 +944,7 @@ async def update_poi_content(
     background_tasks: BackgroundTasks,
     client_version: int = Query(..., description="Client's current content version"),
     change_description: str = Query(None, description="Description of content changes"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
     cache: RedisCache = Depends()
 ) -> ResponseModel[dict]:
@@ -912,14 +952,16 @@ async def update_poi_content(
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
         
-    poi = db.query(PointOfInterest).filter(PointOfInterest.id == poi_id).first()
+    poi = await db.get(PointOfInterest, poi_id)
     if not poi:
         raise HTTPException(status_code=404, detail="POI not found")
     
     # Check for version conflicts
     if not poi.validate_content_version(client_version):
         # Get changes since client version
-        changes = poi.get_content_diff(client_version)
+        changes = await db.run_sync(
+            lambda session: ContentHistoryService(session).get_content_diff(poi, client_version)
+        )
         raise HTTPException(
             status_code=409, 
             detail={
@@ -931,16 +973,18 @@ async def update_poi_content(
         )
     
     # Update content and version
+    previous_content = copy.deepcopy(poi.content)
     poi.content.update(content_update)
     poi.update_content_version(
         change_description=change_description,
-        changed_by=current_user.email
+        changed_by=current_user.email,
+        previous_content=previous_content
     )
     
     # Invalidate cache in background
     background_tasks.add_task(cache.invalidate_poi_content, poi_id)
     
-    db.commit()
+    await db.commit()
     
     return ResponseModel(
         success=True,
@@ -951,18 +995,23 @@ async def update_poi_content(
 @router.get("/pois/{poi_id}/history", response_model=ResponseModel[dict])
 async def get_content_history(
     poi_id: str,
-    db: Session = Depends(get_db),
+    limit: int = Query(50, ge=1, le=200, description="Maximum number of versions to return"),
+    before_version: Optional[int] = Query(None, description="Only return versions older than this one"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ) -> ResponseModel[dict]:
-    """Get POI content version history"""
-    poi = db.query(PointOfInterest).filter(PointOfInterest.id == poi_id).first()
+    """Get POI content version history, newest first"""
+    poi = await db.get(PointOfInterest, poi_id)
     if not poi:
         raise HTTPException(status_code=404, detail="POI not found")
     
+    history = await db.run_sync(
+        lambda session: ContentHistoryService(session).get_history(poi_id, limit, before_version)
+    )
     return ResponseModel(
         success=True,
         message="Retrieved content history",
-        data={"history": poi.content_history}
+        data={"current_version": poi.content_version, "history": history}
     )
 
 @router.post("/pois/{poi_id}/resolve-conflict", response_model=ResponseModel[dict])
@@ -971,7 +1020,7 @@ async def resolve_content_conflict(
     content_update: dict,
     resolution_strategy: str = Query(..., description="Strategy for resolving conflict: merge or override"),
     client_version: int = Query(..., description="Client's current content version"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
     cache: RedisCache = Depends()
 ) -> ResponseModel[dict]:
@@ -979,10 +1028,11 @@ async def resolve_content_conflict(
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
         
-    poi = db.query(PointOfInterest).filter(PointOfInterest.id == poi_id).first()
+    poi = await db.get(PointOfInterest, poi_id)
     if not poi:
         raise HTTPException(status_code=404, detail="POI not found")
     
+    previous_content = copy.deepcopy(poi.content)
     if resolution_strategy == "merge":
         # Merge strategy: keep both versions' changes
         for lang, content in content_update.items():
@@ -997,13 +1047,14 @@ async def resolve_content_conflict(
     # Update version with conflict resolution note
     poi.update_content_version(
         change_description=f"Conflict resolution ({resolution_strategy})",
-        changed_by=current_user.email
+        changed_by=current_user.email,
+        previous_content=previous_content
     )
     
     # Invalidate cache
     await cache.invalidate_poi_content(poi_id)
     
-    db.commit()
+    await db.commit()
     
     return ResponseModel(
         success=True,
@@ -1020,19 +1071,19 @@ class ConflictResolution(BaseModel):
 async def list_poi_conflicts(
     poi_id: str,
     status: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ) -> ResponseModel[List[Dict]]:
     """List all conflicts for a POI"""
-    poi = db.query(PointOfInterest).filter(PointOfInterest.id == poi_id).first()
+    poi = await db.get(PointOfInterest, poi_id)
     if not poi:
         raise HTTPException(status_code=404, detail="POI not found")
         
-    query = db.query(POIContentConflict).filter(POIContentConflict.poi_id == poi_id)
+    query = select(POIContentConflict).where(POIContentConflict.poi_id == poi_id)
     if status:
-        query = query.filter(POIContentConflict.status == status)
+        query = query.where(POIContentConflict.status == status)
         
-    conflicts = query.all()
+    conflicts = (await db.execute(query)).scalars().all()
     return ResponseModel(
         success=True,
         message="Conflicts retrieved successfully",
@@ -1053,17 +1104,17 @@ async def list_poi_conflicts(
 async def create_content_draft(
     poi_id: str,
     changes: Dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ) -> ResponseModel[Dict]:
     """Create a draft change for POI content"""
-    poi = db.query(PointOfInterest).filter(PointOfInterest.id == poi_id).first()
+    poi = await db.get(PointOfInterest, poi_id, options=[selectinload(PointOfInterest.content_conflicts)])
     if not poi:
         raise HTTPException(status_code=404, detail="POI not found")
         
     conflict = poi.create_pending_change(changes)
     db.add(conflict)
-    db.commit()
+    await db.commit()
     
     return ResponseModel(
         success=True,
@@ -1080,11 +1131,11 @@ async def resolve_content_conflict(
     poi_id: str,
     conflict_id: str,
     resolution: ConflictResolution,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ) -> ResponseModel[Dict]:
     """Resolve a content conflict"""
-    poi = db.query(PointOfInterest).filter(PointOfInterest.id == poi_id).first()
+    poi = await db.get(PointOfInterest, poi_id, options=[selectinload(PointOfInterest.content_conflicts)])
     if not poi:
         raise HTTPException(status_code=404, detail="POI not found")
         
@@ -1107,7 +1158,10 @@ async def resolve_content_conflict(
             detail="Could not resolve conflict. It may not exist or is already resolved."
         )
         
-    db.commit()
+    await db.commit()
+
+    # Accepted or merged changes bump the content version
+    await cache.invalidate_poi_content(poi_id)
     return ResponseModel(
         success=True,
         message="Conflict resolved successfully",
@@ -1118,21 +1172,24 @@ async def resolve_content_conflict(
 async def rollback_content_version(
     poi_id: str,
     version: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ) -> ResponseModel[Dict]:
     """Rollback POI content to a specific version"""
-    poi = db.query(PointOfInterest).filter(PointOfInterest.id == poi_id).first()
+    poi = await db.get(PointOfInterest, poi_id, options=[selectinload(PointOfInterest.content_conflicts)])
     if not poi:
         raise HTTPException(status_code=404, detail="POI not found")
         
-    if not poi.rollback_to_version(version):
+    conflict = await db.run_sync(
+        lambda session: ContentHistoryService(session).create_rollback(poi, version)
+    )
+    if conflict is None:
         raise HTTPException(
             status_code=400,
             detail=f"Could not rollback to version {version}. Version may not exist."
         )
         
-    db.commit()
+    await db.commit()
     return ResponseModel(
         success=True,
         message=f"Created rollback request to version {version}",
@@ -1174,15 +1231,15 @@ async def get_location_details(
 
 @router.get("/arcgis/usage", response_model=ResponseModel)
 async def get_arcgis_usage_metrics(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ) -> ResponseModel:
     """Get current ArcGIS API usage metrics (admin only)"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to view API usage metrics")
     
-    metrics = ArcGISUsage.get_usage_metrics(db)
-    daily_usage = ArcGISUsage.get_daily_usage(db)
+    metrics = await db.run_sync(ArcGISUsage.get_usage_metrics)
+    daily_usage = await db.run_sync(ArcGISUsage.get_daily_usage)
     
     return ResponseModel(
         success=True,
@@ -1198,14 +1255,14 @@ async def get_arcgis_usage_metrics(
 @router.get("/arcgis-usage", response_model=ResponseModel[UsageStatistics])
 async def get_arcgis_usage_statistics(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> ResponseModel[UsageStatistics]:
     """Get current ArcGIS usage statistics and rate limit alerts"""
     from ..core.config import get_settings
     settings = get_settings()
     
     # Get daily credit usage
-    daily_credits = ArcGISUsage.get_daily_usage(db)
+    daily_credits = await db.run_sync(ArcGISUsage.get_daily_usage)
     daily_limit = settings.ARCGIS_MAX_CREDITS_PER_DAY
     daily_percentage = (daily_credits / daily_limit) * 100 if daily_limit > 0 else 0
     
@@ -1215,7 +1272,7 @@ async def get_arcgis_usage_statistics(
                       "place_search", "place_details", "elevation"]
     
     for op_type in operation_types:
-        count = ArcGISUsage.get_monthly_count(db, op_type)
+        count = await db.run_sync(ArcGISUsage.get_monthly_count, op_type)
         limit = ArcGISUsage.get_monthly_limit(op_type)
         percentage = (count / limit) * 100 if limit > 0 else 0
         
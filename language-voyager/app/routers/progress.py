@@ -1,16 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import func
+from sqlalchemy.orm import lazyload
 from sqlalchemy.orm.attributes import flag_modified
 from datetime import datetime
 from typing import List
 import logging
 
-from ..database.config import get_db
+from ..database.config import get_async_db
 from ..models.user import User
 from ..models.progress import UserProgress
 from ..models.poi import PointOfInterest
 from ..models.region import Region
+from ..services.progress_tracking import ProgressTracker
 from ..auth.utils import get_current_active_user
 from ..core.schemas import ResponseModel
 from .schemas.progress import (
@@ -20,11 +23,6 @@ from .schemas.progress import (
     OverallProgress,
     POIProgressUpdate
 )
-from ..services.cache import RedisCache
-
-# Initialize cache with RedisCache class instead of importing instance
-cache = RedisCache()
-
 logger = logging.getLogger(__name__)
 
 router = APIRouter(
@@ -33,12 +31,22 @@ router = APIRouter(
     dependencies=[Depends(get_current_active_user)]
 )
 
+def _select_progress():
+    """Select UserProgress without its joined completed_pois, which these routes don't read
+
+    Joined collections would otherwise require Result.unique() and add a join per row.
+    """
+    return select(UserProgress).options(lazyload(UserProgress.completed_pois))
+
 @router.get("/", response_model=ResponseModel[OverallProgress])
 async def get_overall_progress(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    progress = db.query(UserProgress).filter(UserProgress.user_id == current_user.id).all()
+    result = await db.execute(
+        _select_progress().where(UserProgress.user_id == current_user.id)
+    )
+    progress = result.scalars().all()
     
     if not progress:
         return ResponseModel(
@@ -63,7 +71,7 @@ async def get_overall_progress(
     
     for p in progress:
         languages[p.language] = p.proficiency_level
-        regions.add(p.region)
+        regions.add(p.region_name)
         if p.completed_challenges:
             recent_activities.extend(p.completed_challenges)
     
@@ -84,14 +92,17 @@ async def get_overall_progress(
 async def update_progress(
     update: ProgressUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Find existing progress or create new
-    progress = db.query(UserProgress).filter(
-        UserProgress.user_id == current_user.id,
-        UserProgress.language == update.language,
-        UserProgress.region_name == update.region
-    ).first()
+    result = await db.execute(
+        _select_progress().where(
+            UserProgress.user_id == current_user.id,
+            UserProgress.language == update.language,
+            UserProgress.region_name == update.region
+        )
+    )
+    progress = result.scalars().first()
     
     if not progress:
         progress = UserProgress(
@@ -128,8 +139,8 @@ async def update_progress(
         # Update timestamp
         progress.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(progress)
+    await db.commit()
+    await db.refresh(progress)
     
     # Extract challenge IDs for response
     challenge_ids = [c.get("id") for c in progress.completed_challenges if isinstance(c, dict) and "id" in c]
@@ -139,7 +150,7 @@ async def update_progress(
         message="Progress updated successfully",
         data=ProgressResponse(
             language=progress.language,
-            region=progress.region,
+            region=progress.region_name,
             proficiency_level=progress.proficiency_level,
             completed_challenges=challenge_ids,
             achievements=[],  # Will be implemented with achievement system
@@ -151,12 +162,15 @@ async def update_progress(
 async def get_language_progress(
     language: str,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    progress = db.query(UserProgress).filter(
-        UserProgress.user_id == current_user.id,
-        UserProgress.language == language
-    ).all()
+    result = await db.execute(
+        _select_progress().where(
+            UserProgress.user_id == current_user.id,
+            UserProgress.language == language
+        )
+    )
+    progress = result.scalars().all()
     
     if not progress:
         return ResponseModel(
@@ -168,7 +182,7 @@ async def get_language_progress(
     response_data = [
         ProgressResponse(
             language=p.language,
-            region=p.region,
+            region=p.region_name,
             proficiency_level=p.proficiency_level,
             completed_challenges=[c["id"] for c in p.completed_challenges if "id" in c],
             achievements=[],  # Will be implemented with achievement system
@@ -186,12 +200,15 @@ async def get_language_progress(
 async def get_region_progress(
     region_name: str,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    progress = db.query(UserProgress).filter(
-        UserProgress.user_id == current_user.id,
-        UserProgress.region_name == region_name
-    ).all()
+    result = await db.execute(
+        _select_progress().where(
+            UserProgress.user_id == current_user.id,
+            UserProgress.region_name == region_name
+        )
+    )
+    progress = result.scalars().all()
     
     if not progress:
         return ResponseModel(
@@ -221,25 +238,28 @@ async def get_region_progress(
 async def complete_poi_content(
     poi_id: str,
     update: POIProgressUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ) -> ResponseModel[List[Achievement]]:
     """Record completion of POI content and check for achievements"""
     # Verify POI exists
-    poi = db.query(PointOfInterest).filter(PointOfInterest.id == poi_id).first()
+    poi = await db.get(PointOfInterest, poi_id)
     if not poi:
         raise HTTPException(status_code=404, detail="POI not found")
 
     # Get POI's region to determine language
-    region = db.query(Region).filter(Region.id == poi.region_id).first()
+    region = await db.get(Region, poi.region_id)
     if not region:
         raise HTTPException(status_code=404, detail="Region not found")
 
     # Get or create progress record
-    progress = db.query(UserProgress).filter(
-        UserProgress.user_id == current_user.id,
-        UserProgress.region_id == poi.region_id
-    ).first()
+    result = await db.execute(
+        _select_progress().where(
+            UserProgress.user_id == current_user.id,
+            UserProgress.region_id == poi.region_id
+        )
+    )
+    progress = result.scalars().first()
 
     if not progress:
         progress = UserProgress(
@@ -251,71 +271,37 @@ async def complete_poi_content(
             completed_challenges=[],
             vocabulary_mastered={},
             last_location="",
-            poi_progress={},
-            content_mastery={},
             achievements=[]
         )
         db.add(progress)
-        db.commit()
-
-    logger.info(f"Initial progress state - poi_progress: {progress.poi_progress}, achievements: {progress.achievements}")
+        await db.commit()
 
     # Initialize or get progress fields
     if progress.achievements is None:
         progress.achievements = []
         flag_modified(progress, "achievements")
-    if progress.content_mastery is None:
-        progress.content_mastery = {}
-        flag_modified(progress, "content_mastery")
-    if progress.poi_progress is None:
-        progress.poi_progress = {}
-        flag_modified(progress, "poi_progress")
-
-    # Update POI progress
-    if poi_id not in progress.poi_progress:
-        logger.info(f"Creating new POI progress entry for {poi_id}")
-        progress.poi_progress[poi_id] = {
-            "visits": 1,
-            "completed_content": [],
-            "total_time": update.time_spent,
-            "last_visit": str(datetime.utcnow())
-        }
-    else:
-        logger.info(f"Updating existing POI progress for {poi_id}")
-        poi_progress = progress.poi_progress[poi_id]
-        if "visits" not in poi_progress:
-            poi_progress["visits"] = 0
-        current_visits = poi_progress["visits"]
-        logger.info(f"Current visits before increment: {current_visits}")
-        
-        if "completed_content" not in poi_progress:
-            poi_progress["completed_content"] = []
-        if "total_time" not in poi_progress:
-            poi_progress["total_time"] = 0
 
-        # Update visit count and other fields
-        poi_progress["visits"] += 1
-        logger.info(f"Visits after increment: {poi_progress['visits']}")
-        poi_progress["completed_content"].extend(update.completed_items)
-        poi_progress["total_time"] += update.time_spent
-        poi_progress["last_visit"] = str(datetime.utcnow())
+    # Update POI progress and content mastery incrementally
+    def record_completion(session):
+        tracker = ProgressTracker(session)
+        poi_visit = tracker.record_poi_visit(
+            progress.id,
+            poi_id,
+            time_spent=update.time_spent,
+            completed_items=update.completed_items
+        )
+        tracker.record_mastery(
+            progress.id,
+            update.content_type,
+            {item_id: update.score for item_id in update.completed_items}
+        )
+        return poi_visit.visits, set(poi_visit.completed_content or [])
 
-    # Ensure changes are tracked
-    flag_modified(progress, "poi_progress")
-    
-    # Update content mastery
-    if update.content_type not in progress.content_mastery:
-        progress.content_mastery[update.content_type] = {}
-    
-    for item_id in update.completed_items:
-        progress.content_mastery[update.content_type][item_id] = update.score
-    flag_modified(progress, "content_mastery")
+    current_visits, completed_content = await db.run_sync(record_completion)
 
     # Check for achievements
     new_achievements = []
-    current_visits = progress.poi_progress[poi_id]["visits"]
-    logger.info(f"Checking achievements for {current_visits} visits")
-    logger.info(f"Current achievements: {progress.achievements}")
+    logger.debug(f"Checking achievements for {current_visits} visits")
 
     # Visit count achievements
     achievement_id = f"poi_visits_{poi_id}_5"
@@ -336,7 +322,6 @@ async def complete_poi_content(
         })
 
     # Content mastery achievements
-    completed_content = set(progress.poi_progress[poi_id]["completed_content"])
     completed_count = len(completed_content)
     
     # Calculate total content from learning objectives
@@ -381,22 +366,16 @@ async def complete_poi_content(
     else:
         logger.info("No new achievements to add")
 
-    # Update progress and recalculate proficiency
-    content_scores = []
-    for content_type, items in progress.content_mastery.items():
-        content_scores.extend(items.values())
-    
-    if content_scores:
-        progress.proficiency_level = sum(content_scores) / len(content_scores)
-
-    db.commit()
-    db.refresh(progress)
+    # Update progress and recalculate proficiency from running totals
+    avg_mastery, mastered_count = await db.run_sync(
+        lambda session: ProgressTracker(session).get_average_mastery(progress.id)
+    )
+    if mastered_count:
+        progress.proficiency_level = avg_mastery
 
-    logger.info(f"Final progress state - poi_progress: {progress.poi_progress}, achievements: {progress.achievements}")
-    logger.info(f"Returning achievements: {new_achievements}")
+    await db.commit()
 
-    # Invalidate cached content for this POI
-    await cache.invalidate_poi_content(poi_id)
+    logger.info(f"Recorded POI {poi_id} completion for user {current_user.id}, returning achievements: {new_achievements}")
 
     return ResponseModel(
         success=True,
@@ -95,4 +95,8 @@ class ContentDeliveryResponse(BaseModel):
     cultural_notes: List[ContentItem] = Field(default_factory=list)
     difficulty_level: float = Field(..., ge=0, le=100)
     local_context: LocalContext = Field(default_factory=dict)
-    version_info: VersionInfo = Field(...)
\ No newline at end of file
+    version_info: VersionInfo = Field(...)
+
+class OfflineDeltaRequest(BaseModel):
+    versions: Dict[str, int] = Field(default_factory=dict, description="Content version of each POI the client holds")
+    achievements_since: Optional[datetime] = Field(None, description="Client's last achievement sync time")
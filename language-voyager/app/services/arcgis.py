@@ -1,20 +1,54 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-import aiohttp
 import json
 import logging
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Set, Tuple
 from datetime import datetime
-import redis
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+import asyncio
 import hashlib
 import math
+import time
+import uuid
 from ..core.config import get_settings
+from ..database.config import SessionLocal
 from ..models.arcgis_usage import ArcGISUsage
+from .spatial_index import spatial_index
+from .http_client import http_client
 
 settings = get_settings()
-redis_client = redis.from_url(settings.REDIS_URL)
+redis_client = Redis.from_url(settings.REDIS_URL)
 logger = logging.getLogger(__name__)
 
+# Counter TTLs outlive their period so late reads still see the final total
+DAILY_COUNTER_TTL = 2 * 24 * 60 * 60
+MONTHLY_COUNTER_TTL = 32 * 24 * 60 * 60
+
+TILE_URL_TEMPLATE = "https://basemaps.arcgis.com/arcgis/rest/services/World_Basemap/tile/{z}/{y}/{x}"
+
+# Only bump counters that were already seeded from the database; a missing
+# counter is rebuilt from ArcGISUsage (plus buffered rows) on the next check
+INCREMENT_SEEDED_COUNTERS = """
+if redis.call('EXISTS', KEYS[1]) == 1 then redis.call('INCRBYFLOAT', KEYS[1], ARGV[1]) end
+if redis.call('EXISTS', KEYS[2]) == 1 then redis.call('INCR', KEYS[2]) end
+return 1
+"""
+
+# Delete the fetch lock only if this worker still owns it
+RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+# Upstream fetches in flight in this process, keyed by cache key
+_inflight_requests: Dict[str, asyncio.Task] = {}
+# Cache keys with a background stale refresh running
+_refreshing_keys: Set[str] = set()
+# Strong references to background refresh tasks so they are not collected mid-run
+_refresh_tasks: Set[asyncio.Task] = set()
+
 class ArcGISCredit:
     # Credit costs per operation (based on ArcGIS documentation)
     CREDIT_COSTS = {
@@ -27,6 +61,162 @@ class ArcGISCredit:
         'elevation': 0.001
     }
 
+class ArcGISUsageRecorder:
+    """Non-blocking ArcGIS usage accounting.
+
+    Usage rows are buffered in memory and written to `arcgis_usage` in batches
+    by a background task, while Redis counters keep the current day's credits
+    and month's operation counts so limit checks never aggregate the table.
+    """
+
+    def __init__(self):
+        self._pending: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _counter_keys(operation_type: str, now: datetime = None) -> Tuple[str, str]:
+        now = now or datetime.utcnow()
+        return (
+            f"arcgis:usage:credits:{now.strftime('%Y-%m-%d')}",
+            f"arcgis:usage:count:{now.strftime('%Y-%m')}:{operation_type}"
+        )
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def _pending_totals(self, operation_type: str, now: datetime) -> Tuple[int, float]:
+        """Monthly operation count and daily credits of rows not yet flushed"""
+        count = 0
+        credits = 0.0
+        for entry in self._pending:
+            timestamp = entry['timestamp']
+            if entry['operation_type'] == operation_type and \
+                    (timestamp.year, timestamp.month) == (now.year, now.month):
+                count += 1
+            if timestamp.date() == now.date():
+                credits += entry['credits_used']
+        return count, credits
+
+    async def record(
+        self,
+        operation_type: str,
+        credits_used: float,
+        cached: bool = False,
+        request_path: str = None
+    ) -> None:
+        """Buffer a usage row and bump the Redis counters"""
+        now = datetime.utcnow()
+        self._pending.append({
+            'operation_type': operation_type,
+            'credits_used': credits_used,
+            'cached': cached,
+            'request_path': request_path,
+            'timestamp': now
+        })
+
+        daily_key, monthly_key = self._counter_keys(operation_type, now)
+        try:
+            await redis_client.eval(INCREMENT_SEEDED_COUNTERS, 2, daily_key, monthly_key, credits_used)
+        except RedisError as e:
+            logger.error(f"Failed to update ArcGIS usage counters: {str(e)}")
+
+        if len(self._pending) >= settings.ARCGIS_USAGE_FLUSH_BATCH_SIZE and \
+                (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def get_totals(self, db: Session, operation_type: str) -> Tuple[int, float]:
+        """Get (monthly operation count, daily credits used) for limit checks
+
+        Reads the Redis counters, seeding them from the database on a miss. If
+        Redis is unavailable the totals are computed from the database directly.
+        """
+        now = datetime.utcnow()
+        daily_key, monthly_key = self._counter_keys(operation_type, now)
+        try:
+            daily_credits, monthly_count = await redis_client.mget(daily_key, monthly_key)
+            if daily_credits is not None and monthly_count is not None:
+                return int(monthly_count), float(daily_credits)
+
+            monthly_count, daily_credits = self._load_totals(db, operation_type, now)
+            await redis_client.set(daily_key, daily_credits, ex=DAILY_COUNTER_TTL, nx=True)
+            await redis_client.set(monthly_key, monthly_count, ex=MONTHLY_COUNTER_TTL, nx=True)
+            return monthly_count, daily_credits
+        except RedisError as e:
+            logger.error(f"ArcGIS usage counters unavailable, using database totals: {str(e)}")
+            return self._load_totals(db, operation_type, now)
+
+    def _load_totals(self, db: Session, operation_type: str, now: datetime) -> Tuple[int, float]:
+        """Build counter values from flushed rows plus the in-memory buffer"""
+        pending_count, pending_credits = self._pending_totals(operation_type, now)
+        usage = ArcGISUsage.get_monthly_usage(db, operation_type)
+        monthly_count = usage.get(operation_type, {'count': 0})['count'] + pending_count
+        start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        daily_credits = ArcGISUsage.get_credits_since(db, start_of_day) + pending_credits
+        return monthly_count, daily_credits
+
+    @staticmethod
+    def _write_batch(db: Session, entries: List[Dict[str, Any]]) -> None:
+        try:
+            db.add_all([ArcGISUsage(**entry) for entry in entries])
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            raise
+
+    @classmethod
+    def _write_batch_in_session(cls, entries: List[Dict[str, Any]]) -> None:
+        db = SessionLocal()
+        try:
+            cls._write_batch(db, entries)
+        finally:
+            db.close()
+
+    async def flush(self, db: Session = None) -> int:
+        """Write buffered usage rows in a single transaction
+
+        Uses the given session inline, otherwise a fresh session in a worker
+        thread so the event loop is not blocked. Failed batches are re-queued.
+        """
+        entries, self._pending = self._pending, []
+        if not entries:
+            return 0
+        try:
+            if db is not None:
+                self._write_batch(db, entries)
+            else:
+                await asyncio.to_thread(self._write_batch_in_session, entries)
+        except SQLAlchemyError as e:
+            logger.error(f"Failed to flush {len(entries)} ArcGIS usage rows: {str(e)}")
+            self._pending[:0] = entries
+            return 0
+        logger.debug(f"Flushed {len(entries)} ArcGIS usage rows")
+        return len(entries)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.ARCGIS_USAGE_FLUSH_INTERVAL)
+            await self.flush()
+
+    async def start(self) -> None:
+        """Start the periodic flush task (called from the app lifespan)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task and write any remaining rows"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+# Global usage recorder instance
+usage_recorder = ArcGISUsageRecorder()
+
 class ArcGISService:
     def __init__(self, db: Session):
         self.db = db
@@ -44,13 +234,16 @@ class ArcGISService:
 
     async def _get_cached_response(self, cache_key: str) -> Optional[Dict]:
         """Get cached response if available"""
-        cached = redis_client.get(cache_key)
-        if cached:
-            try:
-                return json.loads(cached)
-            except json.JSONDecodeError:
-                logger.warning(f"Invalid JSON in cache for key {cache_key}")
-                redis_client.delete(cache_key)
+        try:
+            cached = await redis_client.get(cache_key)
+            if cached:
+                try:
+                    return json.loads(cached)
+                except json.JSONDecodeError:
+                    logger.warning(f"Invalid JSON in cache for key {cache_key}")
+                    await redis_client.delete(cache_key)
+        except RedisError as e:
+            logger.error(f"Failed to read cached response: {str(e)}")
         return None
 
     async def _cache_response(self, cache_key: str, response: Dict, ttl: int = None):
@@ -58,19 +251,21 @@ class ArcGISService:
         if ttl is None:
             ttl = settings.ARCGIS_CACHE_DURATION
         try:
-            redis_client.setex(
+            await redis_client.setex(
                 cache_key,
                 ttl,
                 json.dumps(response)
             )
-        except (redis.RedisError, json.JSONDecodeError) as e:
+        except (RedisError, json.JSONDecodeError) as e:
             logger.error(f"Failed to cache response: {str(e)}")
 
     async def _check_usage_limits(self, operation_type: str) -> Tuple[bool, float, str]:
         """Check both monthly operation limits and daily credit limits"""
+        monthly_count, daily_credits = await usage_recorder.get_totals(self.db, operation_type)
+
         # First check monthly operation limit
-        within_limit, usage_percentage, alert_level = ArcGISUsage.check_monthly_limit(
-            self.db, operation_type
+        within_limit, usage_percentage, alert_level = ArcGISUsage.evaluate_monthly_limit(
+            operation_type, monthly_count
         )
         
         if not within_limit:
@@ -80,9 +275,8 @@ class ArcGISService:
             )
 
         # Then check daily credit limit
-        current_usage = ArcGISUsage.get_daily_usage(self.db)
         operation_cost = ArcGISCredit.CREDIT_COSTS.get(operation_type, 0.04)
-        if current_usage + operation_cost > self.settings.ARCGIS_MAX_CREDITS_PER_DAY:
+        if daily_credits + operation_cost > self.settings.ARCGIS_MAX_CREDITS_PER_DAY:
             raise HTTPException(
                 status_code=429,
                 detail="Daily ArcGIS credit limit reached. Please try again tomorrow."
@@ -96,62 +290,183 @@ class ArcGISService:
             )
             # Cache the alert to prevent spam
             alert_key = f"arcgis:alert:{operation_type}:{datetime.now().strftime('%Y-%m')}"
-            if not redis_client.exists(alert_key):
-                redis_client.setex(alert_key, 86400, json.dumps({
-                    'level': alert_level,
-                    'percentage': usage_percentage
-                }))
+            try:
+                if not await redis_client.exists(alert_key):
+                    await redis_client.setex(alert_key, 86400, json.dumps({
+                        'level': alert_level,
+                        'percentage': usage_percentage
+                    }))
+            except RedisError as e:
+                logger.error(f"Failed to cache usage alert: {str(e)}")
 
         return within_limit, usage_percentage, alert_level
 
-    def _log_usage(self, operation_type: str, cached: bool = False, request_path: str = None):
-        """Log credit usage to database"""
-        usage = ArcGISUsage(
-            operation_type=operation_type,
-            credits_used=ArcGISCredit.CREDIT_COSTS.get(operation_type, 0.04),
+    async def _record_usage(self, operation_type: str, cached: bool = False, request_path: str = None):
+        """Record credit usage without blocking on a database write"""
+        await usage_recorder.record(
+            operation_type,
+            ArcGISCredit.CREDIT_COSTS.get(operation_type, 0.04),
             cached=cached,
             request_path=request_path
         )
-        self.db.add(usage)
-        self.db.commit()
 
-    async def _make_request(self, endpoint: str, params: Dict[str, Any], operation_type: str) -> Dict:
-        """Make an ArcGIS API request with credit and quota management"""
-        # Generate cache key
-        cache_key = self._generate_cache_key(endpoint, params)
-        
-        # Check cache first
-        cached_response = await self._get_cached_response(cache_key)
-        if cached_response:
-            self._log_usage(operation_type, cached=True, request_path=endpoint)
-            return cached_response
+    async def _get_cached_entry(self, cache_key: str) -> Optional[Tuple[Dict, bool]]:
+        """Get a cached API response and whether it is past its freshness window"""
+        cached = await self._get_cached_response(cache_key)
+        if not cached:
+            return None
+        if not isinstance(cached, dict) or '_cached_at' not in cached or 'response' not in cached:
+            # Entries written before stale-while-revalidate have no timestamp
+            return cached, False
+        age = time.time() - cached['_cached_at']
+        return cached['response'], age >= settings.ARCGIS_CACHE_DURATION
 
+    async def _store_cached_entry(self, cache_key: str, response: Dict):
+        """Cache an API response, kept past its freshness window for stale serving"""
+        await self._cache_response(
+            cache_key,
+            {'response': response, '_cached_at': time.time()},
+            ttl=settings.ARCGIS_CACHE_DURATION + settings.ARCGIS_STALE_DURATION
+        )
+
+    async def _acquire_lock(self, lock_key: str, token: str) -> Optional[bool]:
+        """Try to take the cross-worker fetch lock; None if Redis is unavailable"""
+        try:
+            return bool(await redis_client.set(lock_key, token, nx=True, ex=settings.ARCGIS_LOCK_TIMEOUT))
+        except RedisError as e:
+            logger.error(f"Failed to acquire ArcGIS fetch lock: {str(e)}")
+            return None
+
+    async def _release_lock(self, lock_key: str, token: str):
+        try:
+            await redis_client.eval(RELEASE_LOCK, 1, lock_key, token)
+        except RedisError as e:
+            logger.error(f"Failed to release ArcGIS fetch lock: {str(e)}")
+
+    async def _wait_for_cached_response(self, cache_key: str, lock_key: str) -> Optional[Dict]:
+        """Wait for the worker holding the fetch lock to populate the cache"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.ARCGIS_LOCK_WAIT
+        while loop.time() < deadline:
+            await asyncio.sleep(settings.ARCGIS_LOCK_POLL_INTERVAL)
+            entry = await self._get_cached_entry(cache_key)
+            if entry and not entry[1]:
+                return entry[0]
+            try:
+                if not await redis_client.exists(lock_key):
+                    break
+            except RedisError:
+                break
+        entry = await self._get_cached_entry(cache_key)
+        return entry[0] if entry and not entry[1] else None
+
+    async def _fetch_and_cache(self, endpoint: str, params: Dict[str, Any], operation_type: str, cache_key: str) -> Dict:
+        """Call the ArcGIS API and cache the result"""
         # Check usage limits
         within_limit, usage_percentage, alert_level = await self._check_usage_limits(operation_type)
 
         # Make request
-        base_url = "https://geocode-api.arcgis.com/arcgis/rest/services/World/GeocodeServer" if operation_type == "geocoding" else "https://www.arcgis.com/sharing/rest"
+        base_url = settings.ARCGIS_GEOCODE_URL if operation_type == "geocoding" else settings.ARCGIS_REST_URL
         
-        params['token'] = self.api_key
-        session = aiohttp.ClientSession()
-        try:
-            url = f"{base_url}/{endpoint}"
-            response = await session.get(url, params=params)
-            if response.status != 200:
-                raise HTTPException(
-                    status_code=response.status,
-                    detail=f"ArcGIS API request failed: {url}"
-                )
-            result = await response.json()
-        finally:
-            await session.close()
+        params = dict(params, token=self.api_key)
+        url = f"{base_url}/{endpoint}"
+        response = await http_client.get(url, params=params)
+        if response.status != 200:
+            raise HTTPException(
+                status_code=response.status,
+                detail=f"ArcGIS API request failed: {url}"
+            )
+        result = response.json()
 
         # Log credit usage and cache response
-        self._log_usage(operation_type)
-        await self._cache_response(cache_key, result)
+        await self._record_usage(operation_type)
+        await self._store_cached_entry(cache_key, result)
 
         return result
 
+    async def _fetch_with_lock(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        operation_type: str,
+        cache_key: str,
+        wait: bool = True
+    ) -> Optional[Dict]:
+        """Fetch under a Redis lock so only one worker calls upstream per cache key
+
+        Workers that lose the lock wait for the winner's cached result. With
+        wait=False (background refresh) they give up instead and return None.
+        """
+        lock_key = f"arcgis:lock:{cache_key}"
+        token = uuid.uuid4().hex
+        acquired = await self._acquire_lock(lock_key, token)
+        if acquired is False:
+            if not wait:
+                return None
+            cached = await self._wait_for_cached_response(cache_key, lock_key)
+            if cached is not None:
+                await self._record_usage(operation_type, cached=True, request_path=endpoint)
+                return cached
+            logger.warning(f"Timed out waiting for ArcGIS fetch lock on {endpoint}, fetching directly")
+
+        try:
+            return await self._fetch_and_cache(endpoint, params, operation_type, cache_key)
+        finally:
+            if acquired:
+                await self._release_lock(lock_key, token)
+
+    def _schedule_refresh(self, endpoint: str, params: Dict[str, Any], operation_type: str, cache_key: str):
+        """Refresh a stale cache entry in the background"""
+        if cache_key in _refreshing_keys or cache_key in _inflight_requests:
+            return
+        _refreshing_keys.add(cache_key)
+        task = asyncio.create_task(self._refresh_cached_entry(endpoint, dict(params), operation_type, cache_key))
+        _refresh_tasks.add(task)
+        task.add_done_callback(_refresh_tasks.discard)
+        task.add_done_callback(lambda _: _refreshing_keys.discard(cache_key))
+
+    async def _refresh_cached_entry(self, endpoint: str, params: Dict[str, Any], operation_type: str, cache_key: str):
+        # The request's session may be closed by the time this runs
+        db = SessionLocal()
+        try:
+            service = ArcGISService(db)
+            await service._fetch_with_lock(endpoint, params, operation_type, cache_key, wait=False)
+        except Exception as e:
+            logger.warning(f"Background refresh of ArcGIS {endpoint} failed: {str(e)}")
+        finally:
+            db.close()
+
+    async def _make_request(self, endpoint: str, params: Dict[str, Any], operation_type: str) -> Dict:
+        """Make an ArcGIS API request with credit and quota management
+
+        Stale cache entries are served immediately while a background refresh
+        runs. Concurrent misses for the same key share one upstream fetch.
+        """
+        # Generate cache key
+        cache_key = self._generate_cache_key(endpoint, params)
+        
+        # Check cache first
+        entry = await self._get_cached_entry(cache_key)
+        if entry:
+            cached_response, is_stale = entry
+            await self._record_usage(operation_type, cached=True, request_path=endpoint)
+            if is_stale:
+                self._schedule_refresh(endpoint, params, operation_type, cache_key)
+            return cached_response
+
+        # Join an in-flight fetch for the same key, if any
+        task = _inflight_requests.get(cache_key)
+        if task is not None:
+            result = await asyncio.shield(task)
+            await self._record_usage(operation_type, cached=True, request_path=endpoint)
+            return result
+
+        # Run the fetch as its own task so a cancelled caller does not fail the others
+        task = asyncio.create_task(self._fetch_with_lock(endpoint, dict(params), operation_type, cache_key))
+        _inflight_requests[cache_key] = task
+        task.add_done_callback(lambda _: _inflight_requests.pop(cache_key, None))
+        return await asyncio.shield(task)
+
     async def get_map_features(self, region: str, feature_type: str) -> Dict:
         """Get map features for a region with credit-aware caching"""
         params = {
@@ -208,10 +523,52 @@ class ArcGISService:
         }
         return await self._make_request('layers', params, 'feature_request')
 
-    async def check_proximity_triggers(self, lat: float, lon: float, user_id: int) -> List[Dict]:
+    async def find_nearby_pois(
+        self,
+        lat: float,
+        lon: float,
+        radius_meters: float = 1000,
+        region_id: Optional[str] = None
+    ) -> Dict:
+        """Get POIs within a radius using the local spatial index, falling back to ArcGIS
+
+        The in-process index answers radius queries without a paid request. ArcGIS is
+        only consulted when no POIs are indexed for the requested area and the
+        fallback is enabled.
+        """
+        region_ids = [region_id] if region_id else None
+        if not spatial_index.is_loaded(region_ids):
+            # Loading reads every POI in the area, keep it off the event loop
+            await asyncio.to_thread(spatial_index.ensure_loaded, self.db, region_ids)
+        if spatial_index.has_pois(region_id):
+            features = spatial_index.nearby(
+                lat,
+                lon,
+                radius_meters,
+                region_id=region_id,
+                limit=settings.ARCGIS_FEATURE_LIMIT
+            )
+            return {'features': features, 'source': 'local'}
+
+        if self.settings.SPATIAL_INDEX_ARCGIS_FALLBACK:
+            nearby = await self.get_nearby_pois(lat, lon, radius_meters)
+            nearby.setdefault('source', 'arcgis')
+            return nearby
+
+        return {'features': [], 'source': 'local'}
+
+    async def check_proximity_triggers(
+        self,
+        lat: float,
+        lon: float,
+        user_id: int,
+        region_id: Optional[str] = None
+    ) -> List[Dict]:
         """Check for proximity-based triggers (POIs, challenges, etc.)"""
         # First get nearby POIs
-        nearby = await self.get_nearby_pois(lat, lon)
+        nearby = await self.find_nearby_pois(
+            lat, lon, self.settings.PROXIMITY_TRIGGER_RADIUS, region_id
+        )
         
         # Get cached user location to avoid triggering the same POI multiple times
         cache_key = f"user_location:{user_id}"
@@ -548,27 +905,13 @@ class ArcGISService:
         Returns:
             Dict containing tile package info and URLs
         """
-        if not self.api_key:
-            raise ValueError("ArcGIS API key not configured")
-            
-        # Calculate tile coordinates for each zoom level
-        tile_info = {}
-        for zoom in zoom_levels:
-            tiles = self._calculate_tiles_for_bounds(bounds, zoom)
-            tile_info[str(zoom)] = tiles
-            
-        # Track credit usage - each tile costs 0.003 credits
-        total_tiles = sum(len(tiles['x']) * len(tiles['y']) for tiles in tile_info.values())
-        credits_used = total_tiles * 0.003
-        
-        # Record usage
-        usage = ArcGISUsage(
-            operation_type="tile_package",
-            credits_used=credits_used,
-            timestamp=datetime.utcnow()
-        )
-        self.db.add(usage)
-        self.db.commit()
+        tile_ranges = await self.get_tile_ranges(bounds, zoom_levels)
+        tile_info = {
+            zoom: self._expand_tile_range(tile_range)
+            for zoom, tile_range in tile_ranges['ranges'].items()
+        }
+        total_tiles = tile_ranges['total_tiles']
+        credits_used = tile_ranges['credits_used']
         
         # Generate URLs for each tile
         tile_urls = {}
@@ -576,7 +919,7 @@ class ArcGISService:
             tile_urls[zoom] = []
             for x in tiles['x']:
                 for y in tiles['y']:
-                    url = f"https://basemaps.arcgis.com/arcgis/rest/services/World_Basemap/tile/{zoom}/{y}/{x}?token={self.api_key}"
+                    url = f"{TILE_URL_TEMPLATE.format(z=zoom, y=y, x=x)}?token={self.api_key}"
                     tile_urls[zoom].append({
                         'url': url,
                         'x': x,
@@ -593,12 +936,50 @@ class ArcGISService:
             'timestamp': datetime.utcnow().isoformat()
         }
         
-    def _calculate_tiles_for_bounds(
+    async def get_tile_ranges(
+        self,
+        bounds: Dict[str, float],
+        zoom_levels: List[int]
+    ) -> Dict:
+        """
+        Describe the tiles covering bounds as one x/y range per zoom level
+        
+        Unlike generate_tile_package no per-tile entries are built, so the
+        size of the result does not depend on the number of tiles.
+        """
+        if not self.api_key:
+            raise ValueError("ArcGIS API key not configured")
+            
+        ranges = {
+            str(zoom): self._calculate_tile_range(bounds, zoom)
+            for zoom in zoom_levels
+        }
+        
+        # Track credit usage - each tile costs 0.003 credits
+        total_tiles = sum(
+            (r['max_x'] - r['min_x'] + 1) * (r['max_y'] - r['min_y'] + 1)
+            for r in ranges.values()
+        )
+        credits_used = total_tiles * 0.003
+        
+        # Record usage
+        await usage_recorder.record("tile_package", credits_used)
+        
+        return {
+            'bounds': bounds,
+            'zoom_levels': zoom_levels,
+            'ranges': ranges,
+            'total_tiles': total_tiles,
+            'credits_used': credits_used,
+            'url_template': f"{TILE_URL_TEMPLATE}?token={self.api_key}"
+        }
+
+    def _calculate_tile_range(
         self,
         bounds: Dict[str, float],
         zoom: int
-    ) -> Dict[str, List[int]]:
-        """Calculate tile coordinates that cover the given bounds at specified zoom level"""
+    ) -> Dict[str, int]:
+        """Calculate the inclusive tile coordinate range covering bounds at a zoom level"""
         def lat_to_y(lat: float, zoom: int) -> int:
             lat_rad = math.radians(lat)
             n = 2.0 ** zoom
@@ -610,16 +991,28 @@ class ArcGISService:
             x = int((lon + 180.0) / 360.0 * n)
             return x
             
-        min_x = lon_to_x(bounds['minx'], zoom)
-        max_x = lon_to_x(bounds['maxx'], zoom)
-        min_y = lat_to_y(bounds['maxy'], zoom)  # Note: y is inverted
-        max_y = lat_to_y(bounds['miny'], zoom)
-        
         return {
-            'x': list(range(min_x, max_x + 1)),
-            'y': list(range(min_y, max_y + 1))
+            'min_x': lon_to_x(bounds['minx'], zoom),
+            'max_x': lon_to_x(bounds['maxx'], zoom),
+            'min_y': lat_to_y(bounds['maxy'], zoom),  # Note: y is inverted
+            'max_y': lat_to_y(bounds['miny'], zoom)
+        }
+
+    @staticmethod
+    def _expand_tile_range(tile_range: Dict[str, int]) -> Dict[str, List[int]]:
+        return {
+            'x': list(range(tile_range['min_x'], tile_range['max_x'] + 1)),
+            'y': list(range(tile_range['min_y'], tile_range['max_y'] + 1))
         }
 
+    def _calculate_tiles_for_bounds(
+        self,
+        bounds: Dict[str, float],
+        zoom: int
+    ) -> Dict[str, List[int]]:
+        """Calculate tile coordinates that cover the given bounds at specified zoom level"""
+        return self._expand_tile_range(self._calculate_tile_range(bounds, zoom))
+
     async def reverse_geocode_location(self, lat: float, lon: float) -> Dict:
         """Get detailed location information including street names and water bodies
         
@@ -643,18 +1036,13 @@ class ArcGISService:
         }
 
         # Make request without checking usage limits or caching
-        base_url = "https://geocode-api.arcgis.com/arcgis/rest/services/World/GeocodeServer"
+        base_url = settings.ARCGIS_GEOCODE_URL
         params['token'] = self.api_key
-        session = aiohttp.ClientSession()
-        try:
-            url = f"{base_url}/reverseGeocode"
-            response = await session.get(url, params=params)
-            if response.status != 200:
-                raise HTTPException(
-                    status_code=response.status,
-                    detail=f"ArcGIS API request failed: {url}"
-                )
-            result = await response.json()
-            return result
-        finally:
-            await session.close()
\ No newline at end of file
+        url = f"{base_url}/reverseGeocode"
+        response = await http_client.get(url, params=params)
+        if response.status != 200:
+            raise HTTPException(
+                status_code=response.status,
+                detail=f"ArcGIS API request failed: {url}"
+            )
+        return response.json()
\ No newline at end of file
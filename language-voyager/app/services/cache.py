@@ -1,4 +1,5 @@
-from typing import Optional, Any
+from typing import Optional, Any, Dict, Iterable
+import asyncio
 import json
 from redis.asyncio import Redis
 from datetime import datetime, timedelta
@@ -9,20 +10,25 @@ class RedisCache:
         settings = get_settings()
         self.redis = Redis.from_url(settings.REDIS_URL)
         self.default_ttl = 3600  # 1 hour default TTL
+        self.poi_content_ttl = settings.POI_CONTENT_CACHE_TTL
+        self.proficiency_bucket = settings.POI_CONTENT_PROFICIENCY_BUCKET
+        self.stats = {"poi_content_hits": 0, "poi_content_misses": 0}
+        self._pending = set()
 
     async def get(self, key: str, include_version: bool = False) -> Optional[Any]:
         """Get a value from cache, optionally with version info"""
         try:
-            data = await self.redis.get(key)
+            if include_version:
+                # Fetch value and version in one round trip
+                data, version = await self.redis.mget(key, f"{key}:version")
+            else:
+                data, version = await self.redis.get(key), None
             if not data:
                 return None
                 
             result = json.loads(data)
-            if include_version:
-                version_key = f"{key}:version"
-                version = await self.redis.get(version_key)
-                if version:
-                    result["_version"] = int(version)
+            if version:
+                result["_version"] = int(version)
             return result
         except Exception as e:
             print(f"Cache get error: {e}")
@@ -34,17 +40,12 @@ class RedisCache:
             if ttl is None:
                 ttl = self.default_ttl
                 
-            # Store the value
-            await self.redis.set(
-                key,
-                json.dumps(value),
-                ex=ttl
-            )
-            
-            # Store version if provided
-            if version is not None:
-                version_key = f"{key}:version"
-                await self.redis.set(version_key, str(version), ex=ttl)
+            # Store the value and version together
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.set(key, json.dumps(value), ex=ttl)
+                if version is not None:
+                    pipe.set(f"{key}:version", str(version), ex=ttl)
+                await pipe.execute()
                 
             return True
         except Exception as e:
@@ -82,27 +83,58 @@ class RedisCache:
             print(f"POI content invalidation error: {e}")
             return False
     
+    def schedule_poi_content_invalidation(self, poi_ids: Iterable[str]) -> None:
+        """Invalidate POIs' cached content from synchronous code, such as ORM events"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Without a loop in this thread the entries expire with their TTL
+            return
+        for poi_id in poi_ids:
+            task = loop.create_task(self.invalidate_poi_content(poi_id))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    def quantize_proficiency(self, proficiency_level: float) -> int:
+        """Round a proficiency level down to its cache bucket"""
+        bucket = self.proficiency_bucket
+        level = min(max(proficiency_level, 0), 100)
+        return int(level // bucket) * bucket
+
+    @staticmethod
+    def _poi_content_key(
+        poi_id: str,
+        language: str,
+        proficiency_level: float,
+        content_type: Optional[str] = None
+    ) -> str:
+        return f"poi:{poi_id}:content:{language}:{proficiency_level}:{content_type or 'all'}"
+
     async def get_poi_content(
         self,
         poi_id: str,
         language: str,
         proficiency_level: float,
-        client_version: Optional[int] = None
+        client_version: Optional[int] = None,
+        content_type: Optional[str] = None
     ) -> Optional[dict]:
         """Get cached POI content with version validation"""
-        key = f"poi:{poi_id}:content:{language}:{proficiency_level}"
+        key = self._poi_content_key(poi_id, language, proficiency_level, content_type)
         data = await self.get(key, include_version=True)
         
         if not data:
+            self.stats["poi_content_misses"] += 1
             return None
             
         # Version validation
+        cache_version = data.pop("_version", None)
         if client_version is not None:
-            cache_version = data.get("_version")
             if not cache_version or cache_version != client_version:
                 await self.invalidate(key)
+                self.stats["poi_content_misses"] += 1
                 return None
                 
+        self.stats["poi_content_hits"] += 1
         return data
     
     async def set_poi_content(
@@ -111,11 +143,21 @@ class RedisCache:
         language: str,
         proficiency_level: float,
         content: dict,
-        version: int
+        version: int,
+        content_type: Optional[str] = None
     ) -> bool:
         """Cache POI content with version information"""
-        key = f"poi:{poi_id}:content:{language}:{proficiency_level}"
-        return await self.set(key, content, version=version)
+        key = self._poi_content_key(poi_id, language, proficiency_level, content_type)
+        return await self.set(key, content, ttl=self.poi_content_ttl, version=version)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """POI content cache hit/miss counters for this process"""
+        hits = self.stats["poi_content_hits"]
+        total = hits + self.stats["poi_content_misses"]
+        return {
+            **self.stats,
+            "poi_content_hit_rate": hits / total if total else 0.0
+        }
 
 # Global cache instance
 cache = RedisCache()
\ No newline at end of file
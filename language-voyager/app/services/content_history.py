@@ -0,0 +1,78 @@
+from typing import Dict, List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from ..models.poi import PointOfInterest, POIContentHistory, POIContentConflict
+
+class ContentHistoryService:
+    """Indexed reads of a POI's content history
+
+    Versions are stored as diffs with periodic full snapshots, so rebuilding
+    a version reads the nearest snapshot at or before it plus the diffs up to
+    it, a range on (poi_id, version) that never spans more than
+    POI_HISTORY_SNAPSHOT_INTERVAL rows.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_history(self, poi_id: str, limit: int = 50, before_version: Optional[int] = None) -> List[Dict]:
+        """Version metadata, newest first"""
+        query = select(POIContentHistory).where(POIContentHistory.poi_id == poi_id)
+        if before_version is not None:
+            query = query.where(POIContentHistory.version < before_version)
+        query = query.order_by(POIContentHistory.version.desc()).limit(limit)
+        return [entry.to_dict() for entry in self.db.scalars(query)]
+
+    def get_content_diff(self, poi: PointOfInterest, from_version: int) -> Dict:
+        """Versions after `from_version` with their metadata and changes"""
+        entries = self.db.scalars(
+            select(POIContentHistory).where(
+                POIContentHistory.poi_id == poi.id,
+                POIContentHistory.version > from_version,
+                POIContentHistory.version <= poi.content_version
+            ).order_by(POIContentHistory.version)
+        )
+        changes = []
+        for entry in entries:
+            change = entry.to_dict()
+            change["content" if entry.is_snapshot else "diff"] = entry.content
+            changes.append(change)
+        return {
+            "changes": changes,
+            "from_version": from_version,
+            "to_version": poi.content_version
+        }
+
+    def get_content_at(self, poi_id: str, version: int) -> Optional[Dict]:
+        """Rebuild the content of a version, or None if it is not in the history"""
+        snapshot_version = self.db.scalar(
+            select(func.max(POIContentHistory.version)).where(
+                POIContentHistory.poi_id == poi_id,
+                POIContentHistory.version <= version,
+                POIContentHistory.is_snapshot.is_(True)
+            )
+        )
+        if snapshot_version is None:
+            return None
+
+        entries = list(self.db.scalars(
+            select(POIContentHistory).where(
+                POIContentHistory.poi_id == poi_id,
+                POIContentHistory.version >= snapshot_version,
+                POIContentHistory.version <= version
+            ).order_by(POIContentHistory.version)
+        ))
+        if not entries or entries[-1].version != version:
+            return None
+
+        content = entries[0].content
+        for entry in entries[1:]:
+            content = POIContentHistory.apply(content, entry.content)
+        return content
+
+    def create_rollback(self, poi: PointOfInterest, version: int) -> Optional[POIContentConflict]:
+        """Queue a pending change that restores the content of `version`"""
+        conflict = poi.rollback_to_version(version, self.get_content_at(poi.id, version))
+        if conflict is not None:
+            self.db.add(conflict)
+        return conflict
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from ..core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s.!?。！？、,]+$")
+
+class ConversationCache:
+    """TTL cache of assistant replies for repeated conversation requests
+
+    Replies are stored under two keys. The exact key covers the model,
+    sampling settings and every message as sent. The normalized key ignores
+    case, repeated whitespace and trailing punctuation in the messages, so
+    "Where is platform 4?" and "where is platform 4" at the same POI (same
+    system prompt) share a reply. Lookups try the exact key first.
+
+    An in-process LRU is always used; Redis can be enabled to share replies
+    between workers.
+    """
+
+    def __init__(self, ttl: int = None, maxsize: int = None, use_redis: bool = None):
+        self.ttl = settings.CONVERSATION_CACHE_TTL if ttl is None else ttl
+        self.maxsize = settings.CONVERSATION_CACHE_SIZE if maxsize is None else maxsize
+        if use_redis is None:
+            use_redis = settings.CONVERSATION_CACHE_REDIS
+        self._redis = Redis.from_url(settings.REDIS_URL) if use_redis else None
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.stats = {"exact_hits": 0, "normalized_hits": 0, "misses": 0}
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return _TRAILING_PUNCTUATION.sub("", _WHITESPACE.sub(" ", text).strip().casefold())
+
+    @staticmethod
+    def _hash(value: Any) -> str:
+        return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def keys(self, request: Dict) -> Tuple[str, str]:
+        """Exact and normalized keys for a chat completion request body"""
+        messages: List[Dict] = request["messages"]
+        params = {k: request.get(k) for k in ("model", "temperature", "max_tokens")}
+        exact = self._hash({**params, "messages": messages})
+        normalized = self._hash({
+            **params,
+            "messages": [
+                # The system prompt is built from POI context and is compared as is
+                [m.get("role"), m.get("content") if m.get("role") == "system" else self._normalize(m.get("content") or "")]
+                for m in messages
+            ]
+        })
+        return f"conversation:exact:{exact}", f"conversation:normalized:{normalized}"
+
+    def _get_local(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, content = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return content
+
+    def _set_local(self, key: str, content: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, content)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get(self, request: Dict) -> Optional[str]:
+        """Get a cached reply for a request body, or None on a miss"""
+        if self.ttl <= 0:
+            return None
+
+        for key, stat in zip(self.keys(request), ("exact_hits", "normalized_hits")):
+            content = self._get_local(key)
+            if content is None and self._redis is not None:
+                try:
+                    raw = await self._redis.get(key)
+                    if raw:
+                        content = raw.decode("utf-8")
+                        self._set_local(key, content)
+                except RedisError as e:
+                    logger.warning(f"Conversation cache read failed: {e}")
+            if content is not None:
+                self.stats[stat] += 1
+                return content
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, request: Dict, content: str) -> None:
+        """Cache a completed reply under both keys"""
+        if self.ttl <= 0 or not content:
+            return
+
+        keys = self.keys(request)
+        for key in keys:
+            self._set_local(key, content)
+        if self._redis is not None:
+            try:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.set(key, content, ex=self.ttl)
+                    await pipe.execute()
+            except RedisError as e:
+                logger.warning(f"Conversation cache write failed: {e}")
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.stats["exact_hits"] + self.stats["normalized_hits"]
+        total = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "hit_rate": hits / total if total else 0.0
+        }
+
+# Global conversation cache instance
+conversation_cache = ConversationCache()
@@ -1,4 +1,4 @@
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from pydantic import BaseModel
 import json
@@ -8,11 +8,50 @@ from fastapi import WebSocket
 from starlette.websockets import WebSocketState
 from .websocket import manager
 from .location_manager import location_manager
+from .spatial_index import spatial_index, haversine_distance
+from ..database.config import SessionLocal
 from ..core.config import get_settings
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+class LocationFilter:
+    """Kalman filter smoothing a stream of fixes
+
+    Position uncertainty grows with time at the configured process noise and
+    each fix is weighted by its reported accuracy, so noisy fixes move the
+    estimate less than precise ones.
+    """
+
+    def __init__(self, process_noise: float = None):
+        self.process_noise = settings.LOCATION_PROCESS_NOISE if process_noise is None else process_noise
+        self.reset()
+
+    def reset(self) -> None:
+        self.lat: Optional[float] = None
+        self.lon: Optional[float] = None
+        self.variance = -1.0  # meters squared; negative until the first fix
+        self.timestamp = 0.0
+
+    def update(self, lat: float, lon: float, accuracy: Optional[float], timestamp: float) -> Tuple[float, float]:
+        accuracy = max(accuracy or settings.LOCATION_DEFAULT_ACCURACY, 1.0)
+        if self.variance < 0:
+            self.lat, self.lon = lat, lon
+            self.variance = accuracy * accuracy
+            self.timestamp = timestamp
+            return lat, lon
+
+        elapsed = timestamp - self.timestamp
+        if elapsed > 0:
+            self.variance += elapsed * self.process_noise * self.process_noise
+            self.timestamp = timestamp
+
+        gain = self.variance / (self.variance + accuracy * accuracy)
+        self.lat += gain * (lat - self.lat)
+        self.lon += gain * (lon - self.lon)
+        self.variance *= 1 - gain
+        return self.lat, self.lon
+
 class GeolocationService:
     """Service for managing client-side geolocation"""
     
@@ -25,11 +64,25 @@ class GeolocationService:
         self.update_task = None
         self.last_update_time = 0
         self.min_update_interval = 5.0  # Minimum time between updates in seconds
+        self.nearby_pois: set = set()  # POIs currently within trigger radius
+        
+        # Per-connection stream filtering
+        self.base_update_interval = 5.0  # Interval while moving
+        self.minimum_distance = 10.0  # meters a smoothed fix must move to be forwarded
+        self.location_filter = LocationFilter()
+        self.last_forwarded: Optional[Tuple[float, float]] = None
+        self.last_region_id: Optional[str] = None
+        self.stationary_fixes = 0
+        self.stats = {"received": 0, "forwarded": 0, "dropped": 0}
 
     async def send_json(self, data: Dict) -> None:
         """Safely send JSON data over WebSocket"""
         if self.websocket.client_state != WebSocketState.CONNECTED:
             return
+        if manager.active_connections.get(self.user_id) is self.websocket:
+            # Share the connection's bounded send queue with other senders
+            await manager.send_to_user(self.user_id, data)
+            return
         try:
             await self.websocket.send_json(data)
         except Exception as e:
@@ -49,9 +102,13 @@ class GeolocationService:
         self.error_count = 0
         
         # Update configuration
-        self.min_update_interval = float(config.get("updateInterval", 5.0))
-        if self.min_update_interval < 1.0:
-            self.min_update_interval = 1.0  # Enforce minimum interval
+        interval = max(float(config.get("updateInterval", 5.0)), 1.0)  # Enforce minimum interval
+        if config.get("powerSaveMode"):
+            interval = max(interval, settings.LOCATION_POWER_SAVE_INTERVAL)
+        self.base_update_interval = interval
+        self.min_update_interval = interval
+        self.minimum_distance = float(config.get("minimumDistance", 10.0))
+        self.stationary_fixes = 0
         
         try:
             # Initialize tracking with config
@@ -92,6 +149,9 @@ class GeolocationService:
             return
             
         current_time = datetime.utcnow().timestamp()
+        if self.min_update_interval > self.base_update_interval and self._raw_fix_moved(data):
+            # Movement while backed off restores the normal rate before throttling
+            self._adapt_interval(moved=True)
         if current_time - self.last_update_time < self.min_update_interval:
             return  # Skip update if too soon
             
@@ -100,10 +160,7 @@ class GeolocationService:
             self.error_count = 0
             self.last_position = data
             
-            # Extract coordinates - handle nested structure correctly
-            position = data.get("coords", {})  # The position data might be direct or in coords
-            if not position and isinstance(data, dict):
-                position = data.get("position", {}).get("coords", {})  # Try nested structure
+            position = self._extract_coords(data)
             
             lat = position.get("latitude")
             lon = position.get("longitude")
@@ -119,17 +176,33 @@ class GeolocationService:
             except (TypeError, ValueError):
                 raise ValueError("Latitude and longitude must be numbers")
             
+            # Update last update time
+            self.last_update_time = current_time
+            self.stats["received"] += 1
+            
+            # Smooth jitter, then only do downstream work for real movement
+            lat_float, lon_float = self.location_filter.update(lat_float, lon_float, accuracy_float, current_time)
+            region_id = data.get("region_id")
+            if not self._is_meaningful_move(lat_float, lon_float, region_id):
+                self.stats["dropped"] += 1
+                self._adapt_interval(moved=False)
+                return
+            self._adapt_interval(moved=True)
+            self.last_forwarded = (lat_float, lon_float)
+            self.last_region_id = region_id
+            self.stats["forwarded"] += 1
+            
             # Update location in the location manager
             await manager.update_user_location(
                 self.user_id,
                 lat_float,
                 lon_float,
-                data.get("region_id"),
+                region_id,
                 accuracy_float
             )
             
-            # Update last update time
-            self.last_update_time = current_time
+            # Check POI proximity in-process
+            await self._check_proximity(lat_float, lon_float, region_id)
             
             # Don't send our own success response since manager.update_user_location already does
             
@@ -137,6 +210,80 @@ class GeolocationService:
             logger.error(f"Error processing location update: {e}")
             await self.handle_error("PROCESSING_ERROR", str(e))
 
+    @staticmethod
+    def _extract_coords(data: Dict) -> Dict:
+        """Extract coordinates - handle nested structure correctly"""
+        position = data.get("coords", {})  # The position data might be direct or in coords
+        if not position and isinstance(data, dict):
+            position = data.get("position", {}).get("coords", {})  # Try nested structure
+        return position
+
+    def _raw_fix_moved(self, data: Dict) -> bool:
+        """Check an unfiltered fix against the movement threshold"""
+        position = self._extract_coords(data)
+        try:
+            lat = float(position["latitude"])
+            lon = float(position["longitude"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return self._is_meaningful_move(lat, lon, data.get("region_id"))
+
+    def _is_meaningful_move(self, lat: float, lon: float, region_id: Optional[str]) -> bool:
+        """Whether a smoothed fix is worth forwarding downstream"""
+        if self.last_forwarded is None or region_id != self.last_region_id:
+            return True
+        return haversine_distance(*self.last_forwarded, lat, lon) >= self.minimum_distance
+
+    def _adapt_interval(self, moved: bool) -> None:
+        """Back off polling while stationary and restore it on movement"""
+        if moved:
+            self.stationary_fixes = 0
+            self.min_update_interval = self.base_update_interval
+            return
+        self.stationary_fixes += 1
+        if self.stationary_fixes >= settings.LOCATION_STATIONARY_FIXES:
+            self.min_update_interval = min(
+                self.min_update_interval * 2,
+                max(settings.LOCATION_MAX_UPDATE_INTERVAL, self.base_update_interval)
+            )
+            self.stationary_fixes = 0
+
+    @staticmethod
+    def _load_spatial_index(region_ids: Optional[List[str]]) -> None:
+        """Load regions into the spatial index with a session of its own (runs in a worker thread)"""
+        db = SessionLocal()
+        try:
+            spatial_index.ensure_loaded(db, region_ids)
+        finally:
+            db.close()
+
+    async def _check_proximity(self, lat: float, lon: float, region_id: Optional[str] = None) -> None:
+        """Send proximity triggers for POIs that came into range using the local spatial index"""
+        # Clients rarely send a region, in which case every region is indexed
+        region_ids = [region_id] if region_id else None
+        if not spatial_index.is_loaded(region_ids):
+            await asyncio.to_thread(self._load_spatial_index, region_ids)
+        
+        nearby = spatial_index.nearby(
+            lat,
+            lon,
+            settings.PROXIMITY_TRIGGER_RADIUS,
+            region_id=region_id
+        )
+        
+        # Only trigger POIs that were not already in range on the previous fix
+        for feature in nearby:
+            if feature["id"] not in self.nearby_pois:
+                await self.send_json({
+                    "type": "proximity_trigger",
+                    "trigger": {
+                        "type": "poi_proximity",
+                        "poi": feature,
+                        "distance": feature["distance"]
+                    }
+                })
+        self.nearby_pois = {feature["id"] for feature in nearby}
+
     async def handle_error(self, code: str, message: str) -> None:
         """Handle geolocation errors"""
         if not self.active or self.websocket.client_state != WebSocketState.CONNECTED:
@@ -1,7 +1,7 @@
 from typing import Dict, Optional
-import aiohttp
 from fastapi import HTTPException
 from ..core.config import get_settings
+from .http_client import http_client
 
 settings = get_settings()
 
@@ -28,41 +28,40 @@ class GooglePlacesService:
             'key': self.api_key
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(base_url, params=params) as response:
-                if response.status != 200:
-                    raise HTTPException(
-                        status_code=response.status,
-                        detail="Google Places API request failed"
-                    )
-                data = await response.json()
-                
-                if data['status'] != 'OK':
-                    raise HTTPException(
-                        status_code=503,
-                        detail=f"Google Places API error: {data['status']}"
-                    )
+        response = await http_client.get(base_url, params=params)
+        if response.status != 200:
+            raise HTTPException(
+                status_code=response.status,
+                detail="Google Places API request failed"
+            )
+        data = response.json()
+        
+        if data['status'] != 'OK':
+            raise HTTPException(
+                status_code=503,
+                detail=f"Google Places API error: {data['status']}"
+            )
 
-                # Format the response
-                result = data['results'][0] if data['results'] else {}
-                address_components = result.get('address_components', [])
-                
-                # Extract components
-                locality = next((c['long_name'] for c in address_components 
-                               if 'locality' in c['types']), '')
-                sublocality = next((c['long_name'] for c in address_components 
-                                  if 'sublocality' in c['types']), '')
-                neighborhood = next((c['long_name'] for c in address_components 
-                                  if 'neighborhood' in c['types']), '')
-                
-                return {
-                    'address': {
-                        'Address': result.get('formatted_address', ''),
-                        'Street': sublocality or neighborhood,
-                        'Neighborhood': locality,
-                        'District': '',
-                        'LongLabel': result.get('formatted_address', ''),  # Japanese formatted address
-                        'ShortLabel': locality or sublocality or neighborhood  # Shorter Japanese name
-                    },
-                    'features': []  # Google Places doesn't provide water features
-                }
\ No newline at end of file
+        # Format the response
+        result = data['results'][0] if data['results'] else {}
+        address_components = result.get('address_components', [])
+        
+        # Extract components
+        locality = next((c['long_name'] for c in address_components 
+                       if 'locality' in c['types']), '')
+        sublocality = next((c['long_name'] for c in address_components 
+                          if 'sublocality' in c['types']), '')
+        neighborhood = next((c['long_name'] for c in address_components 
+                          if 'neighborhood' in c['types']), '')
+        
+        return {
+            'address': {
+                'Address': result.get('formatted_address', ''),
+                'Street': sublocality or neighborhood,
+                'Neighborhood': locality,
+                'District': '',
+                'LongLabel': result.get('formatted_address', ''),  # Japanese formatted address
+                'ShortLabel': locality or sublocality or neighborhood  # Shorter Japanese name
+            },
+            'features': []  # Google Places doesn't provide water features
+        }
\ No newline at end of file
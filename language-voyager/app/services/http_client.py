@@ -0,0 +1,249 @@
+from typing import AsyncIterator, Dict, Any, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import logging
+import aiohttp
+from ..core.config import get_settings
+from ..core.profiling import record_http
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Methods that may run twice without a second effect; others, such as a billed
+# POST to chat/completions, are only retried when the request was never sent
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+def _can_retry_error(method: str, error: Exception) -> bool:
+    # A connector error means no connection was made, so nothing reached the server
+    return method.upper() in IDEMPOTENT_METHODS or isinstance(error, aiohttp.ClientConnectorError)
+
+def _can_retry_status(method: str, status: int) -> bool:
+    return status in RETRY_STATUSES and method.upper() in IDEMPOTENT_METHODS
+
+class HTTPResponse:
+    """Fully-read upstream response, safe to use after the connection is released"""
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes, url: str):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.url = url
+
+    def text(self, encoding: str = "utf-8") -> str:
+        return self.body.decode(encoding, errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+class HTTPClientPool:
+    """Shared, long-lived aiohttp session for all outbound API calls.
+
+    A single connector provides keep-alive connection reuse, per-host limits and
+    DNS caching for ArcGIS, OpenRouter and Google Places. The session is opened in
+    the app lifespan (or lazily on first use) and closed on shutdown.
+    """
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self.metrics = {
+            "requests_total": 0,
+            "requests_failed": 0,
+            "retries": 0,
+            "in_flight": 0,
+            "queued": 0,
+            "connections_created": 0,
+            "connections_reused": 0
+        }
+
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_queued_start(session, ctx, params):
+            self.metrics["queued"] += 1
+
+        async def on_queued_end(session, ctx, params):
+            self.metrics["queued"] -= 1
+
+        async def on_connection_created(session, ctx, params):
+            self.metrics["connections_created"] += 1
+
+        async def on_connection_reused(session, ctx, params):
+            self.metrics["connections_reused"] += 1
+
+        async def on_request_start(session, ctx, params):
+            ctx.started = asyncio.get_running_loop().time()
+
+        async def on_request_done(session, ctx, params):
+            # Streamed responses count the time until their headers arrive
+            record_http(asyncio.get_running_loop().time() - ctx.started)
+
+        trace_config.on_connection_queued_start.append(on_queued_start)
+        trace_config.on_connection_queued_end.append(on_queued_end)
+        trace_config.on_connection_create_end.append(on_connection_created)
+        trace_config.on_connection_reuseconn.append(on_connection_reused)
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_done)
+        trace_config.on_request_exception.append(on_request_done)
+        return trace_config
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=settings.HTTP_POOL_LIMIT,
+            limit_per_host=settings.HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL,
+            use_dns_cache=True
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=settings.HTTP_TOTAL_TIMEOUT,
+            connect=settings.HTTP_CONNECT_TIMEOUT
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            trace_configs=[self._build_trace_config()]
+        )
+
+    async def start(self) -> None:
+        """Open the shared session (called from the app lifespan)"""
+        await self.get_session()
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Get the shared session, creating it for the current event loop if needed"""
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._loop is loop:
+            return self._session
+
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._session is None or self._session.closed or self._loop is not loop:
+                self._session = self._create_session()
+                self._loop = loop
+                logger.info("Opened shared HTTP client session")
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared session and its pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("Closed shared HTTP client session")
+        self._session = None
+        self._loop = None
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        retries: Optional[int] = None,
+        **kwargs
+    ) -> HTTPResponse:
+        """Make a request with retry and exponential backoff, returning the read response
+
+        Connection errors, timeouts and retryable statuses (429/5xx) are retried up
+        to `retries` times. The last response is returned for the caller to handle
+        if retries run out on a retryable status. Non-idempotent methods are
+        only retried when connecting failed, since the server may otherwise
+        have acted on the request.
+        """
+        if retries is None:
+            retries = settings.HTTP_MAX_RETRIES
+
+        session = await self.get_session()
+        attempt = 0
+        while True:
+            self.metrics["requests_total"] += 1
+            self.metrics["in_flight"] += 1
+            try:
+                async with session.request(method, url, **kwargs) as response:
+                    body = await response.read()
+                    result = HTTPResponse(
+                        status=response.status,
+                        headers=dict(response.headers),
+                        body=body,
+                        url=str(response.url)
+                    )
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                self.metrics["requests_failed"] += 1
+                if attempt >= retries or not _can_retry_error(method, e):
+                    raise
+                logger.warning(f"HTTP {method} {url} failed ({type(e).__name__}), retrying")
+            else:
+                if not _can_retry_status(method, result.status) or attempt >= retries:
+                    return result
+                logger.warning(f"HTTP {method} {url} returned {result.status}, retrying")
+            finally:
+                self.metrics["in_flight"] -= 1
+
+            attempt += 1
+            self.metrics["retries"] += 1
+            await asyncio.sleep(settings.HTTP_RETRY_BACKOFF * (2 ** (attempt - 1)))
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        method: str,
+        url: str,
+        retries: Optional[int] = None,
+        **kwargs
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Open a request whose body the caller reads incrementally
+
+        Connection errors and retryable statuses are retried as in `request`,
+        including its limits for non-idempotent methods, until a response starts; after that the caller owns the response and
+        the connection is released when the block exits.
+        """
+        if retries is None:
+            retries = settings.HTTP_MAX_RETRIES
+
+        session = await self.get_session()
+        attempt = 0
+        while True:
+            self.metrics["requests_total"] += 1
+            try:
+                response = await session.request(method, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                self.metrics["requests_failed"] += 1
+                if attempt >= retries or not _can_retry_error(method, e):
+                    raise
+                logger.warning(f"HTTP {method} {url} failed ({type(e).__name__}), retrying")
+            else:
+                if not _can_retry_status(method, response.status) or attempt >= retries:
+                    break
+                response.release()
+                logger.warning(f"HTTP {method} {url} returned {response.status}, retrying")
+
+            attempt += 1
+            self.metrics["retries"] += 1
+            await asyncio.sleep(settings.HTTP_RETRY_BACKOFF * (2 ** (attempt - 1)))
+
+        self.metrics["in_flight"] += 1
+        try:
+            yield response
+        finally:
+            self.metrics["in_flight"] -= 1
+            response.release()
+
+    async def get(self, url: str, **kwargs) -> HTTPResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> HTTPResponse:
+        return await self.request("POST", url, **kwargs)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get pool usage metrics for sizing under load"""
+        metrics = dict(self.metrics)
+        connector = self._session.connector if self._session and not self._session.closed else None
+        metrics.update({
+            "session_open": connector is not None,
+            "limit": settings.HTTP_POOL_LIMIT,
+            "limit_per_host": settings.HTTP_POOL_LIMIT_PER_HOST
+        })
+        return metrics
+
+# Global client pool instance
+http_client = HTTPClientPool()
@@ -1,6 +1,9 @@
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 import json
 import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from sqlalchemy.orm import Session
@@ -14,12 +17,20 @@ settings = get_settings()
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS offline_packages (
     region_id TEXT PRIMARY KEY,
-    data TEXT NOT NULL,
+    data BLOB NOT NULL,  -- zlib-compressed JSON without POIs (plain JSON text in older rows)
     version TEXT NOT NULL,
     stored_at TEXT NOT NULL,
     expires_at TEXT
 );
 
+CREATE TABLE IF NOT EXISTS offline_package_pois (
+    region_id TEXT NOT NULL,
+    poi_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    data BLOB NOT NULL,  -- zlib-compressed JSON
+    PRIMARY KEY (region_id, poi_id)
+);
+
 CREATE TABLE IF NOT EXISTS pending_progress (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     region_id TEXT NOT NULL,
@@ -54,29 +65,97 @@ CREATE TABLE IF NOT EXISTS content_versions (
     last_sync TEXT NOT NULL,
     PRIMARY KEY (region_id, content_type)
 );
+
+CREATE INDEX IF NOT EXISTS ix_pending_progress_lookup
+    ON pending_progress (region_id, user_id, synced);
+CREATE INDEX IF NOT EXISTS ix_pending_achievements_lookup
+    ON pending_achievements (region_id, user_id, synced);
 """
 
+def _compress(value) -> bytes:
+    return zlib.compress(json.dumps(value).encode("utf-8"))
+
+def _decompress(data):
+    # Packages stored before compression was added are plain JSON text
+    if isinstance(data, str):
+        return json.loads(data)
+    return json.loads(zlib.decompress(data))
+
+class _LocalDatabase:
+    """A persistent WAL-mode connection to one local storage file
+
+    Opened and migrated once per file and shared by every LocalStorageService,
+    so services are cheap to construct. sqlite3 keeps a prepared statement
+    cache per connection, which a long-lived connection can reuse. A lock
+    serializes access; WAL mode lets other processes read while we write.
+    """
+
+    _instances: Dict[str, "_LocalDatabase"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(
+            str(path),
+            check_same_thread=False,
+            cached_statements=settings.LOCAL_STORAGE_STATEMENT_CACHE
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.RLock()
+
+    @classmethod
+    def get(cls, path: Path) -> "_LocalDatabase":
+        key = str(path)
+        with cls._instances_lock:
+            database = cls._instances.get(key)
+            if database is None:
+                database = cls._instances[key] = cls(path)
+            return database
+
+    @classmethod
+    def close_all(cls) -> None:
+        with cls._instances_lock:
+            for database in cls._instances.values():
+                with database.lock:
+                    database.conn.close()
+            cls._instances.clear()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in one transaction, committed on success"""
+        with self.lock, self.conn:
+            yield self.conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        with self.lock:
+            yield self.conn
+
+def close_local_storage() -> None:
+    """Close every shared local storage connection"""
+    _LocalDatabase.close_all()
+
 class LocalStorageService:
     """Service for managing local storage and offline data synchronization"""
     
     def __init__(self, db: Session):
         self.db = db
         self.local_db_path = Path(settings.LOCAL_STORAGE_PATH) / "offline.db"
-        self._init_local_storage()
-        
-    def _init_local_storage(self):
-        """Initialize local SQLite database"""
-        self.local_db_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with sqlite3.connect(str(self.local_db_path)) as conn:
-            conn.executescript(SCHEMA)
-            conn.commit()
+        self.local_db = _LocalDatabase.get(self.local_db_path)
         
     async def store_offline_package(self, region_id: str, package_data: Dict) -> Dict:
-        """Store map package data for offline use"""
+        """Store map package data for offline use
+        
+        POIs are stored as separate compressed rows so they can be read
+        individually without loading the rest of the package.
+        """
         try:
-            # Store package metadata and data
-            with sqlite3.connect(str(self.local_db_path)) as conn:
+            pois = package_data.get("pois", [])
+            package = {key: value for key, value in package_data.items() if key != "pois"}
+            
+            with self.local_db.transaction() as conn:
                 conn.execute(
                     """
                     INSERT OR REPLACE INTO offline_packages 
@@ -85,13 +164,23 @@ class LocalStorageService:
                     """,
                     (
                         region_id,
-                        json.dumps(package_data),
+                        _compress(package),
                         package_data.get("version", "1.0"),
                         datetime.utcnow().isoformat(),
                         package_data.get("expires_at")
                     )
                 )
-                conn.commit()
+                conn.execute("DELETE FROM offline_package_pois WHERE region_id = ?", (region_id,))
+                conn.executemany(
+                    """
+                    INSERT INTO offline_package_pois (region_id, poi_id, position, data)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    (
+                        (region_id, str(poi.get("id", position)), position, _compress(poi))
+                        for position, poi in enumerate(pois)
+                    )
+                )
             
             # Return storage confirmation
             return {
@@ -102,7 +191,7 @@ class LocalStorageService:
                     "version": package_data.get("version"),
                     "expires_at": package_data.get("expires_at"),
                     "tile_count": len(package_data.get("tiles", [])),
-                    "poi_count": len(package_data.get("pois", [])),
+                    "poi_count": len(pois),
                 },
                 "storage_location": str(self.local_db_path)
             }
@@ -112,10 +201,72 @@ class LocalStorageService:
                 "error": str(e)
             }
     
+    async def get_offline_package(self, region_id: str, include_pois: bool = True) -> Optional[Dict]:
+        """Get a stored package, optionally without decoding its POIs"""
+        with self.local_db.reader() as conn:
+            row = conn.execute(
+                "SELECT data FROM offline_packages WHERE region_id = ?",
+                (region_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            package = _decompress(row[0])
+            if "pois" in package:
+                # Stored before POIs were split into their own rows
+                if not include_pois:
+                    package.pop("pois")
+                return package
+            if include_pois:
+                package["pois"] = [
+                    _decompress(data) for (data,) in conn.execute(
+                        "SELECT data FROM offline_package_pois WHERE region_id = ? ORDER BY position",
+                        (region_id,)
+                    )
+                ]
+            return package
+    
+    async def get_offline_pois(self, region_id: str, poi_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Get specific POIs from a stored package, keyed by POI id"""
+        poi_ids = list(poi_ids)
+        if not poi_ids:
+            return {}
+        placeholders = ",".join("?" * len(poi_ids))
+        with self.local_db.reader() as conn:
+            cursor = conn.execute(
+                f"""
+                SELECT poi_id, data FROM offline_package_pois
+                WHERE region_id = ? AND poi_id IN ({placeholders})
+                """,
+                (region_id, *poi_ids)
+            )
+            return {poi_id: _decompress(data) for poi_id, data in cursor}
+    
+    async def queue_progress_updates(self, region_id: str, user_id: int, updates: List[Dict]) -> int:
+        """Record progress made offline, in one batch"""
+        return self._queue_pending("pending_progress", region_id, user_id, updates)
+    
+    async def queue_achievement_updates(self, region_id: str, user_id: int, updates: List[Dict]) -> int:
+        """Record achievements earned offline, in one batch"""
+        return self._queue_pending("pending_achievements", region_id, user_id, updates)
+    
+    def _queue_pending(self, table: str, region_id: str, user_id: int, updates: List[Dict]) -> int:
+        if not updates:
+            return 0
+        now = datetime.utcnow().isoformat()
+        with self.local_db.transaction() as conn:
+            conn.executemany(
+                f"""
+                INSERT INTO {table} (region_id, user_id, data, created_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                ((region_id, user_id, json.dumps(update), now) for update in updates)
+            )
+        return len(updates)
+    
     async def get_pending_changes(self, region_id: str, user_id: int) -> Dict:
         """Get pending changes that need to be synced"""
         try:
-            with sqlite3.connect(str(self.local_db_path)) as conn:
+            with self.local_db.reader() as conn:
                 # Get offline progress updates
                 progress_updates = self._get_pending_progress(conn, region_id, user_id)
                 
@@ -147,7 +298,7 @@ class LocalStorageService:
             """
             SELECT data FROM pending_progress 
             WHERE region_id = ? AND user_id = ? AND synced = 0
-            ORDER BY created_at ASC
+            ORDER BY created_at ASC, id ASC
             """,
             (region_id, user_id)
         )
@@ -159,7 +310,7 @@ class LocalStorageService:
             """
             SELECT data FROM pending_achievements
             WHERE region_id = ? AND user_id = ? AND synced = 0
-            ORDER BY created_at ASC
+            ORDER BY created_at ASC, id ASC
             """,
             (region_id, user_id)
         )
@@ -198,10 +349,10 @@ class LocalStorageService:
         """Process server sync response and update local storage"""
         try:
             if sync_response.get("status") == "synced":
-                with sqlite3.connect(str(self.local_db_path)) as conn:
+                with self.local_db.transaction() as conn:
                     # Update local content if there are updates
                     if sync_response.get("content_updates"):
-                        await self._update_local_content(
+                        self._update_local_content(
                             conn,
                             region_id,
                             sync_response["content_updates"]
@@ -212,8 +363,6 @@ class LocalStorageService:
                     
                     # Update sync timestamp
                     self._update_sync_timestamp(conn, region_id)
-                    
-                    conn.commit()
                 
                 return {
                     "status": "processed",
@@ -231,7 +380,7 @@ class LocalStorageService:
                 "error": str(e)
             }
     
-    async def _update_local_content(self, conn: sqlite3.Connection, region_id: str, content_updates: Dict):
+    def _update_local_content(self, conn: sqlite3.Connection, region_id: str, content_updates: Dict):
         """Update locally stored content with server changes"""
         for content_type, update in content_updates.items():
             conn.execute(
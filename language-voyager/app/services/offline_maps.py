@@ -1,23 +1,192 @@
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
+import asyncio
+import gzip
 import json
+import os
+import re
+import tempfile
 from datetime import datetime
-from sqlalchemy.orm import Session
+from pathlib import Path
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, lazyload
 from ..models.region import Region
-from ..models.poi import PointOfInterest
+from ..models.poi import PointOfInterest, POIOfflineRecord
 from ..models.progress import UserProgress
 from ..models.achievement import Achievement
-from ..services.arcgis import ArcGISService
+from ..services.arcgis import ArcGISService, TILE_URL_TEMPLATE
 from ..services.cache import cache
 from ..core.config import get_settings
 from .local_storage import LocalStorageService
+from .offline_sync import OfflineSyncPipeline
 
 settings = get_settings()
 
+STREAM_PACKAGE_VERSION = "3.0"
+STREAM_PACKAGE_BATCH_SIZE = 500  # rows fetched per round trip while writing a package
+
+def _row_to_dict(row) -> Dict[str, Any]:
+    return {column.key: getattr(row, column.key) for column in row.__table__.columns}
+
+def _gzip_record(record: Dict) -> bytes:
+    """Encode one NDJSON line as a standalone gzip member
+
+    Members concatenate into a valid gzip stream, so precomputed records can
+    be joined into a response without recompressing them.
+    """
+    line = json.dumps(record, default=str) + "\n"
+    return gzip.compress(line.encode("utf-8"), mtime=0)
+
+def build_poi_offline_payload(poi: PointOfInterest) -> bytes:
+    return _gzip_record({"type": "poi", "data": poi.to_dict()})
+
+@event.listens_for(PointOfInterest, "after_insert")
+@event.listens_for(PointOfInterest, "after_update")
+def _refresh_poi_offline_record(mapper, connection, target: PointOfInterest) -> None:
+    """Precompute the POI's delta record in the same transaction as the write"""
+    records = POIOfflineRecord.__table__
+    connection.execute(records.delete().where(records.c.poi_id == target.id))
+    # Columns set from SQL expressions are unloaded until refreshed; the
+    # record is then rebuilt when a delta is next requested. Database-set
+    # timestamps are not part of the record.
+    if inspect(target).expired_attributes - {"created_at", "updated_at"}:
+        return
+    connection.execute(records.insert().values(
+        poi_id=target.id,
+        region_id=target.region_id,
+        content_version=target.content_version,
+        payload=build_poi_offline_payload(target)
+    ))
+
 class OfflineMapService:
     def __init__(self, db: Session):
         self.db = db
         self.arcgis_service = ArcGISService(db)
         self.storage = LocalStorageService(db)
+        self.package_dir = Path(settings.LOCAL_STORAGE_PATH) / "packages"
+
+    def get_package_path(self, region_id: str, user_id: Optional[int] = None) -> Path:
+        """Location of a region's streamed package file"""
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", region_id)
+        if user_id is not None:
+            name = f"{name}.user_{user_id}"
+        return self.package_dir / f"{name}.ndjson"
+
+    async def build_package_file(
+        self,
+        region_id: str,
+        bounds: Dict,
+        zoom_levels: List[int] = [12, 13, 14, 15, 16],
+        user_id: Optional[int] = None
+    ) -> Dict:
+        """
+        Write a region's offline package to disk as newline-delimited JSON
+        
+        The file holds one record per line: a header with the region, one
+        tile range per zoom level, then POIs, achievements and progress rows,
+        and an end record with counts so clients can detect a truncated
+        download. Rows are fetched and written in batches, so memory use does
+        not grow with the size of the region. Returns the package manifest.
+        """
+        region = self.db.query(Region).filter(Region.id == region_id).first()
+        if not region:
+            raise ValueError(f"Region {region_id} not found")
+
+        tile_ranges = await self.arcgis_service.get_tile_ranges(bounds, zoom_levels)
+        path = self.get_package_path(region_id, user_id)
+        timestamp = datetime.utcnow().isoformat()
+
+        counts = await asyncio.to_thread(
+            self._write_package_file, path, region, tile_ranges, user_id, timestamp
+        )
+        return {
+            "region_id": region_id,
+            "format": "ndjson",
+            "version": STREAM_PACKAGE_VERSION,
+            "timestamp": timestamp,
+            "size": path.stat().st_size,
+            "total_tiles": tile_ranges["total_tiles"],
+            "counts": counts
+        }
+
+    def _write_package_file(
+        self,
+        path: Path,
+        region: Region,
+        tile_ranges: Dict,
+        user_id: Optional[int],
+        timestamp: str
+    ) -> Dict[str, int]:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        counts = {"tiles": 0, "pois": 0, "achievements": 0, "progress": 0}
+        # A unique name per build, so concurrent builds of one package can't interleave
+        tmp_file = tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=path.parent, prefix=f"{path.name}.", suffix=".tmp", delete=False
+        )
+
+        try:
+            with tmp_file as f:
+                def write(record: Dict) -> None:
+                    f.write(json.dumps(record, default=str))
+                    f.write("\n")
+
+                write({
+                    "type": "header",
+                    "version": STREAM_PACKAGE_VERSION,
+                    "timestamp": timestamp,
+                    "zoom_levels": tile_ranges["zoom_levels"],
+                    "region": {
+                        "id": region.id,
+                        "name": region.name,
+                        "local_name": region.local_name,
+                        "bounds": region.bounds,
+                        "center": region.center,
+                        "metadata": region.region_metadata,
+                        "updated_at": region.updated_at
+                    }
+                })
+
+                for zoom, tile_range in tile_ranges["ranges"].items():
+                    write({
+                        "type": "tiles",
+                        "z": int(zoom),
+                        **tile_range,
+                        "url_template": tile_ranges["url_template"]
+                    })
+                counts["tiles"] = tile_ranges["total_tiles"]
+
+                pois = self.db.query(PointOfInterest).filter(
+                    PointOfInterest.region_id == region.id
+                ).yield_per(STREAM_PACKAGE_BATCH_SIZE)
+                for poi in pois:
+                    write({"type": "poi", "data": poi.to_dict()})
+                    counts["pois"] += 1
+
+                if user_id is not None:
+                    achievements = self.db.query(Achievement).filter(
+                        Achievement.user_id == user_id
+                    ).yield_per(STREAM_PACKAGE_BATCH_SIZE)
+                    for achievement in achievements:
+                        write({"type": "achievement", "data": _row_to_dict(achievement)})
+                        counts["achievements"] += 1
+
+                # completed_pois is eager-loaded by default, which can't be batched
+                progress_query = self.db.query(UserProgress).options(lazyload("*")).filter(
+                    UserProgress.region_id == region.id
+                )
+                if user_id is not None:
+                    progress_query = progress_query.filter(UserProgress.user_id == user_id)
+                for progress in progress_query.yield_per(STREAM_PACKAGE_BATCH_SIZE):
+                    write({"type": "progress", "data": _row_to_dict(progress)})
+                    counts["progress"] += 1
+
+                write({"type": "end", "counts": counts})
+
+            # Replace atomically so a download never sees a half-written package
+            os.replace(tmp_file.name, path)
+        except BaseException:
+            os.unlink(tmp_file.name)
+            raise
+        return counts
 
     async def prepare_offline_package(
         self,
@@ -102,6 +271,96 @@ class OfflineMapService:
         )
         return offline_package
 
+    async def get_region_delta(
+        self,
+        region_id: str,
+        client_versions: Dict[str, int],
+        user_id: Optional[int] = None,
+        achievements_since: Optional[datetime] = None
+    ) -> bytes:
+        """
+        Build a gzip-framed NDJSON delta against a client's POI version vector
+        
+        Args:
+            region_id: The region ID to diff
+            client_versions: {poi_id: content_version} for POIs the client holds
+            user_id: Include this user's achievements changed since achievements_since
+            achievements_since: Client's last achievement sync time
+        Returns:
+            Concatenated gzip members: a header listing changed and deleted POI
+            ids, one record per changed POI, achievements, and an end record
+        """
+        region = self.db.query(Region.id).filter(Region.id == region_id).first()
+        if not region:
+            raise ValueError(f"Region {region_id} not found")
+
+        current = self.db.query(
+            PointOfInterest.id,
+            PointOfInterest.content_version,
+            POIOfflineRecord.content_version
+        ).outerjoin(
+            POIOfflineRecord, POIOfflineRecord.poi_id == PointOfInterest.id
+        ).filter(PointOfInterest.region_id == region_id).all()
+
+        changed = {
+            poi_id: version
+            for poi_id, version, _ in current
+            if client_versions.get(poi_id) != version
+        }
+        current_ids = {poi_id for poi_id, _, _ in current}
+        deleted = [poi_id for poi_id in client_versions if poi_id not in current_ids]
+
+        # Records missing or older than the POI are rebuilt once and kept
+        stale = [
+            poi_id for poi_id, version, record_version in current
+            if poi_id in changed and record_version != version
+        ]
+        if stale:
+            self._rebuild_offline_records(stale)
+
+        frames = [_gzip_record({
+            "type": "delta",
+            "region_id": region_id,
+            "timestamp": datetime.utcnow().isoformat(),
+            "versions": changed,
+            "deleted": deleted
+        })]
+        if changed:
+            frames.extend(
+                payload for (payload,) in self.db.query(POIOfflineRecord.payload).filter(
+                    POIOfflineRecord.poi_id.in_(list(changed))
+                )
+            )
+
+        achievement_count = 0
+        if user_id is not None:
+            achievements = self.db.query(Achievement).filter(Achievement.user_id == user_id)
+            if achievements_since:
+                achievements = achievements.filter(
+                    (Achievement.created_at > achievements_since)
+                    | (Achievement.completed_at > achievements_since)
+                )
+            for achievement in achievements:
+                frames.append(_gzip_record({"type": "achievement", "data": _row_to_dict(achievement)}))
+                achievement_count += 1
+
+        frames.append(_gzip_record({
+            "type": "end",
+            "counts": {"pois": len(changed), "deleted": len(deleted), "achievements": achievement_count}
+        }))
+        return b"".join(frames)
+
+    def _rebuild_offline_records(self, poi_ids: List[str]) -> None:
+        pois = self.db.query(PointOfInterest).filter(PointOfInterest.id.in_(poi_ids)).all()
+        for poi in pois:
+            self.db.merge(POIOfflineRecord(
+                poi_id=poi.id,
+                region_id=poi.region_id,
+                content_version=poi.content_version,
+                payload=build_poi_offline_payload(poi)
+            ))
+        self.db.commit()
+
     async def get_cached_package(self, region_id: str) -> Optional[Dict]:
         """Get a cached offline package for a region"""
         cache_key = f"offline_package:{region_id}"
@@ -153,12 +412,14 @@ class OfflineMapService:
     async def sync_offline_changes(
         self,
         region_id: str,
-        offline_data: Dict
+        offline_data: Dict,
+        user_id: int
     ) -> Dict:
         """
         Sync changes made while offline
         Args:
             region_id: The region ID to sync
+            user_id: The user the changes belong to
             offline_data: Dict containing:
                 - progress_updates: List of progress records
                 - achievement_updates: List of achievement records
@@ -166,20 +427,14 @@ class OfflineMapService:
                 - pending_downloads: List of pending tile downloads
         """
         try:
-            # Get the current server state
-            server_package = await self.get_cached_package(region_id)
-            if not server_package:
-                raise ValueError("Server package not found")
-
-            # Process progress updates
+            # Apply progress and achievement updates in deduplicated batches
             progress_updates = offline_data.get("progress_updates", [])
-            for progress in progress_updates:
-                await self._merge_progress_update(progress)
-
-            # Process achievement updates
             achievement_updates = offline_data.get("achievement_updates", [])
-            for achievement in achievement_updates:
-                await self._merge_achievement_update(achievement)
+            sync_stats = OfflineSyncPipeline(self.db).apply(
+                user_id,
+                progress_updates,
+                achievement_updates
+            )
 
             # Handle pending downloads
             pending_downloads = offline_data.get("pending_downloads", [])
@@ -199,6 +454,10 @@ class OfflineMapService:
                 "timestamp": datetime.utcnow().isoformat(),
                 "changes_processed": len(progress_updates),
                 "achievements_processed": len(achievement_updates),
+                "events_applied": sync_stats["applied"],
+                "duplicates_skipped": sync_stats["duplicates"],
+                "events_rejected": sync_stats["rejected"],
+                "batches": sync_stats["batches"],
                 "downloads_processed": len(pending_downloads),
                 "content_updates": content_updates,
                 "current_package": updated_package
@@ -210,31 +469,6 @@ class OfflineMapService:
                 "timestamp": datetime.utcnow().isoformat()
             }
 
-    async def _merge_progress_update(self, progress_data: Dict):
-        """Merge a progress update from offline data"""
-        progress = UserProgress(
-            user_id=progress_data["user_id"],
-            region_id=progress_data["region_id"],
-            type=progress_data["type"],
-            value=progress_data["value"],
-            timestamp=datetime.fromisoformat(progress_data["timestamp"])
-        )
-        self.db.merge(progress)
-        self.db.commit()
-
-    async def _merge_achievement_update(self, achievement_data: Dict):
-        """Merge an achievement update from offline data"""
-        achievement = Achievement(
-            user_id=achievement_data["user_id"],
-            region_id=achievement_data["region_id"],
-            achievement_type=achievement_data["type"],
-            status=achievement_data["status"],
-            progress=achievement_data["progress"],
-            completed_at=datetime.fromisoformat(achievement_data["timestamp"]) if achievement_data.get("timestamp") else None
-        )
-        self.db.merge(achievement)
-        self.db.commit()
-
     async def _check_content_versions(self, region_id: str, client_versions: Dict) -> Dict:
         """Check for content version mismatches"""
         region = self.db.query(Region).filter(Region.id == region_id).first()
@@ -275,7 +509,7 @@ class OfflineMapService:
                 )
                 
                 if not tile_exists:
-                    url = f"https://basemaps.arcgis.com/arcgis/rest/services/World_Basemap/tile/{zoom}/{y}/{x}"
+                    url = TILE_URL_TEMPLATE.format(z=zoom, y=y, x=x)
                     package["tile_package"]["tiles"][str(zoom)].append({
                         "url": url,
                         "x": x,
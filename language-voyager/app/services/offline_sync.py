@@ -0,0 +1,267 @@
+from typing import Dict, List, Optional, Set, Tuple
+from datetime import datetime, timedelta
+import hashlib
+import json
+import logging
+import time
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+from ..models.achievement import Achievement
+from ..models.progress import UserProgress, ProcessedSyncEvent
+from ..core.config import get_settings
+from .progress_tracking import ProgressTracker
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+class OfflineSyncPipeline:
+    """Applies events queued while offline in deduplicated, batched upserts
+
+    Progress events look like:
+        {"event_id": "...", "progress_id": 1, "poi_id": "...", "visit": true,
+         "time_spent": 30, "completed_content": ["v1"],
+         "mastery": {"vocabulary": {"v1": 80}}, "timestamp": "..."}
+    and achievement events like:
+        {"event_id": "...", "achievement_id": "...", "type": "location",
+         "progress": 100, "points": 10, "completed_at": "..."}
+
+    Each event id is claimed with INSERT ... ON CONFLICT DO NOTHING before
+    anything is applied, so events applied by an earlier sync, or by a retry
+    running at the same time, are counted as duplicates. The rest are coalesced into final state per (poi) visit, per
+    (content) mastery item and per achievement, then written with one
+    statement per table in a single transaction per batch.
+
+    Applied event ids are kept for OFFLINE_SYNC_EVENT_RETENTION, then
+    deleted by prune_processed_events. That window is the replay horizon:
+    an event replayed after it is applied again, so clients must retry
+    unacknowledged events within it and drop the ones a sync confirmed.
+    """
+
+    def __init__(self, db: Session, batch_size: Optional[int] = None):
+        self.db = db
+        self.batch_size = batch_size or settings.OFFLINE_SYNC_BATCH_SIZE
+        self.tracker = ProgressTracker(db)
+
+    def apply(
+        self,
+        user_id: int,
+        progress_updates: List[Dict],
+        achievement_updates: List[Dict]
+    ) -> Dict:
+        """Apply a user's offline events and report counts and per-batch timings"""
+        events = [("progress", e) for e in progress_updates] + [("achievement", e) for e in achievement_updates]
+        result = {"applied": 0, "duplicates": 0, "rejected": 0, "batches": []}
+
+        for start in range(0, len(events), self.batch_size):
+            batch = self._apply_batch(user_id, events[start:start + self.batch_size])
+            for key in ("applied", "duplicates", "rejected"):
+                result[key] += batch[key]
+            result["batches"].append(batch)
+        return result
+
+    @staticmethod
+    def prune_processed_events(db: Session, now: Optional[datetime] = None) -> int:
+        """Delete applied event ids older than the retention window"""
+        cutoff = (now or datetime.utcnow()) - timedelta(seconds=settings.OFFLINE_SYNC_EVENT_RETENTION)
+        result = db.execute(delete(ProcessedSyncEvent).where(ProcessedSyncEvent.processed_at < cutoff))
+        db.commit()
+        if result.rowcount:
+            logger.info(f"Pruned {result.rowcount} processed offline sync events before {cutoff}")
+        return result.rowcount
+
+    @staticmethod
+    def _event_id(user_id: int, event: Dict) -> str:
+        """Scope the client's idempotency key to the user, hashing the event if it has none"""
+        key = event.get("event_id") or event.get("idempotency_key")
+        if not key:
+            key = hashlib.sha256(json.dumps(event, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{user_id}:{key}"
+
+    @staticmethod
+    def _parse_timestamp(value) -> Optional[datetime]:
+        if not value:
+            return None
+        if isinstance(value, datetime):
+            return value
+        try:
+            return datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+
+    def _apply_batch(self, user_id: int, events: List[Tuple[str, Dict]]) -> Dict:
+        timings = {}
+        started = stage = time.perf_counter()
+
+        def lap(name: str) -> None:
+            nonlocal stage
+            now = time.perf_counter()
+            timings[f"{name}_ms"] = round((now - stage) * 1000, 3)
+            stage = now
+
+        # Drop repeats within the batch
+        unique: Dict[str, Tuple[str, Dict]] = {}
+        for kind, event in events:
+            unique.setdefault(self._event_id(user_id, event), (kind, event))
+
+        try:
+            # Claim ids before applying anything; ids held by earlier or concurrent
+            # syncs of the same events are not returned, so those are skipped
+            claimed = self._claim_events(user_id, list(unique))
+            pending = {event_id: item for event_id, item in unique.items() if event_id in claimed}
+
+            # Progress events may only touch the user's own progress records
+            progress_ids = {
+                event.get("progress_id") for kind, event in pending.values() if kind == "progress"
+            }
+            owned = {
+                progress_id for (progress_id,) in self.db.query(UserProgress.id).filter(
+                    UserProgress.id.in_([p for p in progress_ids if p is not None]),
+                    UserProgress.user_id == user_id
+                )
+            } if progress_ids else set()
+
+            rejected = 0
+            visits: Dict[Tuple[int, str], Dict] = {}
+            mastery: Dict[Tuple[int, str, str], Dict] = {}
+            achievements: Dict[str, Dict] = {}
+            for kind, event in pending.values():
+                if kind == "progress":
+                    if event.get("progress_id") not in owned or not event.get("poi_id"):
+                        rejected += 1
+                        continue
+                    self._coalesce_progress(event, visits, mastery)
+                else:
+                    if not event.get("achievement_id"):
+                        rejected += 1
+                        continue
+                    self._coalesce_achievement(event, achievements)
+            lap("dedupe")
+
+            self.tracker.bulk_record_poi_visits(list(visits.values()))
+            lap("visits")
+            self.tracker.bulk_record_mastery(list(mastery.values()))
+            lap("mastery")
+            self._upsert_achievements(user_id, achievements)
+            lap("achievements")
+            self.db.commit()
+            lap("commit")
+        except Exception:
+            self.db.rollback()
+            raise
+
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        batch = {
+            "size": len(events),
+            "applied": len(pending) - rejected,
+            "duplicates": len(events) - len(pending),
+            "rejected": rejected,
+            "rows": {"visits": len(visits), "mastery": len(mastery), "achievements": len(achievements)},
+            "timings": timings
+        }
+        logger.info(f"Applied offline sync batch for user {user_id}: {batch}")
+        return batch
+
+    def _claim_events(self, user_id: int, event_ids: List[str]) -> Set[str]:
+        """Record event ids as processed, returning the ids that weren't already"""
+        if not event_ids:
+            return set()
+        table = ProcessedSyncEvent.__table__
+        stmt = self.tracker._upsert(table).on_conflict_do_nothing(
+            index_elements=[table.c.event_id]
+        ).returning(table.c.event_id)
+        now = datetime.utcnow()
+        return set(self.db.scalars(stmt, [
+            {"event_id": event_id, "user_id": user_id, "processed_at": now}
+            for event_id in event_ids
+        ]))
+
+    def _coalesce_progress(self, event: Dict, visits: Dict, mastery: Dict) -> None:
+        progress_id = event["progress_id"]
+        poi_id = event["poi_id"]
+        timestamp = self._parse_timestamp(event.get("timestamp"))
+        completed = event.get("completed_content") or []
+        counts_visit = event.get("visit", True)
+
+        if counts_visit or completed or event.get("time_spent"):
+            visit = visits.setdefault((progress_id, poi_id), {
+                "progress_id": progress_id,
+                "poi_id": poi_id,
+                "visits": 0,
+                "total_time": 0,
+                "completed_content": [],
+                "last_visit": None
+            })
+            if counts_visit:
+                visit["visits"] += 1
+            visit["total_time"] += int(event.get("time_spent") or 0)
+            visit["completed_content"] = list(dict.fromkeys(visit["completed_content"] + completed))
+            if timestamp and (visit["last_visit"] is None or timestamp > visit["last_visit"]):
+                visit["last_visit"] = timestamp
+
+        # The latest score for an item wins
+        for content_type, scores in (event.get("mastery") or {}).items():
+            for content_id, score in scores.items():
+                key = (progress_id, content_type, content_id)
+                current = mastery.get(key)
+                if current and current["updated_at"] and timestamp and timestamp < current["updated_at"]:
+                    continue
+                mastery[key] = {
+                    "progress_id": progress_id,
+                    "content_type": content_type,
+                    "content_id": content_id,
+                    "score": float(score),
+                    "updated_at": timestamp
+                }
+
+    def _coalesce_achievement(self, event: Dict, achievements: Dict) -> None:
+        achievement_id = event["achievement_id"]
+        completed_at = self._parse_timestamp(event.get("completed_at"))
+        current = achievements.setdefault(achievement_id, {
+            "achievement_id": achievement_id,
+            "type": event.get("type"),
+            "points": 0,
+            "progress": 0,
+            "completed_at": None,
+            "achievement_metadata": None
+        })
+        current["type"] = event.get("type") or current["type"]
+        current["points"] = max(current["points"], int(event.get("points") or 0))
+        current["progress"] = max(current["progress"], int(event.get("progress") or 0))
+        if completed_at and (current["completed_at"] is None or completed_at < current["completed_at"]):
+            current["completed_at"] = completed_at
+        if event.get("metadata") is not None:
+            current["achievement_metadata"] = event["metadata"]
+
+    def _upsert_achievements(self, user_id: int, achievements: Dict[str, Dict]) -> None:
+        """Insert new achievements and advance existing ones, one statement each"""
+        if not achievements:
+            return
+        existing = {
+            achievement.achievement_id: achievement
+            for achievement in self.db.query(Achievement).filter(
+                Achievement.user_id == user_id,
+                Achievement.achievement_id.in_(list(achievements))
+            )
+        }
+
+        new_rows = []
+        updates = []
+        for achievement_id, state in achievements.items():
+            current = existing.get(achievement_id)
+            if current is None:
+                new_rows.append({**state, "user_id": user_id, "type": state["type"] or "milestone"})
+                continue
+            completed_at = current.completed_at
+            if state["completed_at"] and (completed_at is None or state["completed_at"] < completed_at):
+                completed_at = state["completed_at"]
+            updates.append({
+                "id": current.id,
+                "points": max(current.points or 0, state["points"]),
+                "progress": max(current.progress or 0, state["progress"]),
+                "completed_at": completed_at
+            })
+
+        if new_rows:
+            self.db.execute(insert(Achievement), new_rows)
+        if updates:
+            self.db.execute(update(Achievement), updates)
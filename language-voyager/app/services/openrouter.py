@@ -1,10 +1,13 @@
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 import aiohttp
+import asyncio
 from datetime import datetime
 import json
 import logging
 import os
 from ..core.config import get_settings
+from .http_client import http_client
+from .conversation_cache import conversation_cache
 from pydantic import BaseModel
 from fastapi.encoders import jsonable_encoder
 
@@ -16,7 +19,7 @@ class OpenRouterService:
     """Service for handling OpenRouter API interactions and conversation management"""
     
     def __init__(self):
-        self.base_url = "https://openrouter.ai/api/v1"
+        self.base_url = settings.OPENROUTER_BASE_URL
         self.api_key = settings.OPENROUTER_API_KEY
         self.default_model = settings.LLM_MODEL or "anthropic/claude-2"  # Use configured model or fallback
         
@@ -33,59 +36,60 @@ class OpenRouterService:
             for msg in messages
         ]
 
-    async def _make_request(self, endpoint: str, data: Dict) -> Dict:
-        """Make authenticated request to OpenRouter API"""
-        headers = {
+    def _headers(self) -> Dict[str, str]:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "HTTP-Referer": "https://github.com/language-voyager",  # More specific referer
             "X-Title": "Language Voyager",
             "Content-Type": "application/json"
         }
+
+    async def _make_request(self, endpoint: str, data: Dict) -> Dict:
+        """Make authenticated request to OpenRouter API"""
+        headers = self._headers()
         
         logger.debug(f"Making request to OpenRouter with model: {data.get('model')}")
         
-        async with aiohttp.ClientSession() as session:
+        try:
+            response = await http_client.post(
+                f"{self.base_url}/{endpoint}",
+                json=data,
+                headers=headers,
+                ssl=True  # Ensure SSL verification is enabled
+            )
+            response_text = response.text()
+            logger.debug(f"OpenRouter response status: {response.status}")
+            logger.debug(f"OpenRouter response headers: {response.headers}")  # Add headers logging
+            
+            if response.status != 200:
+                try:
+                    error_json = json.loads(response_text)
+                    error_message = error_json.get('error', {}).get('message', response_text)
+                    logger.error(f"OpenRouter API error: {error_message}")
+                except:
+                    error_message = response_text
+                raise ValueError(f"OpenRouter API error: {error_message}")
+            
             try:
-                async with session.post(
-                    f"{self.base_url}/{endpoint}",
-                    json=data,
-                    headers=headers,
-                    ssl=True  # Ensure SSL verification is enabled
-                ) as response:
-                    response_text = await response.text()
-                    logger.debug(f"OpenRouter response status: {response.status}")
-                    logger.debug(f"OpenRouter response headers: {response.headers}")  # Add headers logging
-                    
-                    if response.status != 200:
-                        try:
-                            error_json = json.loads(response_text)
-                            error_message = error_json.get('error', {}).get('message', response_text)
-                            logger.error(f"OpenRouter API error: {error_message}")
-                        except:
-                            error_message = response_text
-                        raise ValueError(f"OpenRouter API error: {error_message}")
-                    
-                    try:
-                        return json.loads(response_text)
-                    except json.JSONDecodeError as e:
-                        logger.error(f"Invalid JSON response from OpenRouter: {response_text}")
-                        raise ValueError(f"Invalid JSON response from OpenRouter: {response_text}")
-            except aiohttp.ClientError as e:
-                logger.error(f"Network error when calling OpenRouter API: {str(e)}")
-                raise ValueError(f"Network error when calling OpenRouter API: {str(e)}")
-            except Exception as e:
-                logger.error(f"Unexpected error calling OpenRouter API: {str(e)}")
-                raise ValueError(f"Unexpected error calling OpenRouter API: {str(e)}")
+                return json.loads(response_text)
+            except json.JSONDecodeError as e:
+                logger.error(f"Invalid JSON response from OpenRouter: {response_text}")
+                raise ValueError(f"Invalid JSON response from OpenRouter: {response_text}")
+        except aiohttp.ClientError as e:
+            logger.error(f"Network error when calling OpenRouter API: {str(e)}")
+            raise ValueError(f"Network error when calling OpenRouter API: {str(e)}")
+        except Exception as e:
+            logger.error(f"Unexpected error calling OpenRouter API: {str(e)}")
+            raise ValueError(f"Unexpected error calling OpenRouter API: {str(e)}")
 
-    async def generate_conversation(
+    def _build_request(
         self,
         messages: List[Dict[str, str]],
         context: Dict,
         temperature: float = 0.7,
         model: Optional[str] = None
     ) -> Dict:
-        """Generate a conversation response with location and learning context"""
-        
+        """Build the chat completion request body with location and learning context"""
         # Add context to system message
         system_msg = {
             "role": "system",
@@ -105,14 +109,33 @@ class OpenRouterService:
                 formatted_msg = jsonable_encoder(msg)
                 formatted_messages.append(formatted_msg)
         
-        all_messages = [system_msg] + formatted_messages
-        
-        data = {
+        return {
             "model": model or self.default_model,
-            "messages": all_messages,
+            "messages": [system_msg] + formatted_messages,
             "temperature": temperature,
             "max_tokens": 1000,
         }
+
+    @staticmethod
+    def _assistant_message(content: str) -> Dict:
+        return {
+            "role": "assistant",
+            "content": content,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    async def generate_conversation(
+        self,
+        messages: List[Dict[str, str]],
+        context: Dict,
+        temperature: float = 0.7,
+        model: Optional[str] = None
+    ) -> Dict:
+        """Generate a conversation response with location and learning context"""
+        data = self._build_request(messages, context, temperature, model)
+        cached = await conversation_cache.get(data)
+        if cached is not None:
+            return {"message": self._assistant_message(cached), "cached": True}
         
         try:
             response = await self._make_request("chat/completions", data)
@@ -121,18 +144,87 @@ class OpenRouterService:
             if not response or "choices" not in response or not response["choices"]:
                 raise ValueError("Invalid response format from OpenRouter API")
             
-            assistant_message = response["choices"][0]["message"]
-            return {
-                "message": {
-                    "role": "assistant",
-                    "content": assistant_message["content"],
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-            }
+            content = response["choices"][0]["message"]["content"]
+            await conversation_cache.set(data, content)
+            return {"message": self._assistant_message(content), "cached": False}
         except Exception as e:
             logger.error(f"Error in generate_conversation: {str(e)}")
             raise
 
+    async def stream_conversation(
+        self,
+        messages: List[Dict[str, str]],
+        context: Dict,
+        temperature: float = 0.7,
+        model: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """Stream a conversation response as it is generated
+
+        Yields {"type": "delta", "content": "..."} for each piece of text and
+        finally {"type": "done", "message": {...}, "cached": bool}. A cached
+        reply is sent as a single delta. Replies are cached once complete.
+        """
+        data = self._build_request(messages, context, temperature, model)
+        cached = await conversation_cache.get(data)
+        if cached is not None:
+            yield {"type": "delta", "content": cached}
+            yield {"type": "done", "message": self._assistant_message(cached), "cached": True}
+            return
+
+        parts = []
+        async for delta in self._stream_request("chat/completions", {**data, "stream": True}):
+            parts.append(delta)
+            yield {"type": "delta", "content": delta}
+
+        content = "".join(parts)
+        await conversation_cache.set(data, content)
+        yield {"type": "done", "message": self._assistant_message(content), "cached": False}
+
+    async def _stream_request(self, endpoint: str, data: Dict) -> AsyncIterator[str]:
+        """Make a streaming request and yield the text of each server-sent chunk"""
+        # The total timeout would cap the whole generation; bound the gap between chunks instead
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            connect=settings.HTTP_CONNECT_TIMEOUT,
+            sock_read=settings.OPENROUTER_STREAM_READ_TIMEOUT
+        )
+        try:
+            async with http_client.stream(
+                "POST",
+                f"{self.base_url}/{endpoint}",
+                json=data,
+                headers=self._headers(),
+                timeout=timeout,
+                ssl=True
+            ) as response:
+                if response.status != 200:
+                    response_text = await response.text()
+                    try:
+                        error_message = json.loads(response_text).get('error', {}).get('message', response_text)
+                    except (ValueError, AttributeError):
+                        error_message = response_text
+                    logger.error(f"OpenRouter API error: {error_message}")
+                    raise ValueError(f"OpenRouter API error: {error_message}")
+
+                async for raw_line in response.content:
+                    line = raw_line.decode("utf-8").strip()
+                    # Blank lines separate events; lines starting with ":" are keep-alive comments
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == "[DONE]":
+                        break
+                    chunk = json.loads(payload)
+                    if "error" in chunk:
+                        raise ValueError(f"OpenRouter API error: {chunk['error'].get('message', chunk['error'])}")
+                    choices = chunk.get("choices") or [{}]
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        yield delta
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Network error when streaming from OpenRouter API: {str(e)}")
+            raise ValueError(f"Network error when streaming from OpenRouter API: {str(e)}")
+
     def _build_system_prompt(self, context: Dict) -> str:
         """Build system prompt with relevant context"""
         poi_type = context.get("poi_type", "location")
@@ -0,0 +1,288 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timezone
+import logging
+from sqlalchemy import case, or_, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from ..models.progress import POIVisit, ContentMasteryItem, ContentMasteryStats
+
+logger = logging.getLogger(__name__)
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Normalize to naive UTC so stored and client timestamps compare"""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+class ProgressTracker:
+    """Incremental reads and writes of a user's POI visits and content mastery.
+
+    Every update touches only the rows for the POI and content items involved
+    plus one running aggregate per content type, so the cost of recording
+    progress does not grow with the length of a user's history. Callers own
+    the transaction and commit when done.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_poi_visit(self, progress_id: int, poi_id: str) -> Optional[POIVisit]:
+        return self.db.query(POIVisit).filter(
+            POIVisit.progress_id == progress_id,
+            POIVisit.poi_id == poi_id
+        ).first()
+
+    def record_poi_visit(
+        self,
+        progress_id: int,
+        poi_id: str,
+        time_spent: int = 0,
+        completed_items: Optional[Iterable[str]] = None
+    ) -> POIVisit:
+        """Count a visit to a POI and add any newly completed content"""
+        visit = self.get_poi_visit(progress_id, poi_id)
+        if visit is None:
+            visit = POIVisit(
+                progress_id=progress_id,
+                poi_id=poi_id,
+                visits=1,
+                total_time=time_spent,
+                completed_content=[],
+                last_visit=datetime.utcnow()
+            )
+            self.db.add(visit)
+        else:
+            # Increment in SQL so concurrent visits are not lost
+            visit.visits = POIVisit.visits + 1
+            visit.total_time = POIVisit.total_time + time_spent
+            visit.last_visit = datetime.utcnow()
+
+        if completed_items:
+            completed = list(visit.completed_content or [])
+            known = set(completed)
+            new_items = []
+            for item in completed_items:
+                if item not in known:
+                    known.add(item)
+                    new_items.append(item)
+            if new_items:
+                # Reassign so the JSON column is marked as changed
+                visit.completed_content = completed + new_items
+
+        self.db.flush()
+        return visit
+
+    def record_mastery(self, progress_id: int, content_type: str, scores: Dict[str, float]) -> None:
+        """Set mastery scores for content items and update the per-type aggregate"""
+        if not scores:
+            return
+
+        existing = {
+            item.content_id: item
+            for item in self.db.query(ContentMasteryItem).filter(
+                ContentMasteryItem.progress_id == progress_id,
+                ContentMasteryItem.content_type == content_type,
+                ContentMasteryItem.content_id.in_(list(scores))
+            )
+        }
+
+        score_delta = 0.0
+        new_count = 0
+        for content_id, score in scores.items():
+            item = existing.get(content_id)
+            if item is None:
+                self.db.add(ContentMasteryItem(
+                    progress_id=progress_id,
+                    content_type=content_type,
+                    content_id=content_id,
+                    score=score
+                ))
+                score_delta += score
+                new_count += 1
+            else:
+                score_delta += score - item.score
+                item.score = score
+
+        stats = self.db.query(ContentMasteryStats).filter(
+            ContentMasteryStats.progress_id == progress_id,
+            ContentMasteryStats.content_type == content_type
+        ).first()
+        if stats is None:
+            self.db.add(ContentMasteryStats(
+                progress_id=progress_id,
+                content_type=content_type,
+                score_sum=score_delta,
+                item_count=new_count
+            ))
+        else:
+            stats.score_sum = ContentMasteryStats.score_sum + score_delta
+            stats.item_count = ContentMasteryStats.item_count + new_count
+
+        self.db.flush()
+
+    def get_mastery_stats(self, progress_id: int) -> Dict[str, ContentMasteryStats]:
+        """Get the running mastery aggregate for each content type"""
+        stats = self.db.query(ContentMasteryStats).filter(
+            ContentMasteryStats.progress_id == progress_id
+        ).all()
+        return {s.content_type: s for s in stats}
+
+    def get_average_mastery(self, progress_id: int) -> Tuple[float, int]:
+        """Get (average score, item count) across all content types"""
+        total = 0.0
+        count = 0
+        for stats in self.get_mastery_stats(progress_id).values():
+            total += stats.score_sum
+            count += stats.item_count
+        return (total / count if count else 0.0), count
+
+    def get_mastery_levels(self, progress_id: int, content_ids: List[str]) -> Dict[str, Dict[str, float]]:
+        """Get mastery scores for specific content items, grouped by content type"""
+        if not content_ids:
+            return {}
+        levels: Dict[str, Dict[str, float]] = {}
+        rows = self.db.query(
+            ContentMasteryItem.content_type,
+            ContentMasteryItem.content_id,
+            ContentMasteryItem.score
+        ).filter(
+            ContentMasteryItem.progress_id == progress_id,
+            ContentMasteryItem.content_id.in_(content_ids)
+        )
+        for content_type, content_id, score in rows:
+            levels.setdefault(content_type, {})[content_id] = score
+        return levels
+
+    def _upsert(self, table):
+        """INSERT supporting ON CONFLICT for the session's database"""
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            return postgresql.insert(table)
+        if dialect == "sqlite":
+            return sqlite.insert(table)
+        raise NotImplementedError(f"Bulk upserts are not supported on {dialect}")
+
+    def bulk_record_poi_visits(self, visits: List[Dict]) -> int:
+        """Apply pre-aggregated visits with one upsert
+
+        Each dict holds progress_id, poi_id, visits, total_time,
+        completed_content and last_visit; at most one per (progress_id, poi_id).
+        Counters are added in SQL and completed content is merged with what is
+        already stored.
+        """
+        if not visits:
+            return 0
+
+        keys = [(v["progress_id"], v["poi_id"]) for v in visits]
+        existing = {
+            (progress_id, poi_id): completed or []
+            for progress_id, poi_id, completed in self.db.query(
+                POIVisit.progress_id, POIVisit.poi_id, POIVisit.completed_content
+            ).filter(tuple_(POIVisit.progress_id, POIVisit.poi_id).in_(keys))
+        }
+
+        rows = []
+        for visit in visits:
+            completed = list(dict.fromkeys([
+                *existing.get((visit["progress_id"], visit["poi_id"]), []),
+                *visit.get("completed_content", [])
+            ]))
+            rows.append({
+                "progress_id": visit["progress_id"],
+                "poi_id": visit["poi_id"],
+                "visits": visit.get("visits", 0),
+                "total_time": visit.get("total_time", 0),
+                "completed_content": completed,
+                "last_visit": visit.get("last_visit")
+            })
+
+        table = POIVisit.__table__
+        stmt = self._upsert(table)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.progress_id, table.c.poi_id],
+            set_={
+                "visits": table.c.visits + excluded.visits,
+                "total_time": table.c.total_time + excluded.total_time,
+                "completed_content": excluded.completed_content,
+                "last_visit": case(
+                    (or_(table.c.last_visit.is_(None), excluded.last_visit > table.c.last_visit), excluded.last_visit),
+                    else_=table.c.last_visit
+                )
+            }
+        )
+        self.db.execute(stmt, rows)
+        return len(rows)
+
+    def bulk_record_mastery(self, items: List[Dict]) -> int:
+        """Apply mastery scores with one upsert per table
+
+        Each dict holds progress_id, content_type, content_id, score and
+        updated_at; at most one per item. A score older than the stored one is
+        ignored. Returns the number of items written.
+        """
+        if not items:
+            return 0
+
+        keys = [(i["progress_id"], i["content_type"], i["content_id"]) for i in items]
+        existing = {
+            (progress_id, content_type, content_id): (score, updated_at)
+            for progress_id, content_type, content_id, score, updated_at in self.db.query(
+                ContentMasteryItem.progress_id,
+                ContentMasteryItem.content_type,
+                ContentMasteryItem.content_id,
+                ContentMasteryItem.score,
+                ContentMasteryItem.updated_at
+            ).filter(tuple_(
+                ContentMasteryItem.progress_id,
+                ContentMasteryItem.content_type,
+                ContentMasteryItem.content_id
+            ).in_(keys))
+        }
+
+        rows = []
+        stats: Dict[Tuple[int, str], Dict] = {}
+        for item, key in zip(items, keys):
+            updated_at = item.get("updated_at") or datetime.utcnow()
+            current = existing.get(key)
+            if current and current[1] and _as_utc(current[1]) > _as_utc(updated_at):
+                continue
+            rows.append({
+                "progress_id": item["progress_id"],
+                "content_type": item["content_type"],
+                "content_id": item["content_id"],
+                "score": item["score"],
+                "updated_at": updated_at
+            })
+            delta = stats.setdefault(
+                (item["progress_id"], item["content_type"]),
+                {"progress_id": item["progress_id"], "content_type": item["content_type"], "score_sum": 0.0, "item_count": 0}
+            )
+            if current:
+                delta["score_sum"] += item["score"] - current[0]
+            else:
+                delta["score_sum"] += item["score"]
+                delta["item_count"] += 1
+
+        if not rows:
+            return 0
+
+        table = ContentMasteryItem.__table__
+        stmt = self._upsert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.progress_id, table.c.content_type, table.c.content_id],
+            set_={"score": stmt.excluded.score, "updated_at": stmt.excluded.updated_at}
+        )
+        self.db.execute(stmt, rows)
+
+        table = ContentMasteryStats.__table__
+        stmt = self._upsert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.progress_id, table.c.content_type],
+            set_={
+                "score_sum": table.c.score_sum + stmt.excluded.score_sum,
+                "item_count": table.c.item_count + stmt.excluded.item_count
+            }
+        )
+        self.db.execute(stmt, list(stats.values()))
+        return len(rows)
@@ -1,13 +1,131 @@
-from typing import List, Dict
+from typing import Any, List, Dict, Optional, Tuple
+import heapq
 import logging
-from sqlalchemy.orm import Session
+import threading
+import time
+import numpy as np
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
 from ..models.content import LanguageContent, ContentType
 from ..models.progress import UserProgress
 from ..models.poi import PointOfInterest
 from ..models.achievement import Achievement, AchievementDefinition
+from ..core.config import get_settings
+from .progress_tracking import ProgressTracker
+from .cache import cache
 
+settings = get_settings()
 logger = logging.getLogger(__name__)
 
+class RegionContentFeatures:
+    """Columnar snapshot of a region's content used for recommendation scoring
+
+    Rows are stored as parallel columns; context tags become one boolean
+    membership mask per tag and content types become index lists, so a request
+    scores every item with a few array operations instead of a Python loop.
+    """
+
+    def __init__(self, rows: List[Tuple]):
+        self.ids: List[str] = []
+        self.contents: List[Any] = []
+        self.difficulty_levels: List[Optional[float]] = []
+        self.type_indices: Dict[str, List[int]] = {}
+        tag_rows: Dict[str, List[int]] = {}
+
+        for i, (content_id, content_type, content, context_tags, difficulty_level) in enumerate(rows):
+            self.ids.append(content_id)
+            self.contents.append(content)
+            self.difficulty_levels.append(difficulty_level)
+            type_value = content_type.value if isinstance(content_type, ContentType) else content_type
+            self.type_indices.setdefault(type_value, []).append(i)
+            for tag in set(context_tags or []):
+                tag_rows.setdefault(tag, []).append(i)
+
+        self.tag_masks: Dict[str, np.ndarray] = {}
+        for tag, indices in tag_rows.items():
+            mask = np.zeros(len(self.ids), dtype=bool)
+            mask[indices] = True
+            self.tag_masks[tag] = mask
+        self.built_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+class ContentFeatureStore:
+    """Per-(region, language) cache of RegionContentFeatures
+
+    Features are built with a single query on first use and rebuilt after
+    RECOMMENDATION_FEATURE_TTL seconds or an explicit invalidate().
+    """
+
+    def __init__(self, ttl: int = None):
+        self.ttl = ttl if ttl is not None else settings.RECOMMENDATION_FEATURE_TTL
+        self._features: Dict[Tuple[str, Optional[str]], RegionContentFeatures] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, region_id: str, language: Optional[str] = None) -> RegionContentFeatures:
+        key = (region_id, language)
+        features = self._features.get(key)
+        if features is not None and time.monotonic() - features.built_at < self.ttl:
+            return features
+
+        query = db.query(
+            LanguageContent.id,
+            LanguageContent.content_type,
+            LanguageContent.content,
+            LanguageContent.context_tags,
+            LanguageContent.difficulty_level
+        ).filter(LanguageContent.region == region_id)
+        if language:
+            query = query.filter(LanguageContent.language == language)
+        features = RegionContentFeatures(query.all())
+
+        with self._lock:
+            self._features[key] = features
+        logger.debug(f"Built content features for region {region_id} ({language}): {len(features)} items")
+        return features
+
+    def invalidate(self, region_id: Optional[str] = None) -> None:
+        """Drop cached features for a region, or for every region"""
+        with self._lock:
+            if region_id is None:
+                self._features.clear()
+            else:
+                for key in [k for k in self._features if k[0] == region_id]:
+                    del self._features[key]
+
+# Global feature store instance
+content_features = ContentFeatureStore()
+
+# Regions whose content changed, with their POI ids, applied once the transaction commits
+CONTENT_PENDING_KEY = "content_features"
+
+@event.listens_for(LanguageContent, "after_insert")
+@event.listens_for(LanguageContent, "after_update")
+@event.listens_for(LanguageContent, "after_delete")
+def _queue_content_invalidation(mapper, connection, target: LanguageContent) -> None:
+    """Remember the regions a content write affects, old and new"""
+    pending = object_session(target).info.setdefault(CONTENT_PENDING_KEY, {})
+    regions = {target.region, *inspect(target).attrs.region.history.deleted} - {None} - set(pending)
+    if not regions:
+        return
+    poi_ids = connection.execute(
+        select(PointOfInterest.region_id, PointOfInterest.id).where(PointOfInterest.region_id.in_(regions))
+    ).all()
+    for region_id in regions:
+        pending[region_id] = [poi_id for poi_region, poi_id in poi_ids if poi_region == region_id]
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_content(session: Session) -> None:
+    """Rebuild the regions' features and drop their POIs' cached selections"""
+    pending = session.info.pop(CONTENT_PENDING_KEY, None)
+    if not pending:
+        return
+    for region_id, poi_ids in pending.items():
+        content_features.invalidate(region_id)
+        # Cached selections are keyed on the POI's content_version, which content writes don't bump
+        cache.schedule_poi_content_invalidation(poi_ids)
+
 class ContentRecommender:
     @staticmethod
     def calculate_content_difficulty(base_difficulty: float, mastery_level: float, visit_count: int) -> float:
@@ -27,6 +145,132 @@ class ContentRecommender:
         # Keep within reasonable bounds (0-100)
         return min(max(adjusted_difficulty, 0), 100)
         
+    @staticmethod
+    def _normalize_content_type(content_type) -> Optional[str]:
+        """Map a ContentType or string to the stored column value (None = all types)"""
+        if content_type is None:
+            return None
+        if isinstance(content_type, ContentType):
+            return content_type.value
+        try:
+            return ContentType[str(content_type).upper()].value
+        except KeyError:
+            logger.warning(f"Invalid content type: {content_type}")
+            return None
+
+    @staticmethod
+    def select_content_by_type(
+        db: Session,
+        poi: PointOfInterest,
+        language: Optional[str],
+        content_types: List = None,
+        limit: int = 5
+    ) -> Dict[Any, List[Dict]]:
+        """Select the top content items of each type for a POI
+
+        Scores every content item of the POI's region against the POI context
+        using the cached columnar features, then selects the top `limit` items
+        per type with a heap. The selection does not depend on the user, so it
+        can be cached and personalized with `personalize_recommendations`.
+        """
+        if not content_types:
+            content_types = [None]
+
+        features = content_features.get(db, poi.region_id, language)
+
+        # Score all items at once: context tags matching the POI type weigh double
+        difficulty_match = 1.0  # Default to perfect match for now
+        context_match = np.full(len(features), 0.5)
+        type_mask = features.tag_masks.get(poi.type)
+        if type_mask is not None:
+            context_match[type_mask] = 1.0
+        scores = (difficulty_match * context_match * 100).tolist()
+
+        logger.debug(f"Scoring {len(features)} content items for POI {poi.id}")
+
+        selected = {}
+        for content_type in content_types:
+            type_value = ContentRecommender._normalize_content_type(content_type)
+            if type_value is None:
+                candidates = range(len(features))
+            else:
+                candidates = features.type_indices.get(type_value, [])
+
+            # nlargest keeps query order for equal scores, like a stable sort
+            top_indices = heapq.nlargest(limit, candidates, key=scores.__getitem__)
+            selected[content_type] = [
+                {
+                    "id": features.ids[i],
+                    "content": features.contents[i],
+                    "difficulty_level": features.difficulty_levels[i]
+                }
+                for i in top_indices
+            ]
+            logger.debug(f"Selected {len(top_indices)} {type_value or 'any'} items for POI {poi.id}")
+
+        return selected
+
+    @staticmethod
+    def personalize_recommendations(
+        db: Session,
+        progress_id: Optional[int],
+        selected: Dict[Any, List[Dict]],
+        completed_content: List[str] = None
+    ) -> Dict[Any, List[Dict]]:
+        """Add a user's completion and mastery state to selected content items"""
+        completed_items = set(completed_content or [])
+
+        # Look up mastery only for the selected items
+        mastery = {}
+        if progress_id is not None:
+            selected_ids = list({item["id"] for items in selected.values() for item in items})
+            mastery = ProgressTracker(db).get_mastery_levels(progress_id, selected_ids)
+        any_mastery = {}
+        for levels in mastery.values():
+            any_mastery.update(levels)
+
+        results = {}
+        for content_type, items in selected.items():
+            type_mastery = mastery.get(ContentRecommender._normalize_content_type(content_type), {})
+            results[content_type] = [
+                {
+                    **item,
+                    # Completed if in completed_items OR has mastery
+                    "completed": item["id"] in completed_items or item["id"] in any_mastery,
+                    "mastery_level": type_mastery.get(item["id"], any_mastery.get(item["id"], 0))
+                }
+                for item in items
+            ]
+
+        return results
+
+    @staticmethod
+    def get_recommendations_by_type(
+        db: Session,
+        user_progress: UserProgress,
+        poi: PointOfInterest,
+        content_types: List = None,
+        limit: int = 5,
+        completed_content: List[str] = None
+    ) -> Dict[Any, List[Dict]]:
+        """Get recommended content for several content types in one pass
+
+        Results are keyed by the given content types.
+        """
+        progress_id = getattr(user_progress, 'id', None)
+
+        # Get completed content
+        if completed_content is None and progress_id is not None:
+            visit = ProgressTracker(db).get_poi_visit(progress_id, poi.id)
+            completed_content = list(visit.completed_content or []) if visit else []
+
+        selected = ContentRecommender.select_content_by_type(
+            db, poi, user_progress.language, content_types, limit
+        )
+        return ContentRecommender.personalize_recommendations(
+            db, progress_id, selected, completed_content
+        )
+
     @staticmethod
     def get_recommended_content(
         db: Session,
@@ -37,112 +281,15 @@ class ContentRecommender:
         completed_content: List[str] = None
     ) -> List[Dict]:
         """Get recommended content for a user based on their progress and POI context"""
-        logger.info(f"Getting content recommendations for POI {poi.id}, type {content_type}")
-        
-        # Ensure user_progress.poi_progress is initialized
-        poi_progress = {}
-        if hasattr(user_progress, 'poi_progress') and user_progress.poi_progress:
-            # Access POI-specific progress data
-            poi_progress = user_progress.poi_progress.get(poi.id, {})
-        
-        # Get completed content
-        completed_items = set(poi_progress.get("completed_content", []))
-        if completed_content:
-            completed_items.update(completed_content)
-            
-        # Get mastery info from content_mastery
-        type_mastery = {}
-        
-        # Ensure content_mastery is initialized
-        if hasattr(user_progress, 'content_mastery') and user_progress.content_mastery:
-            if content_type:
-                # Try different variations of the content type key
-                content_type_str = str(content_type)
-                possible_keys = [
-                    content_type_str,
-                    content_type_str.lower(),
-                    content_type_str.upper(),
-                    "vocabulary" if content_type_str.upper() == "VOCABULARY" else None
-                ]
-                possible_keys = [k for k in possible_keys if k]
-                
-                for key in possible_keys:
-                    if key in user_progress.content_mastery:
-                        type_mastery = user_progress.content_mastery[key]
-                        break
-            
-            # Also look for any mastery data that might contain our content IDs
-            # This handles the case where content_type might be an enum but stored as a string
-            if not type_mastery:
-                for key, value in user_progress.content_mastery.items():
-                    if isinstance(value, dict):
-                        type_mastery.update(value)
-        
-        logger.info(f"POI progress for {poi.id}: {poi_progress}")
-        logger.info(f"Completed items from progress: {completed_items}")
-        logger.info(f"Content mastery: {type_mastery}")
-        
-        # Query base content
-        query = db.query(LanguageContent).filter(
-            LanguageContent.region == poi.region_id
+        results = ContentRecommender.get_recommendations_by_type(
+            db,
+            user_progress,
+            poi,
+            content_types=[content_type],
+            limit=limit,
+            completed_content=completed_content
         )
-        
-        if user_progress.language:
-            query = query.filter(LanguageContent.language == user_progress.language)
-            
-        # Filter by content type if specified
-        if content_type:
-            if isinstance(content_type, str):
-                try:
-                    enum_type = ContentType[content_type.upper()]
-                    query = query.filter(LanguageContent.content_type == enum_type)
-                except KeyError:
-                    logger.warning(f"Invalid content type: {content_type}")
-            else:
-                query = query.filter(LanguageContent.content_type == content_type)
-                
-        # Get matching content
-        content_items = query.all()
-        logger.info(f"Found {len(content_items)} content items")
-        recommendations = []
-        
-        for content in content_items:
-            # Check if content is completed (in completed_items OR has mastery)
-            is_completed = (
-                content.id in completed_items or 
-                content.id in type_mastery
-            )
-            
-            # Get mastery level if it exists
-            mastery_level = type_mastery.get(content.id, 0)
-            
-            logger.info(f"Processing content {content.id}:")
-            logger.info(f"- In completed_items: {content.id in completed_items}")
-            logger.info(f"- In type_mastery: {content.id in type_mastery}")
-            logger.info(f"- Final completed status: {is_completed}")
-            logger.info(f"- Mastery level: {mastery_level}")
-            
-            # Calculate recommendation score
-            difficulty_match = 1.0  # Default to perfect match for now
-            context_match = 1.0 if poi.type in content.context_tags else 0.5
-            match_score = difficulty_match * context_match * 100
-            
-            content_dict = {
-                "id": content.id,
-                "content": content.content,
-                "difficulty_level": content.difficulty_level,
-                "completed": is_completed,  # This should now be correct
-                "mastery_level": mastery_level
-            }
-            
-            recommendations.append({
-                "content": content_dict,
-                "match_score": match_score
-            })
-            
-        # Sort by match score
-        recommendations.sort(key=lambda x: x["match_score"], reverse=True)
-        return [r["content"] for r in recommendations[:limit]]
+        return results[content_type]
 
 class LanguageProgressService:
     def __init__(self, db: Session):
@@ -0,0 +1,246 @@
+from typing import Dict, List, Optional, Set, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import threading
+import time
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from ..models.region import Region
+from ..models.progress import UserProgress
+from ..routers.schemas.map import Region as RegionSchema
+from ..core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+REGIONS_MESSAGE = "Regions retrieved successfully"
+
+class RegionGraph:
+    """Serialized regions plus the requirement graph between them
+
+    `dependents` maps a required region name to the regions it can unlock,
+    so a proficiency change only re-evaluates the regions that depend on it.
+    """
+
+    def __init__(self, regions: List[Region]):
+        self.payloads: Dict[str, Dict] = {}
+        self.requirements: Dict[str, Dict[str, float]] = {}
+        self.dependents: Dict[str, Set[str]] = {}
+        for region in regions:
+            self.payloads[region.id] = RegionSchema(
+                id=region.id,
+                name=region.name,
+                local_name=region.local_name,
+                description=region.description,
+                languages=region.languages,
+                bounds=region.bounds,
+                center=region.center,
+                difficulty_level=region.difficulty_level,
+                total_pois=region.total_pois,
+                total_challenges=region.total_challenges,
+                recommended_level=region.recommended_level,
+                created_at=region.created_at,
+                updated_at=region.updated_at
+            ).model_dump(mode="json")
+            self.requirements[region.id] = dict(region.requirements or {})
+            for required in self.requirements[region.id]:
+                self.dependents.setdefault(required, set()).add(region.id)
+
+    def evaluate(self, region_id: str, levels: Dict[str, float]) -> Tuple[bool, Optional[Dict[str, float]]]:
+        """A region is available when any one of its requirements is met"""
+        requirements = self.requirements[region_id]
+        if not requirements:
+            return True, None
+        for required, level in requirements.items():
+            if levels.get(required, -1) >= level:
+                return True, None
+        return False, dict(requirements)
+
+class UserRegions:
+    """A user's proficiency levels, evaluated availability and serialized response"""
+
+    def __init__(self, levels: Dict[str, float], expires_at: float):
+        self.levels = levels
+        self.expires_at = expires_at
+        self.availability: Dict[str, Tuple[bool, Optional[Dict[str, float]]]] = {}
+        self.payload = b""
+        self.etag = ""
+
+class RegionAvailabilityCache:
+    """Caches the region graph and each user's pre-serialized region list
+
+    The graph is built once and rebuilt only after a Region row changes.
+    User entries are evaluated once, patched in place when a progress
+    record's proficiency change is committed in this process, and expire
+    after a TTL to bound staleness from changes made by other workers.
+    Sessions in the threadpool and the event loop share the cache, so
+    entries are only changed under a lock.
+    """
+
+    def __init__(self, ttl: int = None, maxsize: int = None):
+        self.ttl = settings.REGION_AVAILABILITY_TTL if ttl is None else ttl
+        self.maxsize = settings.REGION_AVAILABILITY_CACHE_SIZE if maxsize is None else maxsize
+        self._graph: Optional[RegionGraph] = None
+        self._users: "OrderedDict[int, UserRegions]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "incremental_updates": 0, "graph_builds": 0}
+
+    async def get_regions(self, db: AsyncSession, user_id: int) -> Tuple[bytes, str]:
+        """Get the user's serialized region list and its ETag"""
+        graph = self._graph
+        if graph is None:
+            regions = (await db.execute(select(Region))).scalars().all()
+            graph = self._graph = RegionGraph(regions)
+            self.stats["graph_builds"] += 1
+
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._users.move_to_end(user_id)
+                self.stats["hits"] += 1
+                return entry.payload, entry.etag
+
+        self.stats["misses"] += 1
+        result = await db.execute(
+            select(UserProgress.region_name, UserProgress.proficiency_level).where(
+                UserProgress.user_id == user_id
+            )
+        )
+        levels: Dict[str, float] = {}
+        for region_name, level in result:
+            if region_name is not None and level is not None:
+                levels[region_name] = max(level, levels.get(region_name, level))
+
+        entry = UserRegions(levels, time.monotonic() + self.ttl)
+        for region_id in graph.payloads:
+            entry.availability[region_id] = graph.evaluate(region_id, levels)
+        self._serialize(graph, entry)
+        # Only keep the entry if the graph was not invalidated meanwhile
+        with self._lock:
+            if graph is self._graph and self.ttl > 0:
+                self._users[user_id] = entry
+                while len(self._users) > self.maxsize:
+                    self._users.popitem(last=False)
+        return entry.payload, entry.etag
+
+    @staticmethod
+    def _serialize(graph: RegionGraph, entry: UserRegions) -> None:
+        data = []
+        for region_id, payload in graph.payloads.items():
+            is_available, requirements = entry.availability[region_id]
+            data.append({**payload, "is_available": is_available, "requirements": requirements})
+        entry.payload = json.dumps(
+            {"success": True, "message": REGIONS_MESSAGE, "data": data, "errors": None},
+            separators=(",", ":"),
+            ensure_ascii=False
+        ).encode("utf-8")
+        entry.etag = f'"{hashlib.sha1(entry.payload).hexdigest()}"'
+
+    def update_proficiency(self, user_id: int, region_name: Optional[str], level: Optional[float]) -> None:
+        """Re-evaluate only the regions that depend on region_name"""
+        with self._lock:
+            entry = self._users.get(user_id)
+            graph = self._graph
+            if entry is None or graph is None or region_name is None:
+                return
+            if level is None or level < entry.levels.get(region_name, level):
+                # The best level for a region may now come from another record
+                self.invalidate_user(user_id)
+                return
+
+            entry.levels[region_name] = level
+            changed = False
+            for region_id in graph.dependents.get(region_name, ()):
+                availability = graph.evaluate(region_id, entry.levels)
+                if availability != entry.availability[region_id]:
+                    entry.availability[region_id] = availability
+                    changed = True
+            if changed:
+                self._serialize(graph, entry)
+            self.stats["incremental_updates"] += 1
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def invalidate_graph(self) -> None:
+        """Drop the graph and every user entry derived from it"""
+        with self._lock:
+            self._graph = None
+            self._users.clear()
+
+    def get_stats(self) -> Dict:
+        hits = self.stats["hits"]
+        total = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._users),
+            "hit_rate": hits / total if total else 0.0
+        }
+
+# Global region availability cache
+region_availability = RegionAvailabilityCache()
+
+# Flushed changes wait in session.info until the transaction commits, so a
+# rolled-back write never shows up as unlocked regions
+PENDING_KEY = "region_availability"
+
+def _pending(target) -> Dict:
+    return object_session(target).info.setdefault(PENDING_KEY, {"graph": False, "users": {}})
+
+def _queue_proficiency(target: UserProgress) -> None:
+    updates = _pending(target)["users"].setdefault(target.user_id, [])
+    # None means the user's entry is dropped instead
+    if updates is not None:
+        updates.append((target.region_name, target.proficiency_level))
+
+def _queue_invalidate_user(target: UserProgress, user_id: int) -> None:
+    _pending(target)["users"][user_id] = None
+
+@event.listens_for(Region, "after_insert")
+@event.listens_for(Region, "after_update")
+@event.listens_for(Region, "after_delete")
+def _invalidate_region_graph(mapper, connection, target: Region) -> None:
+    """Rebuild the graph on next use whenever a region changes"""
+    _pending(target)["graph"] = True
+
+@event.listens_for(UserProgress, "after_insert")
+def _add_user_region_level(mapper, connection, target: UserProgress) -> None:
+    _queue_proficiency(target)
+
+@event.listens_for(UserProgress, "after_update")
+def _update_user_region_level(mapper, connection, target: UserProgress) -> None:
+    state = inspect(target)
+    if state.attrs.region_name.history.has_changes() or state.attrs.user_id.history.has_changes():
+        for user_id in {target.user_id, *state.attrs.user_id.history.deleted}:
+            _queue_invalidate_user(target, user_id)
+    elif state.attrs.proficiency_level.history.has_changes():
+        _queue_proficiency(target)
+
+@event.listens_for(UserProgress, "after_delete")
+def _remove_user_region_level(mapper, connection, target: UserProgress) -> None:
+    _queue_invalidate_user(target, target.user_id)
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed_changes(session: Session) -> None:
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending is None:
+        return
+    if pending["graph"]:
+        region_availability.invalidate_graph()
+    for user_id, updates in pending["users"].items():
+        if updates is None:
+            region_availability.invalidate_user(user_id)
+            continue
+        for region_name, level in updates:
+            region_availability.update_proficiency(user_id, region_name, level)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back_changes(session: Session, previous_transaction) -> None:
+    """Keep only invalidations, since a rolled-back savepoint may have held part of them"""
+    pending = session.info.get(PENDING_KEY)
+    if pending is not None:
+        pending["users"] = dict.fromkeys(pending["users"])
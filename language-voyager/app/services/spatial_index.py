@@ -0,0 +1,227 @@
+from typing import Dict, List, Optional, Iterable, Set, Tuple
+import logging
+import math
+import threading
+from sqlalchemy.orm import Session
+from ..models.poi import PointOfInterest
+from ..core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_METERS = 6371000.0
+METERS_PER_DEGREE_LAT = 111320.0
+
+def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in meters"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(a)))
+
+class POIEntry:
+    """Lightweight, DB-detached snapshot of a POI stored in the index"""
+    __slots__ = ("id", "region_id", "lat", "lon", "name", "local_name", "type", "cell")
+
+    def __init__(self, poi_id: str, region_id: str, lat: float, lon: float,
+                 name: str, local_name: Optional[str], poi_type: str, cell: Tuple[int, int]):
+        self.id = poi_id
+        self.region_id = region_id
+        self.lat = lat
+        self.lon = lon
+        self.name = name
+        self.local_name = local_name
+        self.type = poi_type
+        self.cell = cell
+
+    def to_feature(self, distance: float) -> Dict:
+        """Return the entry in the same shape as an ArcGIS nearby feature"""
+        return {
+            "id": self.id,
+            "region_id": self.region_id,
+            "name": self.name,
+            "local_name": self.local_name,
+            "type": self.type,
+            "location": {"lat": self.lat, "lon": self.lon},
+            "distance": distance
+        }
+
+class POISpatialIndex:
+    """In-process grid index over PointOfInterest.location for radius queries.
+
+    POIs are bucketed into fixed-size lat/lon cells. Regions are loaded lazily
+    from the database on first use and kept current through upsert/remove calls
+    on POI create and update, so proximity lookups never leave the process.
+    """
+
+    def __init__(self, cell_size: float = None):
+        self.cell_size = cell_size or settings.SPATIAL_INDEX_CELL_SIZE
+        self._cells: Dict[Tuple[int, int], Dict[str, POIEntry]] = {}
+        self._entries: Dict[str, POIEntry] = {}
+        self._region_pois: Dict[str, Set[str]] = {}
+        self._loaded_regions: Set[str] = set()
+        self._all_loaded = False
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _cell_for(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    @staticmethod
+    def _extract_coordinates(location) -> Optional[Tuple[float, float]]:
+        if not isinstance(location, dict):
+            return None
+        try:
+            return float(location["lat"]), float(location["lon"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def is_region_loaded(self, region_id: str) -> bool:
+        return self._all_loaded or region_id in self._loaded_regions
+
+    def has_pois(self, region_id: Optional[str] = None) -> bool:
+        """Check whether the index holds any POIs (optionally for one region)"""
+        if region_id is None:
+            return bool(self._entries)
+        return bool(self._region_pois.get(region_id))
+
+    def _insert(self, poi: PointOfInterest) -> bool:
+        coords = self._extract_coordinates(poi.location)
+        if coords is None:
+            logger.warning(f"Skipping POI {poi.id} with invalid location: {poi.location}")
+            return False
+
+        self._discard(poi.id)
+        if poi.is_published is False:
+            return False
+
+        lat, lon = coords
+        cell = self._cell_for(lat, lon)
+        entry = POIEntry(poi.id, poi.region_id, lat, lon, poi.name, poi.local_name, poi.type, cell)
+        self._entries[poi.id] = entry
+        self._cells.setdefault(cell, {})[poi.id] = entry
+        self._region_pois.setdefault(poi.region_id, set()).add(poi.id)
+        return True
+
+    def _discard(self, poi_id: str) -> None:
+        entry = self._entries.pop(poi_id, None)
+        if not entry:
+            return
+        bucket = self._cells.get(entry.cell)
+        if bucket is not None:
+            bucket.pop(poi_id, None)
+            if not bucket:
+                del self._cells[entry.cell]
+        region_ids = self._region_pois.get(entry.region_id)
+        if region_ids is not None:
+            region_ids.discard(poi_id)
+
+    def load_region(self, db: Session, region_id: str) -> int:
+        """(Re)load all POIs for a region from the database"""
+        pois = db.query(PointOfInterest).filter(PointOfInterest.region_id == region_id).all()
+        with self._lock:
+            for poi_id in list(self._region_pois.get(region_id, ())):
+                self._discard(poi_id)
+            count = sum(1 for poi in pois if self._insert(poi))
+            self._loaded_regions.add(region_id)
+        logger.info(f"Spatial index loaded {count} POIs for region {region_id}")
+        return count
+
+    def load_all(self, db: Session) -> int:
+        """Load POIs for every region not already in the index"""
+        query = db.query(PointOfInterest)
+        if self._loaded_regions:
+            query = query.filter(PointOfInterest.region_id.notin_(self._loaded_regions))
+        pois = query.all()
+        with self._lock:
+            count = sum(1 for poi in pois if self._insert(poi))
+            self._loaded_regions.update(poi.region_id for poi in pois)
+            self._all_loaded = True
+        logger.info(f"Spatial index loaded {count} POIs across all regions")
+        return count
+
+    def is_loaded(self, region_ids: Optional[Iterable[str]] = None) -> bool:
+        """Check whether the given regions (or all regions) are indexed"""
+        if region_ids is None:
+            return self._all_loaded
+        return all(self.is_region_loaded(region_id) for region_id in region_ids if region_id)
+
+    def ensure_loaded(self, db: Session, region_ids: Optional[Iterable[str]] = None) -> None:
+        """Load the given regions (or all regions) if they are not indexed yet"""
+        if region_ids is None:
+            if not self._all_loaded:
+                self.load_all(db)
+            return
+        for region_id in region_ids:
+            if region_id and not self.is_region_loaded(region_id):
+                self.load_region(db, region_id)
+
+    def upsert(self, poi: PointOfInterest) -> None:
+        """Add or refresh a POI after it was created or updated"""
+        if not self.is_region_loaded(poi.region_id):
+            # Region will be read fresh from the database on first query
+            return
+        with self._lock:
+            self._insert(poi)
+
+    def remove(self, poi_id: str) -> None:
+        with self._lock:
+            self._discard(poi_id)
+
+    def invalidate_region(self, region_id: str) -> None:
+        """Drop a region so it is reloaded on next access"""
+        with self._lock:
+            for poi_id in list(self._region_pois.pop(region_id, ())):
+                self._discard(poi_id)
+            self._loaded_regions.discard(region_id)
+            self._all_loaded = False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cells.clear()
+            self._entries.clear()
+            self._region_pois.clear()
+            self._loaded_regions.clear()
+            self._all_loaded = False
+
+    def nearby(
+        self,
+        lat: float,
+        lon: float,
+        radius_meters: float = 1000,
+        region_id: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """Get POI features within a radius of a point, nearest first"""
+        lat_span = radius_meters / METERS_PER_DEGREE_LAT
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        lon_span = radius_meters / (METERS_PER_DEGREE_LAT * cos_lat)
+
+        min_cell = self._cell_for(lat - lat_span, lon - lon_span)
+        max_cell = self._cell_for(lat + lat_span, lon + lon_span)
+
+        results = []
+        with self._lock:
+            for cell_lat in range(min_cell[0], max_cell[0] + 1):
+                for cell_lon in range(min_cell[1], max_cell[1] + 1):
+                    bucket = self._cells.get((cell_lat, cell_lon))
+                    if not bucket:
+                        continue
+                    for entry in bucket.values():
+                        if region_id and entry.region_id != region_id:
+                            continue
+                        distance = haversine_distance(lat, lon, entry.lat, entry.lon)
+                        if distance <= radius_meters:
+                            results.append((distance, entry))
+
+        results.sort(key=lambda item: item[0])
+        if limit is not None:
+            results = results[:limit]
+        return [entry.to_feature(round(distance, 2)) for distance, entry in results]
+
+# Global index instance
+spatial_index = POISpatialIndex()
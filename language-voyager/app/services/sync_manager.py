@@ -4,8 +4,10 @@ from datetime import datetime, timedelta
 from typing import Dict, Optional
 from sqlalchemy.orm import Session
 from .offline_maps import OfflineMapService
+from .offline_sync import OfflineSyncPipeline
 from .local_storage import LocalStorageService
 from ..core.config import get_settings
+from ..database.config import SessionLocal
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
@@ -19,6 +21,7 @@ class SyncManager:
         self.storage = LocalStorageService(db)
         self._sync_tasks = {}
         self._last_sync = {}
+        self._last_event_prune = None
         self._is_running = False
     
     async def start(self):
@@ -81,7 +84,8 @@ class SyncManager:
                     # Perform sync
                     sync_result = await self.offline_service.sync_offline_changes(
                         region_id,
-                        changes
+                        changes,
+                        user_id
                     )
                     
                     if sync_result.get("status") == "synced":
@@ -106,8 +110,17 @@ class SyncManager:
                 if retries < settings.SYNC_RETRY_ATTEMPTS:
                     await asyncio.sleep(settings.SYNC_RETRY_DELAY)
     
+    @staticmethod
+    def _prune_processed_events() -> int:
+        """Delete expired offline event ids with a session of its own (runs in a worker thread)"""
+        db = SessionLocal()
+        try:
+            return OfflineSyncPipeline.prune_processed_events(db)
+        finally:
+            db.close()
+    
     async def _cleanup_loop(self):
-        """Periodically clean up completed sync tasks"""
+        """Periodically clean up completed sync tasks and expired offline event ids"""
         while self._is_running:
             try:
                 # Remove completed tasks
@@ -121,6 +134,14 @@ class SyncManager:
                             if elapsed > timedelta(days=1):
                                 self._last_sync.pop(task_key)
                 
+                # Forget applied offline event ids past the replay horizon
+                if (
+                    self._last_event_prune is None
+                    or (datetime.utcnow() - self._last_event_prune).total_seconds() >= settings.OFFLINE_SYNC_PRUNE_INTERVAL
+                ):
+                    await asyncio.to_thread(self._prune_processed_events)
+                    self._last_event_prune = datetime.utcnow()
+                
             except Exception as e:
                 logger.error(f"Error in cleanup loop: {e}")
             
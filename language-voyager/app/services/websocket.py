@@ -1,6 +1,7 @@
 from fastapi import WebSocket
 from typing import Dict, Optional, Any
 from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
 from starlette.websockets import WebSocketState
 import json
 import logging
@@ -19,21 +20,35 @@ class LocationUpdate:
         self.timestamp = timestamp or datetime.utcnow().timestamp()
 
 class ConnectionManager:
+    """Tracks this worker's WebSocket connections and delivers messages to any user
+
+    Each connection gets a bounded send queue drained by its own task, so a
+    slow client only delays its own messages: once the queue is full the
+    oldest message is dropped, and a send that stalls past WS_SEND_TIMEOUT
+    disconnects the client. When Redis is available, every worker subscribes
+    to a pub/sub channel per locally connected user, and messages for users
+    connected elsewhere are published to that channel.
+    """
+
     def __init__(self):
         """Initialize the connection manager"""
         self.active_connections: Dict[int, WebSocket] = {}
         self.redis: Optional[Redis] = None
         self.redis_url = settings.REDIS_URL
-        
-    async def connect(self, websocket: WebSocket, user_id: int) -> None:
-        """Store connection - does NOT accept it"""
-        if user_id in self.active_connections:
-            # Clean up existing connection first
-            await self.disconnect(user_id)
-            
-        self.active_connections[user_id] = websocket
-        
-        # Initialize Redis connection if needed
+        self.queue_size = settings.WS_SEND_QUEUE_SIZE
+        self.send_timeout = settings.WS_SEND_TIMEOUT
+        self.channel_prefix = settings.WS_CHANNEL_PREFIX
+        self._send_queues: Dict[int, asyncio.Queue] = {}
+        self._senders: Dict[int, asyncio.Task] = {}
+        self._pubsub: Optional[PubSub] = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self.stats = {"sent": 0, "dropped": 0, "published": 0, "received": 0, "slow_disconnects": 0}
+
+    def _channel(self, user_id: int) -> str:
+        return f"{self.channel_prefix}:{user_id}"
+
+    async def _ensure_redis(self) -> Optional[Redis]:
+        """Connect to Redis on first use; returns None when unavailable"""
         if self.redis_url and not self.redis:
             try:
                 self.redis = Redis.from_url(
@@ -46,10 +61,29 @@ class ConnectionManager:
             except Exception as e:
                 logger.error(f"Redis connection error: {e}")
                 self.redis = None
+        return self.redis
+
+    async def connect(self, websocket: WebSocket, user_id: int) -> None:
+        """Store connection - does NOT accept it"""
+        if user_id in self.active_connections:
+            # Clean up existing connection first
+            await self.disconnect(user_id)
+            
+        self.active_connections[user_id] = websocket
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._send_queues[user_id] = queue
+        self._senders[user_id] = asyncio.create_task(self._sender(user_id, websocket, queue))
+        
+        if await self._ensure_redis():
+            await self._subscribe(user_id)
     
     async def disconnect(self, user_id: int) -> None:
         """Remove connection"""
         if user_id in self.active_connections:
+            sender = self._senders.pop(user_id, None)
+            self._send_queues.pop(user_id, None)
+            if sender and sender is not asyncio.current_task():
+                sender.cancel()
             try:
                 websocket = self.active_connections[user_id]
                 if websocket.client_state == WebSocketState.CONNECTED:
@@ -58,22 +92,114 @@ class ConnectionManager:
                 logger.error(f"Error closing websocket: {e}")
             finally:
                 del self.active_connections[user_id]
+                await self._unsubscribe(user_id)
                 # Clean up Redis data
                 try:
-                    self.redis.delete(f"user_location:{user_id}")
+                    if self.redis:
+                        await self.redis.delete(f"user_location:{user_id}")
                 except Exception as e:
                     logger.error(f"Error cleaning up Redis data: {e}")
     
     async def send_to_user(self, user_id: int, data: Dict[str, Any]) -> None:
-        """Send data to a specific user"""
-        if user_id in self.active_connections:
-            websocket = self.active_connections[user_id]
-            if websocket.client_state == WebSocketState.CONNECTED:
+        """Send data to a user connected to this or any other worker"""
+        if user_id in self._send_queues:
+            self._enqueue(user_id, data)
+        elif await self._ensure_redis():
+            await self.publish(user_id, data)
+    
+    async def publish(self, user_id: int, data: Dict[str, Any]) -> None:
+        """Publish a message on the user's channel for whichever worker holds the connection"""
+        try:
+            await self.redis.publish(self._channel(user_id), json.dumps(data, default=str))
+            self.stats["published"] += 1
+        except Exception as e:
+            logger.error(f"Error publishing message for user {user_id}: {e}")
+    
+    def _enqueue(self, user_id: int, data: Dict[str, Any]) -> None:
+        """Queue a message for a local connection, dropping the oldest when full"""
+        queue = self._send_queues.get(user_id)
+        if queue is None:
+            return
+        if queue.full():
+            queue.get_nowait()
+            self.stats["dropped"] += 1
+            logger.debug(f"Send queue full for user {user_id}; dropped oldest message")
+        queue.put_nowait(data)
+    
+    async def _sender(self, user_id: int, websocket: WebSocket, queue: asyncio.Queue) -> None:
+        """Drain one connection's send queue"""
+        try:
+            while True:
+                data = await queue.get()
+                if websocket.client_state != WebSocketState.CONNECTED:
+                    continue
                 try:
-                    await websocket.send_json(data)
+                    await asyncio.wait_for(websocket.send_json(data), self.send_timeout)
+                    self.stats["sent"] += 1
+                except asyncio.TimeoutError:
+                    logger.warning(f"Send to user {user_id} timed out; disconnecting slow client")
+                    self.stats["slow_disconnects"] += 1
+                    break
                 except Exception as e:
                     logger.error(f"Error sending message to user {user_id}: {e}")
-                    await self.disconnect(user_id)
+                    break
+        except asyncio.CancelledError:
+            return
+        
+        # Only tear down if this connection has not been replaced meanwhile
+        if self.active_connections.get(user_id) is websocket:
+            await self.disconnect(user_id)
+    
+    async def _subscribe(self, user_id: int) -> None:
+        try:
+            if self._pubsub is None:
+                self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            await self._pubsub.subscribe(self._channel(user_id))
+            if self._listener_task is None or self._listener_task.done():
+                self._listener_task = asyncio.create_task(self._listen())
+        except Exception as e:
+            logger.error(f"Error subscribing to messages for user {user_id}: {e}")
+    
+    async def _unsubscribe(self, user_id: int) -> None:
+        if self._pubsub is None:
+            return
+        try:
+            await self._pubsub.unsubscribe(self._channel(user_id))
+        except Exception as e:
+            logger.error(f"Error unsubscribing from messages for user {user_id}: {e}")
+    
+    async def _listen(self) -> None:
+        """Relay messages published by other workers to local connections"""
+        while self._pubsub is not None:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message:
+                    self._dispatch(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error receiving published message: {e}")
+                await asyncio.sleep(1.0)
+    
+    def _dispatch(self, message: Dict[str, Any]) -> None:
+        if message.get("type") != "message":
+            return
+        channel = message["channel"]
+        try:
+            user_id = int(channel.rsplit(":", 1)[1])
+            data = json.loads(message["data"])
+        except (IndexError, ValueError) as e:
+            logger.error(f"Invalid message on {channel}: {e}")
+            return
+        self.stats["received"] += 1
+        self._enqueue(user_id, data)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "connections": len(self.active_connections),
+            "queued": sum(queue.qsize() for queue in self._send_queues.values())
+        }
     
     async def update_user_location(self, user_id: int, lat: float, lon: float, region_id: Optional[str] = None, accuracy: Optional[float] = None) -> None:
         """Update user's location in Redis"""
@@ -145,6 +271,22 @@ class ConnectionManager:
         for user_id in list(self.active_connections.keys()):
             await self.disconnect(user_id)
         
+        # Stop relaying published messages
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        if self._pubsub:
+            try:
+                await self._pubsub.aclose()
+            except Exception as e:
+                logger.error(f"Error closing pub/sub connection: {e}")
+            finally:
+                self._pubsub = None
+        
         # Close Redis connection if it exists
         if self.redis:
             try:
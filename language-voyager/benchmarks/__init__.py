@@ -0,0 +1 @@
+"""Load tests and benchmarks run against local stand-ins for external services"""
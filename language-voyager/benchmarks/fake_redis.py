@@ -0,0 +1,334 @@
+import asyncio
+import fnmatch
+import logging
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+class SimpleString(str):
+    """A RESP simple string reply such as +OK"""
+
+class ReplyError(Exception):
+    """A RESP error reply"""
+
+OK = SimpleString("OK")
+QUEUED = SimpleString("QUEUED")
+
+# Python equivalents of the Lua scripts a client may EVAL, keyed by script text
+Script = Callable[["FakeRedisServer", List[bytes], List[bytes]], Any]
+
+class _Connection:
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.transaction: Optional[List[List[bytes]]] = None
+        self.channels: Set[bytes] = set()
+
+class FakeRedisServer:
+    """In-process RESP2 server with the subset of Redis the app uses
+
+    Keys, strings with expiry, hashes, SCAN, MULTI/EXEC pipelines and
+    pub/sub behave like Redis for a single client process, over RESP2 only. EVAL runs the
+    registered Python equivalent of a known script; any other script is
+    rejected with an error reply, as a Redis without that script would.
+    Every command is counted so load tests can report Redis calls.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, scripts: Optional[Dict[str, Script]] = None):
+        self.host = host
+        self.port = port
+        self.scripts = {text.strip(): script for text, script in (scripts or {}).items()}
+        self.commands: Counter = Counter()
+        self._data: Dict[bytes, Any] = {}
+        self._expires: Dict[bytes, float] = {}
+        self._subscribers: Dict[bytes, Set[_Connection]] = {}
+        self._connections: Set[_Connection] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def url(self) -> str:
+        # Clients defaulting to RESP3 (redis-py 8) are asked to stay on RESP2
+        return f"redis://{self.host}:{self.port}/0?protocol=2"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for connection in list(self._connections):
+                connection.writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connection = _Connection(writer)
+        self._connections.add(connection)
+        try:
+            while True:
+                command = await self._read_command(reader)
+                if command is None:
+                    break
+                writer.write(self._encode(self._dispatch(connection, command)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(connection)
+            for subscribers in self._subscribers.values():
+                subscribers.discard(connection)
+            writer.close()
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline command, as sent by redis-cli or telnet
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:])):
+            header = await reader.readline()
+            length = int(header[1:])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    def _encode(self, value: Any) -> bytes:
+        if isinstance(value, ReplyError):
+            return f"-{value}\r\n".encode()
+        if isinstance(value, SimpleString):
+            return f"+{value}\r\n".encode()
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, bool):
+            return f":{int(value)}\r\n".encode()
+        if isinstance(value, int):
+            return f":{value}\r\n".encode()
+        if isinstance(value, (list, tuple)):
+            return f"*{len(value)}\r\n".encode() + b"".join(self._encode(item) for item in value)
+        if isinstance(value, float):
+            value = repr(value)
+        if isinstance(value, str):
+            value = value.encode()
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _dispatch(self, connection: _Connection, command: List[bytes]) -> Any:
+        name = command[0].decode().upper()
+        args = command[1:]
+        self.commands[name] = self.commands[name] + 1
+
+        if connection.transaction is not None and name not in ("EXEC", "DISCARD", "MULTI"):
+            connection.transaction.append(command)
+            return QUEUED
+        if name == "MULTI":
+            connection.transaction = []
+            return OK
+        if name == "DISCARD":
+            connection.transaction = None
+            return OK
+        if name == "EXEC":
+            queued, connection.transaction = connection.transaction or [], None
+            return [self._execute(connection, cmd[0].decode().upper(), cmd[1:]) for cmd in queued]
+        return self._execute(connection, name, args)
+
+    def execute(self, name: str, *args: Any) -> Any:
+        """Run a command directly, e.g. from a registered script"""
+        return self._execute(None, name.upper(), [a if isinstance(a, bytes) else str(a).encode() for a in args])
+
+    def _execute(self, connection: Optional[_Connection], name: str, args: List[bytes]) -> Any:
+        handler = getattr(self, f"_cmd_{name.lower()}", None)
+        if handler is None:
+            return ReplyError(f"ERR unknown command '{name}'")
+        try:
+            if name in ("SUBSCRIBE", "UNSUBSCRIBE"):
+                return handler(connection, args)
+            return handler(args)
+        except ReplyError as e:
+            return e
+        except (ValueError, IndexError) as e:
+            return ReplyError(f"ERR {e}")
+
+    def _get(self, key: bytes) -> Any:
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return self._data.get(key)
+
+    def _set(self, key: bytes, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = value
+        if ttl is None:
+            self._expires.pop(key, None)
+        else:
+            self._expires[key] = time.monotonic() + ttl
+
+    def _delete(self, key: bytes) -> bool:
+        self._expires.pop(key, None)
+        return self._data.pop(key, None) is not None
+
+    def _keys(self, pattern: bytes = b"*") -> List[bytes]:
+        pattern = pattern.decode()
+        return [key for key in list(self._data) if self._get(key) is not None and fnmatch.fnmatchcase(key.decode(), pattern)]
+
+    def _cmd_ping(self, args):
+        return args[0] if args else SimpleString("PONG")
+
+    def _cmd_hello(self, args):
+        if args and args[0] != b"2":
+            raise ReplyError("NOPROTO this server only speaks RESP2")
+        return [b"server", b"redis", b"version", b"7.2.0", b"proto", 2, b"id", 1, b"mode", b"standalone", b"role", b"master", b"modules", []]
+
+    def _cmd_client(self, args):
+        return OK
+
+    def _cmd_select(self, args):
+        return OK
+
+    def _cmd_flushdb(self, args):
+        self._data.clear()
+        self._expires.clear()
+        return OK
+
+    def _cmd_get(self, args):
+        value = self._get(args[0])
+        if isinstance(value, dict):
+            raise ReplyError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _cmd_set(self, args):
+        key, value = args[0], args[1]
+        ttl, nx, xx = None, False, False
+        options = [a.upper() for a in args[2:]]
+        i = 0
+        while i < len(options):
+            if options[i] == b"EX":
+                ttl, i = float(options[i + 1]), i + 1
+            elif options[i] == b"PX":
+                ttl, i = float(options[i + 1]) / 1000, i + 1
+            elif options[i] == b"NX":
+                nx = True
+            elif options[i] == b"XX":
+                xx = True
+            i += 1
+        exists = self._get(key) is not None
+        if (nx and exists) or (xx and not exists):
+            return None
+        self._set(key, value, ttl)
+        return OK
+
+    def _cmd_setex(self, args):
+        self._set(args[0], args[2], float(args[1]))
+        return OK
+
+    def _cmd_mget(self, args):
+        return [self._cmd_get([key]) for key in args]
+
+    def _cmd_del(self, args):
+        return sum(self._delete(key) for key in args)
+
+    _cmd_unlink = _cmd_del
+
+    def _cmd_exists(self, args):
+        return sum(self._get(key) is not None for key in args)
+
+    def _cmd_expire(self, args):
+        if self._get(args[0]) is None:
+            return 0
+        self._expires[args[0]] = time.monotonic() + float(args[1])
+        return 1
+
+    def _cmd_ttl(self, args):
+        if self._get(args[0]) is None:
+            return -2
+        expires_at = self._expires.get(args[0])
+        return -1 if expires_at is None else int(expires_at - time.monotonic())
+
+    def _cmd_incrby(self, args):
+        value = int(self._get(args[0]) or 0) + int(args[1])
+        self._data[args[0]] = str(value).encode()
+        return value
+
+    def _cmd_incr(self, args):
+        return self._cmd_incrby([args[0], b"1"])
+
+    def _cmd_incrbyfloat(self, args):
+        value = float(self._get(args[0]) or 0) + float(args[1])
+        self._data[args[0]] = repr(value).encode()
+        return repr(value)
+
+    def _cmd_hset(self, args):
+        mapping = self._get(args[0])
+        if mapping is None:
+            mapping = {}
+            self._data[args[0]] = mapping
+        added = 0
+        for field, value in zip(args[1::2], args[2::2]):
+            added += field not in mapping
+            mapping[field] = value
+        return added
+
+    def _cmd_hget(self, args):
+        return (self._get(args[0]) or {}).get(args[1])
+
+    def _cmd_hgetall(self, args):
+        return [item for pair in (self._get(args[0]) or {}).items() for item in pair]
+
+    def _cmd_keys(self, args):
+        return self._keys(args[0] if args else b"*")
+
+    def _cmd_scan(self, args):
+        # The whole keyspace is returned in one page with a finished cursor
+        options = [a.upper() for a in args[1::2]]
+        pattern = b"*"
+        if b"MATCH" in options:
+            pattern = args[2 + 2 * options.index(b"MATCH")]
+        return [b"0", self._keys(pattern)]
+
+    def _cmd_publish(self, args):
+        subscribers = self._subscribers.get(args[0], set())
+        message = self._encode([b"message", args[0], args[1]])
+        for subscriber in list(subscribers):
+            subscriber.writer.write(message)
+        return len(subscribers)
+
+    def _cmd_subscribe(self, connection: _Connection, args):
+        replies = []
+        for channel in args:
+            self._subscribers.setdefault(channel, set()).add(connection)
+            connection.channels.add(channel)
+            replies.append([b"subscribe", channel, len(connection.channels)])
+        return self._multi_reply(connection, replies)
+
+    def _cmd_unsubscribe(self, connection: _Connection, args):
+        channels = args or sorted(connection.channels)
+        if not channels:
+            return [b"unsubscribe", None, 0]
+        replies = []
+        for channel in channels:
+            self._subscribers.get(channel, set()).discard(connection)
+            connection.channels.discard(channel)
+            replies.append([b"unsubscribe", channel, len(connection.channels)])
+        return self._multi_reply(connection, replies)
+
+    def _multi_reply(self, connection: _Connection, replies: List[List]) -> Any:
+        # Pub/sub commands send one reply per channel
+        for reply in replies[:-1]:
+            connection.writer.write(self._encode(reply))
+        return replies[-1]
+
+    def _cmd_eval(self, args):
+        script = self.scripts.get(args[0].decode().strip())
+        if script is None:
+            raise ReplyError("NOSCRIPT No matching script registered with the fake server")
+        numkeys = int(args[1])
+        return script(self, args[2:2 + numkeys], args[2 + numkeys:])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "commands": dict(self.commands),
+            "total_commands": sum(self.commands.values()),
+            "keys": len(self._data)
+        }
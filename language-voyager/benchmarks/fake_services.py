@@ -0,0 +1,131 @@
+import asyncio
+import json
+from collections import Counter
+from typing import Any, Dict, Optional
+from aiohttp import web
+
+class FakeService:
+    """aiohttp server standing in for an upstream API
+
+    Each request waits `latency` seconds before answering, so load tests see
+    realistic upstream time without depending on the network or spending
+    API credits. Requests are counted per path.
+    """
+
+    def __init__(self, latency: float = 0.05, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.requests: Counter = Counter()
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def routes(self, app: web.Application) -> None:
+        raise NotImplementedError
+
+    async def start(self) -> None:
+        app = web.Application()
+        self.routes(app)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"requests": dict(self.requests), "total_requests": sum(self.requests.values())}
+
+class FakeArcGIS(FakeService):
+    """Geocoding and REST endpoints returning fixed, well-formed payloads
+
+    Serve under ARCGIS_GEOCODE_URL=<url>/geocode and ARCGIS_REST_URL=<url>/rest.
+    """
+
+    def routes(self, app: web.Application) -> None:
+        app.router.add_route("*", "/geocode/findAddressCandidates", self._find_address_candidates)
+        app.router.add_route("*", "/geocode/reverseGeocode", self._reverse_geocode)
+        app.router.add_route("*", "/rest/{endpoint:.*}", self._rest)
+
+    async def _find_address_candidates(self, request: web.Request) -> web.Response:
+        self.requests["findAddressCandidates"] += 1
+        await asyncio.sleep(self.latency)
+        address = request.query.get("singleLine") or request.query.get("address", "")
+        return web.json_response({
+            "spatialReference": {"wkid": 4326, "latestWkid": 4326},
+            "candidates": [{
+                "address": address,
+                "location": {"x": 139.767125, "y": 35.681236},
+                "score": 100,
+                "attributes": {"Match_addr": address, "Country": "JPN"}
+            }]
+        })
+
+    async def _reverse_geocode(self, request: web.Request) -> web.Response:
+        self.requests["reverseGeocode"] += 1
+        await asyncio.sleep(self.latency)
+        x, _, y = request.query.get("location", "139.767125,35.681236").partition(",")
+        return web.json_response({
+            "address": {"Match_addr": "Marunouchi, Chiyoda, Tokyo", "City": "Tokyo", "CountryCode": "JPN"},
+            "location": {"x": float(x), "y": float(y or 0), "spatialReference": {"wkid": 4326}}
+        })
+
+    async def _rest(self, request: web.Request) -> web.Response:
+        endpoint = request.match_info["endpoint"]
+        self.requests[endpoint] += 1
+        await asyncio.sleep(self.latency)
+        return web.json_response({"features": [], "contains": False, "endpoint": endpoint})
+
+class FakeOpenRouter(FakeService):
+    """Chat completions endpoint with JSON and server-sent event replies
+
+    Serve under OPENROUTER_BASE_URL=<url>/api/v1. Streamed replies are sent
+    one word per event, `token_delay` seconds apart, after the first-token
+    latency.
+    """
+
+    def __init__(self, latency: float = 0.3, token_delay: float = 0.01, **kwargs):
+        super().__init__(latency=latency, **kwargs)
+        self.token_delay = token_delay
+
+    def routes(self, app: web.Application) -> None:
+        app.router.add_post("/api/v1/chat/completions", self._chat_completions)
+
+    @staticmethod
+    def _reply(body: Dict) -> str:
+        question = next((m.get("content", "") for m in reversed(body.get("messages", [])) if m.get("role") == "user"), "")
+        return f"いい質問ですね。「{question[:40]}」について、駅の案内板を見てみましょう。 (Good question! Let's check the station signs.)"
+
+    async def _chat_completions(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        reply = self._reply(body)
+        await asyncio.sleep(self.latency)
+
+        if not body.get("stream"):
+            self.requests["chat/completions"] += 1
+            return web.json_response({
+                "id": "gen-benchmark",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": len(reply.split()), "total_tokens": 100 + len(reply.split())}
+            })
+
+        self.requests["chat/completions:stream"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        # OpenRouter interleaves keep-alive comments with the data events
+        await response.write(b": OPENROUTER PROCESSING\n\n")
+        for word in reply.split(" "):
+            chunk = {"choices": [{"index": 0, "delta": {"content": word + " "}}]}
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            await asyncio.sleep(self.token_delay)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
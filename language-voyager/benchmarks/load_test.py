@@ -0,0 +1,578 @@
+"""Mixed-traffic load test against local stand-ins for ArcGIS, OpenRouter and Redis
+
+Seeds a database, starts the app under uvicorn in a subprocess with its
+Redis and upstream API settings pointed at in-process fakes, then replays a
+weighted mix of POI content reads, POI completions, region listings,
+location searches and chat requests alongside WebSocket position streams.
+
+Writes throughput, p50/p95/p99 latency, error rate and database queries per
+request for each route as JSON, and compares against a previous run:
+
+    python -m benchmarks.load_test --duration 60 --users 20 --ws-clients 10 --output after.json --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import httpx
+
+try:
+    from websockets.asyncio.client import connect as websocket_connect
+    WEBSOCKET_HEADERS_ARG = "additional_headers"
+except ImportError:  # websockets < 13
+    from websockets import connect as websocket_connect
+    WEBSOCKET_HEADERS_ARG = "extra_headers"
+
+from .fake_redis import FakeRedisServer
+from .fake_services import FakeArcGIS, FakeOpenRouter
+from .server import ROUTE_HEADER, STATS_PATH
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Relative frequency of each HTTP operation in the traffic mix
+DEFAULT_MIX = {
+    "get_poi_content": 40,
+    "complete_poi_content": 15,
+    "list_regions": 20,
+    "location_search": 10,
+    "chat": 10,
+    "chat_stream": 5,
+}
+
+WEBSOCKET_ROUTE = "ws_position_stream"
+
+STATION_QUERIES = ["Tokyo Station", "Shinjuku Station", "Shibuya Station", "Ueno Station", "Akihabara Station"]
+CHAT_PROMPTS = [
+    "Where is platform 4?",
+    "where is platform 4",
+    "How do I buy a ticket?",
+    "What does 出口 mean?",
+    "Which exit is closest to the Imperial Palace?",
+]
+PROFICIENCY_LEVELS = [10.0, 35.0, 50.0, 65.0, 90.0]
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+class RouteStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.statuses: Counter = Counter()
+
+    def record(self, seconds: float, status: Optional[int], ok: bool) -> None:
+        self.latencies.append(seconds)
+        self.statuses[str(status) if status is not None else "error"] += 1
+        if not ok:
+            self.errors += 1
+
+    def summary(self, duration: float, queries: Optional[Dict[str, int]]) -> Dict:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        in_ms = lambda value: None if value is None else round(value * 1000, 2)
+        return {
+            "count": count,
+            "errors": self.errors,
+            "error_rate": self.errors / count if count else 0.0,
+            "throughput_rps": round(count / duration, 2) if duration else 0.0,
+            "statuses": dict(self.statuses),
+            "latency_ms": {
+                "mean": in_ms(sum(latencies) / count) if count else None,
+                "p50": in_ms(percentile(latencies, 50)),
+                "p95": in_ms(percentile(latencies, 95)),
+                "p99": in_ms(percentile(latencies, 99)),
+                "max": in_ms(latencies[-1]) if count else None,
+            },
+            "db_queries_per_request": (
+                round(queries["queries"] / queries["requests"], 2) if queries and queries["requests"] else None
+            ),
+        }
+
+def _release_lock(server: FakeRedisServer, keys: List[bytes], args: List[bytes]) -> int:
+    if server.execute("GET", keys[0]) == args[0]:
+        return server.execute("DEL", keys[0])
+    return 0
+
+def _increment_seeded_counters(server: FakeRedisServer, keys: List[bytes], args: List[bytes]) -> int:
+    if server.execute("EXISTS", keys[0]):
+        server.execute("INCRBYFLOAT", keys[0], args[0])
+    if server.execute("EXISTS", keys[1]):
+        server.execute("INCR", keys[1])
+    return 1
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def seed_database(users: int, pois: int) -> Tuple[List[str], List[str]]:
+    """Create the benchmark region, POIs, content and users; returns (tokens, poi_ids)
+
+    Rows are merged by id, so an existing database can be reused between runs.
+    """
+    from app.database.config import Base, SessionLocal, engine
+    from app.models import achievement, arcgis_usage, content, poi, progress, region, user  # noqa: F401 register mappers
+    from app.models.content import ContentType, LanguageContent
+    from app.models.poi import PointOfInterest
+    from app.models.region import Region
+    from app.models.user import User
+    from app.auth.utils import create_access_token, get_password_hash
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.merge(Region(
+            id="bench_tokyo",
+            name="Benchmark Tokyo",
+            local_name="東京",
+            description="Central Tokyo benchmark region",
+            languages=[{"language_code": "ja", "name": "Japanese", "local_name": "日本語", "required_level": 0.0}],
+            bounds={"north": 35.75, "south": 35.6, "east": 139.85, "west": 139.65},
+            center={"lat": 35.681236, "lng": 139.767125},
+            difficulty_level=2.0,
+            recommended_level=0.0,
+            total_pois=pois,
+            total_challenges=0,
+            region_metadata={"dialect": "tokyo", "language": "ja"}
+        ))
+        db.merge(Region(
+            id="bench_osaka",
+            name="Benchmark Osaka",
+            local_name="大阪",
+            description="Osaka benchmark region unlocked from Tokyo",
+            languages=[{"language_code": "ja", "name": "Japanese", "local_name": "日本語", "required_level": 30.0}],
+            bounds={"north": 34.75, "south": 34.6, "east": 135.6, "west": 135.4},
+            center={"lat": 34.6937, "lng": 135.5023},
+            difficulty_level=3.0,
+            recommended_level=30.0,
+            total_pois=0,
+            total_challenges=0,
+            requirements={"bench_tokyo": 30.0},
+            region_metadata={"dialect": "kansai", "language": "ja"}
+        ))
+        poi_ids = [f"bench_poi_{i}" for i in range(pois)]
+        for i, poi_id in enumerate(poi_ids):
+            db.merge(PointOfInterest(
+                id=poi_id,
+                region_id="bench_tokyo",
+                name=f"Benchmark Station {i}",
+                local_name=f"ベンチ駅{i}",
+                type="station",
+                location={"lat": 35.681236 + i * 0.001, "lon": 139.767125 + i * 0.001},
+                difficulty=40 + i % 20,
+                content={
+                    "en": {"title": f"Station {i}", "description": "Busy railway station", "hints": ["Find the ticket gates"]},
+                    "ja": {"title": f"駅{i}", "description": "大きな駅", "hints": ["改札を探してください"]}
+                },
+                learning_objectives={"vocabulary": ["駅", "電車", "切符"], "grammar": ["～はどこですか"], "cultural": ["Queueing"]},
+                points_value=10,
+                time_estimate=15
+            ))
+        content_types = [ContentType.VOCABULARY, ContentType.PHRASE, ContentType.DIALOGUE, ContentType.CULTURAL_NOTE]
+        for i in range(40):
+            db.merge(LanguageContent(
+                id=f"bench_content_{i}",
+                language="ja",
+                region="bench_tokyo",
+                content_type=content_types[i % len(content_types)],
+                content={"text": f"駅の表現 {i}", "meaning": f"Station expression {i}"},
+                difficulty_level=float(10 + (i * 7) % 90),
+                context_tags=["station"]
+            ))
+
+        hashed_password = get_password_hash("benchmark")
+        emails = [f"bench_user_{i}@example.com" for i in range(users)]
+        existing = {email for (email,) in db.query(User.email).filter(User.email.in_(emails))}
+        for i, email in enumerate(emails):
+            if email not in existing:
+                db.add(User(email=email, username=f"bench_user_{i}", hashed_password=hashed_password, is_active=True))
+        db.commit()
+    finally:
+        db.close()
+    engine.dispose()
+    return [create_access_token({"sub": email}) for email in emails], poi_ids
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.mix = dict(DEFAULT_MIX)
+        for override in args.mix:
+            route, _, weight = override.partition("=")
+            if route not in DEFAULT_MIX:
+                raise SystemExit(f"Unknown route in --mix: {route} (choose from {', '.join(DEFAULT_MIX)})")
+            self.mix[route] = float(weight)
+        self.rng = random.Random(args.seed)
+        self.stats: Dict[str, RouteStats] = {}
+        self.websocket = Counter()
+        self.redis = FakeRedisServer()
+        self.arcgis = FakeArcGIS(latency=args.arcgis_latency)
+        self.openrouter = FakeOpenRouter(latency=args.openrouter_latency)
+        self.base_url = ""
+        self.tokens: List[str] = []
+        self.poi_ids: List[str] = []
+
+    def _environment(self, workdir: str) -> Dict[str, str]:
+        environment = {
+            "DATABASE_URL": self.args.database_url or f"sqlite:///{workdir}/benchmark.db",
+            "REDIS_URL": self.redis.url,
+            "ARCGIS_API_KEY": "benchmark",
+            "ARCGIS_GEOCODE_URL": f"{self.arcgis.url}/geocode",
+            "ARCGIS_REST_URL": f"{self.arcgis.url}/rest",
+            "OPENROUTER_API_KEY": "benchmark",
+            "OPENROUTER_BASE_URL": f"{self.openrouter.url}/api/v1",
+            "LOCAL_STORAGE_PATH": os.path.join(workdir, "storage"),
+        }
+        for override in self.args.env:
+            key, _, value = override.partition("=")
+            environment[key] = value
+        return environment
+
+    async def run(self) -> Dict:
+        with tempfile.TemporaryDirectory(prefix="lv-benchmark-") as workdir:
+            await self.redis.start()
+            await self.arcgis.start()
+            await self.openrouter.start()
+            environment = self._environment(workdir)
+            os.environ.update(environment)
+
+            from app.services.arcgis import INCREMENT_SEEDED_COUNTERS, RELEASE_LOCK
+            self.redis.scripts = {
+                INCREMENT_SEEDED_COUNTERS.strip(): _increment_seeded_counters,
+                RELEASE_LOCK.strip(): _release_lock,
+            }
+            self.tokens, self.poi_ids = await asyncio.to_thread(
+                seed_database, self.args.users + self.args.ws_clients, self.args.pois
+            )
+
+            port = _free_port()
+            self.base_url = f"http://127.0.0.1:{port}"
+            log_path = os.path.join(workdir, "server.log")
+            with open(log_path, "w") as log:
+                server = subprocess.Popen(
+                    [sys.executable, "-m", "benchmarks.server", "--port", str(port)],
+                    cwd=PROJECT_ROOT,
+                    env={**os.environ, **environment},
+                    stdout=log,
+                    stderr=subprocess.STDOUT
+                )
+                try:
+                    async with httpx.AsyncClient(
+                        base_url=self.base_url,
+                        timeout=self.args.timeout,
+                        limits=httpx.Limits(max_connections=self.args.users, max_keepalive_connections=self.args.users)
+                    ) as client:
+                        await self._wait_until_ready(client, server, log_path)
+                        if self.args.warmup > 0:
+                            await self._run_phase(client, self.args.warmup)
+                            await self._reset_counters(client)
+                        started = time.monotonic()
+                        await self._run_phase(client, self.args.duration)
+                        elapsed = time.monotonic() - started
+                        # Let the server finish closing the position streams
+                        await asyncio.sleep(0.5)
+                        server_queries = (await client.get(STATS_PATH)).json()
+                        cache_stats = (await client.get("/health/cache")).json()
+                finally:
+                    server.terminate()
+                    try:
+                        server.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        server.kill()
+                    await self.openrouter.stop()
+                    await self.arcgis.stop()
+                    await self.redis.stop()
+
+        return self._report(elapsed, server_queries, cache_stats)
+
+    async def _wait_until_ready(self, client: httpx.AsyncClient, server: subprocess.Popen, log_path: str) -> None:
+        deadline = time.monotonic() + self.args.startup_timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                break
+            try:
+                if (await client.get("/health/cache")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+        with open(log_path) as log:
+            sys.stderr.write(log.read()[-4000:])
+        raise SystemExit("Benchmark server did not start")
+
+    async def _reset_counters(self, client: httpx.AsyncClient) -> None:
+        await client.get(STATS_PATH, params={"reset": "1"})
+        self.stats.clear()
+        self.websocket.clear()
+        self.redis.commands.clear()
+        self.arcgis.requests.clear()
+        self.openrouter.requests.clear()
+
+    async def _run_phase(self, client: httpx.AsyncClient, duration: float) -> None:
+        deadline = time.monotonic() + duration
+        users = self.args.users
+        tasks = [
+            self._virtual_user(client, self.tokens[i], random.Random(self.rng.random()), deadline)
+            for i in range(users)
+        ]
+        tasks += [
+            self._position_stream(self.tokens[users + i], random.Random(self.rng.random()), deadline)
+            for i in range(self.args.ws_clients)
+        ]
+        await asyncio.gather(*tasks)
+
+    def _record(self, route: str, seconds: float, status: Optional[int], ok: bool) -> None:
+        self.stats.setdefault(route, RouteStats()).record(seconds, status, ok)
+
+    async def _virtual_user(self, client: httpx.AsyncClient, token: str, rng: random.Random, deadline: float) -> None:
+        routes, weights = zip(*[(route, weight) for route, weight in self.mix.items() if weight > 0])
+        state = {"headers": {"Authorization": f"Bearer {token}"}, "etag": None}
+        while time.monotonic() < deadline:
+            route = rng.choices(routes, weights)[0]
+            started = time.perf_counter()
+            status = None
+            try:
+                status, ok = await getattr(self, f"_{route}")(client, rng, state, {
+                    **state["headers"], ROUTE_HEADER.decode(): route
+                })
+            except httpx.HTTPError as e:
+                logger.debug(f"{route} failed: {e}")
+                ok = False
+            self._record(route, time.perf_counter() - started, status, ok)
+            if self.args.think_time:
+                await asyncio.sleep(rng.expovariate(1 / self.args.think_time))
+
+    async def _get_poi_content(self, client, rng, state, headers) -> Tuple[int, bool]:
+        response = await client.get(
+            f"/api/v1/map/pois/{rng.choice(self.poi_ids)}/content",
+            params={"language": "ja", "proficiency_level": rng.choice(PROFICIENCY_LEVELS) + rng.uniform(-3, 3)},
+            headers=headers
+        )
+        return response.status_code, response.status_code == 200
+
+    async def _complete_poi_content(self, client, rng, state, headers) -> Tuple[int, bool]:
+        response = await client.post(
+            f"/api/v1/progress/poi/{rng.choice(self.poi_ids)}/complete",
+            json={
+                "content_type": "vocabulary",
+                "score": rng.uniform(50, 100),
+                "time_spent": rng.randint(10, 300),
+                "completed_items": rng.sample(["駅", "電車", "切符"], rng.randint(1, 3))
+            },
+            headers=headers
+        )
+        return response.status_code, response.status_code == 200
+
+    async def _list_regions(self, client, rng, state, headers) -> Tuple[int, bool]:
+        # Clients revalidate with the ETag of their last response
+        if state["etag"]:
+            headers = {**headers, "If-None-Match": state["etag"]}
+        response = await client.get("/api/v1/map/regions", headers=headers)
+        if response.status_code == 200:
+            state["etag"] = response.headers.get("etag")
+        return response.status_code, response.status_code in (200, 304)
+
+    async def _location_search(self, client, rng, state, headers) -> Tuple[int, bool]:
+        response = await client.get(
+            "/api/v1/map/location/search",
+            params={"query": rng.choice(STATION_QUERIES)},
+            headers=headers
+        )
+        return response.status_code, response.status_code == 200
+
+    def _chat_body(self, rng: random.Random) -> Dict:
+        return {
+            "messages": [{"role": "user", "content": rng.choice(CHAT_PROMPTS)}],
+            "context": {"location": "Tokyo Station", "language": "ja", "proficiency_level": 35}
+        }
+
+    async def _chat(self, client, rng, state, headers) -> Tuple[int, bool]:
+        response = await client.post("/api/v1/conversation/chat", json=self._chat_body(rng), headers=headers)
+        return response.status_code, response.status_code == 200
+
+    async def _chat_stream(self, client, rng, state, headers) -> Tuple[int, bool]:
+        async with client.stream(
+            "POST",
+            "/api/v1/conversation/chat",
+            params={"stream": "true"},
+            json=self._chat_body(rng),
+            headers=headers
+        ) as response:
+            body = await response.aread()
+        return response.status_code, response.status_code == 200 and b"event: done" in body
+
+    async def _position_stream(self, token: str, rng: random.Random, deadline: float) -> None:
+        """Send position updates on one WebSocket until the deadline"""
+        url = self.base_url.replace("http", "ws", 1) + "/api/v1/map/ws/location"
+        headers = {"Authorization": f"Bearer {token}", ROUTE_HEADER.decode(): WEBSOCKET_ROUTE}
+        lat, lon = 35.681236, 139.767125
+        started = time.perf_counter()
+        try:
+            connection = await websocket_connect(url, **{WEBSOCKET_HEADERS_ARG: headers})
+        except Exception as e:
+            logger.debug(f"WebSocket connect failed: {e}")
+            self._record("ws_connect", time.perf_counter() - started, None, False)
+            return
+        self._record("ws_connect", time.perf_counter() - started, 101, True)
+        self.websocket["connections"] += 1
+
+        async def receive():
+            async for message in connection:
+                self.websocket["messages_received"] += 1
+                if '"error"' in message:
+                    self.websocket["errors"] += 1
+
+        receiver = asyncio.create_task(receive())
+        try:
+            while time.monotonic() < deadline:
+                # Walk a few metres at a time, with occasional GPS jitter
+                lat += rng.gauss(0, 0.0001)
+                lon += rng.gauss(0, 0.0001)
+                await connection.send(json.dumps({
+                    "type": "position_update",
+                    "position": {
+                        "coords": {"latitude": lat, "longitude": lon, "accuracy": rng.uniform(5, 30)},
+                        "timestamp": int(time.time() * 1000),
+                        "region_id": "bench_tokyo"
+                    }
+                }))
+                self.websocket["position_updates"] += 1
+                await asyncio.sleep(self.args.ws_interval)
+        except Exception as e:
+            logger.debug(f"WebSocket stream ended: {e}")
+            self.websocket["disconnects"] += 1
+        finally:
+            receiver.cancel()
+            await connection.close()
+
+    def _report(self, elapsed: float, server_queries: Dict[str, Dict[str, int]], cache_stats: Dict) -> Dict:
+        routes = {
+            route: stats.summary(elapsed, server_queries.get(route))
+            for route, stats in sorted(self.stats.items())
+        }
+        websocket_queries = server_queries.get(WEBSOCKET_ROUTE) or {}
+        total = sum(route["count"] for route in routes.values())
+        return {
+            "config": {
+                key: value for key, value in vars(self.args).items()
+                if key not in ("output", "baseline")
+            },
+            "mix": self.mix,
+            "duration_s": round(elapsed, 2),
+            "total_requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "error_rate": sum(route["errors"] for route in routes.values()) / total if total else 0.0,
+            "routes": routes,
+            "websocket": {
+                **self.websocket,
+                "position_updates_per_s": round(self.websocket["position_updates"] / elapsed, 2) if elapsed else 0.0,
+                "db_queries_per_update": (
+                    round(websocket_queries["queries"] / websocket_queries["messages"], 2)
+                    if websocket_queries.get("messages") else None
+                ),
+            },
+            "redis": self.redis.stats(),
+            "upstream": {"arcgis": self.arcgis.stats(), "openrouter": self.openrouter.stats()},
+            "caches": cache_stats,
+        }
+
+def compare(result: Dict, baseline: Dict, max_regression: float) -> Dict:
+    """Per-route changes against a previous run; regressions exceed max_regression"""
+    routes = {}
+    regressions = []
+    for route, current in result["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if not previous:
+            continue
+        change = {}
+        for name, now, before, higher_is_worse in (
+            ("p95_ms", current["latency_ms"]["p95"], previous["latency_ms"]["p95"], True),
+            ("p99_ms", current["latency_ms"]["p99"], previous["latency_ms"]["p99"], True),
+            ("throughput_rps", current["throughput_rps"], previous["throughput_rps"], False),
+            ("db_queries_per_request", current["db_queries_per_request"], previous["db_queries_per_request"], True),
+        ):
+            if now is None or not before:
+                continue
+            ratio = now / before - 1
+            change[name] = {"before": before, "after": now, "change": round(ratio, 4)}
+            if (ratio if higher_is_worse else -ratio) > max_regression:
+                regressions.append(f"{route} {name}: {before} -> {now}")
+        routes[route] = change
+    return {"routes": routes, "regressions": regressions, "max_regression": max_regression}
+
+def _print_summary(result: Dict) -> None:
+    lines = [
+        f"{'route':<22}{'count':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'queries':>9}"
+    ]
+    fmt = lambda value: "-" if value is None else f"{value:.1f}"
+    for route, stats in result["routes"].items():
+        latency = stats["latency_ms"]
+        lines.append(
+            f"{route:<22}{stats['count']:>8}{stats['throughput_rps']:>9.1f}{fmt(latency['p50']):>10}"
+            f"{fmt(latency['p95']):>10}{fmt(latency['p99']):>10}{stats['errors']:>8}{fmt(stats['db_queries_per_request']):>9}"
+        )
+    websocket = result["websocket"]
+    lines.append(
+        f"websocket: {websocket.get('connections', 0)} connections, {websocket['position_updates_per_s']} updates/s, "
+        f"{fmt(websocket['db_queries_per_update'])} queries/update"
+    )
+    lines.append(f"redis: {result['redis']['total_commands']} commands; total: {result['throughput_rps']} req/s")
+    for regression in result.get("comparison", {}).get("regressions", []):
+        lines.append(f"REGRESSION {regression}")
+    print("\n".join(lines), file=sys.stderr)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds of traffic before measuring")
+    parser.add_argument("--users", type=int, default=10, help="concurrent HTTP virtual users")
+    parser.add_argument("--ws-clients", type=int, default=10, help="concurrent WebSocket position streams")
+    parser.add_argument("--ws-interval", type=float, default=1.0, help="seconds between position updates")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between a user's requests")
+    parser.add_argument("--pois", type=int, default=20, help="POIs to seed")
+    parser.add_argument("--mix", action="append", default=[], metavar="ROUTE=WEIGHT", help="override a traffic mix weight")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra app setting for the server")
+    parser.add_argument("--database-url", help="benchmark against this database instead of a temporary SQLite file")
+    parser.add_argument("--arcgis-latency", type=float, default=0.05, help="fake ArcGIS response time in seconds")
+    parser.add_argument("--openrouter-latency", type=float, default=0.3, help="fake OpenRouter time to first token")
+    parser.add_argument("--timeout", type=float, default=30.0, help="client request timeout")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="previous JSON results to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed relative change before failing")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    result = asyncio.run(LoadTest(args).run())
+    if args.baseline:
+        with open(args.baseline) as f:
+            result["comparison"] = compare(result, json.load(f), args.max_regression)
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+    _print_summary(result)
+    if result.get("comparison", {}).get("regressions"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Run the app under uvicorn with per-route database query counting
+
+Started by `benchmarks.load_test` in a subprocess whose environment points
+the database, Redis and upstream API settings at the benchmark stand-ins.
+"""
+import argparse
+import json
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+import uvicorn
+from sqlalchemy import event
+
+ROUTE_HEADER = b"x-benchmark-route"
+STATS_PATH = "/_benchmark/queries"
+
+_current_queries: ContextVar[Optional[List[int]]] = ContextVar("benchmark_queries", default=None)
+
+class QueryCounter:
+    """ASGI wrapper counting SQL statements per request, grouped by route
+
+    The load generator labels each request with an X-Benchmark-Route header.
+    Statements are counted through `before_cursor_execute` on every engine,
+    including work done in `run_sync` and background tasks of the request.
+    WebSocket connections also count their received messages, so statements
+    can be reported per position update.
+    """
+
+    def __init__(self, app, engines):
+        self.app = app
+        self.routes: Dict[str, Dict[str, int]] = {}
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._count)
+
+    @staticmethod
+    def _count(conn, cursor, statement, parameters, context, executemany) -> None:
+        counter = _current_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        if scope["type"] == "http" and scope["path"] == STATS_PATH:
+            return await self._send_stats(scope, send)
+
+        headers = dict(scope.get("headers") or [])
+        route = headers.get(ROUTE_HEADER, b"").decode() or f"{scope.get('method', 'WS')} {scope['path']}"
+        counter = [0]
+        messages = 0
+
+        async def counting_receive():
+            nonlocal messages
+            message = await receive()
+            if message["type"] == "websocket.receive":
+                messages += 1
+            return message
+
+        token = _current_queries.set(counter)
+        try:
+            await self.app(scope, counting_receive, send)
+        finally:
+            _current_queries.reset(token)
+            stats = self.routes.setdefault(route, {"requests": 0, "queries": 0, "messages": 0})
+            stats["requests"] += 1
+            stats["queries"] += counter[0]
+            stats["messages"] += messages
+
+    async def _send_stats(self, scope, send):
+        body = json.dumps(self.routes).encode()
+        if b"reset=1" in scope.get("query_string", b""):
+            self.routes = {}
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    # Imported here so the environment set by the load test is used
+    from app.main import app
+    from app.database.config import engine, async_engine
+
+    uvicorn.run(
+        QueryCounter(app, [engine, async_engine.sync_engine]),
+        host=args.host,
+        port=args.port,
+        log_level=args.log_level,
+        lifespan="on"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""normalize_user_progress_tracking
+
+Revision ID: 3b7e1c9d2f4a
+Revises: 5fbfdc900386
+Create Date: 2026-10-17 12:00:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import table, column
+from datetime import datetime
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e1c9d2f4a'
+down_revision: Union[str, None] = '5fbfdc900386'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _parse_timestamp(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def upgrade() -> None:
+    """Move UserProgress POI and mastery JSON into indexed tables."""
+    poi_visit = op.create_table('poi_visit',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('progress_id', sa.Integer(), nullable=False),
+    sa.Column('poi_id', sa.String(), nullable=False),
+    sa.Column('visits', sa.Integer(), nullable=False),
+    sa.Column('total_time', sa.Integer(), nullable=False),
+    sa.Column('completed_content', sa.JSON(), nullable=False),
+    sa.Column('last_visit', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['poi_id'], ['points_of_interest.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['progress_id'], ['user_progress.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('progress_id', 'poi_id', name='uq_poi_visit_progress_poi')
+    )
+    op.create_index(op.f('ix_poi_visit_id'), 'poi_visit', ['id'], unique=False)
+
+    content_mastery = op.create_table('content_mastery',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('progress_id', sa.Integer(), nullable=False),
+    sa.Column('content_type', sa.String(), nullable=False),
+    sa.Column('content_id', sa.String(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['progress_id'], ['user_progress.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('progress_id', 'content_type', 'content_id', name='uq_content_mastery_item')
+    )
+    op.create_index(op.f('ix_content_mastery_id'), 'content_mastery', ['id'], unique=False)
+    op.create_index('ix_content_mastery_progress_content', 'content_mastery', ['progress_id', 'content_id'], unique=False)
+
+    content_mastery_stats = op.create_table('content_mastery_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('progress_id', sa.Integer(), nullable=False),
+    sa.Column('content_type', sa.String(), nullable=False),
+    sa.Column('score_sum', sa.Float(), nullable=False),
+    sa.Column('item_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['progress_id'], ['user_progress.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('progress_id', 'content_type', name='uq_content_mastery_stats_type')
+    )
+    op.create_index(op.f('ix_content_mastery_stats_id'), 'content_mastery_stats', ['id'], unique=False)
+
+    # Backfill from the existing JSON columns
+    user_progress = table('user_progress',
+        column('id', sa.Integer),
+        column('poi_progress', sa.JSON),
+        column('content_mastery', sa.JSON)
+    )
+    points_of_interest = table('points_of_interest', column('id', sa.String))
+
+    connection = op.get_bind()
+    known_pois = {row.id for row in connection.execute(sa.select(points_of_interest.c.id))}
+
+    visit_rows = []
+    mastery_rows = []
+    stats_rows = []
+    for row in connection.execute(sa.select(user_progress)):
+        for poi_id, data in (row.poi_progress or {}).items():
+            if poi_id not in known_pois or not isinstance(data, dict):
+                continue
+            completed = list(dict.fromkeys(data.get('completed_content') or []))
+            visit_rows.append({
+                'progress_id': row.id,
+                'poi_id': poi_id,
+                'visits': int(data.get('visits') or 0),
+                'total_time': int(data.get('total_time') or 0),
+                'completed_content': completed,
+                'last_visit': _parse_timestamp(data.get('last_visit'))
+            })
+
+        for content_type, items in (row.content_mastery or {}).items():
+            if not isinstance(items, dict) or not items:
+                continue
+            scores = {content_id: float(score) for content_id, score in items.items()}
+            mastery_rows.extend({
+                'progress_id': row.id,
+                'content_type': content_type,
+                'content_id': content_id,
+                'score': score
+            } for content_id, score in scores.items())
+            stats_rows.append({
+                'progress_id': row.id,
+                'content_type': content_type,
+                'score_sum': sum(scores.values()),
+                'item_count': len(scores)
+            })
+
+    if visit_rows:
+        op.bulk_insert(poi_visit, visit_rows)
+    if mastery_rows:
+        op.bulk_insert(content_mastery, mastery_rows)
+    if stats_rows:
+        op.bulk_insert(content_mastery_stats, stats_rows)
+
+
+def downgrade() -> None:
+    """Drop normalized progress tables (JSON columns were left in place)."""
+    op.drop_index(op.f('ix_content_mastery_stats_id'), table_name='content_mastery_stats')
+    op.drop_table('content_mastery_stats')
+    op.drop_index('ix_content_mastery_progress_content', table_name='content_mastery')
+    op.drop_index(op.f('ix_content_mastery_id'), table_name='content_mastery')
+    op.drop_table('content_mastery')
+    op.drop_index(op.f('ix_poi_visit_id'), table_name='poi_visit')
+    op.drop_table('poi_visit')
@@ -0,0 +1,40 @@
+"""add_poi_offline_records
+
+Revision ID: 8d2f6a1c4e7b
+Revises: 3b7e1c9d2f4a
+Create Date: 2026-10-17 13:00:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f6a1c4e7b'
+down_revision: Union[str, None] = '3b7e1c9d2f4a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Store precomputed offline delta records per POI.
+
+    Existing POIs get their record built on first delta request.
+    """
+    op.create_table('poi_offline_records',
+    sa.Column('poi_id', sa.String(), nullable=False),
+    sa.Column('region_id', sa.String(), nullable=False),
+    sa.Column('content_version', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['poi_id'], ['points_of_interest.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('poi_id')
+    )
+    op.create_index(op.f('ix_poi_offline_records_region_id'), 'poi_offline_records', ['region_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop precomputed offline delta records."""
+    op.drop_index(op.f('ix_poi_offline_records_region_id'), table_name='poi_offline_records')
+    op.drop_table('poi_offline_records')
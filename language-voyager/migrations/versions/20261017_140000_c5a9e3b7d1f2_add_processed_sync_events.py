@@ -0,0 +1,35 @@
+"""add_processed_sync_events
+
+Revision ID: c5a9e3b7d1f2
+Revises: 8d2f6a1c4e7b
+Create Date: 2026-10-17 14:00:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a9e3b7d1f2'
+down_revision: Union[str, None] = '8d2f6a1c4e7b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Record applied offline sync events so retried batches are skipped."""
+    op.create_table('processed_sync_events',
+    sa.Column('event_id', sa.String(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('event_id')
+    )
+    op.create_index(op.f('ix_processed_sync_events_user_id'), 'processed_sync_events', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop offline sync idempotency records."""
+    op.drop_index(op.f('ix_processed_sync_events_user_id'), table_name='processed_sync_events')
+    op.drop_table('processed_sync_events')
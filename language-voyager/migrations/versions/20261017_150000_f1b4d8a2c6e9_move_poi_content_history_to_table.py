@@ -0,0 +1,70 @@
+"""move_poi_content_history_to_table
+
+Revision ID: f1b4d8a2c6e9
+Revises: c5a9e3b7d1f2
+Create Date: 2026-10-17 15:00:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b4d8a2c6e9'
+down_revision: Union[str, None] = 'c5a9e3b7d1f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Store POI content versions as diffs and snapshots instead of a JSON array.
+
+    The old history entries held no content, so each POI starts the new
+    history with a snapshot of its current version.
+    """
+    op.create_table('poi_content_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('poi_id', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('is_snapshot', sa.Boolean(), nullable=False),
+    sa.Column('content', sa.JSON(), nullable=False),
+    sa.Column('change_description', sa.String(), nullable=True),
+    sa.Column('changed_by', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['poi_id'], ['points_of_interest.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('poi_id', 'version', name='uq_poi_content_history_version')
+    )
+    op.execute("""
+        INSERT INTO poi_content_history (poi_id, version, is_snapshot, content, change_description)
+        SELECT id, COALESCE(content_version, 1), true, content, 'Snapshot of existing content'
+        FROM points_of_interest
+    """)
+    op.drop_column('points_of_interest', 'content_history')
+
+
+def downgrade() -> None:
+    """Restore the content_history array from version metadata."""
+    op.add_column('points_of_interest',
+                  sa.Column('content_history',
+                           JSONB,
+                           server_default='[]',
+                           nullable=False))
+    op.execute("""
+        UPDATE points_of_interest p
+        SET content_history = h.entries
+        FROM (
+            SELECT poi_id, jsonb_agg(jsonb_build_object(
+                'version', version,
+                'timestamp', created_at,
+                'change_description', change_description,
+                'changed_by', changed_by
+            ) ORDER BY version) AS entries
+            FROM poi_content_history
+            GROUP BY poi_id
+        ) h
+        WHERE h.poi_id = p.id
+    """)
+    op.drop_table('poi_content_history')
@@ -0,0 +1,27 @@
+"""index_processed_sync_events_processed_at
+
+Revision ID: a7c3e5f9b2d4
+Revises: f1b4d8a2c6e9
+Create Date: 2026-10-17 16:00:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e5f9b2d4'
+down_revision: Union[str, None] = 'f1b4d8a2c6e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Index processed_at so expired offline sync events are pruned by range."""
+    op.create_index(op.f('ix_processed_sync_events_processed_at'), 'processed_sync_events', ['processed_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop the processed_at index."""
+    op.drop_index(op.f('ix_processed_sync_events_processed_at'), table_name='processed_sync_events')
@@ -178,4 +178,20 @@ def test_list_regions_insufficient_progress(client, auth_headers, test_regions,
     
     kyoto = next(r for r in data["data"] if r["id"] == "kyoto")
     assert kyoto["is_available"] is False
-    assert kyoto["requirements"] == {"tokyo": 30.0}
\ No newline at end of file
+    assert kyoto["requirements"] == {"tokyo": 30.0}
+
+
+def test_list_regions_revalidates_with_etag(client, auth_headers, test_regions):
+    """Test that an unchanged region list is answered with 304 Not Modified"""
+    response = client.get("/api/v1/map/regions", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "private, no-cache"
+    etag = response.headers["etag"]
+
+    response = client.get("/api/v1/map/regions", headers={**auth_headers, "If-None-Match": f"W/{etag}"})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = client.get("/api/v1/map/regions", headers={**auth_headers, "If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    assert response.headers["etag"] == etag
@@ -1,11 +1,11 @@
 import pytest
 from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy.orm.attributes import flag_modified
 from app.models.poi import PointOfInterest
 from app.models.region import Region
 from app.models.content import LanguageContent, ContentType
-from app.models.progress import UserProgress
+from app.models.progress import UserProgress, POIVisit
+from app.services.progress_tracking import ProgressTracker
 
 @pytest.fixture(autouse=True)
 def clean_user_progress(test_db: Session):
@@ -165,6 +165,22 @@ def test_content(test_db: Session, test_region: Region):
     
     return contents
 
+def seed_poi_progress(db: Session, progress: UserProgress, poi_id: str, visits: int,
+                      completed_content: list, total_time: int, content_mastery: dict):
+    """Persist visit and mastery state through the normalized progress tables"""
+    db.add(POIVisit(
+        progress_id=progress.id,
+        poi_id=poi_id,
+        visits=visits,
+        completed_content=completed_content,
+        total_time=total_time,
+        last_visit=datetime.utcnow()
+    ))
+    tracker = ProgressTracker(db)
+    for content_type, scores in content_mastery.items():
+        tracker.record_mastery(progress.id, content_type, scores)
+    db.commit()
+
 @pytest.mark.asyncio
 async def test_get_poi_content(async_client, test_user, test_poi, test_content, test_db: Session):
     # Login
@@ -219,8 +235,6 @@ async def test_complete_poi_content(async_client, test_user, test_poi, test_cont
             language="ja",
             region_id=test_poi.region_id,  # Use region_id instead of region
             proficiency_level=0,
-            poi_progress={},
-            content_mastery={},
             achievements=[]
         )
         test_db.add(progress)
@@ -245,10 +259,11 @@ async def test_complete_poi_content(async_client, test_user, test_poi, test_cont
     # Verify progress update
     progress = test_db.merge(progress)  # Re-attach to session
     
-    assert "vocabulary" in progress.content_mastery
-    assert progress.content_mastery["vocabulary"]["vocab_1"] == 85
-    assert test_poi.id in progress.poi_progress
-    assert progress.poi_progress[test_poi.id]["total_time"] == 300
+    tracker = ProgressTracker(test_db)
+    assert tracker.get_mastery_levels(progress.id, ["vocab_1"]) == {"vocabulary": {"vocab_1": 85}}
+    poi_visit = tracker.get_poi_visit(progress.id, test_poi.id)
+    assert poi_visit is not None
+    assert poi_visit.total_time == 300
 
 @pytest.mark.asyncio
 async def test_achievement_unlocking(async_client, test_user, test_poi, test_content, test_db: Session):
@@ -275,24 +290,16 @@ async def test_achievement_unlocking(async_client, test_user, test_poi, test_con
             language="ja",
             region_id=test_poi.region_id,  # Use region_id instead of region
             proficiency_level=0,
-            poi_progress={},
-            content_mastery={},
             achievements=[]
         )
         test_db.add(progress)
         test_db.commit()
         test_db.refresh(progress)
     
-    # Clear existing progress and set initial visit count to 4
-    progress.poi_progress = {}
-    progress.poi_progress[test_poi.id] = {
-        "visits": 4,
-        "completed_content": [],
-        "total_time": 1200,
-        "last_visit": str(datetime.utcnow())
-    }
-    flag_modified(progress, "poi_progress")  # Mark JSON field as modified
-    test_db.commit()
+    # Clear existing visits and set initial visit count to 4
+    test_db.query(POIVisit).filter(POIVisit.progress_id == progress.id).delete()
+    seed_poi_progress(test_db, progress, test_poi.id, visits=4, completed_content=[],
+                      total_time=1200, content_mastery={})
     
     # Refresh to ensure we have the latest state
     test_db.refresh(progress)
@@ -303,7 +310,7 @@ async def test_achievement_unlocking(async_client, test_user, test_poi, test_con
         UserProgress.user_id == test_user.id,
         UserProgress.region_id == test_poi.region_id  # Changed from region to region_id
     ).first()
-    assert progress.poi_progress[test_poi.id]["visits"] == 4
+    assert ProgressTracker(test_db).get_poi_visit(progress.id, test_poi.id).visits == 4
     
     # Complete content to trigger achievement
     response = await async_client.post(
@@ -329,7 +336,8 @@ async def test_achievement_unlocking(async_client, test_user, test_poi, test_con
     test_db.refresh(progress)  # Ensure we have latest data
     
     assert len(progress.achievements) > 0
-    assert progress.poi_progress[test_poi.id]["visits"] == 5
+    test_db.expire_all()
+    assert ProgressTracker(test_db).get_poi_visit(progress.id, test_poi.id).visits == 5
 
 @pytest.mark.asyncio
 async def test_content_difficulty_progression(async_client, test_user, test_poi, test_content, test_db: Session):
@@ -352,27 +360,20 @@ async def test_content_difficulty_progression(async_client, test_user, test_poi,
         region_id=test_poi.region_id,  # FIXED: Set the region_id properly
         region_name=test_poi.region_id,  # Set region_name for backward compatibility
         proficiency_level=50,
-        poi_progress={
-            test_poi.id: {
-                "visits": 3,  # Set exactly to 3 for the test
-                "completed_content": ["vocab_1"],
-                "total_time": 900,
-                "last_visit": str(datetime.utcnow())
-            }
-        },
-        content_mastery={
-            "vocabulary": {"vocab_1": 85}  # This should give us exactly 0.255 mastery factor
-        },
         achievements=[]
     )
     
     # Properly persist the progress record
     test_db.add(progress)
-    test_db.flush()  # Make sure the record is created before modifying JSON
-    flag_modified(progress, "poi_progress")  # Mark JSON field as modified
-    flag_modified(progress, "content_mastery")  # Mark JSON field as modified
     test_db.commit()
     test_db.refresh(progress)
+    seed_poi_progress(
+        test_db, progress, test_poi.id,
+        visits=3,  # Set exactly to 3 for the test
+        completed_content=["vocab_1"],
+        total_time=900,
+        content_mastery={"vocabulary": {"vocab_1": 85}}  # This should give us exactly 0.255 mastery factor
+    )
 
     # Verify progress was correctly saved to database
     saved_progress = test_db.query(UserProgress).filter(
@@ -381,9 +382,9 @@ async def test_content_difficulty_progression(async_client, test_user, test_poi,
     ).first()
     
     assert saved_progress is not None
-    assert saved_progress.poi_progress[test_poi.id]["visits"] == 3
-    assert "vocabulary" in saved_progress.content_mastery
-    assert saved_progress.content_mastery["vocabulary"]["vocab_1"] == 85
+    tracker = ProgressTracker(test_db)
+    assert tracker.get_poi_visit(saved_progress.id, test_poi.id).visits == 3
+    assert tracker.get_mastery_levels(saved_progress.id, ["vocab_1"]) == {"vocabulary": {"vocab_1": 85}}
     
     # Clear any existing progress from other tests
     test_db.query(UserProgress).filter(
@@ -459,24 +460,18 @@ async def test_content_recommendation(async_client, test_user, test_poi, test_co
         language="ja",
         region_id=test_poi.region_id,
         proficiency_level=50,
-        poi_progress={
-            test_poi.id: {
-                "visits": 2,
-                "completed_content": ["vocab_1"],
-                "total_time": 600,
-                "last_visit": str(datetime.utcnow())
-            }
-        },
-        content_mastery={
-            "vocabulary": {"vocab_1": 100}  # Fully mastered
-        },
         achievements=[]
     )
     test_db.add(progress)
-    flag_modified(progress, "poi_progress")  # Mark JSON field as modified
-    flag_modified(progress, "content_mastery")  # Mark JSON field as modified
     test_db.commit()
     test_db.refresh(progress)  # Refresh to ensure we have latest data
+    seed_poi_progress(
+        test_db, progress, test_poi.id,
+        visits=2,
+        completed_content=["vocab_1"],
+        total_time=600,
+        content_mastery={"vocabulary": {"vocab_1": 100}}  # Fully mastered
+    )
 
     # Get POI content
     response = await async_client.get(
@@ -536,28 +531,23 @@ async def test_difficulty_adaptation(async_client, test_user, test_poi, test_con
         region_id=test_poi.region_id,
         region_name=test_poi.region_id,
         proficiency_level=50,
-        poi_progress={
-            test_poi.id: {
-                "visits": 5,
-                "completed_content": ["vocab_1", "phrase_1"],
-                "total_time": 1500,
-                "last_visit": str(datetime.utcnow())
-            }
-        },
-        content_mastery={
-            "vocabulary": {"vocab_1": 90},  # 90% mastery
-            "phrase": {"phrase_1": 85}      # 85% mastery
-        },
         achievements=[]
     )
 
     # Properly persist the progress record
     test_db.add(progress)
-    test_db.flush()  # Make sure the record is created
-    flag_modified(progress, "poi_progress")
-    flag_modified(progress, "content_mastery")
     test_db.commit()
     test_db.refresh(progress)
+    seed_poi_progress(
+        test_db, progress, test_poi.id,
+        visits=5,
+        completed_content=["vocab_1", "phrase_1"],
+        total_time=1500,
+        content_mastery={
+            "vocabulary": {"vocab_1": 90},  # 90% mastery
+            "phrase": {"phrase_1": 85}      # 85% mastery
+        }
+    )
 
     # Verify progress was saved correctly
     saved_progress = test_db.query(UserProgress).filter(
@@ -565,9 +555,9 @@ async def test_difficulty_adaptation(async_client, test_user, test_poi, test_con
         UserProgress.language == "ja",
         UserProgress.region_id == test_poi.region_id
     ).first()
-    assert saved_progress.poi_progress[test_poi.id]["visits"] == 5
-    assert "vocab_1" in saved_progress.content_mastery["vocabulary"]
-    assert saved_progress.content_mastery["vocabulary"]["vocab_1"] == 90
+    tracker = ProgressTracker(test_db)
+    assert tracker.get_poi_visit(saved_progress.id, test_poi.id).visits == 5
+    assert tracker.get_mastery_levels(saved_progress.id, ["vocab_1"]) == {"vocabulary": {"vocab_1": 90}}
 
     # Get content after progress
     response = await async_client.get(
@@ -1,5 +1,8 @@
 import pytest
 from fastapi.testclient import TestClient
+from app.models.poi import PointOfInterest
+from app.models.progress import UserProgress
+from app.models.region import Region
 
 @pytest.fixture
 def auth_headers(client):
@@ -154,4 +157,45 @@ def test_multiple_progress_updates(client, auth_headers):
     data = response.json()
     assert data["success"] == True
     assert data["data"]["proficiency_level"] == 87.5  # Average of 85 and 90
-    assert len(data["data"]["completed_challenges"]) == 2
\ No newline at end of file
+    assert len(data["data"]["completed_challenges"]) == 2
+
+
+def test_get_progress_with_completed_pois(client, auth_headers, test_db):
+    client.post(
+        "/api/v1/progress/",
+        headers=auth_headers,
+        json={
+            "language": "japanese",
+            "region": "tokyo",
+            "activity_type": "vocabulary",
+            "score": 85,
+            "metadata": {"id": "vocab_1"}
+        }
+    )
+
+    # Completed POIs are a joined-eager collection, one result row per POI
+    test_db.add(Region(
+        id="tokyo", name="Tokyo", local_name="東京", description="Tokyo",
+        languages=["ja"], bounds={}, center={"lat": 35.68, "lon": 139.76},
+        difficulty_level=1.0, recommended_level=0.0
+    ))
+    pois = [
+        PointOfInterest(
+            id=f"progress_poi_{index}", name=f"POI {index}", local_name=f"POI {index}", type="landmark",
+            location={"lat": 35.68, "lon": 139.76}, region_id="tokyo", difficulty=1, content={}
+        )
+        for index in range(2)
+    ]
+    test_db.add_all(pois)
+    progress = test_db.query(UserProgress).filter(UserProgress.region_name == "tokyo").one()
+    progress.completed_pois = pois
+    test_db.commit()
+
+    response = client.get("/api/v1/progress/", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["data"]["total_regions"] == 1
+
+    for path in ("/api/v1/progress/language/japanese", "/api/v1/progress/region/tokyo"):
+        response = client.get(path, headers=auth_headers)
+        assert response.status_code == 200
+        assert len(response.json()["data"]) == 1
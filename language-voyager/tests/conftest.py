@@ -1,11 +1,14 @@
+import asyncio
+import aiosqlite
 import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
 from httpx import AsyncClient, ASGITransport
 from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.pool import StaticPool
-from app.database.config import Base, get_db
+from app.database.config import Base, get_db, get_async_db
 from app.main import app
 from app.core.config import get_settings
 from app.models.user import User
@@ -14,6 +17,8 @@ from app.models.achievement import Achievement, AchievementDefinition
 from app.models.region import Region
 from app.models.poi import PointOfInterest
 from app.auth.utils import get_password_hash
+from app.auth.user_cache import user_cache
+from app.services.region_availability import region_availability
 
 # Test database URL
 SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///:memory:"
@@ -23,37 +28,123 @@ engine = create_engine(
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@event.listens_for(engine, "connect")
+def _disable_driver_transactions(dbapi_connection, connection_record):
+    # pysqlite's implicit BEGIN/COMMIT breaks SAVEPOINTs, so transactions are begun explicitly
+    dbapi_connection.isolation_level = None
+
+@event.listens_for(engine, "begin")
+def _begin(connection):
+    connection.exec_driver_sql("BEGIN")
+
+# Sessions join the current test's transaction through a SAVEPOINT, so their commits stay inside it
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, join_transaction_mode="create_savepoint")
+
+async def _connect_shared_database():
+    """Run aiosqlite over the sync engine's in-memory connection so both see the same data"""
+    # Read the pooled connection directly; checking it out would reset (roll back) it on return
+    return await aiosqlite.Connection(lambda: engine.pool.connection.dbapi_connection, iter_chunk_size=64)
+
+async_engine = create_async_engine(
+    "sqlite+aiosqlite://",
+    async_creator=_connect_shared_database,
+    poolclass=StaticPool,
+    # Returning the connection must not roll back the sync side's transaction
+    pool_reset_on_return=None,
+)
+
+# Connections holding the running test's transaction
+_connection = None
+_async_connection = None
+
+async def _connect_async_engine():
+    # The first connection initializes the dialect, which ends with a rollback
+    async with async_engine.connect():
+        pass
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_database():
     # Create all tables at the start of testing
     Base.metadata.create_all(bind=engine)
+    # Connect before any test's transaction is open so that rollback can't end it
+    asyncio.run(_connect_async_engine())
     yield
     # Clean up after all tests
     Base.metadata.drop_all(bind=engine)
+    # Stops the aiosqlite worker thread
+    asyncio.run(async_engine.dispose())
 
-@pytest.fixture(scope="function")
-def test_db():
+@pytest.fixture(autouse=True)
+def db_connection():
+    """Connection holding the test's outer transaction, rolled back afterwards"""
+    global _connection
     connection = engine.connect()
     transaction = connection.begin()
-    session = TestingSessionLocal(bind=connection)
+    _connection = connection
+    try:
+        yield connection
+    finally:
+        _connection = None
+        transaction.rollback()
+        connection.close()
+
+@pytest_asyncio.fixture(autouse=True)
+async def async_db_connection(db_connection):
+    """Async connection inside the same transaction, over the same sqlite connection"""
+    global _async_connection
+    connection = await async_engine.connect()
+    # Sends nothing: sqlite is already inside db_connection's transaction
+    await connection.begin()
+    _async_connection = connection
+    try:
+        yield connection
+    finally:
+        _async_connection = None
+        # Rolls back the shared sqlite transaction, leaving db_connection nothing to undo
+        await connection.close()
+
+@pytest.fixture(scope="function")
+def test_db(db_connection):
+    session = TestingSessionLocal(bind=db_connection)
 
     try:
         yield session
     finally:
         session.close()
-        transaction.rollback()
-        connection.close()
 
 def override_get_db():
-    db = TestingSessionLocal()
+    db = TestingSessionLocal(bind=_connection)
     try:
         yield db
     finally:
         db.close()
 
+async def override_get_async_db():
+    async with AsyncSession(
+        bind=_async_connection,
+        autoflush=False,
+        expire_on_commit=False,
+        join_transaction_mode="create_savepoint"
+    ) as db:
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+
+@pytest.fixture
+def test_async_engine(async_db_connection):
+    """Async bind sharing the in-memory test database and the test's transaction"""
+    return async_db_connection
+
+@pytest.fixture(autouse=True)
+def clear_user_cache():
+    """Tests roll back rows without ORM events, so cached users and regions must not leak between them"""
+    user_cache.clear()
+    region_availability.invalidate_graph()
+    yield
+    user_cache.clear()
+    region_availability.invalidate_graph()
 
 @pytest.fixture
 def test_user(test_db: Session):
@@ -94,6 +185,8 @@ async def async_client(test_db):
             if test_db.is_active:
                 test_db.rollback()
     
+    # Restored afterwards, so later tests keep using the test database
+    overrides = dict(app.dependency_overrides)
     app.dependency_overrides[get_db] = override_get_db
     
     transport = ASGITransport(app=app)
@@ -101,6 +194,7 @@ async def async_client(test_db):
         yield ac
     
     app.dependency_overrides.clear()
+    app.dependency_overrides.update(overrides)
 
 @pytest.fixture(scope="function")
 def client():
@@ -1,42 +1,46 @@
 import pytest
+import asyncio
+import json
+import time
 from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi import HTTPException
 from datetime import datetime, timedelta
-import aiohttp
-from app.services.arcgis import ArcGISService
+from app.services import arcgis
+from app.services.arcgis import ArcGISService, usage_recorder
+from app.services.http_client import HTTPResponse
 from app.models.arcgis_usage import ArcGISUsage
 from app.core.config import get_settings
 
 @pytest.fixture
 def mock_redis():
     with patch('app.services.arcgis.redis_client') as mock_redis:
+        # Empty cache and unseeded usage counters by default
+        mock_redis.get = AsyncMock(return_value=None)
+        mock_redis.mget = AsyncMock(return_value=[None, None])
+        mock_redis.set = AsyncMock(return_value=True)
+        mock_redis.setex = AsyncMock(return_value=True)
+        mock_redis.exists = AsyncMock(return_value=0)
+        mock_redis.delete = AsyncMock(return_value=1)
+        mock_redis.eval = AsyncMock(return_value=1)
         yield mock_redis
 
 @pytest.fixture
 def mock_response():
-    response = AsyncMock()
-    response.status = 200
-    response.json.return_value = {"result": "test"}
-    return response
+    return HTTPResponse(status=200, headers={}, body=b'{"result": "test"}', url="https://test")
 
 @pytest.fixture
-def mock_aiohttp_session(mock_response):
-    """Create a properly mocked aiohttp session"""
-    async def get(*args, **kwargs):
-        return mock_response
-    
-    session = AsyncMock()
-    session.get = AsyncMock(side_effect=get)
-    
-    with patch('aiohttp.ClientSession', return_value=session):
-        yield session
+def mock_http_client(mock_response):
+    """Mock the shared HTTP client pool"""
+    with patch('app.services.arcgis.http_client') as client:
+        client.get = AsyncMock(return_value=mock_response)
+        yield client
 
 @pytest.fixture
 def arcgis_service(test_db):
     return ArcGISService(test_db)
 
 @pytest.mark.asyncio
-async def test_credit_usage_tracking(arcgis_service, test_db, mock_aiohttp_session, mock_response):
+async def test_credit_usage_tracking(arcgis_service, test_db, mock_redis, mock_http_client, mock_response):
     # Reset any existing usage
     test_db.query(ArcGISUsage).delete()
     test_db.commit()
@@ -45,6 +49,10 @@ async def test_credit_usage_tracking(arcgis_service, test_db, mock_aiohttp_sessi
     params = {"location": "test"}
     await arcgis_service._make_request("geocoding", params, "geocoding")
     
+    # Usage is buffered until the next flush
+    assert test_db.query(ArcGISUsage).count() == 0
+    assert await usage_recorder.flush(test_db) == 1
+    
     # Verify credit usage was logged
     usage = test_db.query(ArcGISUsage).first()
     assert usage is not None
@@ -53,7 +61,7 @@ async def test_credit_usage_tracking(arcgis_service, test_db, mock_aiohttp_sessi
     assert usage.cached is False
 
 @pytest.mark.asyncio
-async def test_cache_hits(arcgis_service, test_db, mock_redis, mock_aiohttp_session):
+async def test_cache_hits(arcgis_service, test_db, mock_redis, mock_http_client):
     # Reset any existing usage
     test_db.query(ArcGISUsage).delete()
     test_db.commit()
@@ -63,6 +71,7 @@ async def test_cache_hits(arcgis_service, test_db, mock_redis, mock_aiohttp_sess
     
     params = {"location": "test"}
     result = await arcgis_service._make_request("geocoding", params, "geocoding")
+    await usage_recorder.flush(test_db)
     
     # Verify cache hit was logged
     usage = test_db.query(ArcGISUsage).first()
@@ -70,7 +79,7 @@ async def test_cache_hits(arcgis_service, test_db, mock_redis, mock_aiohttp_sess
     assert result == {"result": "cached"}
 
 @pytest.mark.asyncio
-async def test_monthly_limit_enforcement(arcgis_service, test_db):
+async def test_monthly_limit_enforcement(arcgis_service, test_db, mock_redis):
     # Reset any existing usage
     test_db.query(ArcGISUsage).delete()
     test_db.commit()
@@ -92,7 +101,7 @@ async def test_monthly_limit_enforcement(arcgis_service, test_db):
     assert "Monthly limit" in str(exc_info.value.detail)
 
 @pytest.mark.asyncio
-async def test_daily_credit_limit(arcgis_service, test_db):
+async def test_daily_credit_limit(arcgis_service, test_db, mock_redis):
     # Reset any existing usage
     test_db.query(ArcGISUsage).delete()
     test_db.commit()
@@ -116,6 +125,77 @@ async def test_daily_credit_limit(arcgis_service, test_db):
     assert exc_info.value.status_code == 429
     assert "Daily ArcGIS credit limit reached" in str(exc_info.value.detail)
 
+@pytest.mark.asyncio
+async def test_limits_read_from_usage_counters(arcgis_service, test_db, mock_redis):
+    test_db.query(ArcGISUsage).delete()
+    test_db.commit()
+    
+    # Seeded counters are used without aggregating the usage table
+    mock_redis.mget = AsyncMock(return_value=[b"0.5", str(ArcGISUsage.MONTHLY_LIMITS["place_search"]).encode()])
+    with patch.object(ArcGISUsage, "get_monthly_usage") as monthly_usage:
+        with pytest.raises(HTTPException) as exc_info:
+            await arcgis_service._check_usage_limits("place_search")
+        monthly_usage.assert_not_called()
+    assert exc_info.value.status_code == 429
+    
+    # Missing counters are seeded from the database, including buffered rows
+    mock_redis.mget = AsyncMock(return_value=[None, None])
+    await usage_recorder.record("geocoding", 0.04)
+    monthly_count, daily_credits = await usage_recorder.get_totals(test_db, "geocoding")
+    assert monthly_count == 1
+    assert daily_credits == pytest.approx(0.04)
+    mock_redis.set.assert_any_call(
+        f"arcgis:usage:count:{datetime.utcnow().strftime('%Y-%m')}:geocoding", 1, ex=32 * 24 * 60 * 60, nx=True
+    )
+    await usage_recorder.flush(test_db)
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_fetch(arcgis_service, mock_redis, mock_http_client, mock_response):
+    async def slow_get(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return mock_response
+    mock_http_client.get = AsyncMock(side_effect=slow_get)
+    
+    params = {"address": "Tokyo Station"}
+    results = await asyncio.gather(*[
+        arcgis_service._make_request("findAddressCandidates", dict(params), "geocoding")
+        for _ in range(5)
+    ])
+    
+    assert results == [{"result": "test"}] * 5
+    assert mock_http_client.get.await_count == 1
+    # The Redis lock was taken and released around the single fetch
+    lock_key = f"arcgis:lock:{arcgis_service._generate_cache_key('findAddressCandidates', params)}"
+    lock_calls = [c for c in mock_redis.set.call_args_list if c.args[0] == lock_key]
+    assert len(lock_calls) == 1 and lock_calls[0].kwargs["nx"] is True
+    assert any(c.args[2] == lock_key for c in mock_redis.eval.call_args_list)
+    assert usage_recorder.pending_count() == 5
+    usage_recorder._pending.clear()
+
+@pytest.mark.asyncio
+async def test_stale_entry_served_while_revalidating(arcgis_service, test_db, mock_redis, mock_http_client):
+    stale_at = time.time() - get_settings().ARCGIS_CACHE_DURATION - 60
+    mock_redis.get = AsyncMock(return_value=json.dumps({
+        "response": {"result": "stale"}, "_cached_at": stale_at
+    }).encode())
+    
+    with patch('app.services.arcgis.SessionLocal', return_value=test_db):
+        result = await arcgis_service._make_request("route", {"stops": "a;b"}, "routing")
+        assert result == {"result": "stale"}
+        assert mock_http_client.get.await_count == 0
+        assert len(arcgis._refresh_tasks) == 1
+        
+        # Let the background refresh run
+        for _ in range(10):
+            await asyncio.sleep(0)
+    
+    assert mock_http_client.get.await_count == 1
+    assert not arcgis._refresh_tasks
+    refreshed = json.loads(mock_redis.setex.call_args.args[2])
+    assert refreshed["response"] == {"result": "test"}
+    assert refreshed["_cached_at"] > stale_at
+    usage_recorder._pending.clear()
+
 @pytest.mark.asyncio
 async def test_usage_alerts(arcgis_service, test_db):
     # Reset any existing usage
@@ -142,17 +222,11 @@ async def test_usage_alerts(arcgis_service, test_db):
     assert alert_level == "warning"
 
 @pytest.mark.asyncio
-async def test_error_handling(arcgis_service, mock_aiohttp_session):
-    # Create a mock response with error status
-    error_response = AsyncMock()
-    error_response.status = 403
-    error_response.json.return_value = {"error": "Forbidden"}
-    
-    # Update the session's get method to return error response
-    async def get_error(*args, **kwargs):
-        return error_response
-    
-    mock_aiohttp_session.get = AsyncMock(side_effect=get_error)
+async def test_error_handling(arcgis_service, mock_http_client):
+    # Return an error status from the upstream API
+    mock_http_client.get = AsyncMock(return_value=HTTPResponse(
+        status=403, headers={}, body=b'{"error": "Forbidden"}', url="https://test"
+    ))
     
     with pytest.raises(HTTPException) as exc_info:
         await arcgis_service._make_request("test", {}, "geocoding")
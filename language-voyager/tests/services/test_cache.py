@@ -0,0 +1,75 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.services.cache import RedisCache
+
+@pytest.fixture
+def redis_cache():
+    """RedisCache backed by an in-memory fake of the commands it uses"""
+    store = {}
+
+    async def mget(*keys):
+        return [store.get(k) for k in keys]
+
+    async def delete(*keys):
+        for k in keys:
+            store.pop(k, None)
+
+    class Pipeline:
+        def __init__(self):
+            self.ops = []
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            return False
+
+        def set(self, key, value, ex=None):
+            self.ops.append((key, value))
+
+        async def execute(self):
+            for key, value in self.ops:
+                store[key] = value.encode() if isinstance(value, str) else value
+
+    redis = MagicMock()
+    redis.mget = AsyncMock(side_effect=mget)
+    redis.delete = AsyncMock(side_effect=delete)
+    redis.pipeline = MagicMock(side_effect=lambda transaction=True: Pipeline())
+
+    cache = RedisCache()
+    cache.redis = redis
+    cache.proficiency_bucket = 10
+    return cache, store
+
+def test_quantize_proficiency(redis_cache):
+    cache, _ = redis_cache
+    assert cache.quantize_proficiency(0) == 0
+    assert cache.quantize_proficiency(37.5) == 30
+    assert cache.quantize_proficiency(39.9) == 30
+    assert cache.quantize_proficiency(100) == 100
+    assert cache.quantize_proficiency(140) == 100
+
+@pytest.mark.asyncio
+async def test_poi_content_hits_and_misses(redis_cache):
+    cache, store = redis_cache
+    content = {"content": {"vocabulary": [{"id": "v1"}]}, "local_context": {"dialect": "kansai"}}
+
+    assert await cache.get_poi_content("poi1", "ja", 30, client_version=1) is None
+    assert await cache.set_poi_content("poi1", "ja", 30, content, version=1)
+    assert json.loads(store["poi:poi1:content:ja:30:all"]) == content
+
+    # Same bucket and version is served from cache without the version marker
+    assert await cache.get_poi_content("poi1", "ja", 30, client_version=1) == content
+
+    # A content type filter is cached separately
+    assert await cache.get_poi_content("poi1", "ja", 30, client_version=1, content_type="phrase") is None
+
+    # A newer POI version drops the stale entry
+    assert await cache.get_poi_content("poi1", "ja", 30, client_version=2) is None
+    assert "poi:poi1:content:ja:30:all" not in store
+
+    stats = cache.get_stats()
+    assert stats["poi_content_hits"] == 1
+    assert stats["poi_content_misses"] == 3
+    assert stats["poi_content_hit_rate"] == 0.25
@@ -0,0 +1,107 @@
+import copy
+import pytest
+from app.core.config import get_settings
+from app.models.poi import PointOfInterest, POIContentHistory
+from app.services.content_history import ContentHistoryService
+
+@pytest.fixture
+def history_poi(test_db):
+    poi = PointOfInterest(
+        id="history_poi",
+        region_id="history_region",
+        name="History POI",
+        location={"lat": 35.68, "lon": 139.76},
+        type="landmark",
+        content={"ja": {"title": "v1", "hints": ["a"]}}
+    )
+    test_db.add(poi)
+    test_db.commit()
+    return poi
+
+def _edit(test_db, poi, changes, description=None):
+    previous_content = copy.deepcopy(poi.content)
+    for lang, fields in changes.items():
+        poi.content.setdefault(lang, {}).update(fields)
+    poi.update_content_version(change_description=description, changed_by="editor", previous_content=previous_content)
+    test_db.commit()
+
+def test_diff_round_trip():
+    old = {"ja": {"title": "a", "hints": ["x"], "extra": 1}, "en": {"title": "b"}}
+    new = {"ja": {"title": "c", "hints": ["x"]}, "ko": {"title": "d"}}
+    changes = POIContentHistory.diff(old, new)
+    assert changes == {
+        "set": [[["ja", "title"], "c"], [["ko"], {"title": "d"}]],
+        "unset": [["en"], ["ja", "extra"]]
+    }
+    assert POIContentHistory.apply(old, changes) == new
+    assert old["ja"]["title"] == "a"
+
+def test_versions_stored_as_diffs_with_snapshots(test_db, history_poi, monkeypatch):
+    monkeypatch.setattr(get_settings(), "POI_HISTORY_SNAPSHOT_INTERVAL", 3)
+    for version in range(2, 8):
+        _edit(test_db, history_poi, {"ja": {"title": f"v{version}"}}, description=f"edit {version}")
+
+    rows = test_db.query(POIContentHistory).filter(
+        POIContentHistory.poi_id == history_poi.id
+    ).order_by(POIContentHistory.version).all()
+    assert [(row.version, row.is_snapshot) for row in rows] == [
+        (1, True), (2, False), (3, True), (4, False), (5, False), (6, True), (7, False)
+    ]
+    assert rows[1].content == {"set": [[["ja", "title"], "v2"]], "unset": []}
+
+    service = ContentHistoryService(test_db)
+    assert service.get_content_at(history_poi.id, 5) == {"ja": {"title": "v5", "hints": ["a"]}}
+    assert service.get_content_at(history_poi.id, 1) == {"ja": {"title": "v1", "hints": ["a"]}}
+    assert service.get_content_at(history_poi.id, 8) is None
+
+    diff = service.get_content_diff(history_poi, 5)
+    assert [change["version"] for change in diff["changes"]] == [6, 7]
+    assert diff["changes"][1]["diff"] == {"set": [[["ja", "title"], "v7"]], "unset": []}
+    assert "content" in diff["changes"][0]
+
+    history = service.get_history(history_poi.id, limit=2)
+    assert [entry["version"] for entry in history] == [7, 6]
+    assert history[0]["change_description"] == "edit 7"
+    assert [entry["version"] for entry in service.get_history(history_poi.id, before_version=3)] == [2, 1]
+
+    # Responses carry only the current version summary
+    assert set(history_poi.get_version_info()) == {"current_version", "last_sync", "update_type"}
+    assert "content_history" not in history_poi.to_dict()
+
+def test_detail_edits_are_recorded_in_history(test_db, history_poi, monkeypatch):
+    monkeypatch.setattr(get_settings(), "POI_HISTORY_SNAPSHOT_INTERVAL", 3)
+    _edit(test_db, history_poi, {"ja": {"title": "v2"}})
+    history_poi.name = "Renamed POI"
+    test_db.commit()
+    _edit(test_db, history_poi, {"ja": {"title": "v4"}})
+
+    rows = test_db.query(POIContentHistory).filter(
+        POIContentHistory.poi_id == history_poi.id
+    ).order_by(POIContentHistory.version).all()
+    # The detail edit took version 3, so it holds the snapshot due at that version
+    assert [(row.version, row.is_snapshot) for row in rows] == [(1, True), (2, False), (3, True), (4, False)]
+    service = ContentHistoryService(test_db)
+    assert service.get_content_at(history_poi.id, 3) == {"ja": {"title": "v2", "hints": ["a"]}}
+    assert service.get_content_at(history_poi.id, 4) == {"ja": {"title": "v4", "hints": ["a"]}}
+
+def test_history_is_capped_at_a_snapshot(test_db, history_poi, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "POI_HISTORY_SNAPSHOT_INTERVAL", 2)
+    monkeypatch.setattr(settings, "POI_HISTORY_MAX_VERSIONS", 3)
+    for version in range(2, 9):
+        _edit(test_db, history_poi, {"ja": {"title": f"v{version}"}})
+
+    versions = [version for (version,) in test_db.query(POIContentHistory.version).filter(
+        POIContentHistory.poi_id == history_poi.id
+    ).order_by(POIContentHistory.version)]
+    assert versions == [6, 7, 8]
+    assert ContentHistoryService(test_db).get_content_at(history_poi.id, 6)["ja"]["title"] == "v6"
+
+def test_rollback_queues_pending_change(test_db, history_poi):
+    _edit(test_db, history_poi, {"ja": {"title": "v2"}})
+    conflict = ContentHistoryService(test_db).create_rollback(history_poi, 1)
+    test_db.commit()
+    assert conflict.proposed_changes == {"ja": {"title": "v1", "hints": ["a"]}}
+    assert conflict.conflict_type == "rollback"
+    assert conflict.conflict_metadata["target_version"] == 1
+    assert ContentHistoryService(test_db).create_rollback(history_poi, 9) is None
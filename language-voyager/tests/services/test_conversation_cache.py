@@ -0,0 +1,41 @@
+import pytest
+from app.services import conversation_cache as conversation_cache_module
+from app.services.conversation_cache import ConversationCache
+
+def _request(content, system="You are a native standard speaker at a train station"):
+    return {
+        "model": "test-model",
+        "temperature": 0.7,
+        "max_tokens": 1000,
+        "messages": [{"role": "system", "content": system}, {"role": "user", "content": content}]
+    }
+
+@pytest.mark.asyncio
+async def test_exact_and_normalized_hits():
+    cache = ConversationCache(ttl=60, maxsize=10, use_redis=False)
+    await cache.set(_request("Where is platform 4?"), "あちらです。")
+
+    assert await cache.get(_request("Where is platform 4?")) == "あちらです。"
+    assert await cache.get(_request("  where is PLATFORM 4 ")) == "あちらです。"
+    # A different POI context is a different prompt
+    assert await cache.get(_request("Where is platform 4?", system="At a temple")) is None
+
+    stats = cache.get_stats()
+    assert (stats["exact_hits"], stats["normalized_hits"], stats["misses"]) == (1, 1, 1)
+
+@pytest.mark.asyncio
+async def test_entries_expire_and_are_bounded(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(conversation_cache_module.time, "monotonic", lambda: now[0])
+    cache = ConversationCache(ttl=60, maxsize=4, use_redis=False)
+
+    await cache.set(_request("first"), "one")
+    now[0] += 61
+    assert await cache.get(_request("first")) is None
+
+    for i in range(3):
+        await cache.set(_request(f"question {i}"), str(i))
+    # Each reply takes an exact and a normalized entry
+    assert cache.get_stats()["size"] == 4
+    assert await cache.get(_request("question 0")) is None
+    assert await cache.get(_request("question 2")) == "2"
@@ -0,0 +1,111 @@
+import pytest
+from unittest.mock import AsyncMock
+from starlette.websockets import WebSocketState
+from app.services import geolocation
+from app.services.geolocation import GeolocationService, LocationFilter
+from app.models.poi import PointOfInterest
+from app.models.region import Region
+from app.services.spatial_index import POISpatialIndex, haversine_distance
+
+class FakeWebSocket:
+    client_state = WebSocketState.CONNECTED
+
+@pytest.fixture
+def tracking(monkeypatch):
+    update_location = AsyncMock()
+    monkeypatch.setattr(geolocation.manager, "update_user_location", update_location)
+    service = GeolocationService(FakeWebSocket(), user_id=1)
+    service.active = True
+    service.send_json = AsyncMock()
+    service._check_proximity = AsyncMock()
+    service.base_update_interval = service.min_update_interval = 5.0
+    return service, update_location
+
+async def _send_fix(service, lat, lon, accuracy=5.0, region_id="tokyo"):
+    service.last_update_time = 0  # bypass the wall-clock throttle
+    await service.handle_location_update({
+        "coords": {"latitude": lat, "longitude": lon, "accuracy": accuracy},
+        "region_id": region_id
+    })
+
+def test_location_filter_weights_by_accuracy():
+    location_filter = LocationFilter(process_noise=1.0)
+    assert location_filter.update(35.0, 139.0, 5.0, 0.0) == (35.0, 139.0)
+    # A very inaccurate outlier barely moves the estimate
+    lat, lon = location_filter.update(35.01, 139.0, 500.0, 1.0)
+    assert haversine_distance(35.0, 139.0, lat, lon) < 15
+
+@pytest.mark.asyncio
+async def test_stationary_fixes_are_dropped_and_backed_off(tracking):
+    service, update_location = tracking
+
+    await _send_fix(service, 35.681236, 139.767125)
+    # GPS jitter of a few meters around the same spot
+    for offset in (0.00002, -0.00003, 0.00001, -0.00002, 0.00003, 0.0):
+        await _send_fix(service, 35.681236 + offset, 139.767125 - offset)
+
+    assert update_location.await_count == 1
+    assert service.stats == {"received": 7, "forwarded": 1, "dropped": 6}
+    assert service.min_update_interval == 20.0
+
+    # Real movement is forwarded and restores the base interval
+    await _send_fix(service, 35.689592, 139.700413)
+    assert update_location.await_count == 2
+    assert service.min_update_interval == 5.0
+    assert service._check_proximity.await_count == 2
+
+@pytest.mark.asyncio
+async def test_movement_while_backed_off_is_not_throttled(tracking):
+    service, update_location = tracking
+    await _send_fix(service, 35.681236, 139.767125)
+    service.min_update_interval = 40.0
+    service.last_update_time = geolocation.datetime.utcnow().timestamp() - 10.0
+
+    # Jitter is still throttled by the backed-off interval
+    await service.handle_location_update({"coords": {"latitude": 35.68124, "longitude": 139.76713}, "region_id": "tokyo"})
+    assert service.stats["received"] == 1
+
+    await service.handle_location_update({"coords": {"latitude": 35.689592, "longitude": 139.700413}, "region_id": "tokyo"})
+    assert service.min_update_interval == 5.0
+    assert update_location.await_count == 2
+
+@pytest.mark.asyncio
+async def test_region_change_is_always_forwarded(tracking):
+    service, update_location = tracking
+    await _send_fix(service, 35.0, 139.0, region_id="tokyo")
+    await _send_fix(service, 35.0, 139.0, region_id="kanagawa")
+    assert update_location.await_count == 2
+
+@pytest.mark.asyncio
+async def test_power_save_mode_raises_interval(tracking):
+    service, _ = tracking
+    await service.start_tracking({"updateInterval": 5.0, "minimumDistance": 25.0, "powerSaveMode": True})
+    await service.stop_tracking()
+    assert service.base_update_interval == geolocation.settings.LOCATION_POWER_SAVE_INTERVAL
+    assert service.minimum_distance == 25.0
+
+@pytest.mark.asyncio
+async def test_proximity_without_region_indexes_every_region(test_db, monkeypatch):
+    index = POISpatialIndex()
+    monkeypatch.setattr(geolocation, "spatial_index", index)
+    monkeypatch.setattr(geolocation, "SessionLocal", lambda: test_db)
+    test_db.add(Region(
+        id="proximity_test", name="Proximity Test", local_name="近接テスト", description="Proximity test",
+        languages=["ja"], bounds={}, center={"lat": 35.68, "lon": 139.76},
+        difficulty_level=10, recommended_level=0
+    ))
+    test_db.add(PointOfInterest(
+        id="proximity_station", region_id="proximity_test", name="Station", type="station",
+        location={"lat": 35.681236, "lon": 139.767125}, content={}
+    ))
+    test_db.commit()
+    service = GeolocationService(FakeWebSocket(), user_id=1)
+    service.active = True
+    service.send_json = AsyncMock()
+
+    # Clients don't send a region with their fixes
+    await service._check_proximity(35.681236, 139.767125)
+
+    assert index.is_loaded()
+    message = service.send_json.await_args.args[0]
+    assert message["trigger"]["poi"]["id"] == "proximity_station"
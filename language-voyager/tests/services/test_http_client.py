@@ -0,0 +1,85 @@
+import pytest
+import aiohttp
+import pytest_asyncio
+from aiohttp import web
+from app.services.http_client import HTTPClientPool
+
+@pytest_asyncio.fixture
+async def local_server():
+    """Start a local aiohttp server that fails the first /flaky request"""
+    state = {"flaky_calls": 0}
+
+    async def ok(request):
+        return web.json_response({"ok": True})
+
+    async def flaky(request):
+        state["flaky_calls"] += 1
+        if state["flaky_calls"] == 1:
+            return web.Response(status=503)
+        return web.json_response({"attempt": state["flaky_calls"]})
+
+    app = web.Application()
+    app.router.add_get("/ok", ok)
+    app.router.add_get("/flaky", flaky)
+    app.router.add_post("/flaky", flaky)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}", state
+    await runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_connections_are_reused(local_server):
+    base_url, _ = local_server
+    pool = HTTPClientPool()
+    try:
+        for _ in range(3):
+            response = await pool.get(f"{base_url}/ok")
+            assert response.status == 200
+            assert response.json() == {"ok": True}
+
+        metrics = pool.get_metrics()
+        assert metrics["requests_total"] == 3
+        assert metrics["in_flight"] == 0
+        assert metrics["connections_created"] == 1
+        assert metrics["connections_reused"] == 2
+    finally:
+        await pool.close()
+
+@pytest.mark.asyncio
+async def test_retry_on_retryable_status(local_server, monkeypatch):
+    base_url, state = local_server
+    monkeypatch.setattr("app.services.http_client.settings.HTTP_RETRY_BACKOFF", 0)
+    pool = HTTPClientPool()
+    try:
+        response = await pool.get(f"{base_url}/flaky", retries=2)
+        assert response.status == 200
+        assert response.json() == {"attempt": 2}
+        assert pool.get_metrics()["retries"] == 1
+
+        # Without retries the retryable status is returned to the caller
+        state["flaky_calls"] = 0
+        response = await pool.get(f"{base_url}/flaky", retries=0)
+        assert response.status == 503
+    finally:
+        await pool.close()
+
+@pytest.mark.asyncio
+async def test_post_is_not_retried_once_sent(local_server, monkeypatch):
+    base_url, state = local_server
+    monkeypatch.setattr("app.services.http_client.settings.HTTP_RETRY_BACKOFF", 0)
+    pool = HTTPClientPool()
+    try:
+        # The server may have acted on the request, so its 503 is returned as is
+        response = await pool.post(f"{base_url}/flaky", json={}, retries=2)
+        assert response.status == 503
+        assert state["flaky_calls"] == 1
+
+        # A request that never connected is retried
+        with pytest.raises(aiohttp.ClientConnectorError):
+            await pool.post("http://127.0.0.1:1/flaky", json={}, retries=1)
+        assert pool.get_metrics()["retries"] == 1
+    finally:
+        await pool.close()
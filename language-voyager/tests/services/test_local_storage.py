@@ -0,0 +1,74 @@
+import pytest
+from app.services import local_storage
+from app.services.local_storage import LocalStorageService
+
+@pytest.fixture
+def storage(test_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(local_storage.settings, "LOCAL_STORAGE_PATH", str(tmp_path))
+    service = LocalStorageService(test_db)
+    yield service
+    local_storage.close_local_storage()
+
+def test_connection_shared_and_in_wal_mode(test_db, storage):
+    assert LocalStorageService(test_db).local_db is storage.local_db
+    with storage.local_db.reader() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+@pytest.mark.asyncio
+async def test_package_pois_stored_as_compressed_rows(storage):
+    package = {
+        "version": "2.1",
+        "region": {"id": "tokyo"},
+        "pois": [{"id": f"poi_{i}", "name": f"POI {i}", "content": {"ja": "説明" * 50}} for i in range(5)]
+    }
+    result = await storage.store_offline_package("tokyo", package)
+    assert result["status"] == "stored"
+    assert result["metadata"]["poi_count"] == 5
+
+    assert await storage.get_offline_package("tokyo") == package
+    assert await storage.get_offline_package("tokyo", include_pois=False) == {
+        "version": "2.1", "region": {"id": "tokyo"}
+    }
+    pois = await storage.get_offline_pois("tokyo", ["poi_3", "missing"])
+    assert pois == {"poi_3": package["pois"][3]}
+
+    with storage.local_db.reader() as conn:
+        rows = conn.execute("SELECT data FROM offline_package_pois WHERE region_id = 'tokyo'").fetchall()
+    assert len(rows) == 5
+    assert all(isinstance(data, bytes) for (data,) in rows)
+
+@pytest.mark.asyncio
+async def test_legacy_text_packages_still_readable(storage):
+    with storage.local_db.transaction() as conn:
+        conn.execute(
+            "INSERT INTO offline_packages (region_id, data, version, stored_at) VALUES (?, ?, ?, ?)",
+            ("osaka", '{"version": "2.0", "pois": [{"id": "p1"}]}', "2.0", "2025-01-01T00:00:00")
+        )
+    assert await storage.get_offline_package("osaka") == {"version": "2.0", "pois": [{"id": "p1"}]}
+
+@pytest.mark.asyncio
+async def test_pending_updates_batched_and_ordered(storage):
+    updates = [{"type": "visit", "value": i} for i in range(50)]
+    assert await storage.queue_progress_updates("tokyo", 1, updates) == 50
+    assert await storage.queue_achievement_updates("tokyo", 1, [{"type": "badge"}]) == 1
+
+    changes = await storage.get_pending_changes("tokyo", 1)
+    assert changes["progress_updates"] == updates
+    assert changes["achievement_updates"] == [{"type": "badge"}]
+
+    await storage.process_sync_response("tokyo", {"status": "synced"})
+    changes = await storage.get_pending_changes("tokyo", 1)
+    assert changes["progress_updates"] == []
+
+@pytest.mark.asyncio
+async def test_sync_response_applies_content_updates(storage):
+    result = await storage.process_sync_response("tokyo", {
+        "status": "synced",
+        "content_updates": {"vocabulary": {"version": "3"}}
+    })
+    assert result["status"] == "processed"
+    with storage.local_db.reader() as conn:
+        row = conn.execute(
+            "SELECT version FROM content_versions WHERE region_id = 'tokyo' AND content_type = 'vocabulary'"
+        ).fetchone()
+    assert row[0] == "3"
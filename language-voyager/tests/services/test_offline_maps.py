@@ -0,0 +1,129 @@
+import gzip
+import json
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.routers.map import update_poi
+from app.routers.schemas.map import POIUpdate
+from app.services.offline_maps import OfflineMapService
+from app.models.poi import PointOfInterest, POIOfflineRecord
+from app.models.region import Region
+
+@pytest.fixture
+def package_region(test_db):
+    region = test_db.query(Region).filter(Region.id == "offline_test").first()
+    if not region:
+        region = Region(
+            id="offline_test",
+            name="Offline Test",
+            local_name="オフライン",
+            description="Region used by offline package tests",
+            languages=["ja"],
+            bounds={"north": 35.8, "south": 35.6, "east": 139.9, "west": 139.6},
+            center={"lat": 35.68, "lon": 139.76},
+            difficulty_level=10,
+            recommended_level=0
+        )
+        test_db.add(region)
+        for i in range(3):
+            test_db.add(PointOfInterest(
+                id=f"offline_poi_{i}",
+                region_id=region.id,
+                name=f"Offline POI {i}",
+                location={"lat": 35.68, "lon": 139.76 + i / 100},
+                type="landmark",
+                content={}
+            ))
+        test_db.commit()
+    return region
+
+@pytest.mark.asyncio
+async def test_build_package_file_streams_records(test_db, package_region, tmp_path):
+    service = OfflineMapService(test_db)
+    service.package_dir = tmp_path
+    bounds = {"minx": 139.6, "miny": 35.6, "maxx": 139.9, "maxy": 35.8}
+    service.arcgis_service.api_key = "test-key"
+
+    manifest = await service.build_package_file(package_region.id, bounds, zoom_levels=[12, 16], user_id=1)
+
+    path = service.get_package_path(package_region.id, 1)
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert records[0]["type"] == "header"
+    assert records[0]["region"]["id"] == package_region.id
+    assert records[-1] == {"type": "end", "counts": manifest["counts"]}
+
+    # Tiles are described by one range per zoom level, not enumerated
+    tiles = [r for r in records if r["type"] == "tiles"]
+    assert [t["z"] for t in tiles] == [12, 16]
+    assert sum(
+        (t["max_x"] - t["min_x"] + 1) * (t["max_y"] - t["min_y"] + 1) for t in tiles
+    ) == manifest["total_tiles"]
+    assert manifest["total_tiles"] > len(records)
+
+    assert sorted(r["data"]["id"] for r in records if r["type"] == "poi") == [
+        "offline_poi_0", "offline_poi_1", "offline_poi_2"
+    ]
+    assert manifest["size"] == path.stat().st_size
+    assert list(path.parent.glob("*.tmp")) == []
+
+@pytest.mark.asyncio
+async def test_build_package_file_unknown_region(test_db, tmp_path):
+    service = OfflineMapService(test_db)
+    service.package_dir = tmp_path
+    with pytest.raises(ValueError):
+        await service.build_package_file("missing", {"minx": 0, "miny": 0, "maxx": 1, "maxy": 1})
+
+def _read_delta(delta: bytes):
+    return [json.loads(line) for line in gzip.decompress(delta).decode().splitlines()]
+
+@pytest.mark.asyncio
+async def test_region_delta_against_version_vector(test_db, package_region):
+    service = OfflineMapService(test_db)
+
+    # Writes precompute each POI's record
+    poi = test_db.get(PointOfInterest, "offline_poi_1")
+    record = test_db.get(POIOfflineRecord, poi.id)
+    assert record is not None and record.content_version == poi.content_version
+
+    poi.content = {"ja": {"title": "更新"}}
+    poi.content_version += 1
+    test_db.commit()
+    test_db.refresh(record)
+    assert record.content_version == poi.content_version
+
+    client_versions = {
+        "offline_poi_0": 1,
+        "offline_poi_1": 1,
+        "offline_poi_2": 1,
+        "offline_poi_removed": 3
+    }
+    records = _read_delta(await service.get_region_delta(package_region.id, client_versions))
+
+    assert records[0]["type"] == "delta"
+    assert records[0]["versions"] == {"offline_poi_1": poi.content_version}
+    assert records[0]["deleted"] == ["offline_poi_removed"]
+    pois = [r["data"] for r in records if r["type"] == "poi"]
+    assert [p["id"] for p in pois] == ["offline_poi_1"]
+    assert pois[0]["content"] == {"ja": {"title": "更新"}}
+    assert records[-1]["counts"] == {"pois": 1, "deleted": 1, "achievements": 0}
+
+    # An empty vector gets every POI, rebuilding any missing record
+    test_db.query(POIOfflineRecord).filter(POIOfflineRecord.poi_id == "offline_poi_2").delete()
+    test_db.commit()
+    records = _read_delta(await service.get_region_delta(package_region.id, {}))
+    assert sorted(r["data"]["id"] for r in records if r["type"] == "poi") == [
+        "offline_poi_0", "offline_poi_1", "offline_poi_2"
+    ]
+
+@pytest.mark.asyncio
+async def test_patched_poi_is_in_region_delta(test_async_engine, test_db, test_user, package_region):
+    test_user.is_admin = True
+    version = test_db.get(PointOfInterest, "offline_poi_0").content_version
+
+    async with AsyncSession(test_async_engine, join_transaction_mode="create_savepoint") as db:
+        await update_poi("offline_poi_0", POIUpdate(name="Renamed POI"), db=db, current_user=test_user)
+
+    client_versions = {f"offline_poi_{i}": version for i in range(3)}
+    records = _read_delta(await OfflineMapService(test_db).get_region_delta(package_region.id, client_versions))
+    assert records[0]["versions"] == {"offline_poi_0": version + 1}
+    pois = [r["data"] for r in records if r["type"] == "poi"]
+    assert [p["name"] for p in pois] == ["Renamed POI"]
@@ -0,0 +1,96 @@
+import pytest
+from datetime import timedelta
+from app.core.config import get_settings
+from app.models.achievement import Achievement
+from app.models.progress import UserProgress, POIVisit, ContentMasteryItem, ProcessedSyncEvent
+from app.services.offline_sync import OfflineSyncPipeline
+from app.services.progress_tracking import ProgressTracker
+
+@pytest.fixture
+def offline_progress(test_db, test_user):
+    progress = UserProgress(user_id=test_user.id, language="ja", region_id="sync_region")
+    test_db.add(progress)
+    test_db.commit()
+    return progress
+
+def _visit(event_id, progress_id, poi_id="sync_poi", **kwargs):
+    return {"event_id": event_id, "progress_id": progress_id, "poi_id": poi_id, **kwargs}
+
+def test_events_coalesced_into_batched_upserts(test_db, test_user, offline_progress):
+    pipeline = OfflineSyncPipeline(test_db, batch_size=100)
+    progress_updates = [
+        _visit("e1", offline_progress.id, time_spent=60, completed_content=["v1"],
+               mastery={"vocabulary": {"v1": 40}}, timestamp="2026-10-01T10:00:00"),
+        _visit("e2", offline_progress.id, time_spent=30, completed_content=["v1", "v2"],
+               mastery={"vocabulary": {"v1": 90, "v2": 50}}, timestamp="2026-10-01T11:00:00"),
+        # Same event delivered twice
+        _visit("e2", offline_progress.id, time_spent=30, completed_content=["v1", "v2"],
+               mastery={"vocabulary": {"v1": 90, "v2": 50}}, timestamp="2026-10-01T11:00:00"),
+        # Arrives late but is older than e2's score
+        _visit("e3", offline_progress.id, visit=False, mastery={"vocabulary": {"v1": 10}},
+               timestamp="2026-10-01T09:00:00"),
+        # Not the user's progress record
+        _visit("e4", offline_progress.id + 999, time_spent=10),
+    ]
+    achievement_updates = [
+        {"event_id": "a1", "achievement_id": "explorer", "type": "location", "progress": 40},
+        {"event_id": "a2", "achievement_id": "explorer", "type": "location", "progress": 100,
+         "completed_at": "2026-10-01T11:00:00"},
+    ]
+
+    result = pipeline.apply(test_user.id, progress_updates, achievement_updates)
+    assert result["applied"] == 5
+    assert result["duplicates"] == 1
+    assert result["rejected"] == 1
+    batch = result["batches"][0]
+    assert batch["rows"] == {"visits": 1, "mastery": 2, "achievements": 1}
+    assert {"dedupe_ms", "visits_ms", "mastery_ms", "achievements_ms", "commit_ms", "total_ms"} <= set(batch["timings"])
+
+    visit = test_db.query(POIVisit).filter(POIVisit.progress_id == offline_progress.id).one()
+    assert (visit.visits, visit.total_time) == (2, 90)
+    assert visit.completed_content == ["v1", "v2"]
+
+    tracker = ProgressTracker(test_db)
+    assert tracker.get_mastery_levels(offline_progress.id, ["v1", "v2"]) == {"vocabulary": {"v1": 90, "v2": 50}}
+    stats = tracker.get_mastery_stats(offline_progress.id)["vocabulary"]
+    assert (stats.score_sum, stats.item_count) == (140, 2)
+
+    achievement = test_db.query(Achievement).filter(Achievement.user_id == test_user.id).one()
+    assert achievement.progress == 100
+    assert achievement.completed_at is not None
+
+def test_retried_sync_is_idempotent(test_db, test_user, offline_progress):
+    updates = [
+        _visit("r1", offline_progress.id, time_spent=60, completed_content=["p1"],
+               mastery={"phrase": {"p1": 70}}, timestamp="2026-10-01T10:00:00"),
+        _visit("r2", offline_progress.id, time_spent=15, timestamp="2026-10-01T10:05:00"),
+    ]
+    first = OfflineSyncPipeline(test_db, batch_size=1).apply(test_user.id, updates, [])
+    assert len(first["batches"]) == 2
+    retry = OfflineSyncPipeline(test_db).apply(test_user.id, updates, [])
+    assert retry["applied"] == 0
+    assert retry["duplicates"] == 2
+
+    visit = test_db.query(POIVisit).filter(POIVisit.progress_id == offline_progress.id).one()
+    assert (visit.visits, visit.total_time) == (2, 75)
+    # A later sync adds to the stored counters and scores
+    OfflineSyncPipeline(test_db).apply(test_user.id, [
+        _visit("r3", offline_progress.id, time_spent=5, mastery={"phrase": {"p1": 100}},
+               timestamp="2026-10-02T10:00:00")
+    ], [])
+    test_db.refresh(visit)
+    assert (visit.visits, visit.total_time) == (3, 80)
+    stats = ProgressTracker(test_db).get_mastery_stats(offline_progress.id)["phrase"]
+    assert (stats.score_sum, stats.item_count) == (100, 1)
+    assert test_db.query(ProcessedSyncEvent).filter(ProcessedSyncEvent.user_id == test_user.id).count() == 3
+
+def test_expired_event_ids_are_pruned(test_db, test_user, offline_progress):
+    OfflineSyncPipeline(test_db).apply(test_user.id, [_visit("e1", offline_progress.id)], [])
+    processed_at = test_db.query(ProcessedSyncEvent.processed_at).filter(
+        ProcessedSyncEvent.event_id == f"{test_user.id}:e1"
+    ).scalar()
+
+    retention = timedelta(seconds=get_settings().OFFLINE_SYNC_EVENT_RETENTION)
+    assert OfflineSyncPipeline.prune_processed_events(test_db, now=processed_at + retention) == 0
+    assert OfflineSyncPipeline.prune_processed_events(test_db, now=processed_at + retention + timedelta(seconds=1)) == 1
+    assert test_db.query(ProcessedSyncEvent).filter(ProcessedSyncEvent.user_id == test_user.id).count() == 0
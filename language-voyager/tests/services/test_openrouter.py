@@ -1,3 +1,4 @@
+import json
 import pytest
 from datetime import datetime
 from app.services.openrouter import OpenRouterService
@@ -68,4 +69,94 @@ async def test_system_prompt_generation():
     assert "temple" in formal_prompt.lower()
     assert "75/100" in formal_prompt
     assert "shoes" in formal_prompt.lower()
-    assert "photos" in formal_prompt.lower()
\ No newline at end of file
+    assert "photos" in formal_prompt.lower()
+class _FakeStreamResponse:
+    """Upstream response serving pre-recorded server-sent event lines"""
+
+    def __init__(self, lines, status=200):
+        self.status = status
+        self.lines = lines
+
+    @property
+    def content(self):
+        async def iterate():
+            for line in self.lines:
+                yield line.encode("utf-8")
+        return iterate()
+
+    async def text(self):
+        return "".join(self.lines)
+
+@pytest.fixture
+def fake_stream(monkeypatch):
+    from contextlib import asynccontextmanager
+    from app.services import openrouter
+    from app.services.conversation_cache import conversation_cache
+
+    requests = []
+    lines = [
+        ": OPENROUTER PROCESSING\n",
+        "\n",
+        'data: {"choices": [{"delta": {"role": "assistant", "content": "4番線は"}}]}\n',
+        "\n",
+        'data: {"choices": [{"delta": {"content": "あちらです。"}}]}\n',
+        "\n",
+        'data: {"choices": [{"delta": {}, "finish_reason": "stop"}]}\n',
+        "data: [DONE]\n",
+    ]
+
+    @asynccontextmanager
+    async def stream(method, url, **kwargs):
+        requests.append(kwargs["json"])
+        yield _FakeStreamResponse(lines)
+
+    monkeypatch.setattr(openrouter.http_client, "stream", stream)
+    conversation_cache.clear()
+    yield requests
+    conversation_cache.clear()
+
+@pytest.mark.asyncio
+async def test_stream_conversation_relays_deltas_and_caches(fake_stream):
+    service = OpenRouterService()
+    context = {"poi_type": "train_station", "dialect": "standard"}
+    messages = [{"role": "user", "content": "Where is platform 4?"}]
+
+    events = [event async for event in service.stream_conversation(messages, context)]
+    assert [e["content"] for e in events if e["type"] == "delta"] == ["4番線は", "あちらです。"]
+    assert events[-1]["type"] == "done"
+    assert events[-1]["message"]["content"] == "4番線はあちらです。"
+    assert events[-1]["cached"] is False
+    assert fake_stream[0]["stream"] is True
+
+    # The same question at the same POI, typed differently, is served from cache
+    repeat = [{"role": "user", "content": "where is  platform 4"}]
+    events = [event async for event in service.stream_conversation(repeat, context)]
+    assert events == [
+        {"type": "delta", "content": "4番線はあちらです。"},
+        {"type": "done", "message": events[-1]["message"], "cached": True}
+    ]
+    response = await service.generate_conversation(messages, context)
+    assert response["cached"] is True
+    assert len(fake_stream) == 1
+
+def test_chat_streams_server_sent_events(fake_stream):
+    from fastapi.testclient import TestClient
+    from app.auth.utils import get_current_active_user
+    from app.main import app
+
+    app.dependency_overrides[get_current_active_user] = lambda: None
+    try:
+        with TestClient(app) as client:
+            response = client.post(
+                "/api/v1/conversation/chat",
+                params={"stream": "true"},
+                json={"messages": [{"role": "user", "content": "Where is platform 4?"}], "context": {}}
+            )
+    finally:
+        app.dependency_overrides.pop(get_current_active_user, None)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert [lines[0] for lines in events] == ["event: delta", "event: delta", "event: done"]
+    assert json.loads(events[-1][1][len("data: "):])["message"]["content"] == "4番線はあちらです。"
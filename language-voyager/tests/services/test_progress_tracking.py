@@ -0,0 +1,44 @@
+import pytest
+from app.models.progress import UserProgress, POIVisit, ContentMasteryItem, ContentMasteryStats
+from app.services.progress_tracking import ProgressTracker
+
+@pytest.fixture
+def tracked_progress(test_db):
+    progress = UserProgress(user_id=1, language="ja", region_id="tracking_region")
+    test_db.add(progress)
+    test_db.commit()
+    return progress
+
+def test_record_poi_visit_increments(test_db, tracked_progress):
+    tracker = ProgressTracker(test_db)
+    tracker.record_poi_visit(tracked_progress.id, "tracked_poi", time_spent=120, completed_items=["a", "b"])
+    tracker.record_poi_visit(tracked_progress.id, "tracked_poi", time_spent=60, completed_items=["b", "c", "c"])
+    test_db.commit()
+
+    visit = tracker.get_poi_visit(tracked_progress.id, "tracked_poi")
+    assert visit.visits == 2
+    assert visit.total_time == 180
+    assert visit.completed_content == ["a", "b", "c"]
+    assert test_db.query(POIVisit).filter(POIVisit.progress_id == tracked_progress.id).count() == 1
+
+def test_record_mastery_keeps_running_totals(test_db, tracked_progress):
+    tracker = ProgressTracker(test_db)
+    tracker.record_mastery(tracked_progress.id, "vocabulary", {"v1": 80, "v2": 60})
+    tracker.record_mastery(tracked_progress.id, "phrase", {"p1": 100})
+    # Re-scoring an item replaces its contribution instead of adding a new one
+    tracker.record_mastery(tracked_progress.id, "vocabulary", {"v2": 90})
+    test_db.commit()
+
+    stats = tracker.get_mastery_stats(tracked_progress.id)
+    assert stats["vocabulary"].score_sum == 170
+    assert stats["vocabulary"].item_count == 2
+    assert stats["vocabulary"].average == 85
+    assert tracker.get_average_mastery(tracked_progress.id) == (90, 3)
+
+    assert tracker.get_mastery_levels(tracked_progress.id, ["v2", "p1", "missing"]) == {
+        "vocabulary": {"v2": 90},
+        "phrase": {"p1": 100}
+    }
+    assert test_db.query(ContentMasteryItem).filter(
+        ContentMasteryItem.progress_id == tracked_progress.id
+    ).count() == 3
@@ -1,5 +1,9 @@
 import pytest
-from app.services.recommendation import ContentRecommender
+from types import SimpleNamespace
+from sqlalchemy import event
+from app.services import recommendation
+from app.services.recommendation import ContentRecommender, ContentFeatureStore
+from app.services.progress_tracking import ProgressTracker
 from app.models.content import LanguageContent, ContentType
 from app.models.progress import UserProgress
 from app.models.poi import PointOfInterest
@@ -78,22 +82,15 @@ def test_progress(test_db, test_user, test_region, test_poi):
         user_id=test_user.id,
         language="ja",
         region=test_region.id,
-        proficiency_level=50,
-        poi_progress={
-            test_poi.id: {
-                "visits": 3,
-                "completed_content": ["easy_vocab"],
-                "total_time": 900
-            }
-        },
-        content_mastery={
-            ContentType.VOCABULARY: {
-                "easy_vocab": 90
-            }
-        }
+        proficiency_level=50
     )
     test_db.add(progress)
     test_db.commit()
+
+    tracker = ProgressTracker(test_db)
+    tracker.record_poi_visit(progress.id, test_poi.id, time_spent=900, completed_items=["easy_vocab"])
+    tracker.record_mastery(progress.id, ContentType.VOCABULARY.value, {"easy_vocab": 90})
+    test_db.commit()
     return progress
 
 def test_calculate_content_difficulty():
@@ -165,4 +162,95 @@ def test_recommendations_exclude_mastered(test_db, test_progress, test_poi, test
     
     # Verify the mastered content is not included
     content_ids = [r["id"] for r in recommendations]
-    assert "easy_vocab" not in content_ids  # This was marked as mastered in test_progress
\ No newline at end of file
+    assert "easy_vocab" not in content_ids  # This was marked as mastered in test_progress
+def test_recommendations_by_type_single_pass(test_db):
+    """Test batched recommendations across content types from cached features"""
+    items = [
+        ("batch_vocab_plain", ContentType.VOCABULARY, ["street"]),
+        ("batch_vocab_station", ContentType.VOCABULARY, ["station"]),
+        ("batch_phrase_station", ContentType.PHRASE, ["station", "formal"]),
+        ("batch_note", ContentType.CULTURAL_NOTE, []),
+    ]
+    for content_id, content_type, tags in items:
+        test_db.add(LanguageContent(
+            id=content_id,
+            language="ja",
+            region="batch_region",
+            content_type=content_type,
+            difficulty_level=2,
+            content={"text": content_id},
+            context_tags=tags
+        ))
+    test_db.commit()
+
+    poi = SimpleNamespace(id="batch_poi", region_id="batch_region", type="station")
+    progress = UserProgress(user_id=1, language="ja")
+    test_db.add(progress)
+    test_db.commit()
+    tracker = ProgressTracker(test_db)
+    tracker.record_mastery(progress.id, "vocabulary", {"batch_vocab_plain": 80})
+    test_db.commit()
+    test_db.refresh(progress)
+
+    queries = []
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        queries.append(statement)
+
+    store = ContentFeatureStore(ttl=60)
+    original_store = recommendation.content_features
+    recommendation.content_features = store
+    event.listen(test_db.bind, "before_cursor_execute", count_query)
+    try:
+        content_types = [ContentType.VOCABULARY, ContentType.PHRASE, ContentType.DIALOGUE, ContentType.CULTURAL_NOTE]
+        results = ContentRecommender.get_recommendations_by_type(
+            test_db, progress, poi, content_types=content_types, limit=5,
+            completed_content=["batch_phrase_station"]
+        )
+        # One query for region features, one for mastery of the selected items
+        assert len(queries) == 2
+
+        # Cached features are reused without another query
+        queries.clear()
+        ContentRecommender.get_recommendations_by_type(
+            test_db, progress, poi, content_types=content_types, completed_content=[]
+        )
+        assert len(queries) == 1
+    finally:
+        event.remove(test_db.bind, "before_cursor_execute", count_query)
+        recommendation.content_features = original_store
+
+    # Items tagged with the POI type rank first
+    assert [r["id"] for r in results[ContentType.VOCABULARY]] == ["batch_vocab_station", "batch_vocab_plain"]
+    assert results[ContentType.VOCABULARY][1]["completed"] is True
+    assert results[ContentType.VOCABULARY][1]["mastery_level"] == 80
+    assert results[ContentType.PHRASE][0]["completed"] is True
+    assert results[ContentType.DIALOGUE] == []
+    assert [r["id"] for r in results[ContentType.CULTURAL_NOTE]] == ["batch_note"]
+
+def test_content_writes_invalidate_region_features(test_db, monkeypatch):
+    test_db.add(PointOfInterest(
+        id="invalidate_poi", region_id="invalidate_region", name="Invalidate POI",
+        location={"lat": 35.68, "lon": 139.76}, type="station", content={}
+    ))
+    test_db.commit()
+    store = ContentFeatureStore(ttl=60)
+    monkeypatch.setattr(recommendation, "content_features", store)
+    invalidated = []
+    monkeypatch.setattr(recommendation.cache, "schedule_poi_content_invalidation", invalidated.extend)
+    assert len(store.get(test_db, "invalidate_region", "ja")) == 0
+
+    content = LanguageContent(
+        id="invalidate_vocab", language="ja", region="invalidate_region",
+        content_type=ContentType.VOCABULARY, difficulty_level=2, content={"text": "駅"}
+    )
+    test_db.add(content)
+    test_db.flush()
+    # Nothing is dropped until the write commits
+    assert invalidated == []
+    test_db.commit()
+    assert invalidated == ["invalidate_poi"]
+    assert len(store.get(test_db, "invalidate_region", "ja")) == 1
+
+    content.difficulty_level = 3
+    test_db.commit()
+    assert invalidated == ["invalidate_poi", "invalidate_poi"]
@@ -0,0 +1,94 @@
+import json
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.progress import UserProgress
+from app.models.region import Region
+from app.services.region_availability import RegionGraph, region_availability
+
+def _region(region_id, requirements=None):
+    return Region(
+        id=region_id,
+        name=region_id.title(),
+        local_name=region_id,
+        description=f"{region_id.title()} region",
+        languages=[{"language_code": "ja", "name": "Japanese", "local_name": "日本語", "required_level": 0.0}],
+        bounds={"north": 1.0, "south": 0.0, "east": 1.0, "west": 0.0},
+        center={"lat": 0.5, "lng": 0.5},
+        difficulty_level=1.0,
+        recommended_level=0.0,
+        total_pois=0,
+        total_challenges=0,
+        requirements=requirements
+    )
+
+@pytest.fixture
+def unlock_graph():
+    """Three regions where kyoto unlocks through either of its requirements"""
+    region_availability._graph = RegionGraph([
+        _region("unlock_tokyo"),
+        _region("unlock_osaka", {"unlock_tokyo": 50.0}),
+        _region("unlock_kyoto", {"unlock_tokyo": 80.0, "unlock_osaka": 30.0}),
+    ])
+
+def _availability(payload):
+    return {region["id"]: (region["is_available"], region["requirements"]) for region in json.loads(payload)["data"]}
+
+@pytest.mark.asyncio
+async def test_progress_changes_patch_cached_regions(test_db, test_user, test_async_engine, unlock_graph):
+    async with AsyncSession(test_async_engine) as db:
+        payload, etag = await region_availability.get_regions(db, test_user.id)
+    assert _availability(payload) == {
+        "unlock_tokyo": (True, None),
+        "unlock_osaka": (False, {"unlock_tokyo": 50.0}),
+        "unlock_kyoto": (False, {"unlock_tokyo": 80.0, "unlock_osaka": 30.0}),
+    }
+    assert json.loads(payload)["message"] == "Regions retrieved successfully"
+
+    # Progress written through the ORM re-evaluates the dependent regions in place
+    progress = UserProgress(user_id=test_user.id, language="ja", region_name="unlock_tokyo", proficiency_level=60.0)
+    test_db.add(progress)
+    test_db.commit()
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(test_async_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        async with AsyncSession(test_async_engine) as db:
+            updated, updated_etag = await region_availability.get_regions(db, test_user.id)
+    finally:
+        event.remove(test_async_engine.sync_engine, "before_cursor_execute", listener)
+    assert statements == []
+    assert updated_etag != etag
+    assert _availability(updated)["unlock_osaka"] == (True, None)
+    assert _availability(updated)["unlock_kyoto"] == (False, {"unlock_tokyo": 80.0, "unlock_osaka": 30.0})
+
+    # A lower level drops the entry so the user's levels are reloaded
+    misses = region_availability.get_stats()["misses"]
+    progress.proficiency_level = 10.0
+    test_db.commit()
+    async with AsyncSession(test_async_engine) as db:
+        reloaded, reloaded_etag = await region_availability.get_regions(db, test_user.id)
+    assert reloaded_etag == etag
+    assert region_availability.get_stats()["misses"] == misses + 1
+
+def test_region_changes_invalidate_graph(test_db, unlock_graph):
+    region_availability._users[1] = object()
+    test_db.add(_region("unlock_nara", {"unlock_kyoto": 10.0}))
+    test_db.commit()
+    assert region_availability._graph is None
+    assert not region_availability._users
+
+@pytest.mark.asyncio
+async def test_rolled_back_progress_does_not_unlock_regions(test_db, test_user, test_async_engine, unlock_graph):
+    async with AsyncSession(test_async_engine) as db:
+        payload, etag = await region_availability.get_regions(db, test_user.id)
+
+    test_db.add(UserProgress(user_id=test_user.id, language="ja", region_name="unlock_tokyo", proficiency_level=60.0))
+    test_db.flush()
+    test_db.rollback()
+
+    # Nothing was committed, so the cached entry is served unchanged
+    async with AsyncSession(test_async_engine) as db:
+        reloaded, reloaded_etag = await region_availability.get_regions(db, test_user.id)
+    assert reloaded_etag == etag
+    assert _availability(reloaded)["unlock_osaka"] == (False, {"unlock_tokyo": 50.0})
@@ -0,0 +1,95 @@
+import pytest
+from app.services.spatial_index import POISpatialIndex, haversine_distance
+from app.models.poi import PointOfInterest
+from app.models.region import Region
+
+@pytest.fixture
+def index_region(test_db):
+    region = test_db.query(Region).filter(Region.id == "spatial_test").first()
+    if not region:
+        region = Region(
+            id="spatial_test",
+            name="Spatial Test",
+            local_name="空間テスト",
+            description="Region used by spatial index tests",
+            languages=["ja"],
+            bounds={"north": 35.8, "south": 35.6, "east": 139.9, "west": 139.6},
+            center={"lat": 35.68, "lon": 139.76},
+            difficulty_level=10,
+            recommended_level=0
+        )
+        test_db.add(region)
+        test_db.commit()
+    return region
+
+def _make_poi(poi_id: str, region_id: str, lat: float, lon: float, **kwargs) -> PointOfInterest:
+    return PointOfInterest(
+        id=poi_id,
+        region_id=region_id,
+        name=poi_id.replace("_", " ").title(),
+        local_name=kwargs.pop("local_name", None),
+        location={"lat": lat, "lon": lon},
+        type=kwargs.pop("type", "station"),
+        content={},
+        **kwargs
+    )
+
+@pytest.fixture
+def index_pois(test_db, index_region):
+    pois = [
+        _make_poi("idx_tokyo_station", index_region.id, 35.681236, 139.767125),
+        _make_poi("idx_imperial_palace", index_region.id, 35.685175, 139.752800, type="landmark"),
+        _make_poi("idx_shinjuku", index_region.id, 35.689592, 139.700413),
+        _make_poi("idx_hidden", index_region.id, 35.681300, 139.767200, is_published=False),
+    ]
+    for poi in pois:
+        test_db.merge(poi)
+    test_db.commit()
+    return pois
+
+def test_haversine_distance():
+    # Tokyo Station to Shinjuku Station is roughly 6.1km
+    distance = haversine_distance(35.681236, 139.767125, 35.689592, 139.700413)
+    assert 6000 < distance < 6200
+    assert haversine_distance(35.0, 139.0, 35.0, 139.0) == 0
+
+def test_load_region_and_radius_query(test_db, index_pois, index_region):
+    index = POISpatialIndex(cell_size=0.01)
+    loaded = index.load_region(test_db, index_region.id)
+
+    # Unpublished POIs are not indexed
+    assert loaded == 3
+    assert index.is_region_loaded(index_region.id)
+
+    nearby = index.nearby(35.681236, 139.767125, radius_meters=2000)
+    assert [f["id"] for f in nearby] == ["idx_tokyo_station", "idx_imperial_palace"]
+    assert nearby[0]["distance"] == 0
+    assert nearby[1]["distance"] < 2000
+
+    # Larger radius spans several grid cells
+    nearby = index.nearby(35.681236, 139.767125, radius_meters=7000)
+    assert {f["id"] for f in nearby} == {"idx_tokyo_station", "idx_imperial_palace", "idx_shinjuku"}
+
+    assert index.nearby(35.681236, 139.767125, radius_meters=2000, region_id="other") == []
+
+def test_upsert_and_remove_keep_index_current(test_db, index_pois, index_region):
+    index = POISpatialIndex(cell_size=0.01)
+    index.ensure_loaded(test_db, [index_region.id])
+
+    # Move Shinjuku next to Tokyo Station
+    moved = _make_poi("idx_shinjuku", index_region.id, 35.682, 139.768)
+    index.upsert(moved)
+    nearby_ids = [f["id"] for f in index.nearby(35.681236, 139.767125, radius_meters=500)]
+    assert "idx_shinjuku" in nearby_ids
+    assert len(index) == 3
+
+    index.remove("idx_shinjuku")
+    nearby_ids = [f["id"] for f in index.nearby(35.681236, 139.767125, radius_meters=500)]
+    assert "idx_shinjuku" not in nearby_ids
+    assert len(index) == 2
+
+def test_upsert_ignored_for_unloaded_region():
+    index = POISpatialIndex(cell_size=0.01)
+    index.upsert(_make_poi("idx_new", "not_loaded", 35.0, 139.0))
+    assert len(index) == 0
+    assert not index.has_pois()
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from starlette.websockets import WebSocketState
+from app.services.websocket import ConnectionManager
+
+class SlowWebSocket:
+    """WebSocket stand-in whose sends block until released"""
+    def __init__(self):
+        self.client_state = WebSocketState.CONNECTED
+        self.sent = []
+        self.release = asyncio.Event()
+
+    async def send_json(self, data):
+        await self.release.wait()
+        self.sent.append(data)
+
+    async def close(self):
+        self.client_state = WebSocketState.DISCONNECTED
+
+@pytest.fixture
+def connection_manager():
+    manager = ConnectionManager()
+    manager.redis_url = None
+    manager.queue_size = 3
+    return manager
+
+@pytest.mark.asyncio
+async def test_slow_client_drops_oldest_messages(connection_manager):
+    websocket = SlowWebSocket()
+    await connection_manager.connect(websocket, 1)
+
+    # Sends never wait on the client
+    for i in range(10):
+        await asyncio.wait_for(connection_manager.send_to_user(1, {"seq": i}), 0.1)
+    await asyncio.sleep(0)
+
+    websocket.release.set()
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+    # The first message was already in flight; the rest keep only the newest
+    assert [m["seq"] for m in websocket.sent] == [0, 7, 8, 9]
+    assert connection_manager.get_stats()["dropped"] == 6
+    await connection_manager.cleanup()
+
+@pytest.mark.asyncio
+async def test_stalled_client_is_disconnected(connection_manager):
+    connection_manager.send_timeout = 0.01
+    websocket = SlowWebSocket()
+    await connection_manager.connect(websocket, 1)
+
+    await connection_manager.send_to_user(1, {"type": "proximity_trigger"})
+    await asyncio.sleep(0.05)
+
+    assert 1 not in connection_manager.active_connections
+    assert websocket.client_state == WebSocketState.DISCONNECTED
+    assert connection_manager.get_stats()["slow_disconnects"] == 1
+
+@pytest.mark.asyncio
+async def test_remote_users_are_reached_through_pubsub(connection_manager):
+    connection_manager.redis = MagicMock()
+    connection_manager.redis.publish = AsyncMock()
+
+    await connection_manager.send_to_user(42, {"type": "proximity_trigger"})
+    connection_manager.redis.publish.assert_awaited_once_with(
+        "ws:user:42", json.dumps({"type": "proximity_trigger"})
+    )
+
+    # The worker holding the connection relays the published message
+    receiver = ConnectionManager()
+    receiver.redis_url = None
+    websocket = SlowWebSocket()
+    websocket.release.set()
+    await receiver.connect(websocket, 42)
+    receiver._dispatch({"type": "message", "channel": "ws:user:42", "data": json.dumps({"type": "proximity_trigger"})})
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+    assert websocket.sent == [{"type": "proximity_trigger"}]
+    assert receiver.get_stats()["received"] == 1
+    await receiver.cleanup()
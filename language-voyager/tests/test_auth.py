@@ -1,7 +1,12 @@
+from fastapi import Depends, FastAPI
 from fastapi.testclient import TestClient
 import pytest
-from app.auth.utils import create_access_token
-from sqlalchemy import text
+from app.auth.utils import create_access_token, get_current_active_user, get_current_user, get_password_hash
+from app.auth.user_cache import user_cache
+from app.database.config import get_async_db
+from app.models.user import User
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
 import uuid
 
 @pytest.fixture
@@ -344,4 +349,60 @@ def test_reset_password_invalid_token(client):
         }
     )
     assert response.status_code == 400
-    assert "Invalid or expired reset token" in response.json()["detail"]
\ No newline at end of file
+    assert "Invalid or expired reset token" in response.json()["detail"]
+
+
+def test_current_user_resolved_once_and_cached(test_db, test_async_engine):
+    user = User(
+        email="cached_user@example.com",
+        username="testuser_cached",
+        hashed_password=get_password_hash("testpass123"),
+        is_active=True
+    )
+    test_db.add(user)
+    test_db.commit()
+
+    calls = {"resolved": 0}
+    async def counting_current_user(current_user: User = Depends(get_current_user)) -> User:
+        calls["resolved"] += 1
+        return await get_current_active_user(current_user)
+
+    # Same dependency declared on the route and as a parameter, as the routers do
+    app = FastAPI()
+    @app.get("/whoami", dependencies=[Depends(counting_current_user)])
+    async def whoami(current_user: User = Depends(counting_current_user)):
+        return {"id": current_user.id, "email": current_user.email}
+
+    async_session = async_sessionmaker(test_async_engine, expire_on_commit=False)
+    async def override_get_async_db():
+        async with async_session() as db:
+            yield db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+
+    expected = {"id": user.id, "email": user.email}
+    token = create_access_token({"sub": user.email})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    user_queries = []
+    bind = test_async_engine.sync_engine
+    def count_user_queries(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement:
+            user_queries.append(statement)
+    event.listen(bind, "before_cursor_execute", count_user_queries)
+    try:
+        with TestClient(app) as client:
+            for _ in range(3):
+                response = client.get("/whoami", headers=headers)
+                assert response.status_code == 200
+                assert response.json() == expected
+            assert calls["resolved"] == 3
+            assert len(user_queries) == 1
+            assert user_cache.get_stats()["hits"] >= 2
+
+            # Deactivation invalidates the cached entry
+            user.is_active = False
+            test_db.commit()
+            response = client.get("/whoami", headers=headers)
+            assert response.status_code == 401
+    finally:
+        event.remove(bind, "before_cursor_execute", count_user_queries)
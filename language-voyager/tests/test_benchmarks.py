@@ -0,0 +1,50 @@
+import pytest
+from redis.asyncio import Redis
+from app.services.arcgis import RELEASE_LOCK
+from benchmarks.fake_redis import FakeRedisServer
+from benchmarks.load_test import _release_lock, compare, percentile
+
+@pytest.mark.asyncio
+async def test_fake_redis_serves_app_commands():
+    server = FakeRedisServer(scripts={RELEASE_LOCK: _release_lock})
+    await server.start()
+    client = Redis.from_url(server.url)
+    try:
+        assert await client.set("lock", "token", nx=True, ex=30)
+        assert not await client.set("lock", "other", nx=True, ex=30)
+        assert await client.eval(RELEASE_LOCK, 1, "lock", "other") == 0
+        assert await client.eval(RELEASE_LOCK, 1, "lock", "token") == 1
+        assert not await client.exists("lock")
+
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.set("poi", "content", ex=60)
+            pipe.set("poi:version", 3, ex=60)
+            await pipe.execute()
+        assert await client.mget("poi", "poi:version") == [b"content", b"3"]
+        assert sorted([key async for key in client.scan_iter(match="poi*")]) == [b"poi", b"poi:version"]
+        assert server.stats()["commands"]["EVAL"] == 2
+    finally:
+        await client.aclose()
+        await server.stop()
+
+def test_compare_flags_regressions():
+    def run(p95, rps, queries):
+        return {"routes": {"list_regions": {
+            "latency_ms": {"p95": p95, "p99": p95},
+            "throughput_rps": rps,
+            "db_queries_per_request": queries
+        }}}
+
+    assert percentile([0.1, 0.2, 0.3, 0.4], 50) == 0.2
+    assert percentile([1, 2], 50) == 1
+    assert [percentile(list(range(1, 11)), pct) for pct in (50, 95, 99, 100)] == [5, 10, 10, 10]
+    assert percentile(list(range(1, 101)), 95) == 95
+    assert percentile([], 95) is None
+    comparison = compare(run(12.0, 95.0, 1.0), run(10.0, 100.0, 1.0), max_regression=0.25)
+    assert comparison["regressions"] == []
+    assert comparison["routes"]["list_regions"]["p95_ms"]["change"] == 0.2
+    comparison = compare(run(10.0, 50.0, 3.0), run(10.0, 100.0, 1.0), max_regression=0.25)
+    assert comparison["regressions"] == [
+        "list_regions throughput_rps: 100.0 -> 50.0",
+        "list_regions db_queries_per_request: 1.0 -> 3.0"
+    ]
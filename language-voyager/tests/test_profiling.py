@@ -0,0 +1,44 @@
+import logging
+import pytest
+from fastapi import Depends, FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.core.profiling import setup_profiling
+from app.database.config import get_db
+from app.services.http_client import http_client
+from benchmarks.fake_services import FakeArcGIS
+
+@pytest.mark.asyncio
+async def test_profiling_reports_queries_and_upstream_time(test_db, caplog):
+    upstream = FakeArcGIS(latency=0.01)
+    await upstream.start()
+    profiled = FastAPI()
+
+    @profiled.get("/items/{item_id}")
+    async def get_item(item_id: int, db: Session = Depends(get_db)):
+        # One query per related row, as in an N+1 loop
+        for related_id in range(6):
+            db.execute(text("SELECT :id"), {"id": related_id}).scalar()
+        await http_client.get(f"{upstream.url}/rest/features")
+        return {"id": item_id}
+
+    profiled.dependency_overrides[get_db] = lambda: test_db
+    setup_profiling(profiled, [test_db.get_bind()])
+    # Begin the session's SAVEPOINT now so it isn't counted as a query of the request
+    test_db.connection()
+
+    caplog.set_level(logging.DEBUG, logger="app.core.profiling")
+    try:
+        async with AsyncClient(transport=ASGITransport(app=profiled), base_url="http://test") as client:
+            response = await client.get("/items/7")
+    finally:
+        await http_client.close()
+        await upstream.stop()
+
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert 'db;dur=' in timing and 'desc="6 queries"' in timing
+    assert 'desc="1 requests"' in timing
+    assert "ran the same statement 6 times: SELECT ?" in caplog.text
+    assert "GET /items/{item_id} 200" in caplog.text